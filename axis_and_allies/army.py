@@ -0,0 +1,61 @@
+import logging
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.unit as unit
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+class Army:
+    def __init__(self, unit_table, counts=None) -> None:
+        self.unit_table = unit_table
+        if counts is None:
+            self.counts = numpy.zeros(len(unit_table), dtype=numpy.int64)
+        else:
+            self.counts = numpy.array(counts, dtype=numpy.int64)
+        assert self.counts.shape == (len(unit_table),), (self.counts.shape, len(unit_table))
+
+    def __len__(self) -> int:
+        return int(numpy.sum(self.counts))
+
+    def __str__(self) -> str:
+        return "{}".format(
+            {name:int(count) for name, count in zip(self.unit_table.names, self.counts) if count > 0}
+        )
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def copy(self):
+        return Army(self.unit_table, self.counts)
+
+    def calculate_ipc(self):
+        return int(numpy.sum(self.counts * self.unit_table.ipc_arr))
+
+    def to_unit_names(self):
+        unit_name_list = []
+        for name, count in zip(self.unit_table.names, self.counts):
+            unit_name_list += [name]*count
+        return unit_name_list
+
+    def to_units(self):
+        unit_index_list = numpy.repeat(numpy.arange(len(self.unit_table)), self.counts)
+        return [self.unit_table.unit_list[i].copy() for i in unit_index_list]
+
+
+def build_army_from_names(unit_table, unit_names):
+    return Army(unit_table, unit_table.build_counts_from_names(unit_names))
+
+
+def build_army_from_units(unit_table, units):
+    return Army(unit_table, unit_table.build_counts_from_units(units))
+
+
+def build_armies_from_units(attack_units, defense_units):
+    # the unit table only needs the unit types that take part in this battle
+    unit_table = unit.build_unit_table({x.name:x for x in list(attack_units) + list(defense_units)})
+
+    return build_army_from_units(unit_table, attack_units), build_army_from_units(unit_table, defense_units)
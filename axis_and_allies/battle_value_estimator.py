@@ -0,0 +1,193 @@
+import logging
+import collections
+
+import numpy
+import pandas
+
+import axis_and_allies.setup_logger as setup_logger
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+# regression targets, same names as the columns written by run_simulation.collect_data_for_modeling
+TARGET_NAMES = ["diff_remain_IPC", "frac_diff_remain_IPC"]
+DEFAULT_NUM_CALIBRATION_BINS = 10
+# column index for units the estimator has no data for
+NO_COLUMN = -1
+
+ACTIVATION_FUN_DICT = {
+    "identity":lambda x: x,
+    "relu":lambda x: numpy.maximum(x, 0.),
+    "tanh":numpy.tanh,
+    "logistic":lambda x: 1. / (1. + numpy.exp(-x)),
+}
+
+BattlePrediction = collections.namedtuple("BattlePrediction", TARGET_NAMES)
+
+CalibrationSummary = collections.namedtuple("CalibrationSummary",
+    ["num_samples", "rmse", "mae", "r2", "bias", "win_accuracy"]
+)
+
+
+class BattleValueEstimator:
+    # multi layer perceptron that predicts the expected result of a land battle from the unit counts, a fast
+    # replacement for running simulations.  Features are the attack counts, the defense counts and the IPC of each
+    # side, standardized with feature_mean and feature_std.  The network predicts the standardized targets
+    # (TARGET_NAMES), the forward pass is plain numpy so prediction does not need the training library
+    def __init__(self, unit_names, ipc_arr, coef_list, intercept_list, feature_mean, feature_std, target_mean,
+                 target_std, activation="relu") -> None:
+        if activation not in ACTIVATION_FUN_DICT:
+            raise AxisAndAlliesBattleValueEstimatorException(
+                "unknown activation:  {}  known:  {}".format(activation, sorted(ACTIVATION_FUN_DICT.keys()))
+            )
+
+        self.unit_names = list(unit_names)
+        self.unit_index_dict = {x:i for i, x in enumerate(self.unit_names)}
+        self.ipc_arr = numpy.asarray(ipc_arr, dtype=numpy.float64)
+        self.coef_list = [numpy.asarray(x, dtype=numpy.float64) for x in coef_list]
+        self.intercept_list = [numpy.asarray(x, dtype=numpy.float64) for x in intercept_list]
+        self.feature_mean = numpy.asarray(feature_mean, dtype=numpy.float64)
+        self.feature_std = numpy.asarray(feature_std, dtype=numpy.float64)
+        self.target_mean = numpy.asarray(target_mean, dtype=numpy.float64)
+        self.target_std = numpy.asarray(target_std, dtype=numpy.float64)
+        self.activation = activation
+
+        num_features = 2 * len(self.unit_names) + 2
+        if self.coef_list[0].shape[0] != num_features:
+            raise AxisAndAlliesBattleValueEstimatorException(
+                "first layer expects {} features, unit_names gives {}".format(self.coef_list[0].shape[0], num_features)
+            )
+
+    def __repr__(self) -> str:
+        return "unit_names:  {}  layer_sizes:  {}  activation:  {}".format(
+            self.unit_names, [x.shape[0] for x in self.coef_list] + [self.coef_list[-1].shape[1]], self.activation
+        )
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def predict(self, feature_arr):
+        # feature_arr:  battles x features, returns battles x targets
+        activation_fun = ACTIVATION_FUN_DICT[self.activation]
+
+        r = (feature_arr - self.feature_mean) / self.feature_std
+        last_layer = len(self.coef_list) - 1
+        for i, (coef, intercept) in enumerate(zip(self.coef_list, self.intercept_list)):
+            r = r @ coef + intercept
+            if i < last_layer:
+                r = activation_fun(r)
+
+        return r * self.target_std + self.target_mean
+
+    def predict_battle(self, attack_counts, defense_counts):
+        # attack_counts, defense_counts:  battles x unit types in unit_names order, or one battle as a 1D array.
+        # Returns arrays with one entry per battle, frac_diff_remain_IPC is clipped to [-1, 1]
+        r = self.predict(build_feature_arr(self.ipc_arr, attack_counts, defense_counts))
+        return BattlePrediction(diff_remain_IPC=r[:, 0], frac_diff_remain_IPC=numpy.clip(r[:, 1], -1., 1.))
+
+    def build_count_index(self, unit_names):
+        # column of each of unit_names in the estimator's unit order, NO_COLUMN for units it does not know
+        return numpy.array([self.unit_index_dict.get(x, NO_COLUMN) for x in unit_names])
+
+    def reorder_counts(self, counts, unit_names):
+        # counts with columns in unit_names order (e.g. a game state or unit table) to the estimator's unit order
+        counts = numpy.atleast_2d(counts)
+        count_index = self.build_count_index(unit_names)
+
+        unknown_locs = count_index == NO_COLUMN
+        if numpy.any(counts[:, unknown_locs] != 0):
+            raise AxisAndAlliesBattleValueEstimatorException(
+                "estimator has no data for units:  {}".format(
+                    [x for x, is_unknown in zip(unit_names, unknown_locs) if is_unknown]
+                )
+            )
+
+        r = numpy.zeros((counts.shape[0], len(self.unit_names)), dtype=counts.dtype)
+        r[:, count_index[~unknown_locs]] = counts[:, ~unknown_locs]
+        return r
+
+    def save(self, output_file):
+        layer_dict = {"coef_{}".format(i):x for i, x in enumerate(self.coef_list)}
+        layer_dict.update({"intercept_{}".format(i):x for i, x in enumerate(self.intercept_list)})
+        numpy.savez(
+            output_file, unit_names=numpy.array(self.unit_names), ipc_arr=self.ipc_arr,
+            feature_mean=self.feature_mean, feature_std=self.feature_std, target_mean=self.target_mean,
+            target_std=self.target_std, activation=numpy.array(self.activation),
+            num_layers=numpy.array(len(self.coef_list)), **layer_dict
+        )
+
+
+def build_feature_arr(ipc_arr, attack_counts, defense_counts):
+    # battles x features:  attack counts, defense counts, attack IPC, defense IPC
+    attack_counts = numpy.atleast_2d(attack_counts).astype(numpy.float64)
+    defense_counts = numpy.atleast_2d(defense_counts).astype(numpy.float64)
+    return numpy.hstack([
+        attack_counts, defense_counts, (attack_counts @ ipc_arr)[:, None], (defense_counts @ ipc_arr)[:, None]
+    ])
+
+
+def load_estimator(input_file):
+    with numpy.load(input_file) as data:
+        num_layers = int(data["num_layers"])
+        return BattleValueEstimator(
+            unit_names=[str(x) for x in data["unit_names"]], ipc_arr=data["ipc_arr"],
+            coef_list=[data["coef_{}".format(i)] for i in range(num_layers)],
+            intercept_list=[data["intercept_{}".format(i)] for i in range(num_layers)],
+            feature_mean=data["feature_mean"], feature_std=data["feature_std"], target_mean=data["target_mean"],
+            target_std=data["target_std"], activation=str(data["activation"])
+        )
+
+
+def build_counts_from_df(data_df, unit_names):
+    # attack and defense counts from the "<unit name>_attack" and "<unit name>_defense" columns of simulation data
+    attack_counts = data_df[[x + "_attack" for x in unit_names]].to_numpy()
+    defense_counts = data_df[[x + "_defense" for x in unit_names]].to_numpy()
+    return attack_counts, defense_counts
+
+
+def calculate_calibration(predicted, observed, num_bins=DEFAULT_NUM_CALIBRATION_BINS):
+    # predictions are split into bins of about equal size by predicted value.  A calibrated estimator has
+    # mean_predicted close to mean_observed in every bin
+    predicted = numpy.asarray(predicted, dtype=numpy.float64)
+    observed = numpy.asarray(observed, dtype=numpy.float64)
+
+    error = predicted - observed
+    total_sum_squares = numpy.sum((observed - observed.mean())**2)
+    r2 = 1. - numpy.sum(error**2) / total_sum_squares if total_sum_squares > 0 else numpy.nan
+    calibration_summary = CalibrationSummary(
+        num_samples=predicted.shape[0], rmse=float(numpy.sqrt(numpy.mean(error**2))),
+        mae=float(numpy.mean(numpy.abs(error))), r2=float(r2), bias=float(numpy.mean(error)),
+        win_accuracy=float(numpy.mean((predicted > 0) == (observed > 0)))
+    )
+
+    bin_edges = numpy.quantile(predicted, numpy.linspace(0., 1., num_bins + 1))
+    bin_index = numpy.clip(numpy.searchsorted(bin_edges, predicted, side="right") - 1, 0, num_bins - 1)
+    calibration_df = pandas.DataFrame({"bin":bin_index, "predicted":predicted, "observed":observed}).groupby("bin").agg(
+        num_samples=("predicted", "size"), mean_predicted=("predicted", "mean"), mean_observed=("observed", "mean"),
+        std_observed=("observed", "std")
+    )
+
+    return calibration_summary, calibration_df
+
+
+def build_calibration_report(estimator, data_df, num_bins=DEFAULT_NUM_CALIBRATION_BINS):
+    # calibration of each target against held out simulation data (rows of run_simulation.collect_data_for_modeling)
+    attack_counts, defense_counts = build_counts_from_df(data_df, estimator.unit_names)
+    prediction = estimator.predict_battle(attack_counts, defense_counts)
+
+    r = {}
+    for target_name, predicted in zip(TARGET_NAMES, prediction):
+        r[target_name] = calculate_calibration(predicted, data_df[target_name].to_numpy(), num_bins)
+    return r
+
+
+def format_calibration_report(calibration_report):
+    lines = []
+    for target_name, (calibration_summary, calibration_df) in calibration_report.items():
+        lines.append("{}  {}".format(target_name, calibration_summary))
+        lines.append(calibration_df.to_string())
+    return "\n".join(lines)
+
+
+class AxisAndAlliesBattleValueEstimatorException(Exception):
+    pass
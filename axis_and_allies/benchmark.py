@@ -0,0 +1,266 @@
+import logging
+
+import argparse
+import collections
+import itertools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.combat as combat
+import axis_and_allies.run_simulation as run_simulation
+import axis_and_allies.strategic_bombing as strategic_bombing
+import axis_and_allies.min_max.event_tree as evtre
+import axis_and_allies.min_max.build_purchase_nodes as build_purchase_nodes
+import axis_and_allies.reinforcement_learning.super_simple_env as super_simple_env
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+DEFAULT_BASELINE_FILE = "benchmark_baseline.json"
+# fractional change relative to the baseline that counts as a regression
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MIN_DURATION = 1.0
+SEED = 42
+
+PURCHASE_UNIT_NAMES = ["infantry", "artillery", "tank", "fighter", "bomber"]
+RL_IPC_COST_ARR = numpy.array([3, 4, 6, 10, 12])
+
+BenchmarkCase = collections.namedtuple("BenchmarkCase", ["name", "fun", "calculate_num_rounds"])
+
+BenchmarkResult = collections.namedtuple("BenchmarkResult",
+    ["name", "num_calls", "duration", "calls_per_sec", "num_rounds", "round_latency_usec", "peak_memory_bytes"]
+)
+
+
+def calculate_combat_num_rounds(combat_result):
+    return combat_result[-1][0]
+
+
+def build_combat_case(unit_dict, name, attack_unit_names, defense_unit_names, battle_type):
+    attack_units = run_simulation.build_units_from_names(unit_dict, attack_unit_names)
+    defense_units = run_simulation.build_units_from_names(unit_dict, defense_unit_names)
+
+    fun = lambda: combat.run_combat(attack_units, defense_units, battle_type)
+    return BenchmarkCase(name=name, fun=fun, calculate_num_rounds=calculate_combat_num_rounds)
+
+
+def build_combat_case_list(unit_dict):
+    r = []
+    for army_size in [3, 10, 30]:
+        r.append(build_combat_case(
+            unit_dict, "run_combat_land_{}".format(army_size),
+            ["infantry"]*army_size + ["artillery"]*(army_size//3) + ["tank"]*(army_size//3),
+            ["infantry"]*(army_size + army_size//2) + ["tank"]*(army_size//3),
+            combat.BATTLE_TYPE_LAND
+        ))
+
+    for army_size in [2, 6, 18]:
+        r.append(build_combat_case(
+            unit_dict, "run_combat_naval_{}".format(army_size),
+            ["submarine"]*army_size + ["destroyer"]*(army_size//2) + ["fighter"]*(army_size//2),
+            ["submarine"]*(army_size//2) + ["destroyer"]*(army_size//2) + ["cruiser"]*(army_size//2)
+            + ["aircraft carrier"]*1 + ["fighter"]*1,
+            combat.BATTLE_TYPE_NAVAL
+        ))
+
+    for army_size in [3, 10, 30]:
+        r.append(build_combat_case(
+            unit_dict, "run_combat_amphibious_{}".format(army_size),
+            ["infantry"]*army_size + ["artillery"]*(army_size//3) + ["fighter"]*(army_size//3)
+            + ["battleship"]*1 + ["cruiser"]*1,
+            ["infantry"]*army_size + ["tank"]*(army_size//3) + ["anti-aircraft artillery"]*1,
+            combat.BATTLE_TYPE_AMPHIBIOUS
+        ))
+
+    return r
+
+
+def build_strategic_bombing_case_list(unit_dict):
+    r = []
+    for num_bombers in [1, 4, 16]:
+        attack_bombers = run_simulation.build_units_from_names(unit_dict, ["bomber"]*num_bombers)
+        fun = (lambda x: lambda: strategic_bombing.run_strategic_bombing(x))(attack_bombers)
+        r.append(BenchmarkCase(
+            name="run_strategic_bombing_{}".format(num_bombers), fun=fun, calculate_num_rounds=None
+        ))
+    return r
+
+
+def build_convert_action_case_list():
+    r = []
+    rng = numpy.random.RandomState(SEED)
+    # same ranges as the SuperSimpleEnv action space defaults
+    action_arr = numpy.hstack([
+        rng.uniform(-0.5, 0.5, (1000, 1)), rng.uniform(-5, 5, (1000, RL_IPC_COST_ARR.shape[0] - 1))
+    ])
+    for IPC_limit in [30, 100, 300]:
+        action_iter = itertools.cycle(action_arr)
+        fun = (lambda x, y: lambda: super_simple_env.convert_action_to_integers(
+            next(y), x, RL_IPC_COST_ARR
+        ))(IPC_limit, action_iter)
+        r.append(BenchmarkCase(
+            name="convert_action_to_integers_{}".format(IPC_limit), fun=fun, calculate_num_rounds=None
+        ))
+    return r
+
+
+def build_purchase_nodes_case_list(unit_dict):
+    r = []
+    purchase_unit_dict = {x:unit_dict[x] for x in PURCHASE_UNIT_NAMES}
+    for IPC_limit in [10, 15, 20]:
+        fun = (lambda x: lambda: build_purchase_nodes.build_purchase_nodes(
+            x, purchase_unit_dict, evtre.EventTree()
+        ))(IPC_limit)
+        r.append(BenchmarkCase(
+            name="build_purchase_nodes_{}".format(IPC_limit), fun=fun, calculate_num_rounds=None
+        ))
+    return r
+
+
+def build_benchmark_case_list(unit_dict):
+    return (
+        build_combat_case_list(unit_dict) + build_strategic_bombing_case_list(unit_dict)
+        + build_convert_action_case_list() + build_purchase_nodes_case_list(unit_dict)
+    )
+
+
+def run_benchmark_case(benchmark_case, min_duration=DEFAULT_MIN_DURATION, max_calls=10**6):
+    # timing and memory are measured in separate passes because tracemalloc slows down allocation
+    numpy.random.seed(SEED)
+
+    num_calls = 0
+    num_rounds = 0
+    start_time = time.perf_counter()
+    duration = 0.
+    while duration < min_duration and num_calls < max_calls:
+        r = benchmark_case.fun()
+        num_calls += 1
+        if benchmark_case.calculate_num_rounds is not None:
+            num_rounds += benchmark_case.calculate_num_rounds(r)
+        duration = time.perf_counter() - start_time
+
+    tracemalloc.start()
+    benchmark_case.fun()
+    _, peak_memory_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    round_latency_usec = None
+    if num_rounds > 0:
+        round_latency_usec = 1e6 * duration / num_rounds
+
+    return BenchmarkResult(
+        name=benchmark_case.name, num_calls=num_calls, duration=duration, calls_per_sec=num_calls / duration,
+        num_rounds=num_rounds, round_latency_usec=round_latency_usec, peak_memory_bytes=peak_memory_bytes
+    )
+
+
+def run_benchmarks(benchmark_case_list, min_duration=DEFAULT_MIN_DURATION, name_filter=None):
+    r = []
+    for benchmark_case in benchmark_case_list:
+        if name_filter is not None and name_filter not in benchmark_case.name:
+            continue
+
+        benchmark_result = run_benchmark_case(benchmark_case, min_duration)
+        logger.info("benchmark_result:  {}".format(benchmark_result))
+        r.append(benchmark_result)
+
+    return r
+
+
+def save_results(benchmark_result_list, output_file):
+    with open(output_file, "w") as file:
+        json.dump({x.name:x._asdict() for x in benchmark_result_list}, file, indent=2, sort_keys=True)
+
+
+def load_results(input_file):
+    with open(input_file) as file:
+        result_dict = json.load(file)
+    return [BenchmarkResult(**x) for x in result_dict.values()]
+
+
+def compare_to_baseline(benchmark_result_list, baseline_result_list, tolerance=DEFAULT_TOLERANCE):
+    # returns (name, metric, baseline value, current value) for every metric that got worse by more than tolerance
+    baseline_result_dict = {x.name:x for x in baseline_result_list}
+
+    regression_list = []
+    for cur_result in benchmark_result_list:
+        if cur_result.name not in baseline_result_dict:
+            logger.info("no baseline for cur_result.name:  {}".format(cur_result.name))
+            continue
+        baseline_result = baseline_result_dict[cur_result.name]
+
+        if cur_result.calls_per_sec < (1. - tolerance) * baseline_result.calls_per_sec:
+            regression_list.append(
+                (cur_result.name, "calls_per_sec", baseline_result.calls_per_sec, cur_result.calls_per_sec)
+            )
+
+        if cur_result.peak_memory_bytes > (1. + tolerance) * baseline_result.peak_memory_bytes:
+            regression_list.append(
+                (cur_result.name, "peak_memory_bytes", baseline_result.peak_memory_bytes,
+                 cur_result.peak_memory_bytes)
+            )
+
+    return regression_list
+
+
+def format_results(benchmark_result_list):
+    lines = ["{:<36} {:>14} {:>18} {:>18}".format("name", "calls_per_sec", "round_latency_usec", "peak_memory_kb")]
+    for x in benchmark_result_list:
+        round_latency = "" if x.round_latency_usec is None else "{:.1f}".format(x.round_latency_usec)
+        lines.append("{:<36} {:>14.1f} {:>18} {:>18.1f}".format(
+            x.name, x.calls_per_sec, round_latency, x.peak_memory_bytes / 1024.
+        ))
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="benchmark combat simulation, purchase and RL helper functions")
+    parser.add_argument("--baseline_file", default=DEFAULT_BASELINE_FILE,
+                        help="JSON file of previous results to compare against")
+    parser.add_argument("--save_baseline", action="store_true",
+                        help="write the results of this run to baseline_file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="fractional slowdown or memory increase allowed before a regression is reported")
+    parser.add_argument("--min_duration", type=float, default=DEFAULT_MIN_DURATION,
+                        help="minimum number of seconds to run each benchmark")
+    parser.add_argument("--name_filter", default=None, help="only run benchmarks whose name contains this string")
+    parser.add_argument("--unit_file", default=os.path.join(os.path.dirname(__file__), "unit_data.json"))
+    return parser
+
+
+def main(args):
+    unit_dict = build_unit_dict.load_units(args.unit_file)
+
+    benchmark_result_list = run_benchmarks(build_benchmark_case_list(unit_dict), args.min_duration, args.name_filter)
+    print(format_results(benchmark_result_list))
+
+    if args.save_baseline:
+        save_results(benchmark_result_list, args.baseline_file)
+        logger.info("saved baseline to args.baseline_file:  {}".format(args.baseline_file))
+        return 0
+
+    if not os.path.exists(args.baseline_file):
+        logger.info("no baseline found at args.baseline_file:  {}".format(args.baseline_file))
+        return 0
+
+    regression_list = compare_to_baseline(
+        benchmark_result_list, load_results(args.baseline_file), args.tolerance
+    )
+    for name, metric, baseline_value, cur_value in regression_list:
+        print("REGRESSION {} {}  baseline:  {}  current:  {}".format(name, metric, baseline_value, cur_value))
+
+    return 1 if len(regression_list) > 0 else 0
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=False)
+
+    sys.exit(main(build_parser().parse_args()))
@@ -1,9 +1,11 @@
 import numpy
 import logging
+import collections
 
 import axis_and_allies.setup_logger as setup_logger
 
 import axis_and_allies.unit as unit
+import axis_and_allies.army as army
 
 logger = logging.getLogger(setup_logger.LOGGER_NAME)
 
@@ -11,6 +13,14 @@ BATTLE_TYPE_LAND = 0
 BATTLE_TYPE_NAVAL = 1
 BATTLE_TYPE_AMPHIBIOUS = 2
 
+ARTILLERY_SUPPORTED_INFANTRY_ATTACK = 2
+
+MAX_AAA_ATTACKS_PER_UNIT = 3
+
+CombatBatchResult = collections.namedtuple("CombatBatchResult",
+    ["attack_counts", "defense_counts", "num_rounds"]
+)
+
 
 def run_combat_round(cur_attacker_units, cur_defender_units):
     attacker_units_that_hit,_ = calculate_hits(cur_attacker_units)
@@ -37,7 +47,7 @@ def calculate_temp_attacks(attacker_units):
     for i, cur_unit in enumerate(attacker_units):
         cur_unit.temp_attack = cur_unit.attack
         if cur_unit.name == unit.INFANTRY and num_paired_infantry < num_artillery:
-            cur_unit.temp_attack = 2
+            cur_unit.temp_attack = ARTILLERY_SUPPORTED_INFANTRY_ATTACK
             num_paired_infantry += 1
 
     return num_artillery, num_paired_infantry
@@ -87,7 +97,7 @@ def check_and_run_anti_aircraft_artillery(
     num_aaa_hits = 0
     AAA_to_hit_list = []
     if len(aaa_units) > 0 and num_attack_air > 0:
-        num_aaa_attacks = num_attack_air if num_attack_air < 3 else 3
+        num_aaa_attacks = num_attack_air if num_attack_air < MAX_AAA_ATTACKS_PER_UNIT else MAX_AAA_ATTACKS_PER_UNIT
         logger.debug("num_aaa_attacks:  {}".format(num_aaa_attacks))
 
         for cur_aaa_unit in aaa_units:
@@ -107,12 +117,22 @@ def check_and_run_anti_aircraft_artillery(
     return num_aaa_hits, AAA_to_hit_list
 
 
+def remove_first_units_of_type(units, unit_type, num_hits):
+    # units copied from the same unit_dict entry share an id, so remove by position rather than by id
+    remaining_units = []
+    num_removed = 0
+    for cur_unit in units:
+        if cur_unit.unit_type == unit_type and num_removed < num_hits:
+            num_removed += 1
+        else:
+            remaining_units.append(cur_unit)
+
+    return remaining_units
+
+
 def remove_air_units_from_aaa_defense(attacker_units, num_aaa_hits):
     if num_aaa_hits > 0:
-        air_units = [x for x in attacker_units if x.unit_type == unit.UNIT_TYPE_AIR]
-        destroyed_air_unit_ids = set([x.id for x in air_units[:num_aaa_hits]])
-    
-        remaining_attacker_units = [x for x in attacker_units if not x.id in destroyed_air_unit_ids]
+        remaining_attacker_units = remove_first_units_of_type(attacker_units, unit.UNIT_TYPE_AIR, num_aaa_hits)
     else:
         remaining_attacker_units=attacker_units
 
@@ -148,10 +168,7 @@ def check_for_and_run_submarine_surprise_attack(
 
 def remove_naval_units_from_sub_attack(cur_defender_units, num_sub_hits):
     if num_sub_hits > 0:
-        naval_units = [x for x in cur_defender_units if x.unit_type == unit.UNIT_TYPE_NAVAL]
-        destroyed_naval_unit_ids = set([x.id for x in naval_units[:num_sub_hits]])
-
-        remaining_defender_units = [x for x in cur_defender_units if not x.id in destroyed_naval_unit_ids]
+        remaining_defender_units = remove_first_units_of_type(cur_defender_units, unit.UNIT_TYPE_NAVAL, num_sub_hits)
     else:
         remaining_defender_units = cur_defender_units
     
@@ -234,4 +251,210 @@ def run_combat(attacker_units, defender_units, battle_type,
 
         results_list.append((combat_round, build_unit_snapshot(cur_attacker_units), build_unit_snapshot(cur_defender_units)))
 
-    return results_list
\ No newline at end of file
+    return results_list
+
+
+def build_batch_counts(counts, n_sims):
+    counts = numpy.asarray(counts, dtype=numpy.int64)
+    if counts.ndim == 1:
+        counts = numpy.tile(counts, (n_sims, 1))
+    assert counts.shape[0] == n_sims, (counts.shape, n_sims)
+
+    return counts
+
+
+def calculate_hit_probabilities(to_hit_arr):
+    return numpy.clip(numpy.asarray(to_hit_arr) / unit.DICE_SIDES, 0., 1.)
+
+
+def remove_cheapest_units(counts, num_hits, eligible_arr=None):
+    # counts columns must already be in loss order, so removing from the front of each row matches taking
+    # the front of the sorted unit list in run_combat
+    eligible_counts = counts if eligible_arr is None else counts * eligible_arr
+    num_before = numpy.cumsum(eligible_counts, axis=1) - eligible_counts
+    num_removed = numpy.clip(numpy.asarray(num_hits)[:, None] - num_before, 0, eligible_counts)
+
+    return counts - num_removed
+
+
+def calculate_attack_hits_batch(sorted_unit_table, attack_counts, rng=numpy.random):
+    hits = rng.binomial(attack_counts, sorted_unit_table.attack_p_arr)
+
+    infantry_index = sorted_unit_table.get_index(unit.INFANTRY)
+    artillery_index = sorted_unit_table.get_index(unit.ARTILLERY)
+    if infantry_index is not None and artillery_index is not None:
+        num_paired_infantry = numpy.minimum(attack_counts[:, infantry_index], attack_counts[:, artillery_index])
+
+        hits[:, infantry_index] = (
+            rng.binomial(attack_counts[:, infantry_index] - num_paired_infantry,
+                         sorted_unit_table.attack_p_arr[infantry_index])
+            + rng.binomial(num_paired_infantry, ARTILLERY_SUPPORTED_INFANTRY_ATTACK / unit.DICE_SIDES)
+        )
+
+    submarine_index = sorted_unit_table.get_index(unit.SUBMARINE)
+    if submarine_index is not None:
+        num_sub_hits = hits[:, submarine_index]
+        num_general_hits = numpy.sum(hits, axis=1) - num_sub_hits
+    else:
+        num_sub_hits = numpy.zeros(attack_counts.shape[0], dtype=numpy.int64)
+        num_general_hits = numpy.sum(hits, axis=1)
+
+    return num_general_hits, num_sub_hits
+
+
+def calculate_defense_hits_batch(sorted_unit_table, defense_counts, rng=numpy.random):
+    hits = rng.binomial(defense_counts, sorted_unit_table.defense_p_arr)
+    return numpy.sum(hits, axis=1)
+
+
+def run_naval_bombardment_batch(sorted_unit_table, battle_type, attack_counts, rng=numpy.random):
+    num_bombardment_hits = numpy.zeros(attack_counts.shape[0], dtype=numpy.int64)
+
+    if BATTLE_TYPE_AMPHIBIOUS == battle_type:
+        bombard_counts = attack_counts * sorted_unit_table.can_bombard_arr
+        bombard_hits = rng.binomial(bombard_counts, sorted_unit_table.attack_p_arr)
+        num_bombardment_hits = numpy.sum(bombard_hits, axis=1)
+
+        attack_counts = attack_counts * ~sorted_unit_table.is_naval_arr
+
+    return attack_counts, num_bombardment_hits
+
+
+def run_aaa_defense_batch(sorted_unit_table, attack_counts, defense_counts, rng=numpy.random):
+    aaa_index = sorted_unit_table.get_index(unit.ANTI_AIRCRAFT_ARTILLERY)
+    if aaa_index is None:
+        return attack_counts, defense_counts
+
+    num_attack_air = numpy.sum(attack_counts * sorted_unit_table.is_air_arr, axis=1)
+    num_aaa_attacks = numpy.minimum(num_attack_air, MAX_AAA_ATTACKS_PER_UNIT)
+
+    num_aaa_hits = rng.binomial(defense_counts[:, aaa_index] * num_aaa_attacks, sorted_unit_table.defense_p_arr[aaa_index])
+    num_aaa_hits = numpy.minimum(num_aaa_hits, num_attack_air)
+    logger.debug("num_aaa_hits:  {}".format(num_aaa_hits))
+
+    attack_counts = remove_cheapest_units(attack_counts, num_aaa_hits, sorted_unit_table.is_air_arr)
+
+    defense_counts = defense_counts.copy()
+    defense_counts[:, aaa_index] = 0
+
+    return attack_counts, defense_counts
+
+
+def run_combat_batch_round(sorted_unit_table, attack_counts, defense_counts, battle_type, num_bombardment_hits,
+                           rng=numpy.random):
+    num_general_attack_hits, num_sub_hits = calculate_attack_hits_batch(sorted_unit_table, attack_counts, rng)
+    num_general_attack_hits = num_general_attack_hits + num_bombardment_hits
+
+    # submarine hits can only be assigned to naval units, they are always removed before general hits
+    sub_defense_counts = remove_cheapest_units(defense_counts, num_sub_hits, sorted_unit_table.is_naval_arr)
+
+    if BATTLE_TYPE_NAVAL == battle_type:
+        submarine_index = sorted_unit_table.get_index(unit.SUBMARINE)
+        destroyer_index = sorted_unit_table.get_index(unit.DESTROYER)
+
+        has_subs = attack_counts[:, submarine_index] > 0 if submarine_index is not None else False
+        has_destroyers = defense_counts[:, destroyer_index] > 0 if destroyer_index is not None else False
+        did_surprise_attack_happen = numpy.logical_and(has_subs, numpy.logical_not(has_destroyers))
+        did_surprise_attack_happen = numpy.broadcast_to(did_surprise_attack_happen, (attack_counts.shape[0],))
+    else:
+        did_surprise_attack_happen = numpy.zeros(attack_counts.shape[0], dtype=bool)
+
+    # units removed by submarine surprise hits get removed immediately no defense attack
+    firing_defense_counts = numpy.where(did_surprise_attack_happen[:, None], sub_defense_counts, defense_counts)
+    num_defense_hits = calculate_defense_hits_batch(sorted_unit_table, firing_defense_counts, rng)
+
+    attack_counts = remove_cheapest_units(attack_counts, num_defense_hits)
+    defense_counts = remove_cheapest_units(sub_defense_counts, num_general_attack_hits)
+
+    return attack_counts, defense_counts
+
+
+def run_combat_batch(unit_table, attack_counts, defense_counts, battle_type, n_sims, rng=numpy.random):
+    # attack_counts / defense_counts are unit counts in the column order of unit_table, either a single army
+    # (1 dimensional) used for every simulation or one row per simulation
+    attack_counts = build_batch_counts(attack_counts, n_sims)
+    defense_counts = build_batch_counts(defense_counts, n_sims)
+
+    loss_order = unit_table.loss_order
+    sorted_unit_table = unit_table.build_sorted_by_loss_order()
+
+    cur_attack_counts, cur_defense_counts, num_bombardment_hits = run_combat_batch_setup(
+        sorted_unit_table, attack_counts[:, loss_order], defense_counts[:, loss_order], battle_type, rng
+    )
+
+    num_rounds = numpy.zeros(n_sims, dtype=numpy.int64)
+    combat_round = 0
+    live_locs = numpy.flatnonzero(
+        (numpy.sum(cur_attack_counts, axis=1) > 0) & (numpy.sum(cur_defense_counts, axis=1) > 0)
+    )
+    while live_locs.shape[0] > 0:
+        logger.debug("combat_round:  {}  live_locs.shape[0]:  {}".format(combat_round, live_locs.shape[0]))
+
+        cur_num_bombardment_hits = num_bombardment_hits[live_locs] if combat_round == 0 else 0
+
+        live_attack_counts, live_defense_counts = run_combat_batch_round(
+            sorted_unit_table, cur_attack_counts[live_locs], cur_defense_counts[live_locs], battle_type,
+            cur_num_bombardment_hits, rng
+        )
+        cur_attack_counts[live_locs] = live_attack_counts
+        cur_defense_counts[live_locs] = live_defense_counts
+        num_rounds[live_locs] += 1
+
+        still_live = (numpy.sum(live_attack_counts, axis=1) > 0) & (numpy.sum(live_defense_counts, axis=1) > 0)
+        live_locs = live_locs[still_live]
+
+        combat_round += 1
+
+    return CombatBatchResult(
+        attack_counts=unsort_counts(cur_attack_counts, loss_order),
+        defense_counts=unsort_counts(cur_defense_counts, loss_order),
+        num_rounds=num_rounds
+    )
+
+
+def unsort_counts(sorted_counts, loss_order):
+    counts = numpy.zeros(sorted_counts.shape, dtype=numpy.int64)
+    counts[..., loss_order] = sorted_counts
+    return counts
+
+
+def run_combat_batch_setup(sorted_unit_table, attack_counts, defense_counts, battle_type, rng=numpy.random):
+    attack_counts, num_bombardment_hits = run_naval_bombardment_batch(
+        sorted_unit_table, battle_type, attack_counts, rng
+    )
+
+    attack_counts, defense_counts = run_aaa_defense_batch(sorted_unit_table, attack_counts, defense_counts, rng)
+
+    return attack_counts, defense_counts, num_bombardment_hits
+
+
+def run_combat_army(attack_army, defense_army, battle_type, rng=numpy.random):
+    # same results_list as run_combat, with army.Army snapshots that only copy the unit counts each round
+    unit_table = attack_army.unit_table
+    loss_order = unit_table.loss_order
+    sorted_unit_table = unit_table.build_sorted_by_loss_order()
+
+    cur_attack_counts, cur_defense_counts, num_bombardment_hits = run_combat_batch_setup(
+        sorted_unit_table, attack_army.counts[None, loss_order], defense_army.counts[None, loss_order], battle_type,
+        rng
+    )
+
+    def build_army_snapshot(sorted_counts):
+        return army.Army(unit_table, unsort_counts(sorted_counts[0], loss_order))
+
+    combat_round = 0
+    results_list = [(combat_round, build_army_snapshot(cur_attack_counts), build_army_snapshot(cur_defense_counts))]
+    while cur_attack_counts.sum() > 0 and cur_defense_counts.sum() > 0:
+        cur_num_bombardment_hits = num_bombardment_hits if combat_round == 0 else 0
+
+        cur_attack_counts, cur_defense_counts = run_combat_batch_round(
+            sorted_unit_table, cur_attack_counts, cur_defense_counts, battle_type, cur_num_bombardment_hits, rng
+        )
+
+        combat_round += 1
+
+        results_list.append(
+            (combat_round, build_army_snapshot(cur_attack_counts), build_army_snapshot(cur_defense_counts))
+        )
+
+    return results_list
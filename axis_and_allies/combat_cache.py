@@ -0,0 +1,168 @@
+import logging
+import collections
+import os
+import pickle
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.combat as combat
+import axis_and_allies.exact_combat as exact_combat
+import axis_and_allies.run_simulation as run_simulation
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+CombatOutcomeDistribution = collections.namedtuple("CombatOutcomeDistribution",
+    ["attack_counts", "defense_counts", "probability", "combat_result_metric"]
+)
+
+
+def merge_sampled_outcomes(attack_counts, defense_counts):
+    num_unit_types = attack_counts.shape[1]
+    unique_outcomes, outcome_counts = numpy.unique(
+        numpy.hstack([attack_counts, defense_counts]), axis=0, return_counts=True
+    )
+    probability = outcome_counts / attack_counts.shape[0]
+
+    sort_index = numpy.argsort(-probability, kind="stable")
+    unique_outcomes = unique_outcomes[sort_index]
+
+    return unique_outcomes[:, :num_unit_types], unique_outcomes[:, num_unit_types:], probability[sort_index]
+
+
+def evaluate_combat_outcome_distribution(unit_table, attack_counts, defense_counts, battle_type, N_sim,
+                                         rng=numpy.random):
+    # exact distribution when the solver supports the battle, otherwise sampled with the batch engine
+    try:
+        exact_combat_outcome = exact_combat.calculate_exact_combat_outcome(
+            unit_table, attack_counts, defense_counts, battle_type
+        )
+        result_attack_counts, result_defense_counts, probability = exact_combat_outcome
+    except exact_combat.AxisAndAlliesExactCombatUnsupportedException:
+        logger.debug("exact solver does not support battle, running N_sim:  {}".format(N_sim))
+        combat_batch_result = combat.run_combat_batch(
+            unit_table, attack_counts, defense_counts, battle_type, N_sim, rng
+        )
+        result_attack_counts, result_defense_counts, probability = merge_sampled_outcomes(
+            combat_batch_result.attack_counts, combat_batch_result.defense_counts
+        )
+
+    combat_result_metric = run_simulation.calculate_metrics_from_counts(
+        unit_table.ipc_arr, result_attack_counts, result_defense_counts,
+        numpy.sum(attack_counts * unit_table.ipc_arr), numpy.sum(defense_counts * unit_table.ipc_arr)
+    )
+
+    return CombatOutcomeDistribution(
+        attack_counts=result_attack_counts, defense_counts=result_defense_counts, probability=probability,
+        combat_result_metric=combat_result_metric
+    )
+
+
+def calculate_expected_metrics(combat_outcome_distribution):
+    probability = combat_outcome_distribution.probability
+    return run_simulation.CombatResultMetric(
+        *[numpy.sum(x * probability) for x in combat_outcome_distribution.combat_result_metric]
+    )
+
+
+def calculate_metric_variances(combat_outcome_distribution):
+    # variance of each metric over the outcomes, same fields as calculate_expected_metrics
+    probability = combat_outcome_distribution.probability
+    expected_metrics = calculate_expected_metrics(combat_outcome_distribution)
+    return run_simulation.CombatResultMetric(*[
+        numpy.sum((x - y)**2 * probability)
+        for x, y in zip(combat_outcome_distribution.combat_result_metric, expected_metrics)
+    ])
+
+
+class CombatCache:
+    def __init__(self, unit_table, max_size=10000, N_sim=1000, cache_file=None,
+                 evaluate_fun=evaluate_combat_outcome_distribution) -> None:
+        self.unit_table = unit_table
+        self.max_size = max_size
+        self.N_sim = N_sim
+        self.cache_file = cache_file
+        self.evaluate_fun = evaluate_fun
+
+        self.cache_dict = collections.OrderedDict()
+        self.num_hits = 0
+        self.num_misses = 0
+
+        if cache_file is not None and os.path.exists(cache_file):
+            self.load(cache_file)
+
+    def __len__(self) -> int:
+        return len(self.cache_dict)
+
+    def __str__(self) -> str:
+        return """len(cache_dict):  {}
+max_size:  {}
+N_sim:  {}
+num_hits:  {}
+num_misses:  {}
+cache_file:  {}""".format(len(self.cache_dict), self.max_size, self.N_sim, self.num_hits, self.num_misses,
+                          self.cache_file)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def build_key(self, attack_counts, defense_counts, battle_type):
+        return (tuple(int(x) for x in attack_counts), tuple(int(x) for x in defense_counts), battle_type)
+
+    def get(self, attack_counts, defense_counts, battle_type):
+        key = self.build_key(attack_counts, defense_counts, battle_type)
+
+        if key in self.cache_dict:
+            self.num_hits += 1
+            self.cache_dict.move_to_end(key)
+            return self.cache_dict[key]
+
+        self.num_misses += 1
+        combat_outcome_distribution = self.evaluate_fun(
+            self.unit_table, numpy.array(key[0]), numpy.array(key[1]), battle_type, self.N_sim
+        )
+
+        self.cache_dict[key] = combat_outcome_distribution
+        while len(self.cache_dict) > self.max_size:
+            self.cache_dict.popitem(last=False)
+
+        return combat_outcome_distribution
+
+    def get_from_names(self, attack_unit_names, defense_unit_names, battle_type):
+        return self.get(
+            self.unit_table.build_counts_from_names(attack_unit_names),
+            self.unit_table.build_counts_from_names(defense_unit_names),
+            battle_type
+        )
+
+    def get_expected_metrics(self, attack_counts, defense_counts, battle_type):
+        return calculate_expected_metrics(self.get(attack_counts, defense_counts, battle_type))
+
+    def save(self, cache_file=None):
+        cache_file = self.cache_file if cache_file is None else cache_file
+        logger.info("saving len(cache_dict):  {}  cache_file:  {}".format(len(self.cache_dict), cache_file))
+
+        with open(cache_file, "wb") as file:
+            pickle.dump((self.unit_table.names, list(self.cache_dict.items())), file)
+
+    def load(self, cache_file):
+        with open(cache_file, "rb") as file:
+            unit_names, item_list = pickle.load(file)
+
+        if unit_names != self.unit_table.names:
+            raise AxisAndAlliesCombatCacheUnitMismatchException(
+                "cache_file unit names {} do not match unit_table names {}".format(unit_names, self.unit_table.names)
+            )
+
+        for key, combat_outcome_distribution in item_list:
+            self.cache_dict[key] = combat_outcome_distribution
+        while len(self.cache_dict) > self.max_size:
+            self.cache_dict.popitem(last=False)
+
+        logger.info("loaded len(cache_dict):  {}  cache_file:  {}".format(len(self.cache_dict), cache_file))
+
+
+class AxisAndAlliesCombatCacheUnitMismatchException(Exception):
+    pass
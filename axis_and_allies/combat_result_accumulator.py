@@ -0,0 +1,142 @@
+import logging
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+# same fields as run_simulation.CombatResultMetric
+METRIC_FIELDS = ["attack_ipc", "defense_ipc", "diff_ipc", "fraction_ipc_winner"]
+DIFF_IPC_FIELD_INDEX = METRIC_FIELDS.index("diff_ipc")
+
+
+class CombatResultAccumulator:
+    # online summary of combat results - memory depends only on the starting IPC of the armies and the number of
+    # rounds, not on the number of combat results added
+    def __init__(self, sum_start_ipc_attack, sum_start_ipc_defense) -> None:
+        self.sum_start_ipc_attack = int(sum_start_ipc_attack)
+        self.sum_start_ipc_defense = int(sum_start_ipc_defense)
+
+        self.N = 0
+        # running mean and sum of squared deviations of each metric field (Welford / Chan et al.)
+        self.mean_arr = numpy.zeros(len(METRIC_FIELDS))
+        self.M2_arr = numpy.zeros(len(METRIC_FIELDS))
+
+        # diff_ipc is an integer in [-sum_start_ipc_defense, sum_start_ipc_attack], index 0 is -sum_start_ipc_defense
+        self.diff_ipc_count_arr = numpy.zeros(self.sum_start_ipc_attack + self.sum_start_ipc_defense + 1,
+                                              dtype=numpy.int64)
+        self.num_rounds_count_arr = numpy.zeros(0, dtype=numpy.int64)
+
+    def __len__(self) -> int:
+        return self.N
+
+    def __str__(self) -> str:
+        return """N:  {}
+mean:  {}
+std:  {}
+diff_ipc quantiles 0.05 0.5 0.95:  {}
+mean_num_rounds:  {}""".format(self.N, self.calculate_mean(), self.calculate_std(),
+                               self.calculate_diff_ipc_quantile([0.05, 0.5, 0.95]), self.calculate_mean_num_rounds())
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def add(self, combat_result_metric, num_rounds=None):
+        # combat_result_metric fields can be scalars (one combat result) or arrays (one entry per combat result)
+        metric_arr = numpy.array([numpy.atleast_1d(x) for x in combat_result_metric], dtype=float)
+        N_add = metric_arr.shape[1]
+        if N_add == 0:
+            return
+
+        mean_add_arr = metric_arr.mean(axis=1)
+        M2_add_arr = numpy.sum((metric_arr - mean_add_arr[:, None])**2, axis=1)
+        self.merge_moments(N_add, mean_add_arr, M2_add_arr)
+
+        diff_ipc_index = numpy.rint(metric_arr[DIFF_IPC_FIELD_INDEX]).astype(numpy.int64) + self.sum_start_ipc_defense
+        self.diff_ipc_count_arr += numpy.bincount(diff_ipc_index, minlength=self.diff_ipc_count_arr.shape[0])
+
+        if num_rounds is not None:
+            self.add_num_rounds_count(numpy.bincount(numpy.atleast_1d(num_rounds)))
+
+    def merge_moments(self, N_other, mean_other_arr, M2_other_arr):
+        N_total = self.N + N_other
+        delta_arr = mean_other_arr - self.mean_arr
+
+        self.mean_arr = self.mean_arr + delta_arr * (N_other / N_total)
+        self.M2_arr = self.M2_arr + M2_other_arr + delta_arr**2 * (self.N * N_other / N_total)
+        self.N = N_total
+
+    def add_num_rounds_count(self, num_rounds_count_arr):
+        if num_rounds_count_arr.shape[0] > self.num_rounds_count_arr.shape[0]:
+            self.num_rounds_count_arr = numpy.pad(
+                self.num_rounds_count_arr, (0, num_rounds_count_arr.shape[0] - self.num_rounds_count_arr.shape[0])
+            )
+        self.num_rounds_count_arr[:num_rounds_count_arr.shape[0]] += num_rounds_count_arr
+
+    def merge(self, other):
+        if (other.sum_start_ipc_attack, other.sum_start_ipc_defense) != (self.sum_start_ipc_attack,
+                                                                          self.sum_start_ipc_defense):
+            raise AxisAndAlliesCombatResultAccumulatorMismatchException(
+                "cannot merge accumulators with different starting IPC self:  {}  other:  {}".format(
+                    (self.sum_start_ipc_attack, self.sum_start_ipc_defense),
+                    (other.sum_start_ipc_attack, other.sum_start_ipc_defense)
+                )
+            )
+
+        if other.N > 0:
+            self.merge_moments(other.N, other.mean_arr, other.M2_arr)
+            self.diff_ipc_count_arr += other.diff_ipc_count_arr
+        self.add_num_rounds_count(other.num_rounds_count_arr)
+
+        return self
+
+    def calculate_mean(self):
+        return dict(zip(METRIC_FIELDS, self.mean_arr))
+
+    def calculate_variance(self):
+        # population variance, same as numpy.var default
+        return dict(zip(METRIC_FIELDS, self.M2_arr / max(self.N, 1)))
+
+    def calculate_std(self):
+        return {k: numpy.sqrt(v) for k, v in self.calculate_variance().items()}
+
+    def build_ecdf(self):
+        # exact ECDF of diff_ipc:  the distinct values and the fraction of combat results <= each value
+        locs = self.diff_ipc_count_arr > 0
+        diff_ipc_arr = numpy.arange(self.diff_ipc_count_arr.shape[0])[locs] - self.sum_start_ipc_defense
+        cumulative_fraction_arr = numpy.cumsum(self.diff_ipc_count_arr[locs]) / max(self.N, 1)
+
+        return diff_ipc_arr, cumulative_fraction_arr
+
+    def calculate_diff_ipc_quantile(self, q):
+        # smallest diff_ipc whose ECDF is >= q
+        diff_ipc_arr, cumulative_fraction_arr = self.build_ecdf()
+        if diff_ipc_arr.shape[0] == 0:
+            return numpy.full(numpy.shape(q), numpy.nan)
+
+        index = numpy.searchsorted(cumulative_fraction_arr, q, side="left")
+        return diff_ipc_arr[numpy.minimum(index, diff_ipc_arr.shape[0] - 1)]
+
+    def build_diff_ipc_values(self):
+        # sorted diff_ipc values expanded from the histogram, size N
+        diff_ipc_arr = numpy.arange(self.diff_ipc_count_arr.shape[0]) - self.sum_start_ipc_defense
+        return numpy.repeat(diff_ipc_arr, self.diff_ipc_count_arr)
+
+    def calculate_mean_num_rounds(self):
+        N_rounds = self.num_rounds_count_arr.sum()
+        if N_rounds == 0:
+            return numpy.nan
+        return numpy.sum(numpy.arange(self.num_rounds_count_arr.shape[0]) * self.num_rounds_count_arr) / N_rounds
+
+
+def merge_accumulators(accumulator_iter):
+    r = None
+    for cur_accumulator in accumulator_iter:
+        r = cur_accumulator if r is None else r.merge(cur_accumulator)
+    return r
+
+
+class AxisAndAlliesCombatResultAccumulatorMismatchException(Exception):
+    pass
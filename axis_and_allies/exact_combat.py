@@ -0,0 +1,295 @@
+import logging
+import collections
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.unit as unit
+import axis_and_allies.combat as combat
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+ExactCombatOutcome = collections.namedtuple("ExactCombatOutcome",
+    ["attack_counts", "defense_counts", "probability"]
+)
+
+# everything needed to run the Markov chain for one starting army - the anti-aircraft artillery hits before combat
+# split a battle into several of these, one per possible number of air units lost
+ExactCombatBranch = collections.namedtuple("ExactCombatBranch",
+    ["probability", "attack_suffix_counts", "defense_suffix_counts", "attack_hit_dist_list",
+     "defense_hit_dist_list", "first_round_attack_hit_dist"]
+)
+
+
+def calculate_hit_distribution(to_hit_list):
+    # Poisson-binomial distribution of the number of hits, entry i is the probability of exactly i hits
+    hit_dist = numpy.ones(1)
+    for p in combat.calculate_hit_probabilities(numpy.asarray(to_hit_list, dtype=float)):
+        hit_dist = numpy.convolve(hit_dist, [1. - p, p])
+
+    return hit_dist
+
+
+def fold_hit_distribution(hit_dist, max_hits):
+    # hits beyond the number of units that can be removed are wasted, fold them into max_hits
+    folded_hit_dist = numpy.zeros(max_hits + 1)
+    n = min(hit_dist.shape[0], max_hits + 1)
+    folded_hit_dist[:n] = hit_dist[:n]
+    folded_hit_dist[max_hits] += numpy.sum(hit_dist[max_hits+1:])
+
+    return folded_hit_dist
+
+
+def build_unit_index_list(counts):
+    # one entry per unit, the column index of that unit, in loss order when counts are in loss order
+    return numpy.repeat(numpy.arange(counts.shape[0]), counts)
+
+
+def build_suffix_counts(unit_index_list, num_unit_types):
+    # row i holds the unit counts that remain when all but the last i units of unit_index_list have been lost
+    n = unit_index_list.shape[0]
+    suffix_counts = numpy.zeros((n+1, num_unit_types), dtype=numpy.int64)
+    for i in range(1, n+1):
+        suffix_counts[i] = suffix_counts[i-1]
+        suffix_counts[i, unit_index_list[n-i]] += 1
+
+    return suffix_counts
+
+
+def build_attack_to_hit_list(sorted_unit_table, counts):
+    to_hit_arr = numpy.repeat(sorted_unit_table.attack_arr, counts)
+
+    infantry_index = sorted_unit_table.get_index(unit.INFANTRY)
+    artillery_index = sorted_unit_table.get_index(unit.ARTILLERY)
+    if infantry_index is not None and artillery_index is not None:
+        num_paired_infantry = min(counts[infantry_index], counts[artillery_index])
+        infantry_start = int(numpy.sum(counts[:infantry_index]))
+        to_hit_arr[infantry_start:infantry_start+num_paired_infantry] = combat.ARTILLERY_SUPPORTED_INFANTRY_ATTACK
+
+    return to_hit_arr
+
+
+def build_defense_to_hit_list(sorted_unit_table, counts):
+    return numpy.repeat(sorted_unit_table.defense_arr, counts)
+
+
+def build_round_transition(attack_hit_dist, defense_hit_dist, num_attack, num_defense):
+    # entry [a, d] is the probability that one round starting from (num_attack, num_defense) ends with a
+    # attackers and d defenders remaining
+    attack_hit_dist = fold_hit_distribution(attack_hit_dist, num_defense)
+    defense_hit_dist = fold_hit_distribution(defense_hit_dist, num_attack)
+
+    return numpy.outer(defense_hit_dist, attack_hit_dist)[::-1, ::-1]
+
+
+def check_and_build_exact_combat_branches(unit_table, attack_counts, defense_counts, battle_type):
+    loss_order = unit_table.loss_order
+    sorted_unit_table = unit_table.build_sorted_by_loss_order()
+    num_unit_types = len(sorted_unit_table)
+
+    cur_attack_counts = numpy.asarray(attack_counts, dtype=numpy.int64)[loss_order]
+    cur_defense_counts = numpy.asarray(defense_counts, dtype=numpy.int64)[loss_order]
+
+    # submarine hits can only be taken by naval units, so the losses are no longer the front of the sorted list
+    is_attack_hit_arr = numpy.ones(num_unit_types, dtype=bool)
+    submarine_index = sorted_unit_table.get_index(unit.SUBMARINE)
+    if submarine_index is not None and cur_attack_counts[submarine_index] > 0:
+        if numpy.sum(cur_defense_counts * sorted_unit_table.is_naval_arr) > 0:
+            raise AxisAndAlliesExactCombatUnsupportedException(
+                "attacking submarines against defending naval units are not supported by the exact solver"
+            )
+        # with no naval defenders every submarine hit is wasted, only the other attackers' dice count
+        is_attack_hit_arr[submarine_index] = False
+
+    bombard_hit_dist = numpy.ones(1)
+    if combat.BATTLE_TYPE_AMPHIBIOUS == battle_type:
+        bombard_counts = cur_attack_counts * sorted_unit_table.can_bombard_arr
+        bombard_hit_dist = calculate_hit_distribution(build_attack_to_hit_list(sorted_unit_table, bombard_counts))
+        cur_attack_counts = cur_attack_counts * ~sorted_unit_table.is_naval_arr
+    logger.debug("bombard_hit_dist:  {}".format(bombard_hit_dist))
+
+    aaa_hit_dist = numpy.ones(1)
+    aaa_index = sorted_unit_table.get_index(unit.ANTI_AIRCRAFT_ARTILLERY)
+    if aaa_index is not None:
+        num_attack_air = int(numpy.sum(cur_attack_counts * sorted_unit_table.is_air_arr))
+        num_aaa_attacks = min(num_attack_air, combat.MAX_AAA_ATTACKS_PER_UNIT)
+        aaa_to_hit_list = [sorted_unit_table.defense_arr[aaa_index]] * (cur_defense_counts[aaa_index] * num_aaa_attacks)
+        aaa_hit_dist = fold_hit_distribution(calculate_hit_distribution(aaa_to_hit_list), num_attack_air)
+
+        cur_defense_counts = cur_defense_counts.copy()
+        cur_defense_counts[aaa_index] = 0
+    logger.debug("aaa_hit_dist:  {}".format(aaa_hit_dist))
+
+    defense_unit_index_list = build_unit_index_list(cur_defense_counts)
+    defense_suffix_counts = build_suffix_counts(defense_unit_index_list, num_unit_types)
+    defense_hit_dist_list = [
+        calculate_hit_distribution(build_defense_to_hit_list(sorted_unit_table, x)) for x in defense_suffix_counts
+    ]
+
+    branch_list = []
+    for num_aaa_hits, aaa_probability in enumerate(aaa_hit_dist):
+        if aaa_probability == 0.:
+            continue
+
+        branch_attack_counts = combat.remove_cheapest_units(
+            cur_attack_counts[None, :], numpy.array([num_aaa_hits]), sorted_unit_table.is_air_arr
+        )[0]
+
+        attack_unit_index_list = build_unit_index_list(branch_attack_counts)
+        attack_suffix_counts = build_suffix_counts(attack_unit_index_list, num_unit_types)
+        attack_hit_dist_list = [
+            calculate_hit_distribution(build_attack_to_hit_list(sorted_unit_table, x * is_attack_hit_arr))
+            for x in attack_suffix_counts
+        ]
+
+        first_round_attack_hit_dist = numpy.convolve(attack_hit_dist_list[-1], bombard_hit_dist)
+
+        branch_list.append(ExactCombatBranch(
+            probability=aaa_probability, attack_suffix_counts=attack_suffix_counts,
+            defense_suffix_counts=defense_suffix_counts, attack_hit_dist_list=attack_hit_dist_list,
+            defense_hit_dist_list=defense_hit_dist_list, first_round_attack_hit_dist=first_round_attack_hit_dist
+        ))
+
+    return branch_list
+
+
+def build_first_round_state_prob(branch):
+    num_attack = branch.attack_suffix_counts.shape[0] - 1
+    num_defense = branch.defense_suffix_counts.shape[0] - 1
+
+    if num_attack > 0 and num_defense > 0:
+        state_prob = build_round_transition(
+            branch.first_round_attack_hit_dist, branch.defense_hit_dist_list[num_defense], num_attack, num_defense
+        )
+    else:
+        state_prob = numpy.zeros((num_attack+1, num_defense+1))
+        state_prob[num_attack, num_defense] = 1.
+
+    return state_prob
+
+
+def calculate_terminal_state_prob(branch):
+    num_attack = branch.attack_suffix_counts.shape[0] - 1
+    num_defense = branch.defense_suffix_counts.shape[0] - 1
+
+    state_prob = build_first_round_state_prob(branch)
+
+    # every round either stays in place or loses units, so processing the states from the largest armies down
+    # visits each state after everything that can flow into it - the self loop is removed by renormalizing
+    for a in range(num_attack, 0, -1):
+        for d in range(num_defense, 0, -1):
+            cur_prob = state_prob[a, d]
+            if cur_prob == 0.:
+                continue
+
+            transition = build_round_transition(
+                branch.attack_hit_dist_list[a], branch.defense_hit_dist_list[d], a, d
+            )
+            stay_prob = transition[a, d]
+            if stay_prob >= 1.:
+                raise AxisAndAlliesCombatStalemateException(
+                    "neither side can score a hit with {} attacking and {} defending units".format(a, d)
+                )
+
+            transition[a, d] = 0.
+            state_prob[a, d] = 0.
+            state_prob[:a+1, :d+1] += cur_prob * transition / (1. - stay_prob)
+
+    return state_prob
+
+
+def calculate_round_state_prob_list(branch, max_rounds):
+    num_attack = branch.attack_suffix_counts.shape[0] - 1
+    num_defense = branch.defense_suffix_counts.shape[0] - 1
+
+    state_prob = numpy.zeros((num_attack+1, num_defense+1))
+    state_prob[num_attack, num_defense] = 1.
+    state_prob_list = [state_prob]
+
+    if max_rounds > 0:
+        state_prob = build_first_round_state_prob(branch)
+        state_prob_list.append(state_prob)
+
+    for combat_round in range(2, max_rounds+1):
+        new_state_prob = numpy.zeros(state_prob.shape)
+        new_state_prob[0, :] = state_prob[0, :]
+        new_state_prob[1:, 0] = state_prob[1:, 0]
+
+        for a, d in zip(*numpy.nonzero(state_prob[1:, 1:])):
+            a += 1
+            d += 1
+            transition = build_round_transition(
+                branch.attack_hit_dist_list[a], branch.defense_hit_dist_list[d], a, d
+            )
+            new_state_prob[:a+1, :d+1] += state_prob[a, d] * transition
+
+        state_prob = new_state_prob
+        state_prob_list.append(state_prob)
+
+    return state_prob_list
+
+
+def build_exact_combat_outcome(unit_table, branch_list, state_prob_list):
+    outcome_dict = collections.defaultdict(float)
+    for branch, state_prob in zip(branch_list, state_prob_list):
+        for a, d in zip(*numpy.nonzero(state_prob)):
+            key = (tuple(branch.attack_suffix_counts[a]), tuple(branch.defense_suffix_counts[d]))
+            outcome_dict[key] += branch.probability * state_prob[a, d]
+
+    key_list = sorted(outcome_dict.keys(), key=lambda x: -outcome_dict[x])
+    num_unit_types = len(unit_table)
+
+    loss_order = unit_table.loss_order
+    attack_counts = numpy.zeros((len(key_list), num_unit_types), dtype=numpy.int64)
+    defense_counts = numpy.zeros((len(key_list), num_unit_types), dtype=numpy.int64)
+    if len(key_list) > 0:
+        attack_counts[:, loss_order] = numpy.array([x[0] for x in key_list])
+        defense_counts[:, loss_order] = numpy.array([x[1] for x in key_list])
+    probability = numpy.array([outcome_dict[x] for x in key_list])
+
+    return ExactCombatOutcome(attack_counts=attack_counts, defense_counts=defense_counts, probability=probability)
+
+
+def calculate_exact_combat_outcome(unit_table, attack_counts, defense_counts, battle_type):
+    branch_list = check_and_build_exact_combat_branches(unit_table, attack_counts, defense_counts, battle_type)
+    logger.debug("len(branch_list):  {}".format(len(branch_list)))
+
+    state_prob_list = [calculate_terminal_state_prob(x) for x in branch_list]
+
+    return build_exact_combat_outcome(unit_table, branch_list, state_prob_list)
+
+
+def calculate_exact_combat_rounds(unit_table, attack_counts, defense_counts, battle_type, max_rounds):
+    # entry i is the distribution of the state after i combat rounds, battles that already finished keep their
+    # final state - same indexing as the results_list returned by combat.run_combat
+    branch_list = check_and_build_exact_combat_branches(unit_table, attack_counts, defense_counts, battle_type)
+
+    branch_state_prob_list = [calculate_round_state_prob_list(x, max_rounds) for x in branch_list]
+
+    round_outcome_list = []
+    for combat_round in range(max_rounds+1):
+        state_prob_list = [x[combat_round] for x in branch_state_prob_list]
+        round_outcome_list.append(build_exact_combat_outcome(unit_table, branch_list, state_prob_list))
+
+    return round_outcome_list
+
+
+def calculate_ecdf(values, probability):
+    sort_index = numpy.argsort(values, kind="stable")
+    sort_values = numpy.asarray(values)[sort_index]
+    cumulative_probability = numpy.cumsum(numpy.asarray(probability)[sort_index])
+
+    unique_values, last_index = numpy.unique(sort_values[::-1], return_index=True)
+    last_index = sort_values.shape[0] - 1 - last_index
+
+    return unique_values, cumulative_probability[last_index]
+
+
+class AxisAndAlliesExactCombatUnsupportedException(Exception):
+    pass
+
+
+class AxisAndAlliesCombatStalemateException(Exception):
+    pass
@@ -1,14 +1,254 @@
+import copy
+
+import numpy
+
+import axis_and_allies.region as region
+import axis_and_allies.zobrist as zobrist
+
+
+NO_OWNER = -1
+# longest chain of diff-based states before a copy is flattened into its own arrays
+MAX_DIFF_DEPTH = 16
 
 
 class GameState():
-    def __init__(self) -> None:
-        pass
+    # unit counts (regions x unit types), owner and has_industry per region, IPC bank per player and the player to
+    # move.  Regions are indexed by their position in region_id_list and unit types by their position in
+    # unit_names.  A state made by copy() only records its own changes and reads everything else from its parent,
+    # so creating one costs O(changes) not O(board).  A state that has been copied is frozen and cannot change
+    def __init__(self, region_id_list=None, unit_names=None, unit_count_arr=None, owner_arr=None,
+                 has_industry_arr=None, ipc_bank_arr=None, player=0, zobrist_keys=None) -> None:
+        self.region_id_list = [] if region_id_list is None else list(region_id_list)
+        self.region_index_dict = {x:i for i, x in enumerate(self.region_id_list)}
+        self.unit_names = [] if unit_names is None else list(unit_names)
+        self.unit_index_dict = {x:i for i, x in enumerate(self.unit_names)}
+
+        num_regions = len(self.region_id_list)
+        num_unit_types = len(self.unit_names)
+
+        self.unit_count_arr = numpy.zeros((num_regions, num_unit_types), dtype=numpy.uint16)
+        if unit_count_arr is not None:
+            self.unit_count_arr[:] = unit_count_arr
+        self.owner_arr = numpy.full(num_regions, NO_OWNER, dtype=numpy.int8)
+        if owner_arr is not None:
+            self.owner_arr[:] = owner_arr
+        self.has_industry_arr = numpy.zeros(num_regions, dtype=bool)
+        if has_industry_arr is not None:
+            self.has_industry_arr[:] = has_industry_arr
+        self.ipc_bank_arr = numpy.zeros(zobrist.DEFAULT_NUM_PLAYERS, dtype=numpy.int32)
+        if ipc_bank_arr is not None:
+            self.ipc_bank_arr = numpy.array(ipc_bank_arr, dtype=numpy.int32)
+        self.player = player
+
+        # diff-based copies:  parent state and the changes made since it, keyed by (region_index, unit_index) or
+        # region_index.  States without a parent hold all of their data in the arrays above
+        self.parent = None
+        self.diff_depth = 0
+        self.unit_count_diff_dict = {}
+        self.owner_diff_dict = {}
+        self.has_industry_diff_dict = {}
+        self.is_frozen = False
+
+        self.zobrist_keys = zobrist_keys
+        if self.zobrist_keys is None and num_regions > 0:
+            self.zobrist_keys = zobrist.build_zobrist_keys(
+                num_regions, num_unit_types, num_players=len(self.ipc_bank_arr)
+            )
+        # zobrist.calculate_hash of the game state, kept up to date as the game state changes
+        self.zobrist_hash = 0
+        if self.zobrist_keys is not None:
+            self.zobrist_hash = zobrist.calculate_hash(
+                self.zobrist_keys, self.unit_count_arr, self.owner_arr, self.has_industry_arr, self.player,
+                self.ipc_bank_arr
+            )
 
     def copy(self):
-        pass
+        # child state sharing this state's data
+        self.is_frozen = True
+        if self.diff_depth >= MAX_DIFF_DEPTH:
+            return self.flatten()
+
+        my_copy = copy.copy(self)
+        my_copy.parent = self
+        my_copy.diff_depth = self.diff_depth + 1
+        my_copy.unit_count_arr = None
+        my_copy.owner_arr = None
+        my_copy.has_industry_arr = None
+        my_copy.ipc_bank_arr = self.ipc_bank_arr.copy()
+        my_copy.unit_count_diff_dict = {}
+        my_copy.owner_diff_dict = {}
+        my_copy.has_industry_diff_dict = {}
+        my_copy.is_frozen = False
+        return my_copy
+
+    def flatten(self):
+        # unfrozen copy with its own arrays and no parent
+        my_copy = copy.copy(self)
+        my_copy.parent = None
+        my_copy.diff_depth = 0
+        my_copy.unit_count_arr = self.build_unit_count_arr()
+        my_copy.owner_arr = self.build_owner_arr()
+        my_copy.has_industry_arr = self.build_has_industry_arr()
+        my_copy.ipc_bank_arr = self.ipc_bank_arr.copy()
+        my_copy.unit_count_diff_dict = {}
+        my_copy.owner_diff_dict = {}
+        my_copy.has_industry_diff_dict = {}
+        my_copy.is_frozen = False
+        return my_copy
 
     def __repr__(self) -> str:
-        return "TODO"
-    
+        return "num_regions:  {}  num_unit_types:  {}  player:  {}  ipc_bank_arr:  {}  diff_depth:  {}  " \
+            "num_units:  {}  zobrist_hash:  {}".format(
+                len(self.region_id_list), len(self.unit_names), self.player, self.ipc_bank_arr, self.diff_depth,
+                int(numpy.sum(self.build_unit_count_arr(), dtype=numpy.int64)), self.zobrist_hash
+            )
+
     def __str__(self) -> str:
-        return self.__repr__()
\ No newline at end of file
+        return self.__repr__()
+
+    def get_region_index(self, region_id):
+        return self.region_index_dict[region_id]
+
+    def get_unit_index(self, unit_name):
+        return self.unit_index_dict[unit_name]
+
+    def build_chain(self):
+        # this state and its ancestors, oldest (the one holding the arrays) first
+        r = []
+        cur = self
+        while cur is not None:
+            r.append(cur)
+            cur = cur.parent
+        return r[::-1]
+
+    def lookup(self, diff_dict_name, key, arr_name):
+        cur = self
+        while cur.parent is not None:
+            diff_dict = getattr(cur, diff_dict_name)
+            if key in diff_dict:
+                return diff_dict[key]
+            cur = cur.parent
+        return getattr(cur, arr_name)[key]
+
+    def build_arr(self, diff_dict_name, arr_name):
+        chain = self.build_chain()
+        r = getattr(chain[0], arr_name).copy()
+        for cur in chain[1:]:
+            for key, value in getattr(cur, diff_dict_name).items():
+                r[key] = value
+        return r
+
+    def get_unit_count(self, region_index, unit_index):
+        return int(self.lookup("unit_count_diff_dict", (region_index, unit_index), "unit_count_arr"))
+
+    def get_owner(self, region_index):
+        return int(self.lookup("owner_diff_dict", region_index, "owner_arr"))
+
+    def get_has_industry(self, region_index):
+        return bool(self.lookup("has_industry_diff_dict", region_index, "has_industry_arr"))
+
+    def build_unit_count_arr(self):
+        return self.build_arr("unit_count_diff_dict", "unit_count_arr")
+
+    def build_owner_arr(self):
+        return self.build_arr("owner_diff_dict", "owner_arr")
+
+    def build_has_industry_arr(self):
+        return self.build_arr("has_industry_diff_dict", "has_industry_arr")
+
+    def build_region_unit_counts(self, region_index):
+        return numpy.array([self.get_unit_count(region_index, i) for i in range(len(self.unit_names))],
+                           dtype=numpy.uint16)
+
+    def check_not_frozen(self):
+        if self.is_frozen:
+            raise AxisAndAlliesGameStateException("game state has been copied and cannot be changed")
+
+    def set_unit_count(self, region_index, unit_index, count):
+        self.check_not_frozen()
+        if count < 0:
+            raise AxisAndAlliesGameStateException(
+                "negative unit count {} for region_index {} unit_index {}".format(count, region_index, unit_index)
+            )
+
+        if self.zobrist_keys is not None:
+            old_count = self.get_unit_count(region_index, unit_index)
+            self.zobrist_hash = zobrist.update_unit_count(
+                self.zobrist_keys, self.zobrist_hash, region_index, unit_index, old_count, count
+            )
+
+        if self.parent is None:
+            self.unit_count_arr[region_index, unit_index] = count
+        else:
+            self.unit_count_diff_dict[(region_index, unit_index)] = count
+
+    def add_units(self, region_index, unit_index, num_units):
+        # num_units can be negative to remove units
+        self.set_unit_count(region_index, unit_index, self.get_unit_count(region_index, unit_index) + num_units)
+
+    def move_units(self, from_region_index, to_region_index, unit_index, num_units):
+        self.add_units(from_region_index, unit_index, -num_units)
+        self.add_units(to_region_index, unit_index, num_units)
+
+    def set_owner(self, region_index, owner):
+        self.check_not_frozen()
+
+        if self.zobrist_keys is not None:
+            self.zobrist_hash = zobrist.update_owner(
+                self.zobrist_keys, self.zobrist_hash, region_index, self.get_owner(region_index), owner
+            )
+
+        if self.parent is None:
+            self.owner_arr[region_index] = owner
+        else:
+            self.owner_diff_dict[region_index] = owner
+
+    def set_has_industry(self, region_index, has_industry):
+        self.check_not_frozen()
+
+        if self.zobrist_keys is not None and self.get_has_industry(region_index) != has_industry:
+            self.zobrist_hash = zobrist.update_industry(self.zobrist_keys, self.zobrist_hash, region_index)
+
+        if self.parent is None:
+            self.has_industry_arr[region_index] = has_industry
+        else:
+            self.has_industry_diff_dict[region_index] = has_industry
+
+    def add_ipc(self, player, ipc):
+        self.check_not_frozen()
+
+        if self.zobrist_keys is not None:
+            old_ipc = self.ipc_bank_arr[player]
+            self.zobrist_hash = zobrist.update_ipc(self.zobrist_keys, self.zobrist_hash, player, old_ipc, old_ipc + ipc)
+        self.ipc_bank_arr[player] += ipc
+
+    def set_player(self, player):
+        self.check_not_frozen()
+
+        if self.zobrist_keys is not None:
+            self.zobrist_hash = zobrist.update_player(self.zobrist_keys, self.zobrist_hash, self.player, player)
+        self.player = player
+
+    def calculate_num_changes(self):
+        # number of values recorded by this state relative to its parent
+        return len(self.unit_count_diff_dict) + len(self.owner_diff_dict) + len(self.has_industry_diff_dict)
+
+
+def build_game_state(region_status_dict, unit_names, owner_dict=None, ipc_bank_arr=None, player=0,
+                     zobrist_keys=None):
+    region_id_list, unit_count_arr, owner_arr, has_industry_arr = zobrist.build_region_status_arrays(
+        region_status_dict, unit_names, owner_dict
+    )
+    return GameState(
+        region_id_list=region_id_list, unit_names=unit_names, unit_count_arr=unit_count_arr, owner_arr=owner_arr,
+        has_industry_arr=has_industry_arr, ipc_bank_arr=ipc_bank_arr, player=player, zobrist_keys=zobrist_keys
+    )
+
+
+def load_game_state(region_file, unit_names, owner_dict=None, ipc_bank_arr=None, player=0):
+    _, region_status_dict = region.load_from_txt(region_file)
+    return build_game_state(region_status_dict, unit_names, owner_dict, ipc_bank_arr, player)
+
+
+class AxisAndAlliesGameStateException(Exception):
+    pass
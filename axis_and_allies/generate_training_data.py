@@ -0,0 +1,276 @@
+import logging
+
+import argparse
+import json
+import os
+import sys
+
+import numpy
+import pandas
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.combat as combat
+import axis_and_allies.unit as unit
+import axis_and_allies.run_simulation as run_simulation
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+# IPC budget of each battle drawn uniformly at random
+SAMPLING_RANDOM = "random"
+# IPC budgets cycle through every value from IPC_min to IPC_max so each value gets the same number of battles
+SAMPLING_STRATIFIED = "stratified"
+SAMPLING_LIST = [SAMPLING_RANDOM, SAMPLING_STRATIFIED]
+
+MANIFEST_FILE = "manifest.json"
+SHARD_FILE_TEMPLATE = "shard_{:06d}.npz"
+DEFAULT_OUTPUT_DIR = "training_data"
+DEFAULT_NUM_SHARDS = 100
+DEFAULT_SHARD_NUM_CONFIGS = 100000
+DEFAULT_N_SIM_PER_CONFIG = 1
+DEFAULT_IPC_MIN = 10
+DEFAULT_IPC_MAX = 100
+
+# manifest entries that must match to add shards to existing output.  num_shards can change and the seed of the
+# existing output is kept
+MANIFEST_MATCH_KEYS = [
+    "unit_names", "sampling", "IPC_min", "IPC_max", "shard_num_configs", "N_sim_per_config", "battle_type"
+]
+
+
+def select_possible_units(unit_dict):
+    # land battle units, in the same order as run_simulation.collect_data_for_modeling
+    possible_units = [x for x in unit_dict.values() if x.unit_type == unit.UNIT_TYPE_AIR or x.unit_type == unit.UNIT_TYPE_LAND]
+    return sorted(possible_units, key=lambda x: (x.unit_type, x.ipc))
+
+
+def build_IPC_arr(sampling, IPC_min, IPC_max, num_configs, shard_index, rng):
+    if sampling == SAMPLING_RANDOM:
+        return rng.integers(IPC_min, IPC_max + 1, size=num_configs)
+    if sampling == SAMPLING_STRATIFIED:
+        # continues the cycle across shards so every value is equally represented in any set of whole shards
+        start = shard_index * num_configs
+        return IPC_min + (start + numpy.arange(num_configs)) % (IPC_max - IPC_min + 1)
+
+    raise AxisAndAlliesGenerateTrainingDataException(
+        "unknown sampling:  {}  known:  {}".format(sampling, SAMPLING_LIST)
+    )
+
+
+def build_random_force_counts(ipc_arr, IPC_limit_arr, rng):
+    # vectorized run_simulation.build_random_force, one force per entry of IPC_limit_arr:  units are drawn uniformly
+    # and added until the next one would go over the IPC limit
+    num_forces = IPC_limit_arr.shape[0]
+    counts = numpy.zeros((num_forces, ipc_arr.shape[0]), dtype=numpy.int64)
+    cost_arr = numpy.zeros(num_forces, dtype=numpy.int64)
+
+    live_locs = numpy.arange(num_forces)
+    while live_locs.shape[0] > 0:
+        unit_index = rng.integers(0, ipc_arr.shape[0], size=live_locs.shape[0])
+        next_cost_arr = cost_arr[live_locs] + ipc_arr[unit_index]
+
+        is_added = next_cost_arr <= IPC_limit_arr[live_locs]
+        counts[live_locs[is_added], unit_index[is_added]] += 1
+        cost_arr[live_locs[is_added]] = next_cost_arr[is_added]
+        live_locs = live_locs[is_added]
+
+    return counts
+
+
+def build_shard_seed_sequence(seed, shard_index):
+    # depends only on the seed and the shard index, so a shard is the same whichever worker makes it and whenever
+    return numpy.random.SeedSequence(entropy=seed, spawn_key=(shard_index,))
+
+
+def generate_shard(manifest, possible_units, shard_index):
+    # column name to array, same columns as run_simulation.collect_data_for_modeling plus num_rounds.  Each sampled
+    # configuration is simulated N_sim_per_config times
+    rng = numpy.random.default_rng(build_shard_seed_sequence(manifest["seed"], shard_index))
+    unit_table = unit.UnitTable(possible_units)
+    num_configs = manifest["shard_num_configs"]
+    N_sim_per_config = manifest["N_sim_per_config"]
+
+    IPC_arr = build_IPC_arr(
+        manifest["sampling"], manifest["IPC_min"], manifest["IPC_max"], num_configs, shard_index, rng
+    )
+    attack_counts = build_random_force_counts(unit_table.ipc_arr, IPC_arr, rng)
+    defense_counts = build_random_force_counts(unit_table.ipc_arr, IPC_arr, rng)
+
+    IPC_arr = numpy.repeat(IPC_arr, N_sim_per_config)
+    attack_counts = numpy.repeat(attack_counts, N_sim_per_config, axis=0)
+    defense_counts = numpy.repeat(defense_counts, N_sim_per_config, axis=0)
+    attack_IPC = attack_counts @ unit_table.ipc_arr
+    defense_IPC = defense_counts @ unit_table.ipc_arr
+
+    combat_batch_result = combat.run_combat_batch(
+        unit_table, attack_counts, defense_counts, manifest["battle_type"], attack_counts.shape[0], rng
+    )
+    combat_result_metric = run_simulation.calculate_metrics_from_counts(
+        unit_table.ipc_arr, combat_batch_result.attack_counts, combat_batch_result.defense_counts, attack_IPC,
+        defense_IPC
+    )
+
+    r = {
+        "IPC":IPC_arr.astype(numpy.int32), "attack_IPC":attack_IPC.astype(numpy.int32),
+        "defense_IPC":defense_IPC.astype(numpy.int32),
+        "diff_remain_IPC":combat_result_metric.diff_ipc.astype(numpy.int32),
+        "frac_diff_remain_IPC":combat_result_metric.fraction_ipc_winner.astype(numpy.float32),
+        "num_rounds":combat_batch_result.num_rounds.astype(numpy.int16),
+    }
+    for i, cur_unit in enumerate(possible_units):
+        r[cur_unit.name + "_attack"] = attack_counts[:, i].astype(numpy.int16)
+        r[cur_unit.name + "_defense"] = defense_counts[:, i].astype(numpy.int16)
+    return r
+
+
+def build_shard_file(output_dir, shard_index):
+    return os.path.join(output_dir, SHARD_FILE_TEMPLATE.format(shard_index))
+
+
+def write_shard(manifest, possible_units, output_dir, shard_index):
+    # written to a temporary file and renamed, so an interrupted run never leaves a partial shard behind
+    shard_dict = generate_shard(manifest, possible_units, shard_index)
+
+    shard_file = build_shard_file(output_dir, shard_index)
+    temp_file = shard_file + ".tmp.npz"
+    numpy.savez(temp_file, **shard_dict)
+    os.replace(temp_file, shard_file)
+
+    return shard_index, shard_dict["IPC"].shape[0]
+
+
+def build_manifest(unit_dict, num_shards=DEFAULT_NUM_SHARDS, shard_num_configs=DEFAULT_SHARD_NUM_CONFIGS,
+                   N_sim_per_config=DEFAULT_N_SIM_PER_CONFIG, IPC_min=DEFAULT_IPC_MIN, IPC_max=DEFAULT_IPC_MAX,
+                   sampling=SAMPLING_RANDOM, battle_type=combat.BATTLE_TYPE_LAND, seed=None):
+    if sampling not in SAMPLING_LIST:
+        raise AxisAndAlliesGenerateTrainingDataException(
+            "unknown sampling:  {}  known:  {}".format(sampling, SAMPLING_LIST)
+        )
+
+    # the seed is recorded so a resumed run continues the same random streams
+    if seed is None:
+        seed = int(numpy.random.SeedSequence().entropy)
+
+    return {
+        "seed":seed, "unit_names":[x.name for x in select_possible_units(unit_dict)], "sampling":sampling,
+        "IPC_min":IPC_min, "IPC_max":IPC_max, "shard_num_configs":shard_num_configs,
+        "N_sim_per_config":N_sim_per_config, "battle_type":battle_type, "num_shards":num_shards
+    }
+
+
+def save_manifest(manifest, output_dir):
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+
+def load_manifest(output_dir):
+    with open(os.path.join(output_dir, MANIFEST_FILE)) as file:
+        return json.load(file)
+
+
+def prepare_output_dir(output_dir, manifest):
+    # manifest to use for output_dir:  a new directory gets manifest, an existing one keeps its own (including its
+    # seed) and can only change num_shards
+    manifest_file = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_file):
+        os.makedirs(output_dir, exist_ok=True)
+        save_manifest(manifest, output_dir)
+        return manifest
+
+    existing_manifest = load_manifest(output_dir)
+    mismatch_list = [x for x in MANIFEST_MATCH_KEYS if existing_manifest[x] != manifest[x]]
+    if len(mismatch_list) > 0:
+        raise AxisAndAlliesGenerateTrainingDataException(
+            "output_dir {} was generated with different settings:  {}".format(
+                output_dir, {x:(existing_manifest[x], manifest[x]) for x in mismatch_list}
+            )
+        )
+
+    if manifest["num_shards"] != existing_manifest["num_shards"]:
+        existing_manifest["num_shards"] = manifest["num_shards"]
+        save_manifest(existing_manifest, output_dir)
+    return existing_manifest
+
+
+def find_missing_shard_indexes(output_dir, num_shards):
+    return [i for i in range(num_shards) if not os.path.exists(build_shard_file(output_dir, i))]
+
+
+def generate_training_data(unit_dict, output_dir=DEFAULT_OUTPUT_DIR, n_workers=1, **manifest_kwargs):
+    # writes manifest["num_shards"] shards of simulated battles to output_dir.  Shards that already exist are kept,
+    # so running again after an interruption only makes the missing shards.  Returns the number of battles written
+    manifest = prepare_output_dir(output_dir, build_manifest(unit_dict, **manifest_kwargs))
+    possible_units = select_possible_units(unit_dict)
+
+    missing_shard_index_list = find_missing_shard_indexes(output_dir, manifest["num_shards"])
+    logger.info("num_shards:  {}  len(missing_shard_index_list):  {}".format(
+        manifest["num_shards"], len(missing_shard_index_list)
+    ))
+
+    args_list = [(manifest, possible_units, output_dir, i) for i in missing_shard_index_list]
+    num_battles = 0
+    for shard_index, num_shard_battles in run_simulation.iterate_in_pool(write_shard, args_list, n_workers):
+        num_battles += num_shard_battles
+        logger.info("wrote shard_index:  {}  num_battles:  {}".format(shard_index, num_battles))
+
+    return num_battles
+
+
+def load_training_data(output_dir, max_num_shards=None):
+    # DataFrame of the shards in output_dir in shard order, same columns as run_simulation.collect_data_for_modeling
+    manifest = load_manifest(output_dir)
+    num_shards = manifest["num_shards"] if max_num_shards is None else min(max_num_shards, manifest["num_shards"])
+
+    shard_dict_list = []
+    for i in range(num_shards):
+        shard_file = build_shard_file(output_dir, i)
+        if not os.path.exists(shard_file):
+            logger.info("shard not generated yet, shard_file:  {}".format(shard_file))
+            continue
+        with numpy.load(shard_file) as data:
+            shard_dict_list.append({x:data[x] for x in data.files})
+
+    if len(shard_dict_list) == 0:
+        raise AxisAndAlliesGenerateTrainingDataException("no shards found in output_dir:  {}".format(output_dir))
+
+    return pandas.DataFrame({x:numpy.concatenate([y[x] for y in shard_dict_list]) for x in shard_dict_list[0].keys()})
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="generate sharded simulated battle data for surrogate model training")
+    parser.add_argument("--output_dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--num_shards", type=int, default=DEFAULT_NUM_SHARDS)
+    parser.add_argument("--shard_num_configs", type=int, default=DEFAULT_SHARD_NUM_CONFIGS,
+                        help="number of sampled battle configurations in each shard")
+    parser.add_argument("--N_sim_per_config", type=int, default=DEFAULT_N_SIM_PER_CONFIG)
+    parser.add_argument("--IPC_min", type=int, default=DEFAULT_IPC_MIN)
+    parser.add_argument("--IPC_max", type=int, default=DEFAULT_IPC_MAX)
+    parser.add_argument("--sampling", choices=SAMPLING_LIST, default=SAMPLING_RANDOM)
+    parser.add_argument("--n_workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None, help="ignored when resuming, the recorded seed is used")
+    parser.add_argument("--unit_file", default=os.path.join(os.path.dirname(__file__), "unit_data.json"))
+    return parser
+
+
+def main(args):
+    unit_dict = build_unit_dict.load_units(args.unit_file)
+
+    num_battles = generate_training_data(
+        unit_dict, args.output_dir, args.n_workers, num_shards=args.num_shards,
+        shard_num_configs=args.shard_num_configs, N_sim_per_config=args.N_sim_per_config, IPC_min=args.IPC_min,
+        IPC_max=args.IPC_max, sampling=args.sampling, seed=args.seed
+    )
+    logger.info("num_battles:  {}".format(num_battles))
+    return 0
+
+
+class AxisAndAlliesGenerateTrainingDataException(Exception):
+    pass
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=False)
+
+    sys.exit(main(build_parser().parse_args()))
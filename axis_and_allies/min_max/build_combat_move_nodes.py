@@ -0,0 +1,233 @@
+import logging
+import collections
+import heapq
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.game_state as game_state
+import axis_and_allies.region as region
+import axis_and_allies.region_index as region_index
+import axis_and_allies.min_max.event_tree as evtre
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+DEFAULT_MIN_WIN_PROBABILITY = 0.2
+DEFAULT_MAX_NUM_CANDIDATES = 100
+# exponent of the strength ratio in the win probability estimate, larger is closer to a step function
+ODDS_ESTIMATE_EXPONENT = 2.
+
+# source_counts_arr:  regions x unit types, units that move out of each region into target_region_index.
+# unit_counts is its sum over regions
+CombatMove = collections.namedtuple("CombatMove",
+    ["target_region_index", "unit_counts", "source_counts_arr", "win_probability", "score"]
+)
+
+
+class UnitColumns:
+    # unit_table properties in the unit type order of a game state
+    def __init__(self, unit_table, unit_names) -> None:
+        index = numpy.array([unit_table.get_index(x) for x in unit_names])
+        self.attack_arr = unit_table.attack_arr[index]
+        self.defense_arr = unit_table.defense_arr[index]
+        self.ipc_arr = unit_table.ipc_arr[index]
+        self.move_arr = unit_table.move_arr[index]
+        self.max_hit_points_arr = unit_table.max_hit_points_arr[index]
+        self.is_land_arr = unit_table.is_land_arr[index]
+        self.movement_region_type_list = [region_index.MOVEMENT_TYPE_DICT[x] for x in unit_table.unit_type_arr[index]]
+
+
+def find_target_region_indexes(my_game_state, my_region_index, player):
+    # land regions owned by another player and water regions holding another player's units.  The owner of a water
+    # region is the player whose units are in it, it keeps that owner after the units leave so empty water regions
+    # are skipped
+    owner_arr = my_game_state.build_owner_arr()
+    is_enemy = (owner_arr != game_state.NO_OWNER) & (owner_arr != player)
+    is_water = my_region_index.region_type_arr == region.REGION_TYPE_WATER
+    has_units = my_game_state.build_unit_count_arr().sum(axis=1) > 0
+    return numpy.nonzero(is_enemy & (~is_water | has_units))[0]
+
+
+def calculate_available_units(my_game_state, my_region_index, unit_columns, player, target_region_index):
+    # regions x unit types:  units in regions owned by player (for water regions, holding player's units) that can
+    # reach target_region_index.  Land units move through land regions, naval units through water regions and air
+    # units anywhere, so land units can only attack land regions and naval units water regions
+    unit_count_arr = my_game_state.build_unit_count_arr().astype(numpy.int64)
+    is_source = my_game_state.build_owner_arr() == player
+
+    r = numpy.zeros_like(unit_count_arr)
+    for j in range(unit_count_arr.shape[1]):
+        if unit_columns.attack_arr[j] == 0:
+            continue
+        reachable_arr = my_region_index.build_reachable_arr(
+            unit_columns.movement_region_type_list[j], unit_columns.move_arr[j]
+        )[:, target_region_index]
+        locs = is_source & reachable_arr
+        locs[target_region_index] = False
+        r[locs, j] = unit_count_arr[locs, j]
+
+    return r
+
+
+def estimate_win_probability(unit_columns, attack_counts_arr, defense_counts, is_land_target=True):
+    # cheap odds estimate, one entry per row of attack_counts_arr.  Lanchester square law:  fighting strength is
+    # firepower times hit points, win probability is a^k / (a^k + d^k) for attack and defense strengths a and d.
+    # Capturing a land region needs at least one land unit
+    attack_counts_arr = numpy.atleast_2d(attack_counts_arr).astype(numpy.float64)
+    defense_counts = numpy.asarray(defense_counts, dtype=numpy.float64)
+
+    attack_strength = (attack_counts_arr @ unit_columns.attack_arr) * (attack_counts_arr @ unit_columns.max_hit_points_arr)
+    defense_strength = (defense_counts @ unit_columns.defense_arr) * (defense_counts @ unit_columns.max_hit_points_arr)
+
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        r = 1. / (1. + (defense_strength / attack_strength) ** ODDS_ESTIMATE_EXPONENT)
+    r = numpy.where(attack_strength > 0, r, 0.)
+
+    if is_land_target:
+        r = numpy.where(attack_counts_arr @ unit_columns.is_land_arr > 0, r, 0.)
+
+    return r
+
+
+def calculate_score(unit_columns, attack_counts_arr, defense_counts, target_ipc_production, win_probability):
+    # estimated IPC gain:  the region and its defenders when the attack wins, the attackers when it loses
+    defense_ipc = numpy.asarray(defense_counts) @ unit_columns.ipc_arr
+    attack_ipc = numpy.atleast_2d(attack_counts_arr) @ unit_columns.ipc_arr
+    return win_probability * (target_ipc_production + defense_ipc) - (1. - win_probability) * attack_ipc
+
+
+def assign_sources(my_region_index, unit_columns, available_arr, unit_counts, target_region_index):
+    # takes the units of each type from the regions closest to the target first
+    r = numpy.zeros_like(available_arr)
+    for j in numpy.nonzero(unit_counts)[0]:
+        distance_arr = my_region_index.get_distance_arr(unit_columns.movement_region_type_list[j])[
+            :, target_region_index
+        ]
+        remaining = unit_counts[j]
+        for i in numpy.argsort(distance_arr, kind="stable"):
+            num_units = min(remaining, available_arr[i, j])
+            r[i, j] = num_units
+            remaining -= num_units
+            if remaining == 0:
+                break
+    return r
+
+
+def generate_combat_moves(my_game_state, my_region_index, unit_table, player=None,
+                          min_win_probability=DEFAULT_MIN_WIN_PROBABILITY, max_num_candidates=None):
+    # attacks on a single region from a best-first search:  it starts from the attack with every available unit on
+    # each target and removes one unit at a time, always expanding the best scoring attack found so far.  The order
+    # is a heuristic, an attack is only found once one of its parents has been yielded, so a better attack can come
+    # after a worse one.  Attacks estimated to win with less than min_win_probability are dropped along with every
+    # smaller attack, which is weaker still
+    if player is None:
+        player = my_game_state.player
+
+    unit_columns = UnitColumns(unit_table, my_game_state.unit_names)
+    unit_count_arr = my_game_state.build_unit_count_arr()
+
+    target_dict = {}
+    heap = []
+    visited_set = set()
+    for target_region_index in find_target_region_indexes(my_game_state, my_region_index, player):
+        available_arr = calculate_available_units(
+            my_game_state, my_region_index, unit_columns, player, target_region_index
+        )
+        total_available = available_arr.sum(axis=0)
+        if total_available.sum() == 0:
+            continue
+
+        defense_counts = unit_count_arr[target_region_index].astype(numpy.int64)
+        is_land_target = my_region_index.region_type_arr[target_region_index] == region.REGION_TYPE_LAND
+        target_dict[target_region_index] = (available_arr, defense_counts, is_land_target)
+        push_candidate(heap, visited_set, unit_columns, my_region_index, target_dict, target_region_index,
+                       total_available, min_win_probability)
+
+    num_candidates = 0
+    while len(heap) > 0 and (max_num_candidates is None or num_candidates < max_num_candidates):
+        neg_score, _, target_region_index, unit_counts, win_probability = heapq.heappop(heap)
+        unit_counts = numpy.array(unit_counts)
+        available_arr = target_dict[target_region_index][0]
+
+        yield CombatMove(
+            target_region_index=int(target_region_index), unit_counts=unit_counts,
+            source_counts_arr=assign_sources(my_region_index, unit_columns, available_arr, unit_counts,
+                                             target_region_index),
+            win_probability=win_probability, score=-neg_score
+        )
+        num_candidates += 1
+
+        for j in numpy.nonzero(unit_counts)[0]:
+            next_unit_counts = unit_counts.copy()
+            next_unit_counts[j] -= 1
+            push_candidate(heap, visited_set, unit_columns, my_region_index, target_dict, target_region_index,
+                           next_unit_counts, min_win_probability)
+
+
+def push_candidate(heap, visited_set, unit_columns, my_region_index, target_dict, target_region_index, unit_counts,
+                   min_win_probability):
+    key = (int(target_region_index), tuple(int(x) for x in unit_counts))
+    if key in visited_set or sum(key[1]) == 0:
+        return
+    visited_set.add(key)
+
+    _, defense_counts, is_land_target = target_dict[target_region_index]
+    win_probability = float(estimate_win_probability(unit_columns, unit_counts, defense_counts, is_land_target)[0])
+    if win_probability < min_win_probability:
+        return
+
+    score = float(calculate_score(
+        unit_columns, unit_counts, defense_counts, my_region_index.ipc_production_arr[target_region_index],
+        win_probability
+    )[0])
+    # len(visited_set) breaks ties in the order candidates were found
+    heapq.heappush(heap, (-score, len(visited_set), int(target_region_index), key[1], win_probability))
+
+
+def apply_combat_move(my_game_state, combat_move):
+    # child game state with the attacking units removed from their regions, they are in the combat at
+    # combat_move.target_region_index
+    r = my_game_state.copy()
+    for i, j in zip(*numpy.nonzero(combat_move.source_counts_arr)):
+        r.add_units(i, j, -int(combat_move.source_counts_arr[i, j]))
+    return r
+
+
+def build_combat_move_nodes(my_event_tree, parent_index, my_game_state, my_region_index, unit_table,
+                            max_num_candidates=DEFAULT_MAX_NUM_CANDIDATES,
+                            min_win_probability=DEFAULT_MIN_WIN_PROBABILITY, do_include_no_attack=True):
+    # adds one combat move node per candidate as children of parent_index:  unit_counts_arr is the attacking units,
+    # target_region_arr the attacked region, probability_arr the estimated win probability and cost_arr the IPC of
+    # the attacking units.  The first child is not attacking when do_include_no_attack
+    combat_move_list = list(generate_combat_moves(
+        my_game_state, my_region_index, unit_table, min_win_probability=min_win_probability,
+        max_num_candidates=max_num_candidates
+    ))
+    logger.debug("len(combat_move_list):  {}".format(len(combat_move_list)))
+
+    num_unit_types = len(my_game_state.unit_names)
+    unit_counts_arr = numpy.array([x.unit_counts for x in combat_move_list], dtype=numpy.int64).reshape(
+        -1, num_unit_types
+    )
+    target_region_arr = [x.target_region_index for x in combat_move_list]
+    probability_arr = [x.win_probability for x in combat_move_list]
+    if do_include_no_attack:
+        unit_counts_arr = numpy.vstack([numpy.zeros((1, num_unit_types), dtype=numpy.int64), unit_counts_arr])
+        target_region_arr = [evtre.NO_INDEX] + target_region_arr
+        probability_arr = [1.] + probability_arr
+
+    unit_columns = UnitColumns(unit_table, my_game_state.unit_names)
+    my_event_tree.set_unit_names(my_game_state.unit_names)
+    node_list = my_event_tree.add_children(
+        parent_index, evtre.NT_combat_move, unit_counts_arr.shape[0], cost_arr=unit_counts_arr @ unit_columns.ipc_arr,
+        unit_counts_arr=unit_counts_arr, probability_arr=probability_arr, player=my_game_state.player,
+        target_region_arr=target_region_arr
+    )
+
+    attack_node_list = node_list[1:] if do_include_no_attack else node_list
+    for node, combat_move in zip(attack_node_list, combat_move_list):
+        my_event_tree.set_game_state(node["id"], apply_combat_move(my_game_state, combat_move))
+
+    return node_list
@@ -0,0 +1,154 @@
+import logging
+import collections
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.combat as combat
+import axis_and_allies.region as region
+import axis_and_allies.min_max.event_tree as evtre
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+CombatOutcomeSelection = collections.namedtuple("CombatOutcomeSelection",
+    ["attack_counts", "defense_counts", "probability", "total_probability"]
+)
+
+
+def merge_outcomes(attack_counts, defense_counts, probability, outcome_key_arr=None):
+    # one row per distinct outcome key, by default the surviving armies.  Each merged outcome is represented by its
+    # most likely member and has the total probability of its members.  Sorted by decreasing probability
+    if outcome_key_arr is None:
+        outcome_key_arr = numpy.hstack([attack_counts, defense_counts])
+
+    _, inverse_index = numpy.unique(outcome_key_arr, axis=0, return_inverse=True)
+    inverse_index = inverse_index.ravel()
+    num_groups = inverse_index.max() + 1 if inverse_index.shape[0] > 0 else 0
+
+    group_probability = numpy.bincount(inverse_index, weights=probability, minlength=num_groups)
+    # most likely member of each group:  visit rows by increasing probability so the last write wins
+    representative_index = numpy.zeros(num_groups, dtype=numpy.int64)
+    order = numpy.argsort(probability, kind="stable")
+    representative_index[inverse_index[order]] = order
+
+    sort_index = numpy.argsort(-group_probability, kind="stable")
+    representative_index = representative_index[sort_index]
+    return (attack_counts[representative_index], defense_counts[representative_index],
+            group_probability[sort_index])
+
+
+def build_survivor_ipc_key(unit_table, bucket_ipc):
+    # outcome_key_fun that merges outcomes with the same winner whose surviving units are worth about the same IPC
+    def outcome_key_fun(attack_counts, defense_counts):
+        attack_ipc = attack_counts @ unit_table.ipc_arr
+        defense_ipc = defense_counts @ unit_table.ipc_arr
+        return numpy.column_stack([numpy.sign(attack_ipc), numpy.sign(defense_ipc), attack_ipc // bucket_ipc,
+                                   defense_ipc // bucket_ipc])
+
+    return outcome_key_fun
+
+
+def select_combat_outcomes(N_combat_outcome, total_probability_combat_outcome_limit, attack_counts, defense_counts,
+                           probability, outcome_key_fun=None):
+    # most likely outcomes after merging, stopping at N_combat_outcome outcomes or once their total probability
+    # reaches total_probability_combat_outcome_limit
+    outcome_key_arr = None
+    if outcome_key_fun is not None:
+        outcome_key_arr = outcome_key_fun(attack_counts, defense_counts)
+    attack_counts, defense_counts, probability = merge_outcomes(
+        attack_counts, defense_counts, probability, outcome_key_arr
+    )
+
+    cumulative_probability = numpy.cumsum(probability)
+    num_keep = int(numpy.searchsorted(cumulative_probability, total_probability_combat_outcome_limit * (1. - 1e-12)))
+    num_keep = min(num_keep + 1, probability.shape[0])
+    if N_combat_outcome is not None:
+        num_keep = min(num_keep, N_combat_outcome)
+
+    return CombatOutcomeSelection(
+        attack_counts=attack_counts[:num_keep], defense_counts=defense_counts[:num_keep],
+        probability=probability[:num_keep], total_probability=float(cumulative_probability[num_keep-1])
+    )
+
+
+def find_battle_type(my_region_index, target_region_index):
+    if my_region_index is not None and my_region_index.region_type_arr[target_region_index] == region.REGION_TYPE_WATER:
+        return combat.BATTLE_TYPE_NAVAL
+    return combat.BATTLE_TYPE_LAND
+
+
+def apply_combat_outcome(my_game_state, target_region_index, attack_counts, defense_counts, is_land_arr,
+                         is_land_target=True):
+    # child game state after the combat:  when the defenders are gone and (for a land region) a land unit survived the
+    # attacker takes the region and its surviving units move in, otherwise the region keeps its surviving defenders.
+    # Surviving attackers that do not take the region are not returned to the regions they came from
+    r = my_game_state.copy()
+
+    is_captured = defense_counts.sum() == 0 and attack_counts.sum() > 0
+    if is_land_target:
+        is_captured = is_captured and (attack_counts @ is_land_arr) > 0
+
+    remaining_counts = attack_counts if is_captured else defense_counts
+    for j, count in enumerate(remaining_counts):
+        if r.get_unit_count(target_region_index, j) != count:
+            r.set_unit_count(target_region_index, j, int(count))
+    if is_captured:
+        r.set_owner(target_region_index, my_game_state.player)
+
+    return r
+
+
+def build_combat_nodes(N_combat_outcome, total_probability_combat_outcome_limit, my_event_tree, parent_index,
+                       my_combat_cache, my_region_index=None, outcome_key_fun=None):
+    # adds one combat node per selected outcome of the combat move at parent_index as its children:  unit_counts_arr
+    # is the surviving attackers and probability_arr the probability of the outcome (not renormalized).  Outcome
+    # distributions come from my_combat_cache (combat_cache.CombatCache):  exact when the exact solver supports the
+    # battle, otherwise cached Monte Carlo samples.  my_combat_cache.unit_table must have the tree's unit names
+    unit_table = my_combat_cache.unit_table
+    if my_event_tree.unit_names != unit_table.names:
+        raise AxisAndAlliesBuildCombatNodesException(
+            "event tree unit_names {} do not match combat cache unit_table names {}".format(
+                my_event_tree.unit_names, unit_table.names
+            )
+        )
+
+    target_region_index = int(my_event_tree.target_region_arr[parent_index])
+    if target_region_index == evtre.NO_INDEX:
+        return []
+
+    my_game_state = my_event_tree.get_game_state(parent_index)
+    attack_counts = my_event_tree.unit_counts_arr[parent_index].astype(numpy.int64)
+    defense_counts = my_game_state.build_region_unit_counts(target_region_index).astype(numpy.int64)
+    battle_type = find_battle_type(my_region_index, target_region_index)
+
+    combat_outcome_distribution = my_combat_cache.get(attack_counts, defense_counts, battle_type)
+    selection = select_combat_outcomes(
+        N_combat_outcome, total_probability_combat_outcome_limit, combat_outcome_distribution.attack_counts,
+        combat_outcome_distribution.defense_counts, combat_outcome_distribution.probability, outcome_key_fun
+    )
+    logger.debug("len(selection.probability):  {}  selection.total_probability:  {}".format(
+        len(selection.probability), selection.total_probability
+    ))
+
+    node_list = my_event_tree.add_children(
+        parent_index, evtre.NT_combat, selection.probability.shape[0],
+        cost_arr=selection.attack_counts @ unit_table.ipc_arr, unit_counts_arr=selection.attack_counts,
+        probability_arr=selection.probability, player=my_game_state.player,
+        target_region_arr=numpy.full(selection.probability.shape[0], target_region_index)
+    )
+
+    is_land_target = battle_type == combat.BATTLE_TYPE_LAND
+    for node, cur_attack_counts, cur_defense_counts in zip(node_list, selection.attack_counts,
+                                                           selection.defense_counts):
+        my_event_tree.set_game_state(node["id"], apply_combat_outcome(
+            my_game_state, target_region_index, cur_attack_counts, cur_defense_counts, unit_table.is_land_arr,
+            is_land_target
+        ))
+
+    return node_list
+
+
+class AxisAndAlliesBuildCombatNodesException(Exception):
+    pass
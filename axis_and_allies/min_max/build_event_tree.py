@@ -12,19 +12,72 @@ import axis_and_allies.min_max.build_combat_nodes as build_combat_nodes
 logger = logging.getLogger(setup_logger.LOGGER_NAME)
 
 
+def build_expand_fun(expand_fun_dict):
+    # expand_fun for search.ExpectiminimaxSearch:  expand_fun_dict maps node type to a function(tree, index) that
+    # adds the children of a node of that type, node types missing from expand_fun_dict are leaves
+    def expand_fun(tree, index):
+        node_expand_fun = expand_fun_dict.get(tree.get_node_type(index))
+        if node_expand_fun is not None:
+            node_expand_fun(tree, index)
 
+    return expand_fun
 
-def build_indiv_player_turn_event_tree(IPC_limit, N_combat_outcome, total_probability_combat_outcome_limit):
+
+def build_purchase_expand_fun(IPC_limit, unit_dict, prune_fun=None):
+    return lambda tree, index: build_purchase_nodes.build_purchase_nodes(
+        IPC_limit, unit_dict, tree, prune_fun=prune_fun, parent_index=index
+    )
+
+
+def build_lazy_indiv_player_turn_event_tree(IPC_limit, unit_dict, prune_fun=None, expand_fun_dict=None):
+    # only the root is built, the search expands nodes as it visits them.  expand_fun_dict adds expansion of the
+    # other node types e.g. combat moves under purchases
     my_event_tree = evtre.EventTree()
 
-    purchase_node_list = build_purchase_nodes.build_purchase_nodes(IPC_limit, my_event_tree)
+    cur_expand_fun_dict = {evtre.NT_root:build_purchase_expand_fun(IPC_limit, unit_dict, prune_fun)}
+    if expand_fun_dict is not None:
+        cur_expand_fun_dict.update(expand_fun_dict)
+
+    return my_event_tree, build_expand_fun(cur_expand_fun_dict)
+
+
+def build_combat_move_expand_fun(my_region_index, unit_table,
+                                 max_num_candidates=build_combat_move_nodes.DEFAULT_MAX_NUM_CANDIDATES,
+                                 min_win_probability=build_combat_move_nodes.DEFAULT_MIN_WIN_PROBABILITY):
+    return lambda tree, index: build_combat_move_nodes.build_combat_move_nodes(
+        tree, index, tree.get_game_state(index), my_region_index, unit_table, max_num_candidates, min_win_probability
+    )
+
+
+def build_combat_expand_fun(N_combat_outcome, total_probability_combat_outcome_limit, my_combat_cache,
+                            my_region_index=None, outcome_key_fun=None):
+    return lambda tree, index: build_combat_nodes.build_combat_nodes(
+        N_combat_outcome, total_probability_combat_outcome_limit, tree, index, my_combat_cache, my_region_index,
+        outcome_key_fun
+    )
+
+
+def build_indiv_player_turn_event_tree(IPC_limit, unit_dict, N_combat_outcome, total_probability_combat_outcome_limit,
+                                       my_game_state, my_region_index, my_combat_cache,
+                                       max_num_combat_moves=build_combat_move_nodes.DEFAULT_MAX_NUM_CANDIDATES):
+    # the whole turn built up front:  purchases, then combat moves under every purchase, then combat outcomes under
+    # every combat move.  my_game_state.unit_names must be sorted(unit_dict.keys())
+    my_event_tree = evtre.EventTree()
+    my_event_tree.set_game_state(evtre.ROOT_INDEX, my_game_state)
 
-    my_event_tree.root["children"] = purchase_node_list
+    # purchase nodes are added as the children of the root
+    purchase_node_list = build_purchase_nodes.build_purchase_nodes(IPC_limit, unit_dict, my_event_tree)
 
-    combat_move_node_list = build_combat_move_nodes.build_combat_move_nodes()
+    for purchase_node in purchase_node_list:
+        combat_move_node_list = build_combat_move_nodes.build_combat_move_nodes(
+            my_event_tree, purchase_node["id"], my_game_state, my_region_index, my_combat_cache.unit_table,
+            max_num_combat_moves
+        )
 
-    for combat_move_node in combat_move_node_list:
-        combat_node_list = build_combat_nodes.build_combat_nodes(N_combat_outcome, total_probability_combat_outcome_limit)
-        combat_move_node["children"] = combat_node_list
+        for combat_move_node in combat_move_node_list:
+            build_combat_nodes.build_combat_nodes(
+                N_combat_outcome, total_probability_combat_outcome_limit, my_event_tree, combat_move_node["id"],
+                my_combat_cache, my_region_index
+            )
 
-    
\ No newline at end of file
+    return my_event_tree
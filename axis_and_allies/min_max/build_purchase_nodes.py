@@ -4,11 +4,15 @@ import numpy
 
 import axis_and_allies.setup_logger as setup_logger
 
+import axis_and_allies.unit as unit
 import axis_and_allies.min_max.event_tree as evtre
 
 logger = logging.getLogger(setup_logger.LOGGER_NAME)
 
 
+PURCHASE_BLOCK_SIZE = 100000
+
+
 def recurse_build_by_IPC_max_usage(IPC_cost_arr, total_IPC, current_entry, all_entry_set, min_IPC_cost):
     for i in range(IPC_cost_arr.shape[0]):
         new_entry = numpy.array(current_entry, dtype=numpy.uint16)
@@ -35,36 +39,106 @@ def recurse_build_by_IPC(IPC_cost_arr, total_IPC, current_entry, all_entry_set,
             recurse_build_by_IPC(IPC_cost_arr, total_IPC, new_entry, all_entry_set, min_IPC_cost)
 
 
-def build_purchase_nodes(IPC_limit, unit_dict, my_event_tree):
+def enumerate_all_purchases(IPC_cost_arr, total_IPC, dtype=numpy.uint16):
+    # every purchase with cost <= total_IPC (including the empty purchase) exactly once, one row per purchase in
+    # lexicographic order.  Built one unit type at a time:  each partial purchase is repeated once for every count
+    # of the next unit type that still fits in its remaining IPC
+    purchase_arr = numpy.zeros((1, IPC_cost_arr.shape[0]), dtype=dtype)
+    remain_IPC_arr = numpy.array([total_IPC], dtype=numpy.int64)
+
+    for i, cur_cost in enumerate(IPC_cost_arr):
+        num_options = remain_IPC_arr // cur_cost + 1
+        row_index = numpy.repeat(numpy.arange(num_options.shape[0]), num_options)
+        option_start = numpy.cumsum(num_options) - num_options
+        cur_count = numpy.arange(row_index.shape[0]) - option_start[row_index]
+
+        purchase_arr = purchase_arr[row_index]
+        purchase_arr[:, i] = cur_count
+        remain_IPC_arr = remain_IPC_arr[row_index] - cur_count * cur_cost
+
+    return purchase_arr
+
+
+def filter_purchases(purchase_arr, IPC_cost_arr, total_IPC, do_max_usage, do_include_empty):
+    purchase_cost_arr = calculate_purchase_cost(purchase_arr, IPC_cost_arr)
+
+    locs = numpy.ones(purchase_arr.shape[0], dtype=bool)
+    if not do_include_empty:
+        locs &= purchase_cost_arr > 0
+    if do_max_usage:
+        # same as recurse_build_by_IPC_max_usage - the remaining IPC cannot buy any more units
+        locs &= (total_IPC - purchase_cost_arr) < IPC_cost_arr.min()
+
+    return purchase_arr[locs]
+
+
+def calculate_purchase_cost(purchase_arr, IPC_cost_arr):
+    return purchase_arr.astype(numpy.int64) @ IPC_cost_arr
+
+
+def enumerate_purchases(IPC_cost_arr, total_IPC, do_max_usage=False, do_include_empty=False):
+    # same purchases as recurse_build_by_IPC (do_max_usage=False) or recurse_build_by_IPC_max_usage (True)
+    IPC_cost_arr = numpy.asarray(IPC_cost_arr, dtype=numpy.int64)
+
+    purchase_arr = enumerate_all_purchases(IPC_cost_arr, total_IPC)
+
+    return filter_purchases(purchase_arr, IPC_cost_arr, total_IPC, do_max_usage, do_include_empty)
+
+
+def count_purchases(IPC_cost_arr, total_IPC):
+    # entry b is the number of purchases (including the empty purchase) with cost <= b, coin change DP
+    ways_arr = numpy.zeros(total_IPC + 1, dtype=numpy.int64)
+    ways_arr[0] = 1
+    for cur_cost in IPC_cost_arr:
+        for b in range(cur_cost, total_IPC + 1):
+            ways_arr[b] += ways_arr[b - cur_cost]
+
+    return numpy.cumsum(ways_arr)
+
+
+def generate_purchases(IPC_cost_arr, total_IPC, do_max_usage=False, do_include_empty=False,
+                       max_block_size=PURCHASE_BLOCK_SIZE):
+    # streaming version of enumerate_purchases, yields blocks of rows in the same order.  Leading unit counts are
+    # fixed one at a time until the purchases of the remaining unit types fit in max_block_size
+    IPC_cost_arr = numpy.asarray(IPC_cost_arr, dtype=numpy.int64)
+
+    def recurse(prefix, remain_IPC):
+        i = len(prefix)
+        if i == IPC_cost_arr.shape[0] - 1 or count_purchases(IPC_cost_arr[i:], remain_IPC)[-1] <= max_block_size:
+            suffix_arr = enumerate_all_purchases(IPC_cost_arr[i:], remain_IPC)
+            prefix_arr = numpy.broadcast_to(numpy.array(prefix, dtype=suffix_arr.dtype), (suffix_arr.shape[0], i))
+            block_arr = filter_purchases(
+                numpy.hstack([prefix_arr, suffix_arr]), IPC_cost_arr, total_IPC, do_max_usage, do_include_empty
+            )
+            if block_arr.shape[0] > 0:
+                yield block_arr
+            return
+
+        for cur_count in range(remain_IPC // IPC_cost_arr[i] + 1):
+            yield from recurse(prefix + [cur_count], remain_IPC - cur_count * IPC_cost_arr[i])
+
+    yield from recurse([], total_IPC)
+
+
+def build_purchase_nodes(IPC_limit, unit_dict, my_event_tree, prune_fun=None, parent_index=evtre.ROOT_INDEX):
+    # adds one purchase node per purchase option as children of parent_index, prune_fun(unit_table, purchase_arr,
+    # IPC_limit) e.g. prune_purchase_nodes.prune_purchases, removes purchase options before nodes are built
     unit_name_list = sorted(unit_dict.keys())
     logger.debug("unit_name_list:  {}".format(unit_name_list))
 
     IPC_cost_arr = numpy.array([unit_dict[x].ipc for x in unit_name_list])
     logger.debug("IPC_cost_arr:  {}".format(IPC_cost_arr))
 
-    init_entry = numpy.zeros(IPC_cost_arr.shape[0])
-    all_entry_set = set()
-    recurse_build_by_IPC(IPC_cost_arr, IPC_limit, init_entry, all_entry_set, min(IPC_cost_arr))
-
-    ae_list = list(all_entry_set)
-    logger.debug("len(ae_list):  {}".format(len(ae_list)))
-    logger.debug("ae_list:\n{}".format(ae_list))
-
-    all_entry_name_count_list = []
-    for cur_entry in ae_list:
-        cur_cost = sum(IPC_cost_arr * numpy.array(cur_entry))
-        cur_dict = {unit_name_list[i]:unit_count for i,unit_count in enumerate(cur_entry)}
-        all_entry_name_count_list.append((cur_dict, cur_cost))
-
-    node_list = []
-    for cur_entry, cur_cost in all_entry_name_count_list:
-        cur_node = {
-            "type":evtre.NT_purchase, 
-            "IPC_limit":IPC_limit, 
-            "purchase_unit_counts":cur_entry,
-            "cost":cur_cost
-        }
-        cur_node.update(my_event_tree.build_basic_node())
-        node_list.append(cur_node)
-
-    return node_list
\ No newline at end of file
+    purchase_arr = enumerate_purchases(IPC_cost_arr, IPC_limit)
+    if prune_fun is not None:
+        purchase_arr = prune_fun(unit.build_unit_table(unit_dict), purchase_arr, IPC_limit).purchase_arr
+    purchase_cost_arr = calculate_purchase_cost(purchase_arr, IPC_cost_arr)
+    logger.debug("purchase_arr.shape:  {}".format(purchase_arr.shape))
+
+    my_event_tree.set_unit_names(unit_name_list)
+    node_list = my_event_tree.add_children(
+        parent_index, evtre.NT_purchase, purchase_arr.shape[0], cost_arr=purchase_cost_arr,
+        unit_counts_arr=purchase_arr, IPC_limit=IPC_limit
+    )
+
+    return node_list
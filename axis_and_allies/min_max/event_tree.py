@@ -1,25 +1,366 @@
-import itertools
+import collections.abc
+
+import numpy
 
 import axis_and_allies.game_state as game_state
 
 
+NT_root = "root"
 NT_purchase = "purchase"
+NT_combat_move = "combat_move"
+NT_combat = "combat"
+
+NODE_TYPE_LIST = [NT_root, NT_purchase, NT_combat_move, NT_combat]
+NODE_TYPE_CODE_DICT = {x:i for i, x in enumerate(NODE_TYPE_LIST)}
+
+ROOT_INDEX = 0
+NO_INDEX = -1
+NEVER_VISITED = -1
+
+DEFAULT_CAPACITY = 1024
+
 
 class EventTree:
-    id_iter = itertools.count()
+    # struct-of-arrays node store:  node i is entry i of every *_arr attribute, the children of a node are the
+    # contiguous block child_start_arr[i]:child_start_arr[i]+child_count_arr[i].  Game states are shared - a node
+    # whose game_state_index is NO_INDEX uses the game state of its closest ancestor that has one
+    def __init__(self, unit_names=None, capacity=DEFAULT_CAPACITY, unit_count_dtype=numpy.uint16) -> None:
+        self.unit_names = None
+        self.unit_count_dtype = unit_count_dtype
+
+        self.num_nodes = 0
+        self.capacity = 0
+        self.node_type_arr = numpy.zeros(0, dtype=numpy.int8)
+        # player who makes the decision at the node
+        self.player_arr = numpy.zeros(0, dtype=numpy.int8)
+        self.parent_arr = numpy.zeros(0, dtype=numpy.int32)
+        self.child_start_arr = numpy.zeros(0, dtype=numpy.int32)
+        self.child_count_arr = numpy.zeros(0, dtype=numpy.int32)
+        self.cost_arr = numpy.zeros(0, dtype=numpy.int32)
+        self.IPC_limit_arr = numpy.zeros(0, dtype=numpy.int32)
+        self.probability_arr = numpy.zeros(0, dtype=numpy.float32)
+        self.game_state_index_arr = numpy.zeros(0, dtype=numpy.int32)
+        self.unit_counts_arr = numpy.zeros((0, 0), dtype=unit_count_dtype)
+        # region index (region_index.RegionIndex order) of the combat of combat move and combat nodes
+        self.target_region_arr = numpy.zeros(0, dtype=numpy.int32)
+        # lazy expansion:  whether the children of the node have been built, and the last search generation that
+        # visited the node
+        self.is_expanded_arr = numpy.zeros(0, dtype=bool)
+        self.last_visit_arr = numpy.zeros(0, dtype=numpy.int32)
+        # incremented by each search from the root
+        self.generation = 0
+
+        self.game_state_list = []
+
+        self.grow(capacity)
+        if unit_names is not None:
+            self.set_unit_names(unit_names)
+
+        self.root = self.add_node(NT_root)
+        self.set_game_state(ROOT_INDEX, game_state.GameState())
+
+    def __len__(self) -> int:
+        return self.num_nodes
+
+    def __repr__(self) -> str:
+        return "num_nodes:  {}  capacity:  {}  len(game_state_list):  {}  nbytes:  {}".format(
+            self.num_nodes, self.capacity, len(self.game_state_list), self.calculate_nbytes()
+        )
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def build_array_list(self):
+        return [
+            self.node_type_arr, self.player_arr, self.parent_arr, self.child_start_arr, self.child_count_arr,
+            self.cost_arr, self.IPC_limit_arr, self.probability_arr, self.game_state_index_arr, self.unit_counts_arr,
+            self.target_region_arr, self.is_expanded_arr, self.last_visit_arr
+        ]
+
+    def calculate_nbytes(self):
+        return sum(x.nbytes for x in self.build_array_list())
 
-    def __init__(self) -> None:
-        self.root = self.build_basic_node()
+    def grow(self, min_capacity):
+        if min_capacity <= self.capacity:
+            return
+
+        new_capacity = max(min_capacity, 2 * self.capacity)
+
+        def resize(arr, fill_value=0):
+            new_arr = numpy.full((new_capacity,) + arr.shape[1:], fill_value, dtype=arr.dtype)
+            new_arr[:self.num_nodes] = arr[:self.num_nodes]
+            return new_arr
+
+        self.node_type_arr = resize(self.node_type_arr)
+        self.player_arr = resize(self.player_arr)
+        self.parent_arr = resize(self.parent_arr, NO_INDEX)
+        self.child_start_arr = resize(self.child_start_arr, NO_INDEX)
+        self.child_count_arr = resize(self.child_count_arr)
+        self.cost_arr = resize(self.cost_arr)
+        self.IPC_limit_arr = resize(self.IPC_limit_arr)
+        self.probability_arr = resize(self.probability_arr, 1.)
+        self.game_state_index_arr = resize(self.game_state_index_arr, NO_INDEX)
+        self.unit_counts_arr = resize(self.unit_counts_arr)
+        self.target_region_arr = resize(self.target_region_arr, NO_INDEX)
+        self.is_expanded_arr = resize(self.is_expanded_arr)
+        self.last_visit_arr = resize(self.last_visit_arr, NEVER_VISITED)
+
+        self.capacity = new_capacity
+
+    def set_unit_names(self, unit_names):
+        unit_names = list(unit_names)
+        if self.unit_names is not None:
+            if self.unit_names != unit_names:
+                raise AxisAndAlliesEventTreeException(
+                    "unit_names {} do not match existing unit_names {}".format(unit_names, self.unit_names)
+                )
+            return
+
+        self.unit_names = unit_names
+        self.unit_counts_arr = numpy.zeros((self.capacity, len(unit_names)), dtype=self.unit_count_dtype)
+
+    def add_node(self, node_type, parent_index=NO_INDEX):
+        # single node with no children, for the root and for callers of build_basic_node
+        if parent_index != NO_INDEX:
+            return self.add_children(parent_index, node_type, 1)[0]
+
+        self.grow(self.num_nodes + 1)
+        index = self.num_nodes
+        self.node_type_arr[index] = NODE_TYPE_CODE_DICT[node_type]
+        self.num_nodes += 1
+
+        return NodeView(self, index)
 
     def build_basic_node(self):
-        new_node = {"children":[], "id":next(EventTree.id_iter), "game_state":game_state.GameState()}
-        return new_node
-    
+        return self.add_node(NT_root)
+
+    def add_children(self, parent_index, node_type, num_children, cost_arr=None, unit_counts_arr=None,
+                     probability_arr=None, IPC_limit=0, player=0, target_region_arr=None):
+        # appends num_children nodes as the children of parent_index.  A node that already has children can only
+        # get more if its existing children are the last block of nodes, so the children stay contiguous
+        start = self.num_nodes
+        cur_child_count = self.child_count_arr[parent_index]
+        if cur_child_count > 0 and self.child_start_arr[parent_index] + cur_child_count != start:
+            raise AxisAndAlliesEventTreeException(
+                "children of parent_index {} are not the last block of nodes, cannot add more".format(parent_index)
+            )
+
+        self.grow(start + num_children)
+        end = start + num_children
+
+        self.node_type_arr[start:end] = NODE_TYPE_CODE_DICT[node_type]
+        self.parent_arr[start:end] = parent_index
+        self.player_arr[start:end] = player
+        self.IPC_limit_arr[start:end] = IPC_limit
+        if cost_arr is not None:
+            self.cost_arr[start:end] = cost_arr
+        if probability_arr is not None:
+            self.probability_arr[start:end] = probability_arr
+        if target_region_arr is not None:
+            self.target_region_arr[start:end] = target_region_arr
+        if unit_counts_arr is not None:
+            if numpy.max(unit_counts_arr, initial=0) > numpy.iinfo(self.unit_count_dtype).max:
+                raise AxisAndAlliesEventTreeException(
+                    "unit counts larger than unit_count_dtype {} can hold".format(self.unit_count_dtype)
+                )
+            self.unit_counts_arr[start:end] = unit_counts_arr
+
+        if cur_child_count == 0:
+            self.child_start_arr[parent_index] = start
+        self.child_count_arr[parent_index] = cur_child_count + num_children
+        self.is_expanded_arr[parent_index] = True
+
+        self.num_nodes = end
+
+        return [NodeView(self, i) for i in range(start, end)]
+
+    def get_children_indexes(self, index):
+        start = self.child_start_arr[index]
+        return numpy.arange(start, start + self.child_count_arr[index]) if start != NO_INDEX else numpy.arange(0)
+
+    def get_node_type(self, index):
+        return NODE_TYPE_LIST[self.node_type_arr[index]]
+
+    def get_game_state(self, index):
+        # nearest ancestor (or the node itself) that has a game state, the root game state for detached nodes
+        while index != NO_INDEX and self.game_state_index_arr[index] == NO_INDEX:
+            index = self.parent_arr[index]
+
+        if index == NO_INDEX:
+            return self.game_state_list[self.game_state_index_arr[ROOT_INDEX]]
+        return self.game_state_list[self.game_state_index_arr[index]]
+
+    def set_game_state(self, index, my_game_state):
+        self.game_state_index_arr[index] = len(self.game_state_list)
+        self.game_state_list.append(my_game_state)
+
+    def get_unit_counts_dict(self, index):
+        return {x:int(self.unit_counts_arr[index, i]) for i, x in enumerate(self.unit_names)}
+
+    def collapse(self, index):
+        # drops the children of index, they are unreachable until compact removes them and index can be expanded
+        # again
+        self.child_start_arr[index] = NO_INDEX
+        self.child_count_arr[index] = 0
+        self.is_expanded_arr[index] = False
+
+    def find_reachable(self):
+        # entry i is True if node i can be reached from the root through child blocks
+        n = self.num_nodes
+        index_arr = numpy.arange(n)
+        parent_arr = self.parent_arr[:n]
+
+        has_parent = parent_arr != NO_INDEX
+        safe_parent_arr = numpy.where(has_parent, parent_arr, ROOT_INDEX)
+        child_start_arr = self.child_start_arr[safe_parent_arr]
+        is_reachable = has_parent & (child_start_arr != NO_INDEX) & (child_start_arr <= index_arr) \
+            & (index_arr < child_start_arr + self.child_count_arr[safe_parent_arr])
+        is_reachable[ROOT_INDEX] = True
+
+        # a node is reachable if every node on its path to the root is in its parent's child block
+        ancestor_arr = safe_parent_arr.copy()
+        ancestor_arr[ROOT_INDEX] = ROOT_INDEX
+        while numpy.any(ancestor_arr != ROOT_INDEX):
+            is_reachable &= is_reachable[ancestor_arr]
+            ancestor_arr = numpy.where(ancestor_arr != ROOT_INDEX, parent_arr[ancestor_arr], ROOT_INDEX)
+
+        return is_reachable
+
+    def compact(self):
+        # removes unreachable nodes and game states, returns index_map where index_map[old index] is the new index
+        # (NO_INDEX for removed nodes).  Node order is kept so child blocks stay contiguous
+        n = self.num_nodes
+        is_reachable = self.find_reachable()
+
+        index_map = numpy.full(n, NO_INDEX, dtype=numpy.int32)
+        index_map[is_reachable] = numpy.arange(numpy.sum(is_reachable), dtype=numpy.int32)
+
+        def remap(arr):
+            return numpy.where(arr != NO_INDEX, index_map[numpy.maximum(arr, 0)], NO_INDEX)
+
+        game_state_index_arr = self.game_state_index_arr[:n][is_reachable]
+        has_game_state = game_state_index_arr != NO_INDEX
+        self.game_state_list = [self.game_state_list[x] for x in game_state_index_arr[has_game_state]]
+        game_state_index_arr[has_game_state] = numpy.arange(numpy.sum(has_game_state))
+
+        new_n = int(numpy.sum(is_reachable))
+        for name in ["node_type_arr", "player_arr", "cost_arr", "IPC_limit_arr", "probability_arr", "unit_counts_arr",
+                     "target_region_arr", "is_expanded_arr", "last_visit_arr"]:
+            arr = getattr(self, name)
+            arr[:new_n] = arr[:n][is_reachable]
+        self.parent_arr[:new_n] = remap(self.parent_arr[:n][is_reachable])
+        self.child_start_arr[:new_n] = remap(self.child_start_arr[:n][is_reachable])
+        self.child_count_arr[:new_n] = self.child_count_arr[:n][is_reachable]
+        self.game_state_index_arr[:new_n] = game_state_index_arr
+
+        self.num_nodes = new_n
+
+        return index_map
+
+    def find_cold_generation(self, max_num_nodes):
+        # smallest generation g such that removing every node that was, along with its parent, last visited before g
+        # leaves at most max_num_nodes nodes.  Returns None if that needs g past the current generation.  Ancestors
+        # are visited whenever their descendants are, so nodes older than g form whole subtrees
+        n = self.num_nodes
+        last_visit_arr = self.last_visit_arr[:n]
+        parent_arr = self.parent_arr[:n]
+        parent_last_visit_arr = numpy.where(
+            parent_arr != NO_INDEX, last_visit_arr[numpy.maximum(parent_arr, 0)], numpy.iinfo(numpy.int32).max
+        )
+        # a node is removed at generation g if it and its parent were last visited before g
+        remove_generation_arr = numpy.maximum(last_visit_arr, parent_last_visit_arr)
+
+        generation_arr, count_arr = numpy.unique(remove_generation_arr, return_counts=True)
+        # number of nodes removed when collapsing before generation_arr[i] + 1
+        num_removed_arr = numpy.cumsum(count_arr)
+        locs = numpy.nonzero(n - num_removed_arr <= max_num_nodes)[0]
+        if locs.shape[0] == 0 or generation_arr[locs[0]] + 1 > self.generation:
+            return None
+        return int(generation_arr[locs[0]]) + 1
+
+    def evict_cold_subtrees(self, max_num_nodes):
+        # collapses the least recently visited subtrees until at most max_num_nodes remain, nodes visited in the
+        # current generation are never removed.  Returns index_map from compact
+        cold_generation = self.find_cold_generation(max_num_nodes)
+        if cold_generation is None:
+            cold_generation = self.generation
+
+        n = self.num_nodes
+        is_cold = self.last_visit_arr[:n] < cold_generation
+        parent_arr = self.parent_arr[:n]
+        is_parent_cold = numpy.where(parent_arr != NO_INDEX, is_cold[numpy.maximum(parent_arr, 0)], False)
+        # collapse the children of the topmost cold nodes and of warm nodes whose children are all cold
+        collapse_index_arr = numpy.nonzero(
+            ~is_cold & self.is_expanded_arr[:n] & (self.child_count_arr[:n] > 0)
+        )[0]
+        for index in collapse_index_arr:
+            child_index_arr = self.get_children_indexes(index)
+            if numpy.all(is_cold[child_index_arr]):
+                self.collapse(index)
+        for index in numpy.nonzero(is_cold & ~is_parent_cold & (self.child_count_arr[:n] > 0))[0]:
+            self.collapse(index)
+
+        return self.compact()
+
+
+class NodeView(collections.abc.Mapping):
+    # read only dict-like access to one node of an EventTree, same keys as the dict nodes used previously
+    KEYS = ["id", "type", "player", "parent", "children", "cost", "IPC_limit", "probability", "purchase_unit_counts",
+            "game_state", "is_expanded", "target_region"]
+
+    def __init__(self, tree, index) -> None:
+        self.tree = tree
+        self.index = int(index)
+
+    def __getitem__(self, key):
+        tree = self.tree
+        i = self.index
+        if key == "id":
+            return i
+        if key == "type":
+            return tree.get_node_type(i)
+        if key == "player":
+            return int(tree.player_arr[i])
+        if key == "parent":
+            return int(tree.parent_arr[i])
+        if key == "children":
+            return [NodeView(tree, x) for x in tree.get_children_indexes(i)]
+        if key == "cost":
+            return int(tree.cost_arr[i])
+        if key == "IPC_limit":
+            return int(tree.IPC_limit_arr[i])
+        if key == "probability":
+            return float(tree.probability_arr[i])
+        if key == "purchase_unit_counts":
+            return tree.get_unit_counts_dict(i) if tree.unit_names is not None else {}
+        if key == "game_state":
+            return tree.get_game_state(i)
+        if key == "is_expanded":
+            return bool(tree.is_expanded_arr[i])
+        if key == "target_region":
+            return int(tree.target_region_arr[i])
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(NodeView.KEYS)
+
+    def __len__(self) -> int:
+        return len(NodeView.KEYS)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, NodeView) and other.tree is self.tree and other.index == self.index
+
+    def __hash__(self) -> int:
+        return hash((id(self.tree), self.index))
 
     def __repr__(self) -> str:
-        return "len(root):  {}  root.keys():  {}".format(
-            len(self.root), self.root.keys()
+        return "NodeView index:  {}  type:  {}  parent:  {}  num_children:  {}  cost:  {}".format(
+            self.index, self["type"], self["parent"], self.tree.child_count_arr[self.index], self["cost"]
         )
-    
+
     def __str__(self) -> str:
-        return self.__repr__()
\ No newline at end of file
+        return self.__repr__()
+
+
+class AxisAndAlliesEventTreeException(Exception):
+    pass
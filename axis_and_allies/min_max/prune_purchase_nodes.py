@@ -0,0 +1,136 @@
+import logging
+import collections
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.combat as combat
+import axis_and_allies.unit as unit
+import axis_and_allies.min_max.build_purchase_nodes as build_purchase_nodes
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+# number of rows compared against all candidates at once when checking dominance
+DOMINANCE_CHUNK_SIZE = 512
+
+PurchasePruneResult = collections.namedtuple("PurchasePruneResult",
+    ["purchase_arr", "num_dropped_leftover", "num_dropped_dominated", "num_dropped_value"]
+)
+
+
+def build_battle_type_unit_mask(unit_table, battle_type):
+    # which unit types take part in a battle of battle_type, None means every unit type counts
+    if battle_type is None or battle_type == combat.BATTLE_TYPE_AMPHIBIOUS:
+        return numpy.ones(len(unit_table), dtype=bool)
+    if battle_type == combat.BATTLE_TYPE_LAND:
+        return unit_table.is_land_arr | unit_table.is_air_arr
+    if battle_type == combat.BATTLE_TYPE_NAVAL:
+        return unit_table.is_naval_arr | unit_table.is_air_arr
+
+    raise AxisAndAlliesPrunePurchaseException("unrecognized battle_type:  {}".format(battle_type))
+
+
+def calculate_purchase_features(unit_table, purchase_arr, battle_type=None):
+    # one row per purchase:  attack power, defense power, hit points, negative cost - larger is better for each
+    counts = purchase_arr.astype(numpy.int64) * build_battle_type_unit_mask(unit_table, battle_type)
+
+    attack_power = counts @ unit_table.attack_arr
+    infantry_index = unit_table.get_index(unit.INFANTRY)
+    artillery_index = unit_table.get_index(unit.ARTILLERY)
+    if infantry_index is not None and artillery_index is not None:
+        num_paired_infantry = numpy.minimum(counts[:, infantry_index], counts[:, artillery_index])
+        attack_power = attack_power + num_paired_infantry * (
+            combat.ARTILLERY_SUPPORTED_INFANTRY_ATTACK - unit_table.attack_arr[infantry_index]
+        )
+
+    defense_power = counts @ unit_table.defense_arr
+    hit_points = counts @ unit_table.max_hit_points_arr
+    cost = build_purchase_nodes.calculate_purchase_cost(purchase_arr, unit_table.ipc_arr)
+
+    return numpy.column_stack([attack_power, defense_power, hit_points, -cost])
+
+
+def find_dominated_in_block(block_feature_arr, candidate_feature_arr, is_same_block):
+    # entry j is True if some row of candidate_feature_arr dominates row j of block_feature_arr, rows of both are
+    # unique so >= in every feature and not identical means > in at least one
+    is_ge = numpy.all(candidate_feature_arr[:, None, :] >= block_feature_arr[None, :, :], axis=2)
+    if is_same_block:
+        numpy.fill_diagonal(is_ge, False)
+    return numpy.any(is_ge, axis=0)
+
+
+def find_dominated(feature_arr, chunk_size=DOMINANCE_CHUNK_SIZE):
+    # row j is dominated if another row is >= in every feature and > in at least one.  Rows are visited in order of
+    # decreasing feature sum, a dominating row always has a larger sum so each row only has to be compared against
+    # the non-dominated rows found so far (dominance is transitive)
+    unique_feature_arr, inverse_index = numpy.unique(feature_arr, axis=0, return_inverse=True)
+    sort_index = numpy.argsort(-numpy.sum(unique_feature_arr, axis=1), kind="stable")
+    sort_feature_arr = unique_feature_arr[sort_index]
+
+    is_sort_dominated = numpy.zeros(sort_feature_arr.shape[0], dtype=bool)
+    frontier_feature_arr = sort_feature_arr[:0]
+    for start in range(0, sort_feature_arr.shape[0], chunk_size):
+        block_feature_arr = sort_feature_arr[start:start+chunk_size]
+        is_block_dominated = find_dominated_in_block(block_feature_arr, frontier_feature_arr, False)
+
+        candidate_feature_arr = block_feature_arr[~is_block_dominated]
+        is_block_dominated[~is_block_dominated] = find_dominated_in_block(
+            candidate_feature_arr, candidate_feature_arr, True
+        )
+
+        is_sort_dominated[start:start+chunk_size] = is_block_dominated
+        frontier_feature_arr = numpy.vstack([frontier_feature_arr, block_feature_arr[~is_block_dominated]])
+
+    is_unique_dominated = numpy.zeros(unique_feature_arr.shape[0], dtype=bool)
+    is_unique_dominated[sort_index] = is_sort_dominated
+
+    return is_unique_dominated[inverse_index.ravel()]
+
+
+def prune_purchases(unit_table, purchase_arr, total_IPC, battle_type=None, value_fun=None, max_num_options=None):
+    # removes purchases that are never better than another purchase for battle_type:
+    #    1. leftover IPC could still buy one of the unit types that fight in battle_type
+    #    2. another purchase has at least as much attack, defense and hit points for no more IPC
+    # value_fun(unit_table, purchase_arr) is an optional combat value estimator, when given only the
+    # max_num_options purchases with the largest value are kept
+    battle_type_unit_mask = build_battle_type_unit_mask(unit_table, battle_type)
+    min_IPC_cost = unit_table.ipc_arr[battle_type_unit_mask].min()
+
+    purchase_cost_arr = build_purchase_nodes.calculate_purchase_cost(purchase_arr, unit_table.ipc_arr)
+    locs = (total_IPC - purchase_cost_arr) < min_IPC_cost
+    num_dropped_leftover = int(numpy.sum(~locs))
+    purchase_arr = purchase_arr[locs]
+
+    feature_arr = calculate_purchase_features(unit_table, purchase_arr, battle_type)
+    locs = ~find_dominated(feature_arr)
+    num_dropped_dominated = int(numpy.sum(~locs))
+    purchase_arr = purchase_arr[locs]
+
+    num_dropped_value = 0
+    if value_fun is not None and max_num_options is not None and purchase_arr.shape[0] > max_num_options:
+        value_arr = value_fun(unit_table, purchase_arr)
+        keep_index = numpy.sort(numpy.argsort(-value_arr, kind="stable")[:max_num_options])
+        num_dropped_value = purchase_arr.shape[0] - keep_index.shape[0]
+        purchase_arr = purchase_arr[keep_index]
+
+    logger.info("num_dropped_leftover:  {}  num_dropped_dominated:  {}  num_dropped_value:  {}  remaining:  {}".format(
+        num_dropped_leftover, num_dropped_dominated, num_dropped_value, purchase_arr.shape[0]
+    ))
+
+    return PurchasePruneResult(
+        purchase_arr=purchase_arr, num_dropped_leftover=num_dropped_leftover,
+        num_dropped_dominated=num_dropped_dominated, num_dropped_value=num_dropped_value
+    )
+
+
+def calculate_power_value(unit_table, purchase_arr, battle_type=None, attack_weight=0.5):
+    # simple combat value estimator for value_fun, Lanchester square law style:  weighted power times hit points
+    feature_arr = calculate_purchase_features(unit_table, purchase_arr, battle_type)
+    power = attack_weight * feature_arr[:, 0] + (1. - attack_weight) * feature_arr[:, 1]
+    return power * feature_arr[:, 2]
+
+
+class AxisAndAlliesPrunePurchaseException(Exception):
+    pass
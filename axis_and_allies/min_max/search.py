@@ -0,0 +1,306 @@
+import logging
+import collections
+import math
+import time
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.min_max.event_tree as evtre
+import axis_and_allies.min_max.transposition_table as transposition_table
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+DEFAULT_EVICTION_FRACTION = 0.75
+
+SearchResult = collections.namedtuple("SearchResult",
+    ["value", "best_child_index", "depth", "num_nodes_searched", "is_complete"]
+)
+
+
+class ExpectiminimaxSearch:
+    # depth limited expectiminimax over an EventTree.  Decision nodes are max nodes when the deciding player is the
+    # root player and min nodes otherwise, nodes whose children are combat outcomes are chance nodes.
+    #    evaluate_fun(tree, index) - value of a leaf or depth limited node for the root player
+    #    value_min, value_max - bounds on evaluate_fun, when both are finite chance nodes use Star1 pruning and,
+    #        with do_star2, Star2 probing.  Star2 only pays off when the first grandchild is usually the best one
+    #        (good move ordering), otherwise the probes cost more than they prune
+    #    N_combat_outcome, total_probability_combat_outcome_limit - only the N_combat_outcome most likely outcomes
+    #        of a chance node are searched, stopping once their total probability reaches the limit, the searched
+    #        probabilities are renormalized
+    #    expand_fun(tree, index) - builds the children of a node the first time the search needs them, nodes that
+    #        are still unexpanded after expand_fun are leaves
+    #    node_budget - maximum number of nodes in the tree, once reached unexpanded nodes are evaluated instead of
+    #        expanded.  Between iterations of run_iterative_deepening subtrees not visited by the latest
+    #        iteration are evicted to bring the tree back under eviction_fraction * node_budget
+    #    my_transposition_table - transposition_table.TranspositionTable shared by nodes with the same hash_fun(tree,
+    #        index), by default transposition_table.build_game_state_hash_fun
+    def __init__(self, evaluate_fun, value_min=-math.inf, value_max=math.inf, N_combat_outcome=None,
+                 total_probability_combat_outcome_limit=1., do_star2=False, expand_fun=None, node_budget=None,
+                 eviction_fraction=DEFAULT_EVICTION_FRACTION, my_transposition_table=None, hash_fun=None) -> None:
+        self.evaluate_fun = evaluate_fun
+        self.value_min = value_min
+        self.value_max = value_max
+        self.N_combat_outcome = N_combat_outcome
+        self.total_probability_combat_outcome_limit = total_probability_combat_outcome_limit
+        self.do_star2 = do_star2
+        self.expand_fun = expand_fun
+        self.node_budget = node_budget
+        self.eviction_fraction = eviction_fraction
+        self.my_transposition_table = my_transposition_table
+        self.hash_fun = hash_fun
+        if my_transposition_table is not None and hash_fun is None:
+            self.hash_fun = transposition_table.build_game_state_hash_fun()
+
+        self.do_star_pruning = math.isfinite(value_min) and math.isfinite(value_max)
+
+        self.root_player = 0
+        self.deadline = None
+        self.num_nodes_searched = 0
+        self.num_nodes_expanded = 0
+        self.num_nodes_evicted = 0
+        # best child found for each decision node by the previous iteration, searched first in the next one
+        self.best_child_dict = {}
+
+    def __repr__(self) -> str:
+        return "value_min:  {}  value_max:  {}  N_combat_outcome:  {}  total_probability_combat_outcome_limit:  {}  " \
+            "do_star_pruning:  {}  do_star2:  {}  num_nodes_searched:  {}".format(
+                self.value_min, self.value_max, self.N_combat_outcome, self.total_probability_combat_outcome_limit,
+                self.do_star_pruning, self.do_star2, self.num_nodes_searched
+            )
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def is_chance_node(self, tree, index):
+        child_start = tree.child_start_arr[index]
+        return (tree.child_count_arr[index] > 0
+                and tree.node_type_arr[child_start] == evtre.NODE_TYPE_CODE_DICT[evtre.NT_combat])
+
+    def is_max_node(self, tree, index):
+        return tree.player_arr[index] == self.root_player
+
+    def select_chance_children(self, tree, index):
+        child_index_arr = tree.get_children_indexes(index)
+        probability_arr = tree.probability_arr[child_index_arr].astype(float)
+
+        locs = probability_arr > 0
+        child_index_arr = child_index_arr[locs]
+        probability_arr = probability_arr[locs]
+        # no outcome is possible, the caller evaluates the node as a leaf
+        if child_index_arr.shape[0] == 0:
+            return child_index_arr, probability_arr
+
+        sort_index = numpy.argsort(-probability_arr, kind="stable")
+        child_index_arr = child_index_arr[sort_index]
+        probability_arr = probability_arr[sort_index]
+
+        cumulative_probability_arr = numpy.cumsum(probability_arr)
+        # keep outcomes until the one that reaches the limit
+        num_keep = numpy.searchsorted(
+            cumulative_probability_arr, self.total_probability_combat_outcome_limit * cumulative_probability_arr[-1]
+        ) + 1
+        if self.N_combat_outcome is not None:
+            num_keep = min(num_keep, self.N_combat_outcome)
+        num_keep = min(num_keep, child_index_arr.shape[0])
+
+        probability_arr = probability_arr[:num_keep]
+        return child_index_arr[:num_keep], probability_arr / probability_arr.sum()
+
+    def order_decision_children(self, tree, index):
+        child_index_arr = tree.get_children_indexes(index)
+        best_child_index = self.best_child_dict.get(index)
+        if best_child_index is not None and child_index_arr[0] != best_child_index:
+            child_index_arr = numpy.concatenate([[best_child_index], child_index_arr[child_index_arr != best_child_index]])
+        return child_index_arr
+
+    def check_deadline(self):
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise AxisAndAlliesSearchTimeoutException("search deadline passed")
+
+    def search(self, tree, index, depth, alpha=-math.inf, beta=math.inf):
+        # fail-soft:  a returned value <= alpha is an upper bound and a value >= beta is a lower bound
+        self.num_nodes_searched += 1
+        self.check_deadline()
+        tree.last_visit_arr[index] = tree.generation
+
+        key = None
+        if self.my_transposition_table is not None:
+            key = self.hash_fun(tree, index)
+            value = self.my_transposition_table.probe(key, depth, alpha, beta)
+            if value is not None:
+                return value
+
+        if depth > 0 and self.expand_fun is not None and not tree.is_expanded_arr[index]:
+            self.expand(tree, index)
+
+        if depth <= 0 or tree.child_count_arr[index] == 0:
+            value = self.evaluate_fun(tree, index)
+            if key is not None:
+                self.my_transposition_table.store(key, value, 0, transposition_table.BOUND_EXACT)
+            return value
+
+        if self.is_chance_node(tree, index):
+            value = self.search_chance(tree, index, depth, alpha, beta)
+        else:
+            value = self.search_decision(tree, index, depth, alpha, beta)
+
+        if key is not None:
+            self.my_transposition_table.store(key, value, depth, transposition_table.calculate_bound(value, alpha, beta))
+        return value
+
+    def expand(self, tree, index):
+        if self.node_budget is not None and len(tree) >= self.node_budget:
+            return
+
+        num_nodes = len(tree)
+        self.expand_fun(tree, index)
+        tree.is_expanded_arr[index] = True
+        self.num_nodes_expanded += len(tree) - num_nodes
+
+    def evict(self, tree, root_index):
+        # removes subtrees not visited by the current generation, returns the new index of root_index
+        if self.node_budget is None or len(tree) <= self.eviction_fraction * self.node_budget:
+            return root_index
+
+        num_nodes = len(tree)
+        index_map = tree.evict_cold_subtrees(int(self.eviction_fraction * self.node_budget))
+        self.num_nodes_evicted += num_nodes - len(tree)
+        logger.debug("evicted:  {}  remaining:  {}".format(num_nodes - len(tree), len(tree)))
+
+        self.best_child_dict = {
+            int(index_map[k]):int(index_map[v]) for k, v in self.best_child_dict.items()
+            if v is not None and index_map[k] != evtre.NO_INDEX and index_map[v] != evtre.NO_INDEX
+        }
+        return int(index_map[root_index])
+
+    def start_generation(self, tree, root_index):
+        # the root and its ancestors count as visited so eviction never removes them
+        tree.generation += 1
+        if self.my_transposition_table is not None:
+            self.my_transposition_table.new_generation()
+        index = root_index
+        while index != evtre.NO_INDEX:
+            tree.last_visit_arr[index] = tree.generation
+            index = tree.parent_arr[index]
+
+    def search_decision(self, tree, index, depth, alpha, beta):
+        is_max = self.is_max_node(tree, index)
+
+        best_value = -math.inf if is_max else math.inf
+        best_child_index = None
+        for child_index in self.order_decision_children(tree, index):
+            value = self.search(tree, child_index, depth - 1, alpha, beta)
+
+            if (is_max and value > best_value) or (not is_max and value < best_value):
+                best_value = value
+                best_child_index = child_index
+
+            if is_max:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+
+        self.best_child_dict[index] = best_child_index
+        return best_value
+
+    def probe_chance_children(self, tree, child_index_arr, depth, lower_bound_arr, upper_bound_arr):
+        # Star2:  the value of the first grandchild is a lower bound on a max child and an upper bound on a min child
+        for i, child_index in enumerate(child_index_arr):
+            if depth - 1 <= 0 or tree.child_count_arr[child_index] == 0 or self.is_chance_node(tree, child_index):
+                continue
+
+            probe_index = self.order_decision_children(tree, child_index)[0]
+            probe_value = self.search(tree, probe_index, depth - 2, self.value_min, self.value_max)
+            if self.is_max_node(tree, child_index):
+                lower_bound_arr[i] = max(lower_bound_arr[i], probe_value)
+            else:
+                upper_bound_arr[i] = min(upper_bound_arr[i], probe_value)
+
+    def search_chance(self, tree, index, depth, alpha, beta):
+        child_index_arr, probability_arr = self.select_chance_children(tree, index)
+        if child_index_arr.shape[0] == 0:
+            return self.evaluate_fun(tree, index)
+
+        if not self.do_star_pruning:
+            return sum(
+                p * self.search(tree, child_index, depth - 1) for child_index, p in zip(child_index_arr, probability_arr)
+            )
+
+        lower_bound_arr = numpy.full(child_index_arr.shape[0], float(self.value_min))
+        upper_bound_arr = numpy.full(child_index_arr.shape[0], float(self.value_max))
+
+        if self.do_star2:
+            self.probe_chance_children(tree, child_index_arr, depth, lower_bound_arr, upper_bound_arr)
+
+            lower_value = numpy.sum(probability_arr * lower_bound_arr)
+            if lower_value >= beta:
+                return lower_value
+            upper_value = numpy.sum(probability_arr * upper_bound_arr)
+            if upper_value <= alpha:
+                return upper_value
+
+        # Star1:  expected value of the remaining children is bounded by their lower and upper bounds
+        remain_lower_arr = numpy.cumsum((probability_arr * lower_bound_arr)[::-1])[::-1]
+        remain_upper_arr = numpy.cumsum((probability_arr * upper_bound_arr)[::-1])[::-1]
+
+        value_sum = 0.
+        num_children = child_index_arr.shape[0]
+        for i, (child_index, p) in enumerate(zip(child_index_arr, probability_arr)):
+            next_remain_lower = remain_lower_arr[i+1] if i + 1 < num_children else 0.
+            next_remain_upper = remain_upper_arr[i+1] if i + 1 < num_children else 0.
+
+            child_alpha = (alpha - value_sum - next_remain_upper) / p
+            child_beta = (beta - value_sum - next_remain_lower) / p
+
+            value = self.search(
+                tree, child_index, depth - 1, max(child_alpha, lower_bound_arr[i]), min(child_beta, upper_bound_arr[i])
+            )
+            value_sum += p * value
+
+            if value <= child_alpha:
+                return value_sum + next_remain_upper
+            if value >= child_beta:
+                return value_sum + next_remain_lower
+
+        return value_sum
+
+    def run_iterative_deepening(self, tree, max_depth, time_limit=None, root_index=evtre.ROOT_INDEX):
+        # searches depth 1, 2, ... max_depth until time_limit seconds have passed, returns the result of the deepest
+        # completed iteration
+        self.root_player = tree.player_arr[root_index]
+        self.deadline = None if time_limit is None else time.perf_counter() + time_limit
+        self.num_nodes_searched = 0
+
+        r = None
+        try:
+            for depth in range(1, max_depth + 1):
+                self.start_generation(tree, root_index)
+                value = self.search(tree, root_index, depth)
+                root_index = self.evict(tree, root_index)
+                r = SearchResult(
+                    value=value, best_child_index=self.best_child_dict.get(root_index), depth=depth,
+                    num_nodes_searched=self.num_nodes_searched, is_complete=True
+                )
+                logger.debug("r:  {}".format(r))
+        except AxisAndAlliesSearchTimeoutException:
+            logger.info("time_limit reached during depth:  {}".format(depth))
+            if r is None:
+                r = SearchResult(
+                    value=self.evaluate_fun(tree, root_index), best_child_index=None, depth=0,
+                    num_nodes_searched=self.num_nodes_searched, is_complete=False
+                )
+            else:
+                r = r._replace(num_nodes_searched=self.num_nodes_searched, is_complete=False)
+        finally:
+            self.deadline = None
+
+        return r
+
+
+class AxisAndAlliesSearchTimeoutException(Exception):
+    pass
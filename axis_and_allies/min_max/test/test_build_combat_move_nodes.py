@@ -0,0 +1,200 @@
+import unittest
+import logging
+import os
+import tempfile
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.unit as unit
+import axis_and_allies.game_state as game_state
+import axis_and_allies.region_index as region_index
+import axis_and_allies.min_max.event_tree as evtre
+import axis_and_allies.min_max.build_combat_move_nodes as build_combat_move_nodes
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+unit_dict = None
+
+REGION_FILE = "../../region_data.txt"
+# germany, italy, poland, southern europe, bulgaria romania are player 0, the rest player 1
+OWNER_DICT = {100:0, 104:0, 102:0, 109:0, 108:0, 101:1, 103:1, 105:1, 106:1, 107:1, 110:1}
+# two coasts joined by three sea zones
+NAVAL_REGION_ROWS = [
+    (200, "west coast", "land", 3, True, "300"),
+    (201, "east coast", "land", 3, False, "302"),
+    (300, "west sea", "water", 0, False, "200,301"),
+    (301, "middle sea", "water", 0, False, "300,302"),
+    (302, "east sea", "water", 0, False, "301,201"),
+]
+
+
+def write_naval_region_file(output_file):
+    with open(output_file, "w") as file:
+        file.write("id\tname\tregion_type\tipc_production\thas_industry\tadjacent_region_ids\n")
+        for row in NAVAL_REGION_ROWS:
+            file.write("\t".join(str(x) for x in row) + "\n")
+
+
+def build_test_game_state(unit_table):
+    my_game_state = game_state.load_game_state(REGION_FILE, unit_table.names, owner_dict=OWNER_DICT)
+    for region_id, unit_name, count in [(100, "infantry", 6), (100, "tank", 2), (100, "fighter", 1),
+                                        (102, "infantry", 2), (101, "infantry", 1), (110, "infantry", 3),
+                                        (107, "infantry", 10)]:
+        my_game_state.add_units(my_game_state.get_region_index(region_id), my_game_state.get_unit_index(unit_name),
+                                count)
+    return my_game_state
+
+
+class TestBuildCombatMoveNodes(unittest.TestCase):
+    def setUp(self):
+        self.unit_table = unit.build_unit_table(unit_dict)
+        self.my_game_state = build_test_game_state(self.unit_table)
+        self.my_region_index = region_index.load_region_index(REGION_FILE, unit_dict)
+        self.unit_columns = build_combat_move_nodes.UnitColumns(self.unit_table, self.my_game_state.unit_names)
+
+    def get_region_index(self, region_id):
+        return self.my_region_index.get_region_index(region_id)
+
+    def get_unit_index(self, unit_name):
+        return self.my_game_state.get_unit_index(unit_name)
+
+    def test_calculate_available_units(self):
+        r = build_combat_move_nodes.calculate_available_units(
+            self.my_game_state, self.my_region_index, self.unit_columns, 0, self.get_region_index(110)
+        )
+        logger.debug("r.sum(axis=0):  {}".format(r.sum(axis=0)))
+        germany = self.get_region_index(100)
+        logger.debug("belorussia is 2 moves from germany, too far for infantry")
+        self.assertEqual(0, r[germany, self.get_unit_index("infantry")])
+        self.assertEqual(2, r[germany, self.get_unit_index("tank")])
+        self.assertEqual(1, r[germany, self.get_unit_index("fighter")])
+        self.assertEqual(2, r[self.get_region_index(102), self.get_unit_index("infantry")])
+        self.assertEqual(5, r.sum())
+
+    def test_estimate_win_probability(self):
+        defense_counts = numpy.zeros(len(self.unit_table), dtype=int)
+        defense_counts[self.get_unit_index("infantry")] = 2
+        attack_counts_arr = numpy.zeros((4, len(self.unit_table)), dtype=int)
+        attack_counts_arr[1, self.get_unit_index("infantry")] = 1
+        attack_counts_arr[2, self.get_unit_index("infantry")] = 8
+        attack_counts_arr[3, self.get_unit_index("fighter")] = 8
+
+        r = build_combat_move_nodes.estimate_win_probability(self.unit_columns, attack_counts_arr, defense_counts)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(0., r[0])
+        self.assertLess(r[1], 0.1)
+        self.assertGreater(r[2], 0.9)
+        logger.debug("air units alone cannot capture a land region")
+        self.assertEqual(0., r[3])
+
+    def test_generate_combat_moves(self):
+        r = list(build_combat_move_nodes.generate_combat_moves(
+            self.my_game_state, self.my_region_index, self.unit_table, max_num_candidates=30
+        ))
+        logger.debug("len(r):  {}".format(len(r)))
+        for x in r[:5]:
+            logger.debug("x.target_region_index:  {}  x.unit_counts:  {}  x.win_probability:  {}  x.score:  {}".format(
+                self.my_region_index.region_id_list[x.target_region_index], x.unit_counts, x.win_probability, x.score
+            ))
+        self.assertEqual(30, len(r))
+
+        target_region_id_set = {self.my_region_index.region_id_list[x.target_region_index] for x in r}
+        logger.debug("target_region_id_set:  {}".format(target_region_id_set))
+        self.assertTrue(target_region_id_set <= {101, 103, 110})
+        logger.debug("russia is only reachable by the fighter")
+        self.assertNotIn(107, target_region_id_set)
+
+        unit_count_arr = self.my_game_state.build_unit_count_arr()
+        for x in r:
+            self.assertGreaterEqual(x.win_probability, build_combat_move_nodes.DEFAULT_MIN_WIN_PROBABILITY)
+            self.assertTrue(numpy.array_equal(x.unit_counts, x.source_counts_arr.sum(axis=0)))
+            self.assertTrue(numpy.all(x.source_counts_arr <= unit_count_arr))
+            self.assertEqual(0, x.source_counts_arr[x.target_region_index].sum())
+
+        logger.debug("the first candidate uses every available unit")
+        available_arr = build_combat_move_nodes.calculate_available_units(
+            self.my_game_state, self.my_region_index, self.unit_columns, 0, r[0].target_region_index
+        )
+        self.assertTrue(numpy.array_equal(available_arr.sum(axis=0), r[0].unit_counts))
+        self.assertEqual(len(r), len({(x.target_region_index, tuple(x.unit_counts)) for x in r}))
+
+    def test_generate_combat_moves_naval(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            region_file = os.path.join(temp_dir, "naval_region_data.txt")
+            write_naval_region_file(region_file)
+            my_region_index = region_index.load_region_index(region_file, unit_dict)
+            # the owner of a sea zone is the player whose units are in it, the empty east sea was player 1's
+            my_game_state = game_state.load_game_state(
+                region_file, self.unit_table.names, owner_dict={200:0, 201:1, 300:0, 301:1, 302:1}
+            )
+        for region_id, unit_name, count in [(300, "destroyer", 2), (300, "battleship", 1), (200, "infantry", 3),
+                                            (301, "submarine", 1)]:
+            my_game_state.add_units(my_game_state.get_region_index(region_id), self.get_unit_index(unit_name), count)
+
+        target_region_index_arr = build_combat_move_nodes.find_target_region_indexes(my_game_state, my_region_index, 0)
+        logger.debug("target_region_index_arr:  {}".format(target_region_index_arr))
+        self.assertEqual(
+            [my_region_index.get_region_index(x) for x in [201, 301]], list(target_region_index_arr)
+        )
+
+        r = list(build_combat_move_nodes.generate_combat_moves(my_game_state, my_region_index, self.unit_table))
+        for x in r:
+            logger.debug("x.target_region_index:  {}  x.unit_counts:  {}  x.win_probability:  {}".format(
+                my_region_index.region_id_list[x.target_region_index], x.unit_counts, x.win_probability
+            ))
+        logger.debug("only the naval units in the west sea can attack, the coast has no land route")
+        middle_sea = my_region_index.get_region_index(301)
+        self.assertGreater(len(r), 0)
+        self.assertTrue(all(x.target_region_index == middle_sea for x in r))
+        west_sea = my_region_index.get_region_index(300)
+        self.assertEqual(3, r[0].source_counts_arr[west_sea].sum())
+        self.assertEqual(r[0].unit_counts.sum(), r[0].source_counts_arr.sum())
+        self.assertEqual(0, r[0].unit_counts[self.get_unit_index("infantry")])
+
+    def test_build_combat_move_nodes(self):
+        my_event_tree = evtre.EventTree()
+        r = build_combat_move_nodes.build_combat_move_nodes(
+            my_event_tree, evtre.ROOT_INDEX, self.my_game_state, self.my_region_index, self.unit_table,
+            max_num_candidates=10
+        )
+        logger.debug("r[:3]:  {}".format(r[:3]))
+        self.assertEqual(11, len(r))
+        self.assertEqual(evtre.NO_INDEX, r[0]["target_region"])
+        self.assertEqual(0, sum(r[0]["purchase_unit_counts"].values()))
+        self.assertIs(my_event_tree.root["game_state"], r[0]["game_state"])
+
+        germany = self.get_region_index(100)
+        for node in r[1:]:
+            self.assertEqual(evtre.NT_combat_move, node["type"])
+            attack_counts = my_event_tree.unit_counts_arr[node["id"]]
+            self.assertEqual(int(attack_counts @ self.unit_columns.ipc_arr), node["cost"])
+            child_game_state = node["game_state"]
+            self.assertEqual(self.my_game_state.build_unit_count_arr().sum() - attack_counts.sum(),
+                             child_game_state.build_unit_count_arr().sum())
+        self.assertEqual(6, self.my_game_state.get_unit_count(germany, self.get_unit_index("infantry")))
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units("../../unit_data.json")
+
+    unittest.main()
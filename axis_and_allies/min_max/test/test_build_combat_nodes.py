@@ -0,0 +1,173 @@
+import unittest
+import logging
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.unit as unit
+import axis_and_allies.combat_cache as combat_cache
+import axis_and_allies.game_state as game_state
+import axis_and_allies.region_index as region_index
+import axis_and_allies.min_max.event_tree as evtre
+import axis_and_allies.min_max.build_combat_move_nodes as build_combat_move_nodes
+import axis_and_allies.min_max.build_combat_nodes as build_combat_nodes
+import axis_and_allies.min_max.build_event_tree as build_event_tree
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+unit_dict = None
+
+REGION_FILE = "../../region_data.txt"
+OWNER_DICT = {100:0, 104:0, 102:0, 109:0, 108:0, 101:1, 103:1, 105:1, 106:1, 107:1, 110:1}
+
+
+class TestBuildCombatNodes(unittest.TestCase):
+    def test_merge_outcomes(self):
+        attack_counts = numpy.array([[1, 0], [2, 0], [1, 0], [0, 0]])
+        defense_counts = numpy.array([[0, 0], [0, 0], [0, 0], [0, 1]])
+        probability = numpy.array([0.1, 0.3, 0.2, 0.4])
+
+        r = build_combat_nodes.merge_outcomes(attack_counts, defense_counts, probability)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual([[0, 0], [1, 0], [2, 0]], r[0].tolist())
+        self.assertEqual([[0, 1], [0, 0], [0, 0]], r[1].tolist())
+        numpy.testing.assert_allclose([0.4, 0.3, 0.3], r[2])
+
+        logger.debug("merging by attack survivors only, the most likely member represents the merged outcome")
+        r = build_combat_nodes.merge_outcomes(attack_counts, defense_counts, probability,
+                                              outcome_key_arr=(attack_counts.sum(axis=1) > 0)[:, None])
+        logger.debug("r:  {}".format(r))
+        self.assertEqual([[2, 0], [0, 0]], r[0].tolist())
+        numpy.testing.assert_allclose([0.6, 0.4], r[2])
+
+    def test_select_combat_outcomes(self):
+        attack_counts = numpy.arange(5)[:, None]
+        defense_counts = numpy.zeros((5, 1), dtype=int)
+        probability = numpy.array([0.05, 0.4, 0.3, 0.15, 0.1])
+
+        r = build_combat_nodes.select_combat_outcomes(None, 0.8, attack_counts, defense_counts, probability)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual([1, 2, 3], r.attack_counts.ravel().tolist())
+        self.assertAlmostEqual(0.85, r.total_probability)
+
+        r = build_combat_nodes.select_combat_outcomes(2, 0.8, attack_counts, defense_counts, probability)
+        self.assertEqual([1, 2], r.attack_counts.ravel().tolist())
+        self.assertAlmostEqual(0.7, r.total_probability)
+
+        r = build_combat_nodes.select_combat_outcomes(None, 0.7, attack_counts, defense_counts, probability)
+        self.assertEqual([1, 2], r.attack_counts.ravel().tolist())
+
+        r = build_combat_nodes.select_combat_outcomes(None, 1., attack_counts, defense_counts, probability)
+        self.assertEqual(5, r.attack_counts.shape[0])
+
+    def test_build_combat_nodes(self):
+        unit_table = unit.build_unit_table(unit_dict)
+        my_game_state = game_state.load_game_state(REGION_FILE, unit_table.names, owner_dict=OWNER_DICT)
+        germany = my_game_state.get_region_index(100)
+        baltic_states = my_game_state.get_region_index(101)
+        infantry = my_game_state.get_unit_index("infantry")
+        my_game_state.add_units(germany, infantry, 4)
+        my_game_state.add_units(germany, my_game_state.get_unit_index("tank"), 1)
+        my_game_state.add_units(baltic_states, infantry, 2)
+        my_region_index = region_index.load_region_index(REGION_FILE, unit_dict)
+        my_combat_cache = combat_cache.CombatCache(unit_table)
+
+        my_event_tree = evtre.EventTree()
+        combat_move_node_list = build_combat_move_nodes.build_combat_move_nodes(
+            my_event_tree, evtre.ROOT_INDEX, my_game_state, my_region_index, unit_table, max_num_candidates=1
+        )
+        logger.debug("combat_move_node_list:  {}".format(combat_move_node_list))
+        self.assertEqual([], build_combat_nodes.build_combat_nodes(
+            None, 1., my_event_tree, combat_move_node_list[0]["id"], my_combat_cache, my_region_index
+        ))
+
+        combat_move_node = combat_move_node_list[1]
+        self.assertEqual(baltic_states, combat_move_node["target_region"])
+        r = build_combat_nodes.build_combat_nodes(
+            None, 0.9, my_event_tree, combat_move_node["id"], my_combat_cache, my_region_index
+        )
+        logger.debug("r:  {}".format(r))
+        probability = numpy.array([x["probability"] for x in r])
+        logger.debug("probability:  {}".format(probability))
+        self.assertGreaterEqual(probability.sum(), 0.9 - 1e-6)
+        self.assertTrue(numpy.all(numpy.diff(probability) <= 1e-7))
+        self.assertEqual(1, my_combat_cache.num_misses)
+
+        full_distribution = my_combat_cache.get(
+            my_event_tree.unit_counts_arr[combat_move_node["id"]].astype(int),
+            my_game_state.build_region_unit_counts(baltic_states).astype(int), 0
+        )
+        self.assertLess(len(r), full_distribution.probability.shape[0])
+
+        for node in r:
+            self.assertEqual(evtre.NT_combat, node["type"])
+            child_game_state = node["game_state"]
+            survivor_counts = my_event_tree.unit_counts_arr[node["id"]]
+            if child_game_state.get_owner(baltic_states) == 0:
+                self.assertTrue(numpy.array_equal(survivor_counts, child_game_state.build_region_unit_counts(baltic_states)))
+            else:
+                self.assertGreater(child_game_state.get_unit_count(baltic_states, infantry), 0)
+        self.assertEqual(1, my_game_state.get_owner(baltic_states))
+
+        logger.debug("merging outcomes by surviving IPC gives fewer nodes")
+        my_event_tree = evtre.EventTree()
+        combat_move_node = build_combat_move_nodes.build_combat_move_nodes(
+            my_event_tree, evtre.ROOT_INDEX, my_game_state.flatten(), my_region_index, unit_table, max_num_candidates=1
+        )[1]
+        merged_r = build_combat_nodes.build_combat_nodes(
+            None, 0.9, my_event_tree, combat_move_node["id"], my_combat_cache, my_region_index,
+            build_combat_nodes.build_survivor_ipc_key(unit_table, 6)
+        )
+        logger.debug("len(merged_r):  {}".format(len(merged_r)))
+        self.assertLess(len(merged_r), len(r))
+
+        with self.assertRaises(build_combat_nodes.AxisAndAlliesBuildCombatNodesException):
+            build_combat_nodes.build_combat_nodes(None, 0.9, evtre.EventTree(unit_names=["a"]), 0, my_combat_cache)
+
+    def test_build_indiv_player_turn_event_tree(self):
+        cur_unit_dict = {x:unit_dict[x] for x in ["infantry", "tank"]}
+        unit_table = unit.build_unit_table(cur_unit_dict)
+        my_game_state = game_state.load_game_state(REGION_FILE, unit_table.names, owner_dict=OWNER_DICT)
+        my_game_state.add_units(my_game_state.get_region_index(100), my_game_state.get_unit_index("infantry"), 3)
+        my_game_state.add_units(my_game_state.get_region_index(101), my_game_state.get_unit_index("infantry"), 1)
+        my_region_index = region_index.load_region_index(REGION_FILE, cur_unit_dict)
+
+        r = build_event_tree.build_indiv_player_turn_event_tree(
+            6, cur_unit_dict, 5, 0.9, my_game_state, my_region_index, combat_cache.CombatCache(unit_table), 3
+        )
+        logger.debug("len(r):  {}".format(len(r)))
+        node_type_list = [r.get_node_type(i) for i in range(len(r))]
+        self.assertIn(evtre.NT_purchase, node_type_list)
+        self.assertIn(evtre.NT_combat_move, node_type_list)
+        self.assertIn(evtre.NT_combat, node_type_list)
+
+        for i in range(len(r)):
+            if r.get_node_type(i) == evtre.NT_combat:
+                parent_index = r.parent_arr[i]
+                self.assertEqual(evtre.NT_combat_move, r.get_node_type(parent_index))
+                self.assertNotEqual(evtre.NO_INDEX, r.target_region_arr[parent_index])
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units("../../unit_data.json")
+
+    unittest.main()
@@ -141,6 +141,48 @@ class TestBuildPurchaseNodes(unittest.TestCase):
         for i, x in enumerate(r):
             logger.debug("i:  {}  node:  {}".format(i, x))
 
+    def test_enumerate_purchases(self):
+        IPC_cost_arr = numpy.array([3, 4, 6, 10])
+
+        for total_IPC in [0, 2, 10, 17]:
+            init_entry = numpy.zeros(IPC_cost_arr.shape[0])
+            all_entry_set = set()
+            bpn.recurse_build_by_IPC(IPC_cost_arr, total_IPC, init_entry, all_entry_set, min(IPC_cost_arr))
+
+            r = bpn.enumerate_purchases(IPC_cost_arr, total_IPC)
+            logger.debug("total_IPC:  {}  r.shape:  {}".format(total_IPC, r.shape))
+            self.assertEqual(sorted(all_entry_set), [tuple(x) for x in r.tolist()])
+
+            all_entry_set = set()
+            bpn.recurse_build_by_IPC_max_usage(IPC_cost_arr, total_IPC, init_entry, all_entry_set, min(IPC_cost_arr))
+
+            r = bpn.enumerate_purchases(IPC_cost_arr, total_IPC, do_max_usage=True)
+            self.assertEqual(sorted(all_entry_set), [tuple(x) for x in r.tolist()])
+
+        r = bpn.enumerate_purchases(IPC_cost_arr, 7, do_include_empty=True)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual([0, 0, 0, 0], list(r[0]))
+        self.assertTrue(all(bpn.calculate_purchase_cost(r, IPC_cost_arr) <= 7))
+
+    def test_count_purchases(self):
+        IPC_cost_arr = numpy.array([3, 4, 6, 5, 10])
+        r = bpn.count_purchases(IPC_cost_arr, 25)
+        logger.debug("r:  {}".format(r))
+        for total_IPC in [0, 3, 11, 25]:
+            self.assertEqual(
+                bpn.enumerate_purchases(IPC_cost_arr, total_IPC, do_include_empty=True).shape[0], r[total_IPC]
+            )
+
+    def test_generate_purchases(self):
+        IPC_cost_arr = numpy.array([3, 4, 6, 5, 10, 12])
+        expected = bpn.enumerate_purchases(IPC_cost_arr, 30, do_max_usage=True)
+
+        r = list(bpn.generate_purchases(IPC_cost_arr, 30, do_max_usage=True, max_block_size=20))
+        logger.debug("len(r):  {}".format(len(r)))
+        self.assertGreater(len(r), 1)
+        self.assertTrue(all(x.shape[0] > 0 for x in r))
+        self.assertTrue(numpy.array_equal(expected, numpy.vstack(r)))
+
 
 if __name__ == "__main__":
     setup_logger.setup(verbose=True)
@@ -2,9 +2,12 @@ import unittest
 import logging
 import axis_and_allies.setup_logger as setup_logger
 
+import numpy
+
 import axis_and_allies.game_state as game_state
 
 import axis_and_allies.min_max.event_tree as evtre
+from axis_and_allies.min_max.event_tree import NodeView
 
 
 
@@ -39,6 +42,98 @@ class TestEventTree(unittest.TestCase):
         self.assertIn("game_state", r)
         self.assertIs(game_state.GameState, type(r["game_state"]))
 
+    def test_add_children(self):
+        my_evtree = evtre.EventTree(unit_names=["a", "b"], capacity=2)
+        unit_counts_arr = numpy.array([[1, 0], [0, 2], [3, 1]])
+        r = my_evtree.add_children(evtre.ROOT_INDEX, evtre.NT_purchase, 3, cost_arr=[3, 8, 11],
+                                   unit_counts_arr=unit_counts_arr, IPC_limit=12)
+        logger.debug("r:  {}".format(r))
+        logger.debug("my_evtree:  {}".format(my_evtree))
+
+        self.assertEqual(4, len(my_evtree))
+        self.assertGreaterEqual(my_evtree.capacity, 4)
+        self.assertEqual([1, 2, 3], [x["id"] for x in r])
+        self.assertEqual(r, my_evtree.root["children"])
+        self.assertEqual(evtre.NT_purchase, r[1]["type"])
+        self.assertEqual(evtre.ROOT_INDEX, r[1]["parent"])
+        self.assertEqual(8, r[1]["cost"])
+        self.assertEqual(12, r[1]["IPC_limit"])
+        self.assertEqual({"a":0, "b":2}, r[1]["purchase_unit_counts"])
+        self.assertEqual(list(unit_counts_arr[2]), list(my_evtree.unit_counts_arr[r[2]["id"]]))
+
+        logger.debug("children share the root game state until they are given their own")
+        self.assertIs(my_evtree.root["game_state"], r[0]["game_state"])
+        grandchild = my_evtree.add_children(r[0]["id"], evtre.NT_combat_move, 1)[0]
+        new_game_state = game_state.GameState()
+        my_evtree.set_game_state(r[0]["id"], new_game_state)
+        self.assertIs(new_game_state, grandchild["game_state"])
+        self.assertIs(my_evtree.root["game_state"], r[1]["game_state"])
+
+        logger.debug("children of a node must stay contiguous")
+        with self.assertRaises(evtre.AxisAndAlliesEventTreeException):
+            my_evtree.add_children(evtre.ROOT_INDEX, evtre.NT_purchase, 1)
+        my_evtree.add_children(grandchild["id"], evtre.NT_combat, 2, probability_arr=[0.25, 0.75])
+        my_evtree.add_children(grandchild["id"], evtre.NT_combat, 1, probability_arr=[0.5])
+        self.assertEqual([0.25, 0.75, 0.5], [x["probability"] for x in grandchild["children"]])
+
+        with self.assertRaises(evtre.AxisAndAlliesEventTreeException):
+            my_evtree.set_unit_names(["b", "a"])
+        with self.assertRaises(evtre.AxisAndAlliesEventTreeException):
+            my_evtree.add_children(evtre.ROOT_INDEX, evtre.NT_purchase, 1, unit_counts_arr=[[70000, 0]])
+
+    def test_compact(self):
+        my_evtree = evtre.EventTree(unit_names=["a"])
+        a, b = my_evtree.add_children(evtre.ROOT_INDEX, evtre.NT_purchase, 2, cost_arr=[1, 2])
+        a_children = my_evtree.add_children(a["id"], evtre.NT_combat_move, 2, cost_arr=[11, 12])
+        b_children = my_evtree.add_children(b["id"], evtre.NT_combat_move, 3, cost_arr=[21, 22, 23])
+        my_evtree.add_children(a_children[1]["id"], evtre.NT_combat, 2, cost_arr=[121, 122])
+        my_evtree.add_children(b_children[0]["id"], evtre.NT_combat, 1, cost_arr=[211])
+        new_game_state = game_state.GameState()
+        my_evtree.set_game_state(b_children[0]["id"], new_game_state)
+        self.assertEqual(11, len(my_evtree))
+
+        my_evtree.collapse(a["id"])
+        self.assertFalse(a["is_expanded"])
+        r = my_evtree.compact()
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(7, len(my_evtree))
+        self.assertEqual([0, 1, 2, -1, -1, 3, 4, 5, -1, -1, 6], list(r))
+        self.assertEqual([0, 1, 2, 21, 22, 23, 211], list(my_evtree.cost_arr[:len(my_evtree)]))
+        self.assertEqual([21, 22, 23], [x["cost"] for x in my_evtree.root["children"][1]["children"]])
+        self.assertEqual([211], [x["cost"] for x in NodeView(my_evtree, 3)["children"]])
+        self.assertEqual(3, my_evtree.parent_arr[6])
+        self.assertIs(new_game_state, NodeView(my_evtree, 6)["game_state"])
+        self.assertEqual(2, len(my_evtree.game_state_list))
+
+    def test_evict_cold_subtrees(self):
+        my_evtree = evtre.EventTree()
+        a, b = my_evtree.add_children(evtre.ROOT_INDEX, evtre.NT_purchase, 2)
+        my_evtree.add_children(a["id"], evtre.NT_combat_move, 3)
+        my_evtree.add_children(b["id"], evtre.NT_combat_move, 2)
+
+        logger.debug("generation 1 visits everything, generation 2 only visits the root and b")
+        my_evtree.last_visit_arr[:len(my_evtree)] = 1
+        my_evtree.generation = 2
+        my_evtree.last_visit_arr[[evtre.ROOT_INDEX, b["id"]]] = 2
+        self.assertEqual(2, my_evtree.find_cold_generation(5))
+        self.assertIsNone(my_evtree.find_cold_generation(2))
+
+        b_index = b["id"]
+        r = my_evtree.evict_cold_subtrees(5)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(3, len(my_evtree))
+        self.assertEqual(2, r[b_index])
+        self.assertFalse(NodeView(my_evtree, r[a["id"]])["is_expanded"])
+        self.assertFalse(NodeView(my_evtree, r[b_index])["is_expanded"])
+        self.assertEqual(2, len(my_evtree.root["children"]))
+
+    def test_calculate_nbytes(self):
+        my_evtree = evtre.EventTree(unit_names=[str(x) for x in range(11)], capacity=1000)
+        r = my_evtree.calculate_nbytes()
+        logger.debug("r:  {}".format(r))
+        logger.debug("bytes per node with 11 unit types:  {}".format(r / my_evtree.capacity))
+        self.assertLess(r / my_evtree.capacity, 64)
+
 
 if __name__ == "__main__":
     setup_logger.setup(verbose=True)
@@ -0,0 +1,118 @@
+import unittest
+import logging
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.combat as combat
+import axis_and_allies.unit as unit
+import axis_and_allies.min_max.event_tree as evtre
+
+import axis_and_allies.min_max.build_purchase_nodes as bpn
+import axis_and_allies.min_max.prune_purchase_nodes as ppn
+
+unit_dict = None
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+class TestPrunePurchaseNodes(unittest.TestCase):
+
+    def test_find_dominated(self):
+        feature_arr = numpy.array([
+            [1, 1, 1],
+            [2, 1, 1],
+            [1, 2, 0],
+            [2, 1, 1],
+            [0, 0, 0],
+        ])
+        r = ppn.find_dominated(feature_arr, chunk_size=2)
+        logger.debug("r:  {}".format(r))
+        logger.debug("duplicate rows do not dominate each other")
+        self.assertEqual([True, False, False, False, True], list(r))
+
+        rng = numpy.random.RandomState(3)
+        feature_arr = rng.randint(0, 5, (300, 4))
+        expected = [
+            numpy.any(numpy.all(feature_arr >= x, axis=1) & numpy.any(feature_arr > x, axis=1)) for x in feature_arr
+        ]
+        r = ppn.find_dominated(feature_arr, chunk_size=16)
+        self.assertEqual(expected, list(r))
+
+    def test_calculate_purchase_features(self):
+        my_unit_dict = {x:unit_dict[x] for x in ["infantry", "artillery", "destroyer"]}
+        unit_table = unit.build_unit_table(my_unit_dict)
+        purchase_arr = numpy.array([unit_table.build_counts_from_names(["infantry"]*2 + ["artillery", "destroyer"])])
+
+        r = ppn.calculate_purchase_features(unit_table, purchase_arr, combat.BATTLE_TYPE_LAND)
+        logger.debug("r:  {}".format(r))
+        logger.debug("one infantry is supported by the artillery, the destroyer does not count in a land battle")
+        self.assertEqual([1 + 2 + 2, 2 + 2 + 2, 3, -(3 + 3 + 4 + 8)], list(r[0]))
+
+    def test_prune_purchases(self):
+        my_unit_dict = {x:unit_dict[x] for x in ["infantry", "artillery", "tank", "fighter", "destroyer"]}
+        unit_table = unit.build_unit_table(my_unit_dict)
+        total_IPC = 24
+
+        purchase_arr = bpn.enumerate_purchases(unit_table.ipc_arr, total_IPC)
+        r = ppn.prune_purchases(unit_table, purchase_arr, total_IPC, combat.BATTLE_TYPE_LAND)
+        logger.debug("r:  {}".format(r))
+
+        self.assertEqual(purchase_arr.shape[0], r.purchase_arr.shape[0] + r.num_dropped_leftover
+                         + r.num_dropped_dominated + r.num_dropped_value)
+        self.assertGreater(r.num_dropped_leftover, 0)
+        self.assertGreater(r.num_dropped_dominated, 0)
+        self.assertEqual(0, r.num_dropped_value)
+
+        remain_IPC_arr = total_IPC - bpn.calculate_purchase_cost(r.purchase_arr, unit_table.ipc_arr)
+        self.assertTrue(all(remain_IPC_arr < unit_dict["infantry"].ipc))
+        logger.debug("destroyers do not help in a land battle")
+        self.assertTrue(all(r.purchase_arr[:, unit_table.get_index("destroyer")] == 0))
+        logger.debug("8 infantry has the most hit points so it is never dominated")
+        self.assertIn(list(unit_table.build_counts_from_names(["infantry"]*8)), r.purchase_arr.tolist())
+
+        logger.debug("value estimator keeps only the best options")
+        value_fun = lambda x, y: ppn.calculate_power_value(x, y, combat.BATTLE_TYPE_LAND)
+        s = ppn.prune_purchases(
+            unit_table, purchase_arr, total_IPC, combat.BATTLE_TYPE_LAND, value_fun=value_fun, max_num_options=3
+        )
+        logger.debug("s:  {}".format(s))
+        self.assertEqual(3, s.purchase_arr.shape[0])
+        self.assertEqual(r.purchase_arr.shape[0] - 3, s.num_dropped_value)
+        best_value = value_fun(unit_table, r.purchase_arr).max()
+        self.assertEqual(best_value, value_fun(unit_table, s.purchase_arr).max())
+
+        with self.assertRaises(ppn.AxisAndAlliesPrunePurchaseException):
+            ppn.prune_purchases(unit_table, purchase_arr, total_IPC, "not a battle type")
+
+    def test_build_purchase_nodes_prune_fun(self):
+        my_unit_dict = {x:unit_dict[x] for x in ["infantry", "artillery", "tank"]}
+
+        r = bpn.build_purchase_nodes(10, my_unit_dict, evtre.EventTree(), prune_fun=ppn.prune_purchases)
+        logger.debug("r:  {}".format(r))
+        unpruned = bpn.build_purchase_nodes(10, my_unit_dict, evtre.EventTree())
+        self.assertLess(len(r), len(unpruned))
+        self.assertTrue(all(x["cost"] > 10 - unit_dict["infantry"].ipc for x in r))
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units("../../unit_data.json", do_add_test_units=True)
+
+    unittest.main()
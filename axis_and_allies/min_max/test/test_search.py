@@ -0,0 +1,330 @@
+import unittest
+import logging
+import math
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.min_max.event_tree as evtre
+import axis_and_allies.min_max.search as search
+import axis_and_allies.min_max.transposition_table as transposition_table
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+def build_random_tree(rng, num_turns, num_decisions=3, num_outcomes=3):
+    # each turn:  player decision (purchase), then chance (combat outcomes), players alternate every turn
+    my_evtree = evtre.EventTree()
+    leaf_value_dict = {}
+
+    def recurse(index, turn):
+        if turn == num_turns:
+            leaf_value_dict[index] = rng.uniform(-10, 10)
+            return
+
+        player = turn % 2
+        decision_nodes = my_evtree.add_children(index, evtre.NT_purchase, rng.randint(1, num_decisions + 1),
+                                                player=player)
+        for decision_node in decision_nodes:
+            num_children = rng.randint(1, num_outcomes + 1)
+            probability_arr = rng.dirichlet(numpy.ones(num_children))
+            outcome_nodes = my_evtree.add_children(decision_node["id"], evtre.NT_combat, num_children,
+                                                   probability_arr=probability_arr, player=(turn + 1) % 2)
+            for outcome_node in outcome_nodes:
+                recurse(outcome_node["id"], turn + 1)
+
+    recurse(evtre.ROOT_INDEX, 0)
+
+    return my_evtree, leaf_value_dict
+
+
+def calculate_expectiminimax(tree, index, depth, evaluate_fun, root_player=0):
+    # brute force reference
+    if depth <= 0 or tree.child_count_arr[index] == 0:
+        return evaluate_fun(tree, index)
+
+    child_index_arr = tree.get_children_indexes(index)
+    if tree.get_node_type(child_index_arr[0]) == evtre.NT_combat:
+        probability_arr = tree.probability_arr[child_index_arr].astype(float)
+        probability_arr = probability_arr / probability_arr.sum()
+        return sum(p * calculate_expectiminimax(tree, x, depth - 1, evaluate_fun, root_player)
+                   for x, p in zip(child_index_arr, probability_arr))
+
+    values = [calculate_expectiminimax(tree, x, depth - 1, evaluate_fun, root_player) for x in child_index_arr]
+    return max(values) if tree.player_arr[index] == root_player else min(values)
+
+
+def build_id_expand_fun(num_turns):
+    # children are built from the id stored in cost_arr (digits are the path from the root) so a tree expanded
+    # lazily, or evicted and expanded again, is identical to one built up front
+    def expand_fun(tree, index):
+        node_id = int(tree.cost_arr[index])
+        depth = len(str(node_id)) if node_id > 0 else 0
+        if depth >= 2 * num_turns:
+            return
+
+        num_children = 1 + node_id % 3
+        child_id_arr = 10 * node_id + numpy.arange(1, num_children + 1)
+        if depth % 2 == 0:
+            tree.add_children(index, evtre.NT_purchase, num_children, cost_arr=child_id_arr)
+        else:
+            probability_arr = 1. + child_id_arr % 4
+            tree.add_children(index, evtre.NT_combat, num_children, cost_arr=child_id_arr,
+                              probability_arr=probability_arr / probability_arr.sum(), player=((depth + 1) // 2) % 2)
+
+    return expand_fun
+
+
+def evaluate_id(tree, index):
+    return 10. * math.sin(float(tree.cost_arr[index]))
+
+
+def build_state_expand_fun(num_turns):
+    # the state (cost_arr) of a child is its parent's state plus the child number, so different paths reach the same
+    # state at the same depth (IPC_limit_arr) and have identical subtrees
+    def expand_fun(tree, index):
+        state = int(tree.cost_arr[index])
+        depth = int(tree.IPC_limit_arr[index])
+        if depth >= 2 * num_turns:
+            return
+
+        num_children = 2 + state % 2
+        child_state_arr = state + numpy.arange(1, num_children + 1)
+        tree.add_children(
+            index, evtre.NT_purchase if depth % 2 == 0 else evtre.NT_combat, num_children, cost_arr=child_state_arr,
+            probability_arr=numpy.full(num_children, 1. / num_children), IPC_limit=depth + 1,
+            player=((depth + 1) // 2) % 2
+        )
+
+    return expand_fun
+
+
+def hash_state(tree, index):
+    return numpy.uint64(hash((int(tree.cost_arr[index]), int(tree.IPC_limit_arr[index]))) % 2**64)
+
+
+class TestSearch(unittest.TestCase):
+    def test_search_simple(self):
+        my_evtree = evtre.EventTree()
+        a, b = my_evtree.add_children(evtre.ROOT_INDEX, evtre.NT_combat_move, 2)
+        a_outcomes = my_evtree.add_children(a["id"], evtre.NT_combat, 2, probability_arr=[0.5, 0.5])
+        b_outcomes = my_evtree.add_children(b["id"], evtre.NT_combat, 2, probability_arr=[0.9, 0.1])
+        leaf_value_dict = {
+            a_outcomes[0]["id"]:10., a_outcomes[1]["id"]:0., b_outcomes[0]["id"]:6., b_outcomes[1]["id"]:-10.
+        }
+        evaluate_fun = lambda tree, index: leaf_value_dict.get(index, 0.)
+
+        my_search = search.ExpectiminimaxSearch(evaluate_fun, value_min=-10, value_max=10)
+        r = my_search.run_iterative_deepening(my_evtree, max_depth=2)
+        logger.debug("r:  {}".format(r))
+        self.assertAlmostEqual(5., r.value)
+        self.assertEqual(a["id"], r.best_child_index)
+        self.assertEqual(2, r.depth)
+        self.assertTrue(r.is_complete)
+
+        logger.debug("only the most likely outcome of each combat")
+        my_search = search.ExpectiminimaxSearch(evaluate_fun, value_min=-10, value_max=10, N_combat_outcome=1)
+        r = my_search.run_iterative_deepening(my_evtree, max_depth=2)
+        logger.debug("r:  {}".format(r))
+        self.assertAlmostEqual(10., r.value)
+
+        logger.debug("outcomes until 0.85 of the probability is covered")
+        my_search = search.ExpectiminimaxSearch(evaluate_fun, total_probability_combat_outcome_limit=0.85)
+        r = my_search.run_iterative_deepening(my_evtree, max_depth=2)
+        logger.debug("r:  {}".format(r))
+        self.assertAlmostEqual(6., r.value)
+        self.assertEqual(b["id"], r.best_child_index)
+
+    def test_search_zero_probability_outcomes(self):
+        my_evtree = evtre.EventTree()
+        a, b = my_evtree.add_children(evtre.ROOT_INDEX, evtre.NT_combat_move, 2)
+        a_outcomes = my_evtree.add_children(a["id"], evtre.NT_combat, 2, probability_arr=[0., 0.])
+        b_outcomes = my_evtree.add_children(b["id"], evtre.NT_combat, 1, probability_arr=[1.])
+        leaf_value_dict = {a["id"]:3., a_outcomes[0]["id"]:10., a_outcomes[1]["id"]:10., b_outcomes[0]["id"]:2.}
+        evaluate_fun = lambda tree, index: leaf_value_dict.get(index, 0.)
+
+        my_search = search.ExpectiminimaxSearch(evaluate_fun)
+        logger.debug("a chance node with no possible outcome is evaluated as a leaf")
+        child_index_arr, probability_arr = my_search.select_chance_children(my_evtree, a["id"])
+        self.assertEqual(0, child_index_arr.shape[0])
+        self.assertEqual(0, probability_arr.shape[0])
+
+        for value_min, value_max in [(-math.inf, math.inf), (-10, 10)]:
+            my_search = search.ExpectiminimaxSearch(evaluate_fun, value_min, value_max)
+            r = my_search.run_iterative_deepening(my_evtree, max_depth=2)
+            logger.debug("r:  {}".format(r))
+            self.assertAlmostEqual(3., r.value)
+            self.assertEqual(a["id"], r.best_child_index)
+
+    def test_search_matches_expectiminimax(self):
+        rng = numpy.random.RandomState(11)
+        for i in range(15):
+            my_evtree, leaf_value_dict = build_random_tree(rng, num_turns=3)
+            evaluate_fun = lambda tree, index: leaf_value_dict.get(index, float(numpy.tanh(index)))
+
+            for depth in [1, 2, 4, 6]:
+                expected = calculate_expectiminimax(my_evtree, evtre.ROOT_INDEX, depth, evaluate_fun)
+
+                num_nodes_searched_list = []
+                for value_min, value_max, do_star2 in [(-math.inf, math.inf, False), (-10, 10, False),
+                                                       (-10, 10, True)]:
+                    my_search = search.ExpectiminimaxSearch(evaluate_fun, value_min, value_max, do_star2=do_star2)
+                    r = my_search.run_iterative_deepening(my_evtree, max_depth=depth)
+                    self.assertAlmostEqual(expected, r.value, msg=(i, depth, value_min, do_star2))
+                    num_nodes_searched_list.append(r.num_nodes_searched)
+
+                logger.debug("depth:  {}  num_nodes_searched_list:  {}".format(depth, num_nodes_searched_list))
+
+    def test_star_pruning_searches_fewer_nodes(self):
+        rng = numpy.random.RandomState(5)
+        my_evtree, leaf_value_dict = build_random_tree(rng, num_turns=4, num_decisions=4, num_outcomes=3)
+        evaluate_fun = lambda tree, index: leaf_value_dict.get(index, 0.)
+
+        num_nodes_searched_list = []
+        for value_min, value_max, do_star2 in [(-math.inf, math.inf, False), (-10, 10, False), (-10, 10, True)]:
+            my_search = search.ExpectiminimaxSearch(evaluate_fun, value_min, value_max, do_star2=do_star2)
+            my_search.search(my_evtree, evtre.ROOT_INDEX, 8)
+            num_nodes_searched_list.append(my_search.num_nodes_searched)
+        logger.debug("num_nodes_searched_list:  {}".format(num_nodes_searched_list))
+        self.assertEqual(len(my_evtree), num_nodes_searched_list[0])
+        self.assertLess(num_nodes_searched_list[1], num_nodes_searched_list[0])
+
+    def test_run_iterative_deepening_time_limit(self):
+        rng = numpy.random.RandomState(3)
+        my_evtree, leaf_value_dict = build_random_tree(rng, num_turns=4, num_decisions=4, num_outcomes=3)
+        evaluate_fun = lambda tree, index: leaf_value_dict.get(index, 0.)
+
+        my_search = search.ExpectiminimaxSearch(evaluate_fun)
+        r = my_search.run_iterative_deepening(my_evtree, max_depth=8, time_limit=0.)
+        logger.debug("r:  {}".format(r))
+        self.assertFalse(r.is_complete)
+        self.assertEqual(0, r.depth)
+        self.assertIsNone(my_search.deadline)
+
+    def test_lazy_expansion(self):
+        num_turns = 3
+        expand_fun = build_id_expand_fun(num_turns)
+
+        full_evtree = evtre.EventTree()
+        for index in range(evtre.ROOT_INDEX, 10**6):
+            if index >= len(full_evtree):
+                break
+            expand_fun(full_evtree, index)
+        logger.debug("len(full_evtree):  {}".format(len(full_evtree)))
+
+        for depth in [1, 3, 6]:
+            full_search = search.ExpectiminimaxSearch(evaluate_id, -10, 10)
+            expected = full_search.run_iterative_deepening(full_evtree, max_depth=depth)
+
+            lazy_evtree = evtre.EventTree()
+            lazy_search = search.ExpectiminimaxSearch(evaluate_id, -10, 10, expand_fun=expand_fun)
+            r = lazy_search.run_iterative_deepening(lazy_evtree, max_depth=depth)
+            logger.debug("depth:  {}  len(lazy_evtree):  {}  r:  {}".format(depth, len(lazy_evtree), r))
+
+            self.assertAlmostEqual(expected.value, r.value)
+            self.assertEqual(full_evtree.cost_arr[expected.best_child_index], lazy_evtree.cost_arr[r.best_child_index])
+            self.assertLess(len(lazy_evtree), len(full_evtree))
+            self.assertEqual(len(lazy_evtree) - 1, lazy_search.num_nodes_expanded)
+
+    def test_node_budget_eviction(self):
+        num_turns = 4
+        expand_fun = build_id_expand_fun(num_turns)
+
+        lazy_evtree = evtre.EventTree()
+        lazy_search = search.ExpectiminimaxSearch(evaluate_id, -10, 10, expand_fun=expand_fun)
+        expected = lazy_search.run_iterative_deepening(lazy_evtree, max_depth=2 * num_turns)
+        logger.debug("len(lazy_evtree):  {}  expected:  {}".format(len(lazy_evtree), expected))
+
+        logger.debug("searching again from a grandchild of the root evicts the subtrees of its siblings")
+        grandchild_index = lazy_evtree.get_children_indexes(expected.best_child_index)[-1]
+        grandchild_cost = lazy_evtree.cost_arr[grandchild_index]
+        unbudget_search = search.ExpectiminimaxSearch(evaluate_id, -10, 10, expand_fun=expand_fun)
+        unbudget_r = unbudget_search.run_iterative_deepening(lazy_evtree, max_depth=2, root_index=grandchild_index)
+
+        node_budget = len(lazy_evtree) // 2
+        budget_search = search.ExpectiminimaxSearch(evaluate_id, -10, 10, expand_fun=expand_fun,
+                                                    node_budget=node_budget)
+        r = budget_search.run_iterative_deepening(lazy_evtree, max_depth=2, root_index=grandchild_index)
+        logger.debug("budget_search:  {}  len(lazy_evtree):  {}  r:  {}".format(budget_search, len(lazy_evtree), r))
+        self.assertAlmostEqual(unbudget_r.value, r.value)
+        self.assertGreater(budget_search.num_nodes_evicted, 0)
+        self.assertLessEqual(len(lazy_evtree), node_budget)
+        new_grandchild_index = lazy_evtree.parent_arr[r.best_child_index]
+        self.assertEqual(grandchild_cost, lazy_evtree.cost_arr[new_grandchild_index])
+
+        logger.debug("a small budget stops expansion")
+        node_budget = 20
+        budget_evtree = evtre.EventTree()
+        budget_search = search.ExpectiminimaxSearch(evaluate_id, -10, 10, expand_fun=expand_fun,
+                                                    node_budget=node_budget)
+        r = budget_search.run_iterative_deepening(budget_evtree, max_depth=2 * num_turns)
+        logger.debug("len(budget_evtree):  {}  r:  {}".format(len(budget_evtree), r))
+        self.assertLessEqual(len(budget_evtree), node_budget + 2)
+        self.assertTrue(r.is_complete)
+
+    def test_transposition_table(self):
+        num_turns = 4
+        expand_fun = build_state_expand_fun(num_turns)
+
+        for value_min, value_max in [(-math.inf, math.inf), (-10, 10)]:
+            expected_search = search.ExpectiminimaxSearch(evaluate_id, value_min, value_max, expand_fun=expand_fun)
+            expected = expected_search.run_iterative_deepening(evtre.EventTree(), max_depth=2 * num_turns)
+
+            my_transposition_table = transposition_table.TranspositionTable(num_buckets=2**10)
+            my_search = search.ExpectiminimaxSearch(evaluate_id, value_min, value_max, expand_fun=expand_fun,
+                                                    my_transposition_table=my_transposition_table,
+                                                    hash_fun=hash_state)
+            r = my_search.run_iterative_deepening(evtre.EventTree(), max_depth=2 * num_turns)
+            logger.debug("expected:  {}".format(expected))
+            logger.debug("r:  {}".format(r))
+            logger.debug("my_transposition_table:  {}".format(my_transposition_table))
+
+            self.assertAlmostEqual(expected.value, r.value)
+            self.assertLess(r.num_nodes_searched, expected.num_nodes_searched)
+            self.assertGreater(my_transposition_table.num_hits, 0)
+
+    def test_transposition_table_default_hash_fun(self):
+        # siblings share their parent's game state, they differ only in their purchase and target region
+        my_evtree = evtre.EventTree(unit_names=["infantry", "tank"])
+        purchase_nodes = my_evtree.add_children(evtre.ROOT_INDEX, evtre.NT_purchase, 3,
+                                                unit_counts_arr=[[1, 0], [0, 1], [2, 0]], player=1)
+        for purchase_node in purchase_nodes:
+            unit_counts = my_evtree.unit_counts_arr[purchase_node["id"]]
+            my_evtree.add_children(purchase_node["id"], evtre.NT_combat_move, 2, unit_counts_arr=[unit_counts]*2,
+                                   target_region_arr=[3, 5], player=1)
+
+        def evaluate_fun(tree, index):
+            return float(tree.unit_counts_arr[index] @ numpy.array([1, 3]) - tree.target_region_arr[index])
+
+        expected_search = search.ExpectiminimaxSearch(evaluate_fun)
+        expected = expected_search.run_iterative_deepening(my_evtree, max_depth=2)
+
+        my_transposition_table = transposition_table.TranspositionTable(num_buckets=2**6)
+        my_search = search.ExpectiminimaxSearch(evaluate_fun, my_transposition_table=my_transposition_table)
+        r = my_search.run_iterative_deepening(my_evtree, max_depth=2)
+        logger.debug("expected:  {}  r:  {}".format(expected, r))
+        logger.debug("my_transposition_table:  {}".format(my_transposition_table))
+        self.assertAlmostEqual(-2., expected.value)
+        self.assertAlmostEqual(expected.value, r.value)
+        self.assertEqual(expected.best_child_index, r.best_child_index)
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import logging
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.game_state as game_state
+import axis_and_allies.min_max.event_tree as evtre
+import axis_and_allies.min_max.transposition_table as transposition_table
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+class TestTranspositionTable(unittest.TestCase):
+    def test___init__(self):
+        r = transposition_table.TranspositionTable(num_buckets=8)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(0, r.calculate_num_used())
+
+        with self.assertRaises(transposition_table.AxisAndAlliesTranspositionTableException):
+            transposition_table.TranspositionTable(num_buckets=6)
+
+    def test_probe(self):
+        my_table = transposition_table.TranspositionTable(num_buckets=8)
+        my_table.store(3, 1.5, 2, transposition_table.BOUND_EXACT)
+        my_table.store(4, 2.5, 2, transposition_table.BOUND_LOWER)
+        my_table.store(5, -1., 2, transposition_table.BOUND_UPPER)
+        logger.debug("my_table:  {}".format(my_table))
+
+        self.assertEqual(1.5, my_table.probe(3, 2, -10, 10))
+        self.assertEqual(1.5, my_table.probe(3, 1, -10, 10))
+        logger.debug("entry not searched deep enough")
+        self.assertIsNone(my_table.probe(3, 3, -10, 10))
+
+        logger.debug("lower bound only decides a search that fails high")
+        self.assertEqual(2.5, my_table.probe(4, 2, -10, 2))
+        self.assertIsNone(my_table.probe(4, 2, -10, 10))
+        logger.debug("upper bound only decides a search that fails low")
+        self.assertEqual(-1., my_table.probe(5, 2, 0, 10))
+        self.assertIsNone(my_table.probe(5, 2, -10, 10))
+
+        self.assertIsNone(my_table.probe(11, 0, -10, 10))
+        self.assertEqual(8, my_table.num_probes)
+        self.assertEqual(4, my_table.num_hits)
+
+    def test_store_replacement(self):
+        my_table = transposition_table.TranspositionTable(num_buckets=4)
+        # keys 1, 5, 9 are in the same bucket
+        my_table.store(1, 1., 5, transposition_table.BOUND_EXACT)
+        my_table.store(5, 5., 2, transposition_table.BOUND_EXACT)
+        logger.debug("shallower entry goes to the always-replace slot")
+        self.assertEqual(1., my_table.get(1).value)
+        self.assertEqual(5., my_table.get(5).value)
+
+        my_table.store(9, 9., 1, transposition_table.BOUND_EXACT)
+        self.assertIsNone(my_table.get(5))
+        self.assertEqual(1., my_table.get(1).value)
+
+        logger.debug("shallower result for the same key does not replace the deep one")
+        my_table.store(1, -1., 3, transposition_table.BOUND_EXACT)
+        self.assertEqual(transposition_table.TranspositionEntry(1., 5, transposition_table.BOUND_EXACT),
+                         my_table.get(1))
+
+        logger.debug("deeper entry takes the depth-preferred slot and moves the old one")
+        my_table.store(5, 5., 6, transposition_table.BOUND_LOWER)
+        self.assertEqual(transposition_table.TranspositionEntry(5., 6, transposition_table.BOUND_LOWER),
+                         my_table.get(5))
+        self.assertEqual(1., my_table.get(1).value)
+        self.assertIsNone(my_table.get(9))
+
+        logger.debug("entries from an older generation are replaced")
+        my_table.new_generation()
+        my_table.store(9, 9., 1, transposition_table.BOUND_EXACT)
+        self.assertEqual(9., my_table.get(9).value)
+        self.assertEqual(5., my_table.get(5).value)
+        self.assertIsNone(my_table.get(1))
+
+        my_table.clear()
+        self.assertEqual(0, my_table.calculate_num_used())
+
+    def test_build_game_state_hash_fun(self):
+        my_evtree = evtre.EventTree(unit_names=["a", "b"])
+        my_evtree.root["game_state"].zobrist_hash = numpy.uint64(12345)
+        purchase_nodes = my_evtree.add_children(evtre.ROOT_INDEX, evtre.NT_purchase, 3,
+                                                unit_counts_arr=[[1, 0], [0, 1], [1, 0]])
+        combat_move_nodes = my_evtree.add_children(purchase_nodes[0]["id"], evtre.NT_combat_move, 2,
+                                                   unit_counts_arr=[[1, 0], [1, 0]], target_region_arr=[2, 4])
+        hash_fun = transposition_table.build_game_state_hash_fun()
+
+        r = [hash_fun(my_evtree, x) for x in range(len(my_evtree))]
+        logger.debug("r:  {}".format(r))
+        logger.debug("node type, purchase and target region change the hash of nodes sharing a game state")
+        self.assertEqual(5, len(set(r)))
+        self.assertEqual(r[1], r[3])
+
+        new_game_state = game_state.GameState()
+        new_game_state.zobrist_hash = numpy.uint64(54321)
+        my_evtree.set_game_state(purchase_nodes[2]["id"], new_game_state)
+        self.assertNotEqual(r[1], hash_fun(my_evtree, 3))
+
+        logger.debug("counts too large for a table of keys")
+        my_evtree.add_children(combat_move_nodes[1]["id"], evtre.NT_purchase, 2, unit_counts_arr=[[200, 0], [201, 0]])
+        self.assertNotEqual(hash_fun(my_evtree, 6), hash_fun(my_evtree, 7))
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unittest.main()
@@ -0,0 +1,175 @@
+import logging
+import collections
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.zobrist as zobrist
+import axis_and_allies.min_max.event_tree as evtre
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+BOUND_EXACT = 0
+# value is a lower bound (search failed high)
+BOUND_LOWER = 1
+# value is an upper bound (search failed low)
+BOUND_UPPER = 2
+
+DEFAULT_NUM_BUCKETS = 2**16
+# entries per bucket:  slot 0 keeps the deepest entry, slot 1 is always replaced
+BUCKET_SIZE = 2
+EMPTY_KEY = 0
+
+TranspositionEntry = collections.namedtuple("TranspositionEntry", ["value", "depth", "bound"])
+
+
+class TranspositionTable:
+    # fixed size hash table of search results keyed by 64 bit hash.  Each bucket has a depth-preferred slot that is
+    # only replaced by an entry searched at least as deep, or by any entry once the old one is from a previous
+    # generation, and an always-replace slot that takes everything else.  Values are from the point of view of the
+    # root player of the search, so the table should be cleared before searching for a different player
+    def __init__(self, num_buckets=DEFAULT_NUM_BUCKETS) -> None:
+        if num_buckets <= 0 or (num_buckets & (num_buckets - 1)) != 0:
+            raise AxisAndAlliesTranspositionTableException(
+                "num_buckets must be a power of 2, num_buckets:  {}".format(num_buckets)
+            )
+
+        self.num_buckets = num_buckets
+        self.mask = numpy.uint64(num_buckets - 1)
+
+        self.key_arr = numpy.zeros((num_buckets, BUCKET_SIZE), dtype=numpy.uint64)
+        self.value_arr = numpy.zeros((num_buckets, BUCKET_SIZE), dtype=numpy.float64)
+        self.depth_arr = numpy.zeros((num_buckets, BUCKET_SIZE), dtype=numpy.int16)
+        self.bound_arr = numpy.zeros((num_buckets, BUCKET_SIZE), dtype=numpy.int8)
+        self.generation_arr = numpy.zeros((num_buckets, BUCKET_SIZE), dtype=numpy.int32)
+
+        self.generation = 0
+        self.num_probes = 0
+        self.num_hits = 0
+        self.num_stores = 0
+
+    def __repr__(self) -> str:
+        return "num_buckets:  {}  num_used:  {}  num_probes:  {}  num_hits:  {}  num_stores:  {}".format(
+            self.num_buckets, self.calculate_num_used(), self.num_probes, self.num_hits, self.num_stores
+        )
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def calculate_num_used(self):
+        return int(numpy.sum(self.key_arr != EMPTY_KEY))
+
+    def clear(self):
+        self.key_arr[:] = EMPTY_KEY
+        self.generation = 0
+
+    def new_generation(self):
+        # entries from older generations are replaced first
+        self.generation += 1
+
+    def find_slot(self, key):
+        bucket = int(numpy.uint64(key) & self.mask)
+        locs = numpy.nonzero(self.key_arr[bucket] == numpy.uint64(key))[0]
+        return bucket, (int(locs[0]) if locs.shape[0] > 0 else None)
+
+    def get(self, key):
+        bucket, slot = self.find_slot(key)
+        if slot is None:
+            return None
+        return TranspositionEntry(
+            value=float(self.value_arr[bucket, slot]), depth=int(self.depth_arr[bucket, slot]),
+            bound=int(self.bound_arr[bucket, slot])
+        )
+
+    def probe(self, key, depth, alpha, beta):
+        # value if the entry for key was searched at least depth deep and its bound decides the search window,
+        # otherwise None
+        self.num_probes += 1
+        entry = self.get(key)
+        if entry is None or entry.depth < depth:
+            return None
+
+        if (entry.bound == BOUND_EXACT or (entry.bound == BOUND_LOWER and entry.value >= beta)
+                or (entry.bound == BOUND_UPPER and entry.value <= alpha)):
+            self.num_hits += 1
+            return entry.value
+        return None
+
+    def store(self, key, value, depth, bound):
+        self.num_stores += 1
+        key = numpy.uint64(key)
+        bucket, slot = self.find_slot(key)
+
+        if slot is None:
+            if (self.key_arr[bucket, 0] == EMPTY_KEY or depth >= self.depth_arr[bucket, 0]
+                    or self.generation_arr[bucket, 0] != self.generation):
+                # new entry takes the depth-preferred slot, the entry it replaces moves to the always-replace slot
+                self.copy_slot(bucket, 0, 1)
+                slot = 0
+            else:
+                slot = 1
+        elif slot == 0 and depth < self.depth_arr[bucket, 0] and self.generation_arr[bucket, 0] == self.generation:
+            # a shallower result does not replace a deeper one from the same generation
+            return
+
+        self.key_arr[bucket, slot] = key
+        self.value_arr[bucket, slot] = value
+        self.depth_arr[bucket, slot] = depth
+        self.bound_arr[bucket, slot] = bound
+        self.generation_arr[bucket, slot] = self.generation
+
+    def copy_slot(self, bucket, from_slot, to_slot):
+        for arr in [self.key_arr, self.value_arr, self.depth_arr, self.bound_arr, self.generation_arr]:
+            arr[bucket, to_slot] = arr[bucket, from_slot]
+
+
+def calculate_bound(value, alpha, beta):
+    if value <= alpha:
+        return BOUND_UPPER
+    if value >= beta:
+        return BOUND_LOWER
+    return BOUND_EXACT
+
+
+def build_node_keys(seed=zobrist.SEED + 1):
+    # keys for the parts of a node that are not in its game state:  node type and the player to move
+    rng = numpy.random.default_rng(seed)
+    return zobrist.build_random_keys(rng, (len(evtre.NODE_TYPE_LIST), zobrist.DEFAULT_NUM_PLAYERS))
+
+
+def build_unit_count_keys(num_unit_types, seed=zobrist.SEED + 2):
+    # base key per unit type, zobrist.mix_keys gives the key of each count
+    rng = numpy.random.default_rng(seed)
+    return zobrist.build_random_keys(rng, num_unit_types)
+
+
+def build_game_state_hash_fun(seed=zobrist.SEED + 1):
+    # hash_fun for search.ExpectiminimaxSearch:  game states are shared with ancestors until they change, so the node
+    # type, player, pending purchase or move (unit_counts_arr, keys built for tree.unit_names) and target region of a
+    # node are combined with the game state hash.  Siblings that share a game state differ in these
+    node_keys = build_node_keys(seed)
+    target_region_key = zobrist.build_random_keys(numpy.random.default_rng(seed + 2), 1)[0]
+    unit_count_keys_dict = {}
+
+    def hash_fun(tree, index):
+        r = numpy.uint64(tree.get_game_state(index).zobrist_hash)
+        r ^= node_keys[tree.node_type_arr[index], tree.player_arr[index]]
+
+        unit_counts = tree.unit_counts_arr[index]
+        if unit_counts.shape[0] not in unit_count_keys_dict:
+            unit_count_keys_dict[unit_counts.shape[0]] = build_unit_count_keys(unit_counts.shape[0], seed + 1)
+        locs = unit_counts > 0
+        r ^= zobrist.xor_reduce(zobrist.mix_keys(unit_count_keys_dict[unit_counts.shape[0]][locs], unit_counts[locs]))
+
+        target_region_index = tree.target_region_arr[index]
+        if target_region_index != evtre.NO_INDEX:
+            r ^= zobrist.mix_keys(target_region_key, target_region_index)
+        return numpy.uint64(r)
+
+    return hash_fun
+
+
+class AxisAndAlliesTranspositionTableException(Exception):
+    pass
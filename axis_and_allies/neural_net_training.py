@@ -1,21 +1,142 @@
+import logging
+import argparse
+import os
+import sys
+
 import pandas
 import numpy
 
 import sklearn.neural_network as neural_network
 
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.battle_value_estimator as battle_value_estimator
+import axis_and_allies.generate_training_data as generate_training_data
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+DEFAULT_INPUT_FILE = "sim_data_r273x19.txt"
+DEFAULT_OUTPUT_FILE = "battle_value_estimator.npz"
+DEFAULT_HIDDEN_LAYER_SIZES = (64, 64)
+DEFAULT_MAX_ITER = 500
+DEFAULT_TEST_FRACTION = 0.2
+
+
+def load_sim_data(input_file):
+    # simulation data written by run_simulation.collect_data_for_modeling, or a directory of shards written by
+    # generate_training_data, one row per simulated battle
+    if os.path.isdir(input_file):
+        data_df = generate_training_data.load_training_data(input_file)
+    else:
+        data_df = pandas.read_csv(input_file, sep="\t", index_col=0)
+
+    if "frac_diff_remain_IPC" not in data_df.columns:
+        locs = data_df.diff_remain_IPC >= 0
+        data_df["frac_diff_remain_IPC"] = float("nan")
+        data_df.loc[locs, "frac_diff_remain_IPC"] = data_df.diff_remain_IPC / data_df.attack_IPC
+        data_df.loc[~locs, "frac_diff_remain_IPC"] = data_df.diff_remain_IPC / data_df.defense_IPC
+
+    # the fraction is undefined when the winning side bought nothing
+    locs = numpy.all(numpy.isfinite(data_df[battle_value_estimator.TARGET_NAMES].to_numpy()), axis=1)
+    logger.debug("data_df.shape:  {}  rows dropped for non finite targets:  {}".format(data_df.shape, (~locs).sum()))
+    return data_df[locs]
+
+
+def find_unit_names(data_df):
+    # units with both a "<unit name>_attack" and a "<unit name>_defense" count column, in column order
+    column_set = set(data_df.columns)
+    return [x[:-len("_attack")] for x in data_df.columns
+            if x.endswith("_attack") and x[:-len("_attack")] + "_defense" in column_set]
+
+
+def split_train_test(data_df, unit_names, test_fraction=DEFAULT_TEST_FRACTION, seed=None):
+    # held out rows are whole battle configurations (the same attack and defense counts), so the test data measures
+    # prediction for battles that were not trained on
+    attack_counts, defense_counts = battle_value_estimator.build_counts_from_df(data_df, unit_names)
+    _, config_index = numpy.unique(numpy.hstack([attack_counts, defense_counts]), axis=0, return_inverse=True)
+    config_index = config_index.ravel()
+    num_configs = config_index.max() + 1
+
+    rng = numpy.random.default_rng(seed)
+    num_test_configs = int(numpy.round(num_configs * test_fraction))
+    is_test_config = numpy.zeros(num_configs, dtype=bool)
+    is_test_config[rng.choice(num_configs, size=num_test_configs, replace=False)] = True
+
+    locs = is_test_config[config_index]
+    return data_df[~locs], data_df[locs]
+
+
+def train_estimator(data_df, unit_dict, unit_names=None, hidden_layer_sizes=DEFAULT_HIDDEN_LAYER_SIZES,
+                    max_iter=DEFAULT_MAX_ITER, seed=None):
+    # fits sklearn's MLPRegressor to the standardized features and targets and copies its weights into a
+    # battle_value_estimator.BattleValueEstimator
+    if unit_names is None:
+        unit_names = find_unit_names(data_df)
+    ipc_arr = numpy.array([unit_dict[x].ipc for x in unit_names], dtype=numpy.float64)
+
+    attack_counts, defense_counts = battle_value_estimator.build_counts_from_df(data_df, unit_names)
+    feature_arr = battle_value_estimator.build_feature_arr(ipc_arr, attack_counts, defense_counts)
+    target_arr = data_df[battle_value_estimator.TARGET_NAMES].to_numpy(dtype=numpy.float64)
+
+    feature_mean = feature_arr.mean(axis=0)
+    feature_std = feature_arr.std(axis=0)
+    # constant features (e.g. a unit that was never bought) are left unscaled
+    feature_std[feature_std == 0] = 1.
+    target_mean = target_arr.mean(axis=0)
+    target_std = target_arr.std(axis=0)
+    target_std[target_std == 0] = 1.
+
+    regressor = neural_network.MLPRegressor(
+        hidden_layer_sizes=hidden_layer_sizes, max_iter=max_iter, early_stopping=True, random_state=seed
+    )
+    regressor.fit((feature_arr - feature_mean) / feature_std, (target_arr - target_mean) / target_std)
+    logger.debug("regressor.n_iter_:  {}  regressor.loss_:  {}".format(regressor.n_iter_, regressor.loss_))
+
+    return battle_value_estimator.BattleValueEstimator(
+        unit_names, ipc_arr, regressor.coefs_, regressor.intercepts_, feature_mean, feature_std, target_mean,
+        target_std, activation=regressor.activation
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="train the neural network battle value estimator on simulation data")
+    parser.add_argument("--input_file", default=DEFAULT_INPUT_FILE,
+                        help="simulation data from run_simulation.collect_data_for_modeling, or a directory of shards "
+                        "from generate_training_data")
+    parser.add_argument("--output_file", default=DEFAULT_OUTPUT_FILE, help="where to save the trained estimator")
+    parser.add_argument("--unit_file", default=os.path.join(os.path.dirname(__file__), "unit_data.json"))
+    parser.add_argument("--hidden_layer_sizes", type=int, nargs="+", default=list(DEFAULT_HIDDEN_LAYER_SIZES))
+    parser.add_argument("--max_iter", type=int, default=DEFAULT_MAX_ITER)
+    parser.add_argument("--test_fraction", type=float, default=DEFAULT_TEST_FRACTION,
+                        help="fraction of battle configurations held out for the calibration report")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser
+
 
-input_file = "sim_data_r273x19.txt"
+def main(args):
+    unit_dict = build_unit_dict.load_units(args.unit_file)
 
+    data_df = load_sim_data(args.input_file)
+    train_df, test_df = split_train_test(data_df, find_unit_names(data_df), args.test_fraction, args.seed)
+    logger.info("train_df.shape:  {}  test_df.shape:  {}".format(train_df.shape, test_df.shape))
 
-data_df = pandas.read_csv(input_file, sep="\t", index_col=0)
+    estimator = train_estimator(
+        train_df, unit_dict, hidden_layer_sizes=tuple(args.hidden_layer_sizes), max_iter=args.max_iter,
+        seed=args.seed
+    )
+    logger.info("estimator:  {}".format(estimator))
 
-data_df["z_IPC"] = (data_df.IPC - data_df.IPC.mean()) / data_df.IPC.std()
+    calibration_report = battle_value_estimator.build_calibration_report(estimator, test_df)
+    print(battle_value_estimator.format_calibration_report(calibration_report))
 
-print(data_df)
-print(data_df.columns)
+    estimator.save(args.output_file)
+    logger.info("saved estimator to args.output_file:  {}".format(args.output_file))
+    return 0
 
-X_cols = [x for x in data_df.columns if x.endswith("_defense")]
-X_cols.extend(["z_IPC"])
-print(X_cols)
 
+if __name__ == "__main__":
+    setup_logger.setup(verbose=False)
 
+    sys.exit(main(build_parser().parse_args()))
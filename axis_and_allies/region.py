@@ -86,10 +86,14 @@ def load_from_txt(input_file):
     return region_dict, region_status_dict
 
 def validate_region_connections(region_dict):
+    # every connection must be listed by both regions, checked against a set of all connections so the cost is
+    # O(number of connections)
+    connection_set = {(x.id, y.id) for x in region_dict.values() for y in x.adjacent_regions}
+
     mismatch_list = []
     for cur_region in region_dict.values():
         for cur_adj_region in cur_region.adjacent_regions:
-            if not cur_region.id in cur_adj_region.get_adjacent_region_ids():
+            if not (cur_adj_region.id, cur_region.id) in connection_set:
                 mismatch_list.append((cur_region, cur_adj_region))
     
     if len(mismatch_list) > 0:
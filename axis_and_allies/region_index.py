@@ -0,0 +1,144 @@
+import logging
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.unit as unit
+import axis_and_allies.region as region
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+# distance between regions that cannot reach each other, larger than any move so "distance <= move" is False
+UNREACHABLE = numpy.iinfo(numpy.int16).max
+
+# which regions a unit can move through:  land units through land regions, naval units through water regions and
+# air units through any region
+MOVEMENT_TYPE_DICT = {
+    unit.UNIT_TYPE_LAND:region.REGION_TYPE_LAND, unit.UNIT_TYPE_NAVAL:region.REGION_TYPE_WATER, unit.UNIT_TYPE_AIR:None
+}
+
+
+class RegionIndex:
+    # regions are indexed by their position in region_id_list (sorted ids, same order as game_state.GameState).
+    # Adjacency is stored in CSR form:  the neighbors of region i are adjacency_arr[offset_arr[i]:offset_arr[i+1]]
+    def __init__(self, region_dict, move_list=None) -> None:
+        self.region_id_list = sorted(region_dict.keys())
+        self.region_index_dict = {x:i for i, x in enumerate(self.region_id_list)}
+
+        region_list = [region_dict[x] for x in self.region_id_list]
+        self.region_type_arr = numpy.array([x.region_type for x in region_list])
+        self.ipc_production_arr = numpy.array([x.ipc_production for x in region_list], dtype=numpy.int64)
+
+        degree_arr = numpy.array([len(x.adjacent_regions) for x in region_list], dtype=numpy.int64)
+        self.offset_arr = numpy.concatenate([[0], numpy.cumsum(degree_arr)])
+        self.adjacency_arr = numpy.array(
+            [self.region_index_dict[y.id] for x in region_list for y in x.adjacent_regions], dtype=numpy.int32
+        )
+
+        # UNREACHABLE where there is no path, key None is for paths through any region type
+        self.distance_arr_dict = {
+            region_type:calculate_distances(self.offset_arr, self.adjacency_arr, self.build_region_type_mask(region_type))
+            for region_type in [None, region.REGION_TYPE_LAND, region.REGION_TYPE_WATER]
+        }
+
+        # (region type, move) to bool regions x regions, entry [i, j] is True if j is reachable from i within move
+        self.reachable_arr_dict = {}
+        if move_list is not None:
+            for move in move_list:
+                for region_type in self.distance_arr_dict.keys():
+                    self.build_reachable_arr(region_type, move)
+
+    def __len__(self) -> int:
+        return len(self.region_id_list)
+
+    def __repr__(self) -> str:
+        return "num_regions:  {}  num_adjacencies:  {}  reachable_arr_dict.keys():  {}".format(
+            len(self), self.adjacency_arr.shape[0], sorted(self.reachable_arr_dict.keys(), key=str)
+        )
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def get_region_index(self, region_id):
+        return self.region_index_dict[region_id]
+
+    def build_region_type_mask(self, region_type):
+        if region_type is None:
+            return numpy.ones(len(self), dtype=bool)
+        return self.region_type_arr == region_type
+
+    def get_adjacent_region_indexes(self, region_index):
+        return self.adjacency_arr[self.offset_arr[region_index]:self.offset_arr[region_index+1]]
+
+    def get_distance_arr(self, region_type=None):
+        return self.distance_arr_dict[region_type]
+
+    def calculate_distance(self, from_region_index, to_region_index, region_type=None):
+        return int(self.distance_arr_dict[region_type][from_region_index, to_region_index])
+
+    def build_reachable_arr(self, region_type, move):
+        key = (region_type, move)
+        if key not in self.reachable_arr_dict:
+            self.reachable_arr_dict[key] = self.distance_arr_dict[region_type] <= move
+        return self.reachable_arr_dict[key]
+
+    def get_reachable_region_indexes(self, region_index, move, region_type=None):
+        # regions within move of region_index (including region_index) moving only through region_type
+        return numpy.nonzero(self.build_reachable_arr(region_type, move)[region_index])[0]
+
+    def get_unit_reachable_region_indexes(self, region_index, my_unit):
+        return self.get_reachable_region_indexes(region_index, my_unit.move, MOVEMENT_TYPE_DICT[my_unit.unit_type])
+
+
+def calculate_distances(offset_arr, adjacency_arr, region_mask):
+    # all pairs shortest path lengths using only regions in region_mask, breadth first search from every region at
+    # once.  The frontier is the (source, region) pairs first reached in the latest step, so each pair is expanded
+    # once and the total work is O(regions * connections)
+    num_regions = offset_arr.shape[0] - 1
+    distance_arr = numpy.full((num_regions, num_regions), UNREACHABLE, dtype=numpy.int16)
+    flat_distance_arr = distance_arr.reshape(-1)
+
+    # CSR of the connections with both ends in region_mask
+    from_arr = numpy.repeat(numpy.arange(num_regions), numpy.diff(offset_arr))
+    locs = region_mask[from_arr] & region_mask[adjacency_arr]
+    to_arr = adjacency_arr[locs].astype(numpy.int64)
+    degree_arr = numpy.bincount(from_arr[locs], minlength=num_regions)
+    mask_offset_arr = numpy.concatenate([[0], numpy.cumsum(degree_arr)])
+
+    frontier_source_arr = numpy.nonzero(region_mask)[0]
+    frontier_region_arr = frontier_source_arr.copy()
+    distance_arr[frontier_source_arr, frontier_region_arr] = 0
+
+    distance = 0
+    while frontier_source_arr.shape[0] > 0:
+        distance += 1
+
+        cur_degree_arr = degree_arr[frontier_region_arr]
+        pair_index = numpy.repeat(numpy.arange(frontier_region_arr.shape[0]), cur_degree_arr)
+        edge_offset = numpy.arange(pair_index.shape[0]) - (numpy.cumsum(cur_degree_arr) - cur_degree_arr)[pair_index]
+        next_region_arr = to_arr[mask_offset_arr[frontier_region_arr][pair_index] + edge_offset]
+
+        flat_index = frontier_source_arr[pair_index] * num_regions + next_region_arr
+        flat_index = numpy.sort(flat_index[flat_distance_arr[flat_index] == UNREACHABLE])
+        # a region can be reached from more than one frontier region
+        flat_index = flat_index[numpy.diff(flat_index, prepend=-1) != 0]
+        flat_distance_arr[flat_index] = distance
+
+        frontier_source_arr, frontier_region_arr = numpy.divmod(flat_index, num_regions)
+
+    return distance_arr
+
+
+def build_region_index(region_dict, unit_dict=None):
+    # reachability is precomputed for every move value in unit_dict
+    move_list = None
+    if unit_dict is not None:
+        move_list = sorted({x.move for x in unit_dict.values() if x.move is not None})
+    return RegionIndex(region_dict, move_list)
+
+
+def load_region_index(input_file, unit_dict=None):
+    region_dict, _ = region.load_from_txt(input_file)
+    return build_region_index(region_dict, unit_dict)
@@ -8,25 +8,35 @@ import gymnasium as gym
 
 import axis_and_allies.run_simulation as run_simulation
 import axis_and_allies.reinforcement_learning.super_simple_env as super_simple_env
+import axis_and_allies.reinforcement_learning.vec_super_simple_env as vec_super_simple_env
 
 output_template = "env_data_r{}x{}.txt"
 output_eval_template = "evaluate_model_r{}x{}.txt"
 
 IPC_limit = 30
 ipc_cost_arr = numpy.array([3,4,6,10,12])
+# envs stepped together during rollouts, n_steps is per env so the rollout size stays 4096*128
+num_envs = 256
 
 unit_dict = run_simulation.load_units("../unit_data.json")
 
 def evaluate_model(env, model, N=200):
     default_obs = env.build_default_obseration()[0]
 
-    action_list = [model.predict(default_obs)[0] for i in range(N)]
-    result_list = [env.step(action)[1] for action in action_list]
-    eval_dict= {"result":result_list}
-
-    for i in range(len(action_list[0])):
+    # one predict call and one batch of battles for all N evaluations
+    action_arr = model.predict(numpy.tile(default_obs, (N, 1)))[0]
+    unit_counts_arr = super_simple_env.convert_actions_to_integers(action_arr, env.IPC_limit, env.ipc_cost_arr)
+    opponent_unit_counts = super_simple_env.convert_action_to_integers(
+        super_simple_env.OPPONENT_ACTION, env.IPC_limit, env.ipc_cost_arr
+    )
+    combat_result_metric = super_simple_env.run_battles_batch(
+        env.get_unit_table(), unit_counts_arr, opponent_unit_counts
+    )
+    eval_dict= {"result":combat_result_metric.fraction_ipc_winner}
+
+    for i in range(action_arr.shape[1]):
         col = "action_{}".format(i)
-        eval_dict[col] = [x[i] for x in action_list]
+        eval_dict[col] = action_arr[:, i]
 
     eval_df = pandas.DataFrame(eval_dict)
     return eval_df
@@ -35,7 +45,8 @@ def evaluate_model(env, model, N=200):
 env = super_simple_env.SuperSimpleEnv(IPC_limit, ipc_cost_arr, unit_dict)
 print(env)
 
-model = stable_baselines3.PPO(stable_baselines3.ppo.MlpPolicy, env, verbose=0, n_steps=4096*128)
+train_env = vec_super_simple_env.VecSuperSimpleEnv(num_envs, IPC_limit, ipc_cost_arr, unit_dict)
+model = stable_baselines3.PPO(stable_baselines3.ppo.MlpPolicy, train_env, verbose=0, n_steps=4096*128 // num_envs)
 env.model = model
 
 print("predictions from untrained model")
@@ -0,0 +1,146 @@
+import logging
+import glob
+import os
+
+import numpy
+import torch
+import stable_baselines3
+import stable_baselines3.common.callbacks as callbacks
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.reinforcement_learning.super_simple_env as super_simple_env
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+SNAPSHOT_FILE_TEMPLATE = "policy_{:06d}.zip"
+SNAPSHOT_FILE_GLOB = "policy_*.zip"
+DEFAULT_BUFFER_SIZE = 4096
+DEFAULT_SNAPSHOT_FREQ = 100000
+
+
+class OpponentPool:
+    # frozen snapshots of past policies for self-play, saved in pool_dir.  Opponent actions are generated
+    # buffer_size at a time with one predict call by a snapshot chosen at random and handed out in order by
+    # next_actions.  The snapshots on disk are the pool:  every refill rescans pool_dir, so copies of the pool in
+    # other processes (e.g. the shards of vec_super_simple_env.SubprocVecSuperSimpleEnv) see snapshots added by the
+    # learner.  Until the first snapshot the opponent plays default_action
+    def __init__(self, pool_dir, observation, default_action=super_simple_env.OPPONENT_ACTION,
+                 buffer_size=DEFAULT_BUFFER_SIZE, max_size=None, model_class=stable_baselines3.PPO,
+                 deterministic=False, seed=None) -> None:
+        self.pool_dir = pool_dir
+        self.observation = numpy.asarray(observation)
+        self.default_action = numpy.asarray(default_action)
+        self.buffer_size = buffer_size
+        self.max_size = max_size
+        self.model_class = model_class
+        self.deterministic = deterministic
+        self.rng = numpy.random.default_rng(seed)
+
+        os.makedirs(pool_dir, exist_ok=True)
+        self.snapshot_file_list = []
+        self.loaded_model_dict = {}
+        self.buffer = None
+        self.buffer_position = 0
+        self.buffer_snapshot_file = None
+
+        self.reload()
+
+    def __repr__(self) -> str:
+        return "pool_dir:  {}  len(snapshot_file_list):  {}  buffer_size:  {}  buffer_snapshot_file:  {}".format(
+            self.pool_dir, len(self.snapshot_file_list), self.buffer_size, self.buffer_snapshot_file
+        )
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __len__(self) -> int:
+        return len(self.snapshot_file_list)
+
+    def __getstate__(self):
+        # loaded models and the buffer are not copied to other processes, they reload from pool_dir
+        r = self.__dict__.copy()
+        r["loaded_model_dict"] = {}
+        r["buffer"] = None
+        return r
+
+    def seed(self, seed):
+        self.rng = numpy.random.default_rng(seed)
+        self.buffer = None
+
+    def reload(self):
+        self.snapshot_file_list = sorted(glob.glob(os.path.join(self.pool_dir, SNAPSHOT_FILE_GLOB)))
+        self.loaded_model_dict = {x:y for x, y in self.loaded_model_dict.items() if x in self.snapshot_file_list}
+
+    def add(self, model):
+        # saves a frozen copy of model to pool_dir, removing the oldest snapshots beyond max_size
+        self.reload()
+        snapshot_index = 0
+        if len(self.snapshot_file_list) > 0:
+            snapshot_index = int(os.path.basename(self.snapshot_file_list[-1])[len("policy_"):-len(".zip")]) + 1
+        snapshot_file = os.path.join(self.pool_dir, SNAPSHOT_FILE_TEMPLATE.format(snapshot_index))
+        model.save(snapshot_file)
+        logger.info("saved snapshot_file:  {}".format(snapshot_file))
+
+        self.reload()
+        if self.max_size is not None:
+            for x in self.snapshot_file_list[:-self.max_size]:
+                os.remove(x)
+            self.reload()
+
+        # the next actions come from the updated pool
+        self.buffer = None
+        return snapshot_file
+
+    def load_model(self, snapshot_file):
+        if snapshot_file not in self.loaded_model_dict:
+            self.loaded_model_dict[snapshot_file] = self.model_class.load(snapshot_file, device="cpu")
+        return self.loaded_model_dict[snapshot_file]
+
+    def refill_buffer(self):
+        self.reload()
+        self.buffer_position = 0
+
+        if len(self.snapshot_file_list) == 0:
+            self.buffer_snapshot_file = None
+            self.buffer = numpy.tile(self.default_action, (self.buffer_size, 1))
+            return
+
+        self.buffer_snapshot_file = self.snapshot_file_list[self.rng.integers(len(self.snapshot_file_list))]
+        model = self.load_model(self.buffer_snapshot_file)
+        observations = numpy.tile(self.observation, (self.buffer_size, 1))
+        # stable_baselines3 samples actions with the global torch generator, seed a private copy from rng instead
+        with torch.random.fork_rng():
+            torch.manual_seed(int(self.rng.integers(2**63)))
+            self.buffer = model.predict(observations, deterministic=self.deterministic)[0]
+        logger.debug("self.buffer_snapshot_file:  {}".format(self.buffer_snapshot_file))
+
+    def next_actions(self, num_actions):
+        # num_actions x action dimensions, refilling the buffer as it runs out
+        action_list = []
+        num_remaining = num_actions
+        while num_remaining > 0:
+            if self.buffer is None or self.buffer_position == self.buffer.shape[0]:
+                self.refill_buffer()
+            num_take = min(num_remaining, self.buffer.shape[0] - self.buffer_position)
+            action_list.append(self.buffer[self.buffer_position:self.buffer_position+num_take])
+            self.buffer_position += num_take
+            num_remaining -= num_take
+
+        return numpy.concatenate(action_list)
+
+
+class OpponentPoolCallback(callbacks.BaseCallback):
+    # adds a snapshot of the model being trained to opponent_pool every snapshot_freq timesteps
+    def __init__(self, opponent_pool, snapshot_freq=DEFAULT_SNAPSHOT_FREQ, verbose=0) -> None:
+        super().__init__(verbose)
+        self.opponent_pool = opponent_pool
+        self.snapshot_freq = snapshot_freq
+        self.last_snapshot_timestep = 0
+
+    def _on_step(self) -> bool:
+        if self.num_timesteps - self.last_snapshot_timestep >= self.snapshot_freq:
+            self.opponent_pool.add(self.model)
+            self.last_snapshot_timestep = self.num_timesteps
+        return True
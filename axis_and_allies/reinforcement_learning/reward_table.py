@@ -0,0 +1,157 @@
+import logging
+import argparse
+import json
+import os
+import sys
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.combat_cache as combat_cache
+import axis_and_allies.reinforcement_learning.super_simple_env as super_simple_env
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+TABLE_FILE = "reward_table.npy"
+METADATA_FILE = "reward_table.json"
+DEFAULT_OUTPUT_DIR = "reward_table"
+DEFAULT_IPC_LIMIT = 30
+DEFAULT_IPC_COST_ARR = [3, 4, 6, 10, 12]
+DEFAULT_N_SIM = 10000
+
+# last axis of the table
+REWARD_MEAN = 0
+REWARD_VARIANCE = 1
+
+
+class RewardTable:
+    # dense table of the expected reward of every affordable purchase against one opponent army, indexed by the unit
+    # counts:  table[unit counts] is (mean, variance) of fraction_ipc_winner, nan for purchases over IPC_limit.
+    # table is usually a read only memory map of the file written by build_reward_table
+    def __init__(self, table, IPC_limit, ipc_cost_arr, opponent_unit_counts) -> None:
+        self.table = table
+        self.IPC_limit = IPC_limit
+        self.ipc_cost_arr = numpy.asarray(ipc_cost_arr)
+        self.opponent_unit_counts = numpy.asarray(opponent_unit_counts)
+
+    def __repr__(self) -> str:
+        return "table.shape:  {}  IPC_limit:  {}  ipc_cost_arr:  {}  opponent_unit_counts:  {}".format(
+            self.table.shape, self.IPC_limit, self.ipc_cost_arr, self.opponent_unit_counts
+        )
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def lookup(self, unit_counts_arr):
+        # unit_counts_arr:  purchases x unit types, returns arrays of the reward mean and variance of each purchase
+        r = self.table[tuple(numpy.asarray(unit_counts_arr).T)]
+        return r[:, REWARD_MEAN], r[:, REWARD_VARIANCE]
+
+    def check(self, IPC_limit, ipc_cost_arr, opponent_unit_counts):
+        # the table only applies to an env with the same purchase space and opponent
+        if (IPC_limit != self.IPC_limit or not numpy.array_equal(ipc_cost_arr, self.ipc_cost_arr)
+                or not numpy.array_equal(opponent_unit_counts, self.opponent_unit_counts)):
+            raise AxisAndAlliesRewardTableException(
+                "reward table {} does not match IPC_limit:  {}  ipc_cost_arr:  {}  opponent_unit_counts:  {}".format(
+                    self, IPC_limit, ipc_cost_arr, opponent_unit_counts
+                )
+            )
+
+
+def build_table_shape(IPC_limit, ipc_cost_arr):
+    # most of each unit type that IPC_limit can buy, plus one for buying none
+    return tuple(int(x) for x in IPC_limit // numpy.asarray(ipc_cost_arr) + 1)
+
+
+def enumerate_purchases(IPC_limit, ipc_cost_arr):
+    # every purchase that costs at most IPC_limit, a superset of the purchases convert_action_to_integers produces
+    table_shape = build_table_shape(IPC_limit, ipc_cost_arr)
+    r = numpy.indices(table_shape).reshape(len(table_shape), -1).T
+    return r[r @ numpy.asarray(ipc_cost_arr) <= IPC_limit]
+
+
+def build_reward_table(unit_dict, output_dir=DEFAULT_OUTPUT_DIR, IPC_limit=DEFAULT_IPC_LIMIT,
+                       ipc_cost_arr=DEFAULT_IPC_COST_ARR, opponent_action=super_simple_env.OPPONENT_ACTION,
+                       N_sim=DEFAULT_N_SIM):
+    # evaluates every affordable purchase against the opponent and writes the dense table as a .npy file (so it can be
+    # memory mapped) with a json file of the settings.  Battles the exact solver supports are exact, others use N_sim
+    # sampled battles
+    ipc_cost_arr = numpy.asarray(ipc_cost_arr)
+    unit_table = super_simple_env.build_reference_unit_table(unit_dict, len(ipc_cost_arr))
+    opponent_unit_counts = super_simple_env.convert_action_to_integers(opponent_action, IPC_limit, ipc_cost_arr)
+
+    purchases = enumerate_purchases(IPC_limit, ipc_cost_arr)
+    logger.info("purchases.shape:  {}  opponent_unit_counts:  {}".format(purchases.shape, opponent_unit_counts))
+
+    my_combat_cache = combat_cache.CombatCache(unit_table, max_size=purchases.shape[0], N_sim=N_sim)
+    reward_mean, reward_variance = super_simple_env.calculate_expected_rewards(
+        my_combat_cache, purchases, opponent_unit_counts
+    )
+    logger.debug("my_combat_cache:  {}".format(my_combat_cache))
+
+    os.makedirs(output_dir, exist_ok=True)
+    table_file = os.path.join(output_dir, TABLE_FILE)
+    # written to a temporary file first so an interrupted run does not leave a partial table
+    tmp_table_file = table_file + ".tmp.npy"
+    table = numpy.lib.format.open_memmap(
+        tmp_table_file, mode="w+", dtype=numpy.float32, shape=build_table_shape(IPC_limit, ipc_cost_arr) + (2,)
+    )
+    table[:] = numpy.nan
+    table[tuple(purchases.T)] = numpy.column_stack([reward_mean, reward_variance])
+    table.flush()
+    del table
+    os.replace(tmp_table_file, table_file)
+
+    metadata = {"IPC_limit":int(IPC_limit), "ipc_cost_arr":[int(x) for x in ipc_cost_arr],
+                "opponent_unit_counts":[int(x) for x in opponent_unit_counts], "unit_names":unit_table.names,
+                "N_sim":int(N_sim), "num_purchases":int(purchases.shape[0])}
+    with open(os.path.join(output_dir, METADATA_FILE), "w") as file:
+        json.dump(metadata, file, indent=2, sort_keys=True)
+
+    return load_reward_table(output_dir)
+
+
+def load_reward_table(output_dir=DEFAULT_OUTPUT_DIR, mmap_mode="r"):
+    with open(os.path.join(output_dir, METADATA_FILE)) as file:
+        metadata = json.load(file)
+
+    return RewardTable(
+        numpy.load(os.path.join(output_dir, TABLE_FILE), mmap_mode=mmap_mode), metadata["IPC_limit"],
+        metadata["ipc_cost_arr"], metadata["opponent_unit_counts"]
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="precompute the expected reward of every SuperSimpleEnv purchase against the opponent"
+    )
+    parser.add_argument("--output_dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--IPC_limit", type=int, default=DEFAULT_IPC_LIMIT)
+    parser.add_argument("--ipc_cost_arr", type=int, nargs="+", default=DEFAULT_IPC_COST_ARR)
+    parser.add_argument("--N_sim", type=int, default=DEFAULT_N_SIM,
+                        help="sampled battles for purchases the exact solver does not support")
+    parser.add_argument("--unit_file", default=os.path.join(os.path.dirname(__file__), "..", "unit_data.json"))
+    return parser
+
+
+def main(args):
+    unit_dict = build_unit_dict.load_units(args.unit_file)
+
+    reward_table = build_reward_table(
+        unit_dict, args.output_dir, args.IPC_limit, numpy.array(args.ipc_cost_arr), N_sim=args.N_sim
+    )
+    logger.info("reward_table:  {}".format(reward_table))
+    return 0
+
+
+class AxisAndAlliesRewardTableException(Exception):
+    pass
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=False)
+
+    sys.exit(main(build_parser().parse_args()))
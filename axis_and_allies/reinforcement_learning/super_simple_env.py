@@ -6,6 +6,9 @@ import axis_and_allies.setup_logger as setup_logger
 
 import axis_and_allies.run_simulation as run_simulation
 import axis_and_allies.combat as combat
+import axis_and_allies.combat_cache as combat_cache
+import axis_and_allies.army as army
+import axis_and_allies.unit as unit
 
 
 logger = logging.getLogger(setup_logger.LOGGER_NAME)
@@ -19,6 +22,17 @@ ACTION_RATIO_BOMBER = 4
 
 UNIT_NAMES_REFERENCE = ["infantry", "artillery", "tank", "fighter", "bomber"]
 
+# spend 25% of the IPC, all of it on infantry
+OPPONENT_ACTION = numpy.array([-0.25, -5, -5, -5, -5])
+
+# reward is the result of one random battle
+REWARD_MODE_SAMPLE = "sample"
+# reward is the expected result over the distribution of battle outcomes, its variance is in the info dict
+REWARD_MODE_EXPECTED = "expected"
+# reward is read from a precomputed reward_table.RewardTable, its variance is in the info dict
+REWARD_MODE_LOOKUP = "lookup"
+REWARD_MODE_LIST = [REWARD_MODE_SAMPLE, REWARD_MODE_EXPECTED, REWARD_MODE_LOOKUP]
+
 
 class SuperSimpleEnv(gym.Env):
     """
@@ -32,10 +46,22 @@ class SuperSimpleEnv(gym.Env):
 
     DEFAULT_ACTION = [1.] #+ [0.]*4
 
-    def __init__(self, IPC_limit, ipc_cost_arr, unit_dict, render_mode="console", log_ratio_limit=5, ipc_frac_limits=(-.5, .5)):
+    def __init__(self, IPC_limit, ipc_cost_arr, unit_dict, render_mode="console", log_ratio_limit=5, ipc_frac_limits=(-.5, .5),
+                 reward_mode=REWARD_MODE_SAMPLE, my_combat_cache=None, reward_table=None, opponent_pool=None):
         super(SuperSimpleEnv, self).__init__()
         self.render_mode = render_mode
 
+        check_reward_mode(reward_mode)
+        self.reward_mode = reward_mode
+        # outcome distributions for REWARD_MODE_EXPECTED, keyed by purchase
+        self.combat_cache = my_combat_cache
+        # rewards for REWARD_MODE_LOOKUP
+        check_reward_table(reward_mode, reward_table, IPC_limit, ipc_cost_arr)
+        self.reward_table = reward_table
+        # self-play opponents (opponent_pool.OpponentPool), None for OPPONENT_ACTION
+        check_opponent_pool(reward_mode, opponent_pool)
+        self.opponent_pool = opponent_pool
+
         self.IPC_limit = IPC_limit
         self.ipc_cost_arr = ipc_cost_arr
         self.unit_dict = unit_dict
@@ -51,6 +77,8 @@ class SuperSimpleEnv(gym.Env):
         # self.all_actions = []
         # self.all_opponent_actions = []
 
+        self.unit_table = None
+
         self.model = None
         
         self.step_count = 0
@@ -60,16 +88,11 @@ class SuperSimpleEnv(gym.Env):
         # number of infantry to purchase
         # these values will then be converted into conrete integer numbers of units to be purchased subject to the IPC
         # constraint
-        self.action_space = gym.spaces.Box(
-            low=numpy.array([ipc_frac_limits[0]] + [-log_ratio_limit]*4),
-            high=numpy.array([ipc_frac_limits[1]] + [log_ratio_limit]*4)
-        )
+        self.action_space = build_action_space(log_ratio_limit, ipc_frac_limits)
 
         # The observation will be the fraction of IPC remaining after the battle
         # where positive indicates a win, negative indicates a loss
-        self.observation_space = gym.spaces.Box(
-            low=0, high=45, shape=(1,), dtype=numpy.int32
-        )
+        self.observation_space = build_observation_space()
 
     def build_default_obseration(self):
         return numpy.array([self.IPC_limit]).astype(numpy.float32), {}  # empty info dict
@@ -86,42 +109,56 @@ class SuperSimpleEnv(gym.Env):
 
         return self.build_default_obseration()
 
+    def get_unit_table(self):
+        if self.unit_table is None:
+            self.unit_table = build_reference_unit_table(self.unit_dict, len(self.ipc_cost_arr))
+        return self.unit_table
+
+    def get_combat_cache(self):
+        if self.combat_cache is None:
+            self.combat_cache = combat_cache.CombatCache(self.get_unit_table())
+        return self.combat_cache
+
     def step(self, action):
         # self.current_action = action
         # self.all_actions.append(action)
 
         self.unit_counts = convert_action_to_integers(action, self.IPC_limit, self.ipc_cost_arr)
-        unit_names = convert_unit_count_to_unit_name_list(self.unit_counts)
 
-        opponent_action = numpy.array([-0.25, -5, -5, -5, -5])
-        #self.model.predict(self.build_default_obseration()[0])[0]
+        opponent_action = OPPONENT_ACTION
+        if self.opponent_pool is not None:
+            opponent_action = self.opponent_pool.next_actions(1)[0]
         # print("opponent_action:  {}".format(opponent_action))
         # self.all_opponent_actions.append(opponent_action)
 
         opponent_unit_counts = convert_action_to_integers(opponent_action, self.IPC_limit, self.ipc_cost_arr)
-        opponent_unit_names = convert_unit_count_to_unit_name_list(opponent_unit_counts)
         if self.step_count == 0:
-            print("opponent_unit_names:  {}".format(opponent_unit_names))
-        
-        self.combat_result = run_simulation.run_single_from_names(
-            self.unit_dict, unit_names, opponent_unit_names, combat.BATTLE_TYPE_LAND
-        )
-
-        sum_start_ipc_attack = run_simulation.calculate_sum_ipc(
-            run_simulation.build_units_from_names(self.unit_dict, unit_names)
-        )
-        sum_start_ipc_defense = run_simulation.calculate_sum_ipc(
-            run_simulation.build_units_from_names(self.unit_dict, opponent_unit_names)
-        )
-        result_metrics = run_simulation.calculate_metrics_from_combat_result(
-            self.combat_result[-1], sum_start_ipc_attack, sum_start_ipc_defense
-        )
-        # -1 indicates result from last round of combat
+            print("opponent_unit_names:  {}".format(convert_unit_count_to_unit_name_list(opponent_unit_counts)))
 
         # Optionally we can pass additional info, we are not using that for now
         info = {}
 
-        result = result_metrics.fraction_ipc_winner # reward
+        if self.reward_mode in (REWARD_MODE_EXPECTED, REWARD_MODE_LOOKUP):
+            if self.reward_mode == REWARD_MODE_EXPECTED:
+                reward_mean, reward_variance = calculate_expected_rewards(
+                    self.get_combat_cache(), self.unit_counts[None, :], opponent_unit_counts
+                )
+            else:
+                reward_mean, reward_variance = self.reward_table.lookup(self.unit_counts[None, :])
+            result = float(reward_mean[0]) # reward
+            info["reward_variance"] = float(reward_variance[0])
+        else:
+            attack_army = army.Army(self.get_unit_table(), self.unit_counts)
+            defense_army = army.Army(self.get_unit_table(), opponent_unit_counts)
+
+            self.combat_result = combat.run_combat_army(attack_army, defense_army, combat.BATTLE_TYPE_LAND)
+
+            result_metrics = run_simulation.calculate_metrics_from_combat_result(
+                self.combat_result[-1], attack_army.calculate_ipc(), defense_army.calculate_ipc()
+            )
+            # -1 indicates result from last round of combat
+
+            result = result_metrics.fraction_ipc_winner # reward
         # print("defense self.result:  {}".format(self.result))
 
         # self.all_results.append(self.result)
@@ -172,6 +209,18 @@ observation_space:  {}
         return self.__str__()
 
 
+def build_action_space(log_ratio_limit=5., ipc_frac_limits=(-.5, .5)):
+    log_ratio_limit = float(log_ratio_limit)
+    return gym.spaces.Box(
+        low=numpy.array([ipc_frac_limits[0]] + [-log_ratio_limit]*4),
+        high=numpy.array([ipc_frac_limits[1]] + [log_ratio_limit]*4)
+    )
+
+
+def build_observation_space():
+    return gym.spaces.Box(low=0, high=45, shape=(1,), dtype=numpy.int32)
+
+
 def calculate_unit_ratios_and_cost_array(log_ratio_arr, ipc_cost_arr):
     unit_ratios = numpy.power(2., log_ratio_arr)
     logger.debug("unit_ratios:  {}".format(unit_ratios))
@@ -243,10 +292,139 @@ def convert_action_to_integers(action, IPC_limit, ipc_cost_arr):
     return unit_count
 
 
+def check_costs_and_adjust_units_batch(initial_unit_counts, ipc_cost_arr, IPC_spend_arr):
+    # check_cost_and_adjust_units for each row of initial_unit_counts with the same result.  The scalar version
+    # removes the unit whose cost is closest to the excess cost one at a time.  While the excess is at least the cost
+    # of the most expensive unit left that unit is always the closest, so all of those removals are done in one pass.
+    # The other passes remove one unit, so the number of passes depends on the unit costs not the unit counts
+    unit_counts = numpy.array(initial_unit_counts, dtype=int)
+    ipc_cost_arr = numpy.asarray(ipc_cost_arr)
+
+    live_locs = numpy.flatnonzero(unit_counts @ ipc_cost_arr > IPC_spend_arr)
+    while live_locs.shape[0] > 0:
+        cur_unit_counts = unit_counts[live_locs]
+        excess_cost = cur_unit_counts @ ipc_cost_arr - IPC_spend_arr[live_locs]
+        is_available = cur_unit_counts > 0
+        # only reachable with a negative IPC_spend, an empty purchase costs nothing
+        if not numpy.all(numpy.any(is_available, axis=1)):
+            raise AxisAndAlliesSuperSimpleEnvException(
+                "no units left to remove, IPC_spend_arr:  {}".format(
+                    IPC_spend_arr[live_locs][~numpy.any(is_available, axis=1)]
+                )
+            )
+
+        unit_vs_excess_cost = numpy.where(is_available, numpy.absolute(ipc_cost_arr - excess_cost[:, None]), numpy.inf)
+        unit_to_remove_index = numpy.argmin(unit_vs_excess_cost, axis=1)
+        unit_to_remove_cost = ipc_cost_arr[unit_to_remove_index]
+        max_available_cost = numpy.max(numpy.where(is_available, ipc_cost_arr, -numpy.inf), axis=1)
+
+        num_remove = numpy.ones(live_locs.shape[0], dtype=int)
+        locs = (unit_to_remove_cost == max_available_cost) & (excess_cost >= unit_to_remove_cost)
+        num_remove[locs] = numpy.minimum(
+            cur_unit_counts[locs, unit_to_remove_index[locs]],
+            numpy.floor(excess_cost[locs] / unit_to_remove_cost[locs]).astype(int)
+        )
+
+        unit_counts[live_locs, unit_to_remove_index] -= num_remove
+        live_locs = live_locs[unit_counts[live_locs] @ ipc_cost_arr > IPC_spend_arr[live_locs]]
+
+    return unit_counts
+
+
+def convert_actions_to_integers(action_arr, IPC_limit, ipc_cost_arr):
+    # convert_action_to_integers for each row of action_arr with the same result, one row of unit counts per action
+    action_arr = numpy.atleast_2d(action_arr)
+    ipc_cost_arr = numpy.asarray(ipc_cost_arr)
+
+    fraction_IPC_spend = action_arr[:, ACTION_FRACTION_SPEND] + 0.5
+    IPC_spend_arr = numpy.round(IPC_limit * fraction_IPC_spend) + 0.1
+
+    unit_ratios = numpy.power(2., action_arr[:, 1:])
+    cost_arr = numpy.column_stack([numpy.full(action_arr.shape[0], ipc_cost_arr[0]), unit_ratios * ipc_cost_arr[1:]])
+    sum_cost = numpy.sum(cost_arr, axis=1)
+
+    buy_count = numpy.maximum(numpy.round(IPC_spend_arr / sum_cost).astype(int), 1)
+    raw_unit_counts = numpy.column_stack([buy_count, unit_ratios * buy_count[:, None]])
+    initial_unit_counts = numpy.round(raw_unit_counts).astype(int)
+
+    return check_costs_and_adjust_units_batch(initial_unit_counts, ipc_cost_arr, IPC_spend_arr)
+
+
+def run_battles_batch(unit_table, unit_counts_arr, opponent_unit_counts, rng=numpy.random):
+    # one land battle per row of unit_counts_arr against opponent_unit_counts (one army for every battle or one row
+    # per battle), all fought at once with the batch engine.  Returns run_simulation.CombatResultMetric with one entry
+    # per battle
+    num_battles = unit_counts_arr.shape[0]
+    combat_batch_result = combat.run_combat_batch(
+        unit_table, unit_counts_arr, opponent_unit_counts, combat.BATTLE_TYPE_LAND, num_battles, rng
+    )
+
+    return run_simulation.calculate_metrics_from_counts(
+        unit_table.ipc_arr, combat_batch_result.attack_counts, combat_batch_result.defense_counts,
+        unit_counts_arr @ unit_table.ipc_arr, opponent_unit_counts @ unit_table.ipc_arr
+    )
+
+
+def calculate_expected_rewards(my_combat_cache, unit_counts_arr, opponent_unit_counts):
+    # mean and variance of the reward (fraction_ipc_winner) of each row of unit_counts_arr against
+    # opponent_unit_counts (one army or one row per purchase), from the outcome distributions in my_combat_cache
+    # (combat_cache.CombatCache):  exact when the exact solver supports the battle, otherwise sampled.  Repeated
+    # battles are looked up once
+    num_unit_types = unit_counts_arr.shape[1]
+    opponent_unit_counts_arr = numpy.broadcast_to(opponent_unit_counts, unit_counts_arr.shape)
+    unique_battles, inverse_index = numpy.unique(
+        numpy.hstack([unit_counts_arr, opponent_unit_counts_arr]), axis=0, return_inverse=True
+    )
+    inverse_index = inverse_index.ravel()
+
+    unique_mean = numpy.zeros(unique_battles.shape[0])
+    unique_variance = numpy.zeros(unique_battles.shape[0])
+    for i, battle in enumerate(unique_battles):
+        combat_outcome_distribution = my_combat_cache.get(
+            battle[:num_unit_types], battle[num_unit_types:], combat.BATTLE_TYPE_LAND
+        )
+        unique_mean[i] = combat_cache.calculate_expected_metrics(combat_outcome_distribution).fraction_ipc_winner
+        unique_variance[i] = combat_cache.calculate_metric_variances(combat_outcome_distribution).fraction_ipc_winner
+
+    return unique_mean[inverse_index], unique_variance[inverse_index]
+
+
+def check_reward_mode(reward_mode):
+    if reward_mode not in REWARD_MODE_LIST:
+        raise AxisAndAlliesSuperSimpleEnvException(
+            "unknown reward_mode:  {}  known:  {}".format(reward_mode, REWARD_MODE_LIST)
+        )
+
+
+def check_reward_table(reward_mode, reward_table, IPC_limit, ipc_cost_arr, opponent_action=OPPONENT_ACTION):
+    if reward_mode != REWARD_MODE_LOOKUP:
+        return
+    if reward_table is None:
+        raise AxisAndAlliesSuperSimpleEnvException("reward_mode {} requires a reward_table".format(reward_mode))
+    reward_table.check(IPC_limit, ipc_cost_arr, convert_action_to_integers(opponent_action, IPC_limit, ipc_cost_arr))
+
+
+def check_opponent_pool(reward_mode, opponent_pool):
+    # the reward table is for the fixed opponent
+    if reward_mode == REWARD_MODE_LOOKUP and opponent_pool is not None:
+        raise AxisAndAlliesSuperSimpleEnvException("reward_mode {} cannot be used with an opponent_pool".format(
+            reward_mode
+        ))
+
+
+def build_reference_unit_table(unit_dict, num_unit_types=len(UNIT_NAMES_REFERENCE)):
+    # columns follow UNIT_NAMES_REFERENCE so the integer purchases can be used directly as army counts
+    return unit.UnitTable([unit_dict[x] for x in UNIT_NAMES_REFERENCE[:num_unit_types]])
+
+
 def convert_unit_count_to_unit_name_list(unit_count):
     unit_name_list = []
 
     for i, unit_name in enumerate(UNIT_NAMES_REFERENCE):
         unit_name_list += [unit_name]*unit_count[i]
 
-    return unit_name_list
\ No newline at end of file
+    return unit_name_list
+
+
+class AxisAndAlliesSuperSimpleEnvException(Exception):
+    pass
@@ -0,0 +1,141 @@
+import unittest
+import logging
+import axis_and_allies.setup_logger as setup_logger
+
+import os
+import pickle
+import tempfile
+
+import numpy
+import stable_baselines3
+
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.reinforcement_learning.super_simple_env as ssenv
+import axis_and_allies.reinforcement_learning.vec_super_simple_env as vssenv
+import axis_and_allies.reinforcement_learning.opponent_pool as opponent_pool
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+unit_dict = None
+
+IPC_LIMIT = 30
+IPC_COST_ARR = numpy.array([3, 4, 6, 10, 12])
+
+
+def build_model(env, seed):
+    return stable_baselines3.PPO(
+        stable_baselines3.ppo.MlpPolicy, env, n_steps=16, batch_size=32, n_epochs=1, seed=seed
+    )
+
+
+class TestOpponentPool(unittest.TestCase):
+    def test_next_actions(self):
+        env = vssenv.VecSuperSimpleEnv(4, IPC_LIMIT, IPC_COST_ARR, unit_dict, seed=1)
+        observation = env.build_observations()[0]
+
+        with tempfile.TemporaryDirectory() as pool_dir:
+            pool = opponent_pool.OpponentPool(pool_dir, observation, buffer_size=16, max_size=2, deterministic=True,
+                                              seed=2)
+            logger.debug("pool:  {}".format(pool))
+
+            logger.debug("empty pool plays the default action")
+            r = pool.next_actions(5)
+            numpy.testing.assert_array_equal(numpy.tile(ssenv.OPPONENT_ACTION, (5, 1)), r)
+
+            logger.debug("actions come from the snapshot, consumed from the buffer")
+            model = build_model(env, 3)
+            snapshot_file = pool.add(model)
+            self.assertTrue(os.path.exists(snapshot_file))
+            self.assertEqual(1, len(pool))
+            r = pool.next_actions(40)
+            logger.debug("r[:3]:  {}".format(r[:3]))
+            self.assertEqual((40, 5), r.shape)
+            self.assertEqual(8, pool.buffer_position)
+            expected = model.predict(observation, deterministic=True)[0]
+            numpy.testing.assert_allclose(numpy.tile(expected, (40, 1)), r, rtol=1e-5)
+
+            logger.debug("oldest snapshots beyond max_size are removed")
+            pool.add(build_model(env, 4))
+            pool.add(build_model(env, 5))
+            self.assertEqual(2, len(pool))
+            self.assertFalse(os.path.exists(snapshot_file))
+            self.assertEqual(2, len(os.listdir(pool_dir)))
+
+            logger.debug("the pool on disk is shared by copies and new pools")
+            copied_pool = pickle.loads(pickle.dumps(pool))
+            self.assertEqual({}, copied_pool.loaded_model_dict)
+            other_pool = opponent_pool.OpponentPool(pool_dir, observation)
+            other_pool.add(build_model(env, 6))
+            copied_pool.refill_buffer()
+            self.assertEqual(other_pool.snapshot_file_list, copied_pool.snapshot_file_list)
+            self.assertEqual(3, len(copied_pool))
+            self.assertIn(copied_pool.buffer_snapshot_file, copied_pool.snapshot_file_list)
+
+    def test_self_play(self):
+        num_envs = 8
+        with tempfile.TemporaryDirectory() as pool_dir:
+            pool = opponent_pool.OpponentPool(pool_dir, numpy.array([IPC_LIMIT], dtype=numpy.float32),
+                                              buffer_size=32)
+            env = vssenv.VecSuperSimpleEnv(num_envs, IPC_LIMIT, IPC_COST_ARR, unit_dict, seed=7, opponent_pool=pool)
+            model = build_model(env, 7)
+            model.learn(total_timesteps=256, callback=opponent_pool.OpponentPoolCallback(pool, snapshot_freq=64))
+            logger.debug("pool:  {}".format(pool))
+            self.assertEqual(4, len(pool))
+
+            logger.debug("each env plays its own opponent from the pool")
+            actions = numpy.zeros((num_envs, 5))
+            env.seed(8)
+            env.reset()
+            expected_rewards = env.step(actions)[1]
+            expected_opponent_unit_counts_arr = env.opponent_unit_counts_arr
+            logger.debug("expected_opponent_unit_counts_arr:  {}".format(expected_opponent_unit_counts_arr))
+            self.assertEqual((num_envs, 5), expected_opponent_unit_counts_arr.shape)
+            self.assertTrue(numpy.all(expected_opponent_unit_counts_arr @ IPC_COST_ARR <= IPC_LIMIT))
+
+            logger.debug("seeding repeats the opponents and rewards")
+            env.seed(8)
+            env.reset()
+            numpy.testing.assert_array_equal(expected_rewards, env.step(actions)[1])
+            numpy.testing.assert_array_equal(expected_opponent_unit_counts_arr, env.opponent_unit_counts_arr)
+
+            logger.debug("expected rewards against the pool")
+            expected_env = vssenv.VecSuperSimpleEnv(
+                num_envs, IPC_LIMIT, IPC_COST_ARR, unit_dict, seed=9, opponent_pool=pool,
+                reward_mode=ssenv.REWARD_MODE_EXPECTED
+            )
+            _, rewards, _, infos = expected_env.step(actions)
+            self.assertEqual((num_envs,), rewards.shape)
+            self.assertIn("reward_variance", infos[0])
+
+            logger.debug("the scalar env takes its opponent from the pool")
+            scalar_env = ssenv.SuperSimpleEnv(IPC_LIMIT, IPC_COST_ARR, unit_dict, opponent_pool=pool)
+            scalar_env.reset()
+            position = pool.buffer_position
+            scalar_env.step(actions[0])
+            self.assertEqual((position + 1) % pool.buffer_size, pool.buffer_position % pool.buffer_size)
+
+            with self.assertRaises(ssenv.AxisAndAlliesSuperSimpleEnvException):
+                ssenv.check_opponent_pool(ssenv.REWARD_MODE_LOOKUP, pool)
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units("../../unit_data.json")
+
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import logging
+import axis_and_allies.setup_logger as setup_logger
+
+import os
+import tempfile
+
+import numpy
+
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.combat_cache as combat_cache
+import axis_and_allies.reinforcement_learning.super_simple_env as ssenv
+import axis_and_allies.reinforcement_learning.vec_super_simple_env as vssenv
+import axis_and_allies.reinforcement_learning.reward_table as reward_table
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+unit_dict = None
+
+IPC_LIMIT = 15
+IPC_COST_ARR = numpy.array([3, 4, 6, 10, 12])
+
+
+class TestRewardTable(unittest.TestCase):
+    def test_enumerate_purchases(self):
+        r = reward_table.enumerate_purchases(IPC_LIMIT, IPC_COST_ARR)
+        logger.debug("r.shape:  {}".format(r.shape))
+        self.assertTrue(numpy.all(r @ IPC_COST_ARR <= IPC_LIMIT))
+        self.assertEqual(r.shape[0], numpy.unique(r, axis=0).shape[0])
+
+        logger.debug("every purchase convert_actions_to_integers makes is in the table")
+        rng = numpy.random.default_rng(1)
+        action_arr = numpy.column_stack([rng.uniform(-0.5, 0.5, 1000), rng.uniform(-5., 5., (1000, 4))])
+        unit_counts_arr = numpy.unique(
+            ssenv.convert_actions_to_integers(action_arr, IPC_LIMIT, IPC_COST_ARR), axis=0
+        )
+        purchase_set = set(tuple(x) for x in r)
+        self.assertTrue(all(tuple(x) in purchase_set for x in unit_counts_arr))
+
+    def test_build_reward_table(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            r = reward_table.build_reward_table(unit_dict, output_dir, IPC_LIMIT, IPC_COST_ARR)
+            logger.debug("r:  {}".format(r))
+            self.assertIsInstance(r.table, numpy.memmap)
+            self.assertEqual(reward_table.build_table_shape(IPC_LIMIT, IPC_COST_ARR) + (2,), r.table.shape)
+            self.assertFalse(os.path.exists(os.path.join(output_dir, reward_table.TABLE_FILE + ".tmp.npy")))
+
+            logger.debug("lookup gives the expected rewards")
+            purchases = reward_table.enumerate_purchases(IPC_LIMIT, IPC_COST_ARR)
+            reward_mean, reward_variance = r.lookup(purchases)
+            expected_mean, expected_variance = ssenv.calculate_expected_rewards(
+                combat_cache.CombatCache(ssenv.build_reference_unit_table(unit_dict)), purchases,
+                r.opponent_unit_counts
+            )
+            numpy.testing.assert_allclose(expected_mean, reward_mean, atol=1e-6)
+            numpy.testing.assert_allclose(expected_variance, reward_variance, atol=1e-6)
+            self.assertEqual(purchases.shape[0], numpy.sum(~numpy.isnan(r.table[..., reward_table.REWARD_MEAN])))
+
+            logger.debug("lookup mode of the envs")
+            rng = numpy.random.default_rng(2)
+            actions = numpy.column_stack([rng.uniform(-0.5, 0.5, 8), rng.uniform(-2., 2., (8, 4))])
+            env = vssenv.VecSuperSimpleEnv(
+                8, IPC_LIMIT, IPC_COST_ARR, unit_dict, reward_mode=ssenv.REWARD_MODE_LOOKUP, reward_table=r
+            )
+            env.reset()
+            _, rewards, _, infos = env.step(actions)
+            logger.debug("rewards:  {}".format(rewards))
+            expected_mean, expected_variance = r.lookup(env.unit_counts_arr)
+            numpy.testing.assert_array_equal(expected_mean, rewards)
+            self.assertEqual(expected_variance[3], infos[3]["reward_variance"])
+
+            scalar_env = ssenv.SuperSimpleEnv(
+                IPC_LIMIT, IPC_COST_ARR, unit_dict, reward_mode=ssenv.REWARD_MODE_LOOKUP,
+                reward_table=reward_table.load_reward_table(output_dir)
+            )
+            scalar_env.reset()
+            _, reward, _, _, info = scalar_env.step(actions[0])
+            self.assertAlmostEqual(rewards[0], reward, places=6)
+
+            logger.debug("table for a different purchase space")
+            with self.assertRaises(reward_table.AxisAndAlliesRewardTableException) as context:
+                ssenv.SuperSimpleEnv(
+                    IPC_LIMIT + 1, IPC_COST_ARR, unit_dict, reward_mode=ssenv.REWARD_MODE_LOOKUP, reward_table=r
+                )
+            logger.debug("context.exception:  {}".format(context.exception))
+
+            with self.assertRaises(ssenv.AxisAndAlliesSuperSimpleEnvException):
+                ssenv.SuperSimpleEnv(IPC_LIMIT, IPC_COST_ARR, unit_dict, reward_mode=ssenv.REWARD_MODE_LOOKUP)
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units("../../unit_data.json")
+
+    unittest.main()
@@ -86,6 +86,42 @@ class TestSuperSimpleEnv(unittest.TestCase):
         r = ssenv.convert_action_to_integers(action, 10, ipc_cost)
         logger.debug("IPC limit low - r:  {}".format(r))
 
+    def test_convert_actions_to_integers(self):
+        ipc_cost = numpy.array([3, 4, 6, 10, 12])
+        rng = numpy.random.default_rng(3)
+
+        for IPC_limit, log_ratio_limit in [(10, 1.), (30, 3.), (100, 3.), (45, 5.)]:
+            action_arr = numpy.column_stack([
+                rng.uniform(-0.5, 0.5, 200), rng.uniform(-log_ratio_limit, log_ratio_limit, (200, 4))
+            ])
+            r = ssenv.convert_actions_to_integers(action_arr, IPC_limit, ipc_cost)
+            logger.debug("IPC_limit:  {}  log_ratio_limit:  {}  r[:3]:  {}".format(IPC_limit, log_ratio_limit, r[:3]))
+            expected = numpy.array([ssenv.convert_action_to_integers(x, IPC_limit, ipc_cost) for x in action_arr])
+            numpy.testing.assert_array_equal(expected, r)
+            self.assertTrue(numpy.all(r @ ipc_cost <= IPC_limit))
+
+        logger.debug("single action")
+        action = numpy.array([0.5, 0., 0., 0., 0.])
+        numpy.testing.assert_array_equal(
+            [ssenv.convert_action_to_integers(action, 30, ipc_cost)],
+            ssenv.convert_actions_to_integers(action, 30, ipc_cost)
+        )
+
+    def test_check_costs_and_adjust_units_batch(self):
+        ipc_cost = numpy.array([3, 3, 6, 10, 12])
+        rng = numpy.random.default_rng(4)
+        initial_unit_counts = rng.integers(0, 10, (200, 5))
+        IPC_spend_arr = rng.integers(0, 60, 200) + 0.1
+
+        r = ssenv.check_costs_and_adjust_units_batch(initial_unit_counts, ipc_cost, IPC_spend_arr)
+        expected = numpy.array([
+            ssenv.check_cost_and_adjust_units(x, ipc_cost, y) for x, y in zip(initial_unit_counts, IPC_spend_arr)
+        ])
+        numpy.testing.assert_array_equal(expected, r)
+
+        with self.assertRaises(ssenv.AxisAndAlliesSuperSimpleEnvException):
+            ssenv.check_costs_and_adjust_units_batch(numpy.array([[1, 0, 0, 0, 0]]), ipc_cost, numpy.array([-1.]))
+
     def test_render(self):
         r = ssenv.SuperSimpleEnv(IPC_limit=10, ipc_cost_arr=numpy.array([3,4,6,10,12]), unit_dict={})
         r.render()
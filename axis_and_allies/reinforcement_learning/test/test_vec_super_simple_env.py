@@ -0,0 +1,202 @@
+import unittest
+import logging
+import axis_and_allies.setup_logger as setup_logger
+
+import numpy
+import stable_baselines3
+import stable_baselines3.common.vec_env as vec_env
+
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.reinforcement_learning.super_simple_env as ssenv
+import axis_and_allies.reinforcement_learning.vec_super_simple_env as vssenv
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+unit_dict = None
+
+IPC_LIMIT = 30
+IPC_COST_ARR = numpy.array([3, 4, 6, 10, 12])
+
+
+def build_actions(num_envs, seed):
+    rng = numpy.random.default_rng(seed)
+    return numpy.column_stack([rng.uniform(-0.5, 0.5, num_envs), rng.uniform(-2., 2., (num_envs, 4))])
+
+
+class TestVecSuperSimpleEnv(unittest.TestCase):
+    def test_step(self):
+        num_envs = 16
+        env = vssenv.VecSuperSimpleEnv(num_envs, IPC_LIMIT, IPC_COST_ARR, unit_dict, seed=3)
+        logger.debug("env:  {}".format(env))
+        self.assertIsInstance(env, vec_env.VecEnv)
+
+        observations = env.reset()
+        self.assertEqual((num_envs, 1), observations.shape)
+        self.assertTrue(env.observation_space.contains(observations[0].astype(numpy.int32)))
+
+        actions = build_actions(num_envs, 4)
+        observations, rewards, dones, infos = env.step(actions)
+        logger.debug("rewards:  {}".format(rewards))
+        self.assertEqual((num_envs, 1), observations.shape)
+        self.assertEqual((num_envs,), rewards.shape)
+        self.assertTrue(numpy.all(numpy.abs(rewards) <= 1.))
+        self.assertTrue(numpy.all(dones))
+        self.assertEqual(num_envs, len(infos))
+        numpy.testing.assert_array_equal(observations[0], infos[0]["terminal_observation"])
+
+        logger.debug("same purchases as the scalar conversion")
+        for action, unit_counts in zip(actions, env.unit_counts_arr):
+            numpy.testing.assert_array_equal(
+                ssenv.convert_action_to_integers(action, IPC_LIMIT, IPC_COST_ARR), unit_counts
+            )
+
+        logger.debug("seeding repeats the rewards")
+        env.seed(11)
+        env.reset()
+        expected_rewards = env.step(actions)[1]
+        env.seed(11)
+        env.reset()
+        numpy.testing.assert_array_equal(expected_rewards, env.step(actions)[1])
+
+        self.assertEqual([IPC_LIMIT]*3, env.get_attr("IPC_limit", [0, 1, 2]))
+        env.set_attr("IPC_limit", 20)
+        self.assertEqual([20], env.get_attr("IPC_limit", 5))
+        self.assertEqual([False]*num_envs, env.env_is_wrapped(vec_env.VecMonitor))
+
+    def test_run_battles_batch(self):
+        unit_table = ssenv.build_reference_unit_table(unit_dict)
+
+        logger.debug("the batched battles have the same win rate as the battle the scalar env fights")
+        unit_counts = numpy.array([2, 1, 0, 0, 0])
+        opponent_unit_counts = numpy.array([3, 0, 0, 0, 0])
+        N = 20000
+        r = ssenv.run_battles_batch(
+            unit_table, numpy.tile(unit_counts, (N, 1)), opponent_unit_counts, numpy.random.default_rng(5)
+        )
+        logger.debug("numpy.mean(r.fraction_ipc_winner):  {}".format(numpy.mean(r.fraction_ipc_winner)))
+
+        numpy.random.seed(6)
+        scalar_reward_list = []
+        for i in range(2000):
+            attack_army = ssenv.army.Army(unit_table, unit_counts)
+            defense_army = ssenv.army.Army(unit_table, opponent_unit_counts)
+            combat_result = ssenv.combat.run_combat_army(attack_army, defense_army, ssenv.combat.BATTLE_TYPE_LAND)
+            scalar_reward_list.append(ssenv.run_simulation.calculate_metrics_from_combat_result(
+                combat_result[-1], attack_army.calculate_ipc(), defense_army.calculate_ipc()
+            ).fraction_ipc_winner)
+        logger.debug("numpy.mean(scalar_reward_list):  {}".format(numpy.mean(scalar_reward_list)))
+        self.assertAlmostEqual(numpy.mean(scalar_reward_list), numpy.mean(r.fraction_ipc_winner), delta=0.05)
+        self.assertEqual((N,), r.diff_ipc.shape)
+
+    def test_expected_reward(self):
+        num_envs = 6
+        env = vssenv.VecSuperSimpleEnv(
+            num_envs, IPC_LIMIT, IPC_COST_ARR, unit_dict, seed=13, reward_mode=ssenv.REWARD_MODE_EXPECTED
+        )
+        env.reset()
+        actions = build_actions(num_envs, 14)
+        actions[-1] = actions[0]
+        observations, rewards, dones, infos = env.step(actions)
+        logger.debug("rewards:  {}".format(rewards))
+        logger.debug("env.combat_cache:  {}".format(env.combat_cache))
+        self.assertEqual((num_envs,), rewards.shape)
+        self.assertEqual(rewards[0], rewards[-1])
+        self.assertLessEqual(len(env.combat_cache), num_envs - 1)
+
+        logger.debug("expected rewards match the mean and variance of sampled battles")
+        N = 20000
+        for unit_counts, reward, info in zip(env.unit_counts_arr[:2], rewards, infos):
+            r = ssenv.run_battles_batch(
+                env.unit_table, numpy.tile(unit_counts, (N, 1)), env.opponent_unit_counts,
+                numpy.random.default_rng(15)
+            )
+            logger.debug("unit_counts:  {}  reward:  {}  info['reward_variance']:  {}".format(
+                unit_counts, reward, info["reward_variance"]
+            ))
+            self.assertAlmostEqual(numpy.mean(r.fraction_ipc_winner), reward, delta=0.02)
+            self.assertAlmostEqual(numpy.var(r.fraction_ipc_winner), info["reward_variance"], delta=0.02)
+
+        logger.debug("the scalar env gives the same expected reward")
+        scalar_env = ssenv.SuperSimpleEnv(
+            IPC_LIMIT, IPC_COST_ARR, unit_dict, reward_mode=ssenv.REWARD_MODE_EXPECTED,
+            my_combat_cache=env.combat_cache
+        )
+        scalar_env.reset()
+        _, reward, _, _, info = scalar_env.step(actions[0])
+        self.assertAlmostEqual(rewards[0], reward, places=5)
+        self.assertAlmostEqual(infos[0]["reward_variance"], info["reward_variance"])
+
+        with self.assertRaises(ssenv.AxisAndAlliesSuperSimpleEnvException) as context:
+            vssenv.VecSuperSimpleEnv(num_envs, IPC_LIMIT, IPC_COST_ARR, unit_dict, reward_mode="fake")
+        self.assertIn("unknown reward_mode:  fake", str(context.exception))
+
+    def test_learn(self):
+        env = vssenv.VecSuperSimpleEnv(8, IPC_LIMIT, IPC_COST_ARR, unit_dict, seed=7)
+        model = stable_baselines3.PPO(
+            stable_baselines3.ppo.MlpPolicy, env, n_steps=16, batch_size=32, n_epochs=1, seed=7
+        )
+        model.learn(total_timesteps=256)
+        logger.debug("model.num_timesteps:  {}".format(model.num_timesteps))
+        self.assertEqual(256, model.num_timesteps)
+
+    def test_subproc(self):
+        num_shards = 2
+        num_envs_per_shard = 4
+        env = vssenv.SubprocVecSuperSimpleEnv(
+            num_shards, num_envs_per_shard, IPC_LIMIT, IPC_COST_ARR, unit_dict, seed=8
+        )
+        try:
+            logger.debug("env:  {}".format(env))
+            self.assertEqual(num_shards * num_envs_per_shard, env.num_envs)
+            self.assertEqual((8, 1), env.reset().shape)
+
+            actions = build_actions(env.num_envs, 9)
+            observations, rewards, dones, infos = env.step(actions)
+            logger.debug("rewards:  {}".format(rewards))
+            self.assertEqual((8,), rewards.shape)
+            self.assertTrue(numpy.all(dones))
+            self.assertEqual(8, len(infos))
+
+            unit_counts_arr = numpy.concatenate(env.get_attr("unit_counts_arr", [0, 4]))
+            numpy.testing.assert_array_equal(
+                ssenv.convert_actions_to_integers(actions, IPC_LIMIT, IPC_COST_ARR), unit_counts_arr
+            )
+
+            env.seed(12)
+            env.reset()
+            expected_rewards = env.step(actions)[1]
+            env.seed(12)
+            env.reset()
+            numpy.testing.assert_array_equal(expected_rewards, env.step(actions)[1])
+
+            self.assertEqual([IPC_LIMIT]*3, env.get_attr("IPC_limit", [0, 3, 7]))
+            env.set_attr("IPC_limit", 20, indices=[5])
+            self.assertEqual([IPC_LIMIT, 20], env.get_attr("IPC_limit", [0, 4]))
+            r = env.env_method("build_observations", indices=[1, 6])
+            self.assertEqual(2, len(r))
+            self.assertEqual((num_envs_per_shard, 1), r[1].shape)
+        finally:
+            env.close()
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units("../../unit_data.json")
+
+    unittest.main()
@@ -0,0 +1,297 @@
+import logging
+import multiprocessing
+
+import numpy
+import stable_baselines3.common.vec_env as vec_env
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.combat_cache as combat_cache
+
+import axis_and_allies.reinforcement_learning.super_simple_env as super_simple_env
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+DEFAULT_START_METHOD = "forkserver"
+
+
+def build_indices(num_envs, indices):
+    # same meaning as the indices argument of stable_baselines3 VecEnv methods
+    if indices is None:
+        return list(range(num_envs))
+    if isinstance(indices, int):
+        return [indices]
+    return list(indices)
+
+
+class VecSuperSimpleEnv(vec_env.VecEnv):
+    # num_envs copies of super_simple_env.SuperSimpleEnv stepped together:  the purchases of a batch of actions are
+    # converted at once and their battles against the opponent are fought with the batch combat engine.  Every
+    # episode is one step, so each step returns the reset observation and the infos of every env have the
+    # terminal_observation.  The envs share their settings, so get_attr, set_attr and env_method act on all of them.
+    # With reward_mode super_simple_env.REWARD_MODE_EXPECTED the rewards are the expected rewards from the shared
+    # my_combat_cache, with REWARD_MODE_LOOKUP they are read from reward_table, and the infos have their
+    # "reward_variance".  With an opponent_pool (opponent_pool.OpponentPool) each env plays its own opponent action
+    # from the pool instead of opponent_action
+    def __init__(self, num_envs, IPC_limit, ipc_cost_arr, unit_dict, log_ratio_limit=5,
+                 ipc_frac_limits=(-.5, .5), opponent_action=super_simple_env.OPPONENT_ACTION, seed=None,
+                 render_mode=None, reward_mode=super_simple_env.REWARD_MODE_SAMPLE, my_combat_cache=None,
+                 reward_table=None, opponent_pool=None) -> None:
+        super_simple_env.check_reward_mode(reward_mode)
+        super_simple_env.check_reward_table(reward_mode, reward_table, IPC_limit, ipc_cost_arr, opponent_action)
+        super_simple_env.check_opponent_pool(reward_mode, opponent_pool)
+
+        self.IPC_limit = IPC_limit
+        self.ipc_cost_arr = numpy.asarray(ipc_cost_arr)
+        self.unit_dict = unit_dict
+        self.log_ratio_limit = float(log_ratio_limit)
+        self.render_mode = render_mode
+
+        self.unit_table = super_simple_env.build_reference_unit_table(unit_dict, len(self.ipc_cost_arr))
+        self.opponent_unit_counts = super_simple_env.convert_action_to_integers(
+            opponent_action, IPC_limit, self.ipc_cost_arr
+        )
+        self.rng = numpy.random.default_rng(seed)
+
+        self.reward_mode = reward_mode
+        if my_combat_cache is None and reward_mode == super_simple_env.REWARD_MODE_EXPECTED:
+            my_combat_cache = combat_cache.CombatCache(self.unit_table)
+        self.combat_cache = my_combat_cache
+        self.reward_table = reward_table
+
+        self.opponent_pool = opponent_pool
+        self.seed_opponent_pool()
+        # opponent of each env in the last step
+        self.opponent_unit_counts_arr = None
+
+        self.actions = None
+        self.unit_counts_arr = None
+        self.step_count = 0
+
+        super().__init__(
+            num_envs, super_simple_env.build_observation_space(),
+            super_simple_env.build_action_space(log_ratio_limit, ipc_frac_limits)
+        )
+
+    def __repr__(self) -> str:
+        return "num_envs:  {}  IPC_limit:  {}  opponent_unit_counts:  {}  step_count:  {}".format(
+            self.num_envs, self.IPC_limit, self.opponent_unit_counts, self.step_count
+        )
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def build_observations(self):
+        return numpy.full((self.num_envs, 1), self.IPC_limit, dtype=numpy.float32)
+
+    def seed_opponent_pool(self):
+        # the opponent pool's random stream follows the env's
+        if self.opponent_pool is not None:
+            self.opponent_pool.seed(int(self.rng.integers(2**63)))
+
+    def reset(self):
+        # the envs share one random generator, a seed set with seed() replaces it using the first env's seed
+        if self._seeds[0] is not None:
+            self.rng = numpy.random.default_rng(self._seeds[0])
+            self.seed_opponent_pool()
+        self._reset_seeds()
+        self._reset_options()
+        return self.build_observations()
+
+    def step_async(self, actions):
+        self.actions = numpy.asarray(actions)
+
+    def step_wait(self):
+        self.unit_counts_arr = super_simple_env.convert_actions_to_integers(
+            self.actions, self.IPC_limit, self.ipc_cost_arr
+        )
+        if self.opponent_pool is None:
+            self.opponent_unit_counts_arr = numpy.tile(self.opponent_unit_counts, (self.num_envs, 1))
+        else:
+            self.opponent_unit_counts_arr = super_simple_env.convert_actions_to_integers(
+                self.opponent_pool.next_actions(self.num_envs), self.IPC_limit, self.ipc_cost_arr
+            )
+
+        reward_variances = None
+        if self.reward_mode == super_simple_env.REWARD_MODE_EXPECTED:
+            rewards, reward_variances = super_simple_env.calculate_expected_rewards(
+                self.combat_cache, self.unit_counts_arr, self.opponent_unit_counts_arr
+            )
+        elif self.reward_mode == super_simple_env.REWARD_MODE_LOOKUP:
+            rewards, reward_variances = self.reward_table.lookup(self.unit_counts_arr)
+        else:
+            rewards = super_simple_env.run_battles_batch(
+                self.unit_table, self.unit_counts_arr, self.opponent_unit_counts_arr, self.rng
+            ).fraction_ipc_winner
+        rewards = rewards.astype(numpy.float32)
+        self.step_count += 1
+
+        observations = self.build_observations()
+        dones = numpy.ones(self.num_envs, dtype=bool)
+        infos = [{"terminal_observation":x, "TimeLimit.truncated":False} for x in observations]
+        if reward_variances is not None:
+            for info, reward_variance in zip(infos, reward_variances):
+                info["reward_variance"] = float(reward_variance)
+        return observations, rewards, dones, infos
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name)] * len(build_indices(self.num_envs, indices))
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        r = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [r] * len(build_indices(self.num_envs, indices))
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(build_indices(self.num_envs, indices))
+
+
+def run_shard_worker(remote, parent_remote, env_kwargs):
+    # runs one VecSuperSimpleEnv in a subprocess, commands are (name, args) tuples sent by SubprocVecSuperSimpleEnv
+    parent_remote.close()
+    env = VecSuperSimpleEnv(**env_kwargs)
+    try:
+        while True:
+            command, args = remote.recv()
+            if command == "step":
+                env.step_async(args)
+                remote.send(env.step_wait())
+            elif command == "reset":
+                env._seeds = [args] * env.num_envs
+                remote.send(env.reset())
+            elif command == "get_attr":
+                remote.send(getattr(env, args))
+            elif command == "set_attr":
+                remote.send(setattr(env, *args))
+            elif command == "env_method":
+                method_name, method_args, method_kwargs = args
+                remote.send(getattr(env, method_name)(*method_args, **method_kwargs))
+            elif command == "close":
+                remote.close()
+                break
+            else:
+                raise AxisAndAlliesVecSuperSimpleEnvException("unknown command:  {}".format(command))
+    except KeyboardInterrupt:
+        logger.info("shard worker interrupted")
+    finally:
+        env.close()
+
+
+class SubprocVecSuperSimpleEnv(vec_env.VecEnv):
+    # num_shards subprocesses that each step a VecSuperSimpleEnv of num_envs_per_shard envs, for when one process
+    # cannot keep up with the learner.  The actions are split by shard in order and the results concatenated.  Each
+    # shard gets its own random stream spawned from seed
+    def __init__(self, num_shards, num_envs_per_shard, IPC_limit, ipc_cost_arr, unit_dict, seed=None,
+                 start_method=DEFAULT_START_METHOD, **env_kwargs) -> None:
+        self.num_shards = num_shards
+        self.num_envs_per_shard = num_envs_per_shard
+        self.waiting = False
+        self.closed = False
+
+        seed_sequence_list = numpy.random.SeedSequence(seed).spawn(num_shards)
+        context = multiprocessing.get_context(start_method)
+        self.remote_list, work_remote_list = zip(*[context.Pipe() for i in range(num_shards)])
+        self.process_list = []
+        for remote, work_remote, seed_sequence in zip(self.remote_list, work_remote_list, seed_sequence_list):
+            cur_env_kwargs = dict(
+                env_kwargs, num_envs=num_envs_per_shard, IPC_limit=IPC_limit, ipc_cost_arr=ipc_cost_arr,
+                unit_dict=unit_dict, seed=seed_sequence
+            )
+            process = context.Process(target=run_shard_worker, args=(work_remote, remote, cur_env_kwargs), daemon=True)
+            process.start()
+            self.process_list.append(process)
+            work_remote.close()
+
+        self.remote_list[0].send(("get_attr", "observation_space"))
+        observation_space = self.remote_list[0].recv()
+        self.remote_list[0].send(("get_attr", "action_space"))
+        action_space = self.remote_list[0].recv()
+
+        super().__init__(num_shards * num_envs_per_shard, observation_space, action_space)
+
+    def __repr__(self) -> str:
+        return "num_shards:  {}  num_envs_per_shard:  {}".format(self.num_shards, self.num_envs_per_shard)
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def build_shard_indices(self, indices):
+        # shard to its env indexes within the shard, for the shards that have any of indices
+        r = {}
+        for i in build_indices(self.num_envs, indices):
+            r.setdefault(i // self.num_envs_per_shard, []).append(i % self.num_envs_per_shard)
+        return r
+
+    def receive_shard_results(self, shard_indices):
+        # one result per shard, repeated for each of its envs in indices
+        r = []
+        for shard, index_list in shard_indices.items():
+            r.extend([self.remote_list[shard].recv()] * len(index_list))
+        return r
+
+    def reset(self):
+        # a seed set with seed() seeds each shard from the seed of its first env
+        for i, remote in enumerate(self.remote_list):
+            remote.send(("reset", self._seeds[i * self.num_envs_per_shard]))
+        observations = numpy.concatenate([remote.recv() for remote in self.remote_list])
+        self._reset_seeds()
+        self._reset_options()
+        return observations
+
+    def step_async(self, actions):
+        for remote, shard_actions in zip(self.remote_list, numpy.split(numpy.asarray(actions), self.num_shards)):
+            remote.send(("step", shard_actions))
+        self.waiting = True
+
+    def step_wait(self):
+        result_list = [remote.recv() for remote in self.remote_list]
+        self.waiting = False
+
+        observations, rewards, dones, infos = zip(*result_list)
+        return (numpy.concatenate(observations), numpy.concatenate(rewards), numpy.concatenate(dones),
+                [x for shard_infos in infos for x in shard_infos])
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remote_list:
+                remote.recv()
+        for remote in self.remote_list:
+            remote.send(("close", None))
+        for process in self.process_list:
+            process.join()
+        self.closed = True
+
+    def get_attr(self, attr_name, indices=None):
+        shard_indices = self.build_shard_indices(indices)
+        for shard in shard_indices.keys():
+            self.remote_list[shard].send(("get_attr", attr_name))
+        return self.receive_shard_results(shard_indices)
+
+    def set_attr(self, attr_name, value, indices=None):
+        shard_indices = self.build_shard_indices(indices)
+        for shard in shard_indices.keys():
+            self.remote_list[shard].send(("set_attr", (attr_name, value)))
+        for shard in shard_indices.keys():
+            self.remote_list[shard].recv()
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        shard_indices = self.build_shard_indices(indices)
+        for shard in shard_indices.keys():
+            self.remote_list[shard].send(("env_method", (method_name, method_args, method_kwargs)))
+        return self.receive_shard_results(shard_indices)
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(build_indices(self.num_envs, indices))
+
+
+class AxisAndAlliesVecSuperSimpleEnvException(Exception):
+    pass
@@ -3,18 +3,25 @@ import logging
 import os
 import shutil
 import collections
+import multiprocessing
 
 import numpy
 import pandas
 import plotly.express as pltxpr
 
+import axis_and_allies.army as army
 import axis_and_allies.combat as combat
+import axis_and_allies.combat_result_accumulator as combat_result_accumulator
+import axis_and_allies.exact_combat as exact_combat
 import axis_and_allies.unit as unit
 import axis_and_allies.setup_logger as setup_logger
 
 logger = logging.getLogger(setup_logger.LOGGER_NAME)
 
 
+SIM_CHUNK_SIZE = 250
+BATCH_CHUNK_SIZE = 100000
+
 CombatResultMetric = collections.namedtuple("CombatResultMetric", 
     ["attack_ipc", "defense_ipc", "diff_ipc", "fraction_ipc_winner"]
 )
@@ -37,6 +44,40 @@ def run_single_from_names(unit_dict, attack_unit_names, defense_unit_names, batt
     return combat_result
 
 
+def run_single_from_counts(unit_table, attack_counts, defense_counts, battle_type):
+    attack_army = army.Army(unit_table, attack_counts)
+    defense_army = army.Army(unit_table, defense_counts)
+
+    combat_result = combat.run_combat_army(attack_army, defense_army, battle_type)
+
+    return combat_result
+
+
+def run_batch_from_names(unit_table, attack_unit_names, defense_unit_names, battle_type, N_sim):
+    attack_counts = unit_table.build_counts_from_names(attack_unit_names)
+    defense_counts = unit_table.build_counts_from_names(defense_unit_names)
+
+    combat_batch_result = combat.run_combat_batch(unit_table, attack_counts, defense_counts, battle_type, N_sim)
+
+    return combat_batch_result
+
+
+def run_exact_from_names(unit_table, attack_unit_names, defense_unit_names, battle_type):
+    attack_counts = unit_table.build_counts_from_names(attack_unit_names)
+    defense_counts = unit_table.build_counts_from_names(defense_unit_names)
+
+    exact_combat_outcome = exact_combat.calculate_exact_combat_outcome(
+        unit_table, attack_counts, defense_counts, battle_type
+    )
+
+    combat_result_metric = calculate_metrics_from_counts(
+        unit_table.ipc_arr, exact_combat_outcome.attack_counts, exact_combat_outcome.defense_counts,
+        numpy.sum(attack_counts * unit_table.ipc_arr), numpy.sum(defense_counts * unit_table.ipc_arr)
+    )
+
+    return combat_result_metric, exact_combat_outcome.probability
+
+
 def run_sim_land_game(unit_dict):
     attack_unit_names = ["infantry"]*9 + ["artillery"]*4 + ["tank"]*0 + ["fighter"]*4 + ["bomber"]*0 + ["cruiser"]*0 + ["battleship"]*1
 
@@ -80,6 +121,9 @@ def build_units_from_names(unit_dict, unit_names):
     return units
 
 def calculate_sum_ipc(unit_list):
+    if isinstance(unit_list, army.Army):
+        return unit_list.calculate_ipc()
+
     ipc_list = [x.ipc for x in unit_list]
     return sum(ipc_list)
 
@@ -111,19 +155,263 @@ def calculate_metrics_from_combat_result(combat_result, sum_start_ipc_attack, su
         diff_ipc=diff_ipc, fraction_ipc_winner=frac_winner_ipc
     )
 
+def calculate_metrics_from_counts(ipc_arr, attack_counts, defense_counts, sum_start_ipc_attack,
+                                  sum_start_ipc_defense):
+    # vectorized version of calculate_metrics_from_combat_result, each row of the counts is one combat result
+    sum_remain_ipc_attack = numpy.sum(attack_counts * ipc_arr, axis=1)
+    sum_remain_ipc_defense = numpy.sum(defense_counts * ipc_arr, axis=1)
+
+    diff_ipc = sum_remain_ipc_attack - sum_remain_ipc_defense
+
+    sum_start_ipc_attack = numpy.broadcast_to(sum_start_ipc_attack, diff_ipc.shape)
+    sum_start_ipc_defense = numpy.broadcast_to(sum_start_ipc_defense, diff_ipc.shape)
+
+    frac_winner_ipc = numpy.zeros(diff_ipc.shape)
+    locs = diff_ipc > 0
+    frac_winner_ipc[locs] = diff_ipc[locs] / sum_start_ipc_attack[locs]
+    locs = diff_ipc < 0
+    frac_winner_ipc[locs] = diff_ipc[locs] / sum_start_ipc_defense[locs]
+
+    return CombatResultMetric(
+        attack_ipc=sum_remain_ipc_attack, defense_ipc=sum_remain_ipc_defense,
+        diff_ipc=diff_ipc, fraction_ipc_winner=frac_winner_ipc
+    )
+
 def fig_ops(fig, do_show_fig, do_write_fig, output_filepath):
     if do_show_fig:
         fig.show()
     if do_write_fig:
         fig.write_html(output_filepath, include_plotlyjs="cdn")
 
+def build_chunk_N_sim_list(N_sim, chunk_size):
+    # chunks depend only on N_sim and chunk_size so the random streams do not depend on the number of workers
+    chunk_N_sim_list = [chunk_size]*(N_sim // chunk_size)
+    if N_sim % chunk_size > 0:
+        chunk_N_sim_list.append(N_sim % chunk_size)
+    return chunk_N_sim_list
+
+
+def run_with_seed_sequence(seed_sequence, fun, *args):
+    # combat uses the global numpy.random state, seed it from seed_sequence for the duration of the call
+    prev_state = numpy.random.get_state()
+    numpy.random.seed(seed_sequence.generate_state(4))
+    try:
+        r = fun(*args)
+    finally:
+        numpy.random.set_state(prev_state)
+
+    return r
+
+
+def generate_combat_results(attack_units, defense_units, battle_type, N_sim):
+    # one results_list per combat, nothing is kept after it is yielded
+    attack_army, defense_army = army.build_armies_from_units(attack_units, defense_units)
+    for i in range(N_sim):
+        yield combat.run_combat_army(attack_army, defense_army, battle_type)
+
+
+def select_combat_round(combat_result, plot_round):
+    # a combat that finished before plot_round stays in its final state
+    if plot_round >= len(combat_result):
+        return combat_result[-1]
+    return combat_result[plot_round]
+
+
+def accumulate_combat_results(combat_result_iter, plot_data_for_round, sum_start_ipc_attack, sum_start_ipc_defense,
+                              do_record_diff_ipc=False, buffer_size=SIM_CHUNK_SIZE):
+    # streams combat results into one accumulator per plot round, metrics are buffered so they are added in blocks
+    accumulator_list = [
+        combat_result_accumulator.CombatResultAccumulator(sum_start_ipc_attack, sum_start_ipc_defense)
+        for x in plot_data_for_round
+    ]
+    diff_ipc_list_list = [[] for x in plot_data_for_round] if do_record_diff_ipc else None
+
+    metric_buffer_list = [[] for x in plot_data_for_round]
+    num_rounds_buffer = []
+
+    def flush_buffers():
+        for cur_accumulator, cur_metric_buffer in zip(accumulator_list, metric_buffer_list):
+            cur_accumulator.add(list(zip(*cur_metric_buffer)), num_rounds_buffer)
+            cur_metric_buffer.clear()
+        num_rounds_buffer.clear()
+
+    for combat_result in combat_result_iter:
+        num_rounds_buffer.append(combat_result[-1][0])
+
+        for i, cur_plot_round in enumerate(plot_data_for_round):
+            combat_result_metric = calculate_metrics_from_combat_result(
+                select_combat_round(combat_result, cur_plot_round), sum_start_ipc_attack, sum_start_ipc_defense
+            )
+            metric_buffer_list[i].append(combat_result_metric)
+            if do_record_diff_ipc:
+                diff_ipc_list_list[i].append(combat_result_metric.diff_ipc)
+
+        if len(num_rounds_buffer) >= buffer_size:
+            flush_buffers()
+
+    if len(num_rounds_buffer) > 0:
+        flush_buffers()
+
+    diff_ipc_arr_list = None
+    if do_record_diff_ipc:
+        diff_ipc_arr_list = [numpy.array(x) for x in diff_ipc_list_list]
+
+    return accumulator_list, diff_ipc_arr_list
+
+
+def run_combat_chunk(attack_units, defense_units, battle_type, N_sim):
+    attack_army, defense_army = army.build_armies_from_units(attack_units, defense_units)
+    return [combat.run_combat_army(attack_army, defense_army, battle_type) for i in range(N_sim)]
+
+
+def run_combat_chunk_with_seed_sequence(attack_units, defense_units, battle_type, N_sim, seed_sequence):
+    return run_with_seed_sequence(seed_sequence, run_combat_chunk, attack_units, defense_units, battle_type, N_sim)
+
+
+def run_accumulate_chunk(attack_units, defense_units, battle_type, N_sim, plot_data_for_round, do_record_diff_ipc):
+    sum_start_ipc_attack = calculate_sum_ipc(attack_units)
+    sum_start_ipc_defense = calculate_sum_ipc(defense_units)
+
+    return accumulate_combat_results(
+        generate_combat_results(attack_units, defense_units, battle_type, N_sim), plot_data_for_round,
+        sum_start_ipc_attack, sum_start_ipc_defense, do_record_diff_ipc
+    )
+
+
+def run_accumulate_chunk_with_seed_sequence(attack_units, defense_units, battle_type, N_sim, plot_data_for_round,
+                                            do_record_diff_ipc, seed_sequence):
+    return run_with_seed_sequence(
+        seed_sequence, run_accumulate_chunk, attack_units, defense_units, battle_type, N_sim, plot_data_for_round,
+        do_record_diff_ipc
+    )
+
+
+def run_in_pool(fun, args_list, n_workers):
+    if n_workers == 1:
+        return [fun(*x) for x in args_list]
+
+    with multiprocessing.Pool(n_workers) as pool:
+        return pool.starmap(fun, args_list)
+
+
+def call_with_args(fun_args):
+    fun, args = fun_args
+    return fun(*args)
+
+
+def iterate_in_pool(fun, args_list, n_workers):
+    # like run_in_pool but yields each result in order as it finishes so the results do not all have to be held
+    if n_workers == 1:
+        for args in args_list:
+            yield fun(*args)
+        return
+
+    with multiprocessing.Pool(n_workers) as pool:
+        for r in pool.imap(call_with_args, [(fun, x) for x in args_list]):
+            yield r
+
+
+def run_combat_sims(attack_units, defense_units, battle_type, N_sim, n_workers=1, seed=None,
+                    chunk_size=SIM_CHUNK_SIZE):
+    if n_workers == 1 and seed is None:
+        attack_army, defense_army = army.build_armies_from_units(attack_units, defense_units)
+
+        all_results_list = []
+        for i in range(N_sim):
+            all_results_list.append(combat.run_combat_army(attack_army, defense_army, battle_type))
+
+            if i%100 == 0:
+                logger.info("progress i:  {}".format(i))
+
+        return all_results_list
+
+    chunk_N_sim_list = build_chunk_N_sim_list(N_sim, chunk_size)
+    seed_sequence_list = numpy.random.SeedSequence(seed).spawn(len(chunk_N_sim_list))
+    logger.info("n_workers:  {}  len(chunk_N_sim_list):  {}".format(n_workers, len(chunk_N_sim_list)))
+
+    args_list = [
+        (attack_units, defense_units, battle_type, cur_N_sim, cur_seed_sequence)
+        for cur_N_sim, cur_seed_sequence in zip(chunk_N_sim_list, seed_sequence_list)
+    ]
+    chunk_results_list = run_in_pool(run_combat_chunk_with_seed_sequence, args_list, n_workers)
+
+    return [x for chunk_results in chunk_results_list for x in chunk_results]
+
+
+def run_combat_sims_accumulate(attack_units, defense_units, battle_type, N_sim, plot_data_for_round=[-1],
+                               n_workers=1, seed=None, chunk_size=SIM_CHUNK_SIZE, do_record_diff_ipc=False):
+    # streaming version of run_combat_sims, returns one accumulator per plot round and optionally the diff_ipc of
+    # each combat for each plot round
+    sum_start_ipc_attack = calculate_sum_ipc(attack_units)
+    sum_start_ipc_defense = calculate_sum_ipc(defense_units)
+
+    if n_workers == 1 and seed is None:
+        return accumulate_combat_results(
+            generate_combat_results(attack_units, defense_units, battle_type, N_sim), plot_data_for_round,
+            sum_start_ipc_attack, sum_start_ipc_defense, do_record_diff_ipc
+        )
+
+    chunk_N_sim_list = build_chunk_N_sim_list(N_sim, chunk_size)
+    seed_sequence_list = numpy.random.SeedSequence(seed).spawn(len(chunk_N_sim_list))
+    logger.info("n_workers:  {}  len(chunk_N_sim_list):  {}".format(n_workers, len(chunk_N_sim_list)))
+
+    args_list = [
+        (attack_units, defense_units, battle_type, cur_N_sim, plot_data_for_round, do_record_diff_ipc,
+         cur_seed_sequence)
+        for cur_N_sim, cur_seed_sequence in zip(chunk_N_sim_list, seed_sequence_list)
+    ]
+
+    accumulator_list = [
+        combat_result_accumulator.CombatResultAccumulator(sum_start_ipc_attack, sum_start_ipc_defense)
+        for x in plot_data_for_round
+    ]
+    diff_ipc_arr_list_list = []
+    for chunk_accumulator_list, chunk_diff_ipc_arr_list in iterate_in_pool(
+            run_accumulate_chunk_with_seed_sequence, args_list, n_workers):
+        for cur_accumulator, cur_chunk_accumulator in zip(accumulator_list, chunk_accumulator_list):
+            cur_accumulator.merge(cur_chunk_accumulator)
+        if do_record_diff_ipc:
+            diff_ipc_arr_list_list.append(chunk_diff_ipc_arr_list)
+
+    diff_ipc_arr_list = None
+    if do_record_diff_ipc:
+        diff_ipc_arr_list = [
+            numpy.concatenate([x[i] for x in diff_ipc_arr_list_list]) for i in range(len(plot_data_for_round))
+        ]
+
+    return accumulator_list, diff_ipc_arr_list
+
+
+def run_combat_batch_accumulate(unit_table, attack_counts, defense_counts, battle_type, N_sim,
+                                chunk_size=BATCH_CHUNK_SIZE, rng=numpy.random):
+    # final round summary of N_sim combats using the batch engine, memory is bounded by chunk_size
+    sum_start_ipc_attack = numpy.sum(attack_counts * unit_table.ipc_arr)
+    sum_start_ipc_defense = numpy.sum(defense_counts * unit_table.ipc_arr)
+
+    accumulator = combat_result_accumulator.CombatResultAccumulator(sum_start_ipc_attack, sum_start_ipc_defense)
+    for cur_N_sim in build_chunk_N_sim_list(N_sim, chunk_size):
+        combat_batch_result = combat.run_combat_batch(
+            unit_table, attack_counts, defense_counts, battle_type, cur_N_sim, rng
+        )
+        combat_result_metric = calculate_metrics_from_counts(
+            unit_table.ipc_arr, combat_batch_result.attack_counts, combat_batch_result.defense_counts,
+            sum_start_ipc_attack, sum_start_ipc_defense
+        )
+        accumulator.add(combat_result_metric, combat_batch_result.num_rounds)
+
+    return accumulator
+
+
 def main(attack_units, defense_units, title_prefix, battle_type, N_sim=1000, max_plot_points=10000,
-         plot_data_for_round=[-1], do_show_fig=True, do_write_fig=False
+         plot_data_for_round=[-1], do_show_fig=True, do_write_fig=False, n_workers=1, seed=None, summary_only=False
          ):
+    # summary_only:  return the accumulators instead of the diff_ipc of every combat, memory is then independent of
+    # N_sim
     output_path = os.path.join("output", title_prefix)
-    if os.path.exists(output_path):
-        shutil.rmtree(output_path)
-    os.mkdir(output_path)
+    if do_write_fig:
+        if os.path.exists(output_path):
+            shutil.rmtree(output_path)
+        os.makedirs(output_path)
 
     logger.info("len(attack_units):  {}".format(len(attack_units)))
     sum_start_ipc_attack = calculate_sum_ipc(attack_units)
@@ -133,67 +421,50 @@ def main(attack_units, defense_units, title_prefix, battle_type, N_sim=1000, max
     sum_start_ipc_defence = calculate_sum_ipc(defense_units)
     logger.info("sum_start_ipc_defense:  {}".format(sum_start_ipc_defence))
 
-    all_results_list = []
-    for i in range(N_sim):
-        results_list = combat.run_combat(attack_units, defense_units, battle_type)
-        all_results_list.append(results_list)
-
-        _, result_attack_units, result_defense_units = results_list[-1]
-
-        logger.debug("result_attack_units:  {}".format(result_attack_units))
-        logger.debug("result_defense_units:  {}".format(result_defense_units))
-
-        if i%100 == 0:
-            logger.info("progress i:  {}".format(i))
-
-    diff_remain_ipc_arr_list = []
-    for cur_plot_round in plot_data_for_round:
-        combat_result_metric_list = [
-            calculate_metrics_from_combat_result(
-                x[cur_plot_round], sum_start_ipc_attack, sum_start_ipc_defence
-            ) for x in all_results_list
-        ]
+    accumulator_list, diff_remain_ipc_arr_list = run_combat_sims_accumulate(
+        attack_units, defense_units, battle_type, N_sim, plot_data_for_round, n_workers, seed,
+        do_record_diff_ipc=not summary_only
+    )
 
-        sort_diff_remain_ipc_arr = sorted(combat_result_metric_list, key=lambda x: x.diff_ipc)
+    for cur_plot_round, cur_accumulator in zip(plot_data_for_round, accumulator_list):
+        logger.info("cur_plot_round:  {}  cur_accumulator:\n{}".format(cur_plot_round, cur_accumulator))
 
         if do_show_fig or do_write_fig:
+            plot_diff_ipc_arr, f = cur_accumulator.build_ecdf()
+
             plot_incr = 1
-            if len(sort_diff_remain_ipc_arr) > max_plot_points:
-                plot_incr = int(numpy.round(sort_diff_remain_ipc_arr.shape[0] / max_plot_points))
-            
-            plot_sort_diff_remain_ipc_arr = [
-                x.diff_ipc for x in sort_diff_remain_ipc_arr[::plot_incr]
-            ]
-            f = numpy.linspace(0., 1., num=len(plot_sort_diff_remain_ipc_arr))
+            if plot_diff_ipc_arr.shape[0] > max_plot_points:
+                plot_incr = int(numpy.round(plot_diff_ipc_arr.shape[0] / max_plot_points))
+
             title = "{} round {} ECDF of difference in remaining IPC attacker - defense".format(
                 title_prefix, cur_plot_round)
             labels = {"x":"difference in remaining IPC", "y":"fraction of simulations"}
-            fig = pltxpr.scatter(x=plot_sort_diff_remain_ipc_arr, y=f, title=title, labels=labels)
+            fig = pltxpr.scatter(x=plot_diff_ipc_arr[::plot_incr], y=f[::plot_incr], title=title, labels=labels)
             output_filepath = os.path.join(output_path, "{}.html".format(title))
             fig_ops(fig, do_show_fig, do_write_fig, output_filepath)
 
-            # title = "{} round {} Histogram of difference in remaining IPC attacker - defense".format(
-            #     title_prefix, cur_plot_round)
-            # fig = pltxpr.histogram(x=plot_sort_diff_remain_ipc_arr, title=title, labels=labels)
-            # output_filepath = os.path.join(output_path, "{}.html".format(title))
-            # fig_ops(fig, do_show_fig, do_write_fig, output_filepath)
-
-            # labels = {"x":"fractional difference in remaining IPC", "y":"fraction of simulations"}
-            # title = "{} round {} ECDF of difference in remaining fractional IPC attacker - defense".format(
-            #     title_prefix, cur_plot_round)
-            # fig = pltxpr.scatter(x=frac_winner_ipc, y=f, title=title, labels=labels)
-            # output_filepath = os.path.join(output_path, "{}.html".format(title))
-            # fig_ops(fig, do_show_fig, do_write_fig, output_filepath)
-
-            # title = "{} round {} Histogram of difference in remaining fractional IPC attacker - defense".format(
-            #     title_prefix, cur_plot_round)
-            # fig = pltxpr.histogram(x=frac_winner_ipc, title=title, labels=labels)
-            # output_filepath = os.path.join(output_path, "{}.html".format(title))
-            # fig_ops(fig, do_show_fig, do_write_fig, output_filepath)
+    if summary_only:
+        return accumulator_list
 
     return diff_remain_ipc_arr_list
 
-def collect_data_for_modeling(unit_dict):
+def run_modeling_config(IPC, possible_units, N_sim_per_config):
+    attack_units, attack_units_counts, attack_IPC = build_random_force(IPC, possible_units)
+    defense_units, defense_units_counts, defense_IPC = build_random_force(IPC, possible_units)
+
+    diff_remain_IPC_arr = main(
+        attack_units, defense_units, "NA", combat.BATTLE_TYPE_AMPHIBIOUS, do_write_fig=False, 
+        plot_data_for_round=[-1], do_show_fig=False, N_sim=N_sim_per_config
+    )[0]
+
+    return (IPC, attack_units_counts, defense_units_counts, attack_IPC, defense_IPC, diff_remain_IPC_arr)
+
+
+def run_modeling_config_with_seed_sequence(IPC, possible_units, N_sim_per_config, seed_sequence):
+    return run_with_seed_sequence(seed_sequence, run_modeling_config, IPC, possible_units, N_sim_per_config)
+
+
+def collect_data_for_modeling(unit_dict, n_workers=1, seed=None):
     N_sim_per_config = 3
     N_config_per_IPC = lambda IPC: 1
     IPC_min = 10
@@ -203,22 +474,14 @@ def collect_data_for_modeling(unit_dict):
     possible_units = [x for x in unit_dict.values() if x.unit_type == unit.UNIT_TYPE_AIR or x.unit_type == unit.UNIT_TYPE_LAND]
     possible_units = sorted(possible_units, key=lambda x: (x.unit_type, x.ipc))
 
-    all_results = []
-    for IPC in range(IPC_min, IPC_max+1):
-        N_config = N_config_per_IPC(IPC)
+    IPC_list = [IPC for IPC in range(IPC_min, IPC_max+1) for i in range(N_config_per_IPC(IPC))]
+    seed_sequence_list = numpy.random.SeedSequence(seed).spawn(len(IPC_list))
 
-        for i in range(N_config):
-            attack_units, attack_units_counts, attack_IPC = build_random_force(IPC, possible_units)
-            defense_units, defense_units_counts, defense_IPC = build_random_force(IPC, possible_units)
-
-            diff_remain_IPC_arr = main(
-                attack_units, defense_units, "NA", combat.BATTLE_TYPE_AMPHIBIOUS, do_write_fig=False, 
-                plot_data_for_round=[-1], do_show_fig=False, N_sim=N_sim_per_config
-            )[0]
-
-            all_results.append(
-                (IPC, attack_units_counts, defense_units_counts, attack_IPC, defense_IPC, diff_remain_IPC_arr)
-            )
+    args_list = [
+        (IPC, possible_units, N_sim_per_config, cur_seed_sequence)
+        for IPC, cur_seed_sequence in zip(IPC_list, seed_sequence_list)
+    ]
+    all_results = run_in_pool(run_modeling_config_with_seed_sequence, args_list, n_workers)
 
     data_dict = {"IPC":[], "attack_IPC":[], "defense_IPC":[], "diff_remain_IPC":[]}
     data_dict.update({x.name+"_attack":[] for x in possible_units})
@@ -4,19 +4,29 @@ import pandas
 import plotly.express as pltxpr
 
 import logging
+import collections
 
 import axis_and_allies.combat as combat
+import axis_and_allies.exact_combat as exact_combat
+import axis_and_allies.unit as unit
 import axis_and_allies.run_simulation as run_simulation
 import axis_and_allies.setup_logger as setup_logger
 
 logger = logging.getLogger(setup_logger.LOGGER_NAME)
 
+AIR_DEFENSE_TO_HIT = 1
+DEFAULT_MAX_BOMBER_DAMAGE = 20
+
+StrategicBombingDistribution = collections.namedtuple("StrategicBombingDistribution",
+    ["N_bomber_after", "bomber_damage", "clipped_bomber_damage", "net_IPC", "clipped_net_IPC", "probability"]
+)
+
 
 def run_strategic_bombing(attack_bombers):
     cur_attacker_bombers = sorted(attack_bombers, key=lambda x: x.ipc)
     combat.calculate_temp_attacks(cur_attacker_bombers)
 
-    air_defense_to_hit_list = [1]*len(cur_attacker_bombers)
+    air_defense_to_hit_list = [AIR_DEFENSE_TO_HIT]*len(cur_attacker_bombers)
     did_air_defense_hit_arr,_ = combat.calculate_rolls_and_compare(air_defense_to_hit_list)
 
     num_air_defense_hits = numpy.sum(did_air_defense_hit_arr*1)
@@ -27,42 +37,128 @@ def run_strategic_bombing(attack_bombers):
 
     return cur_attacker_bombers, bomber_damage
 
-def simulate_strategic_bombing(unit_dict, max_bomber_damage=20):
-    N_bombers = numpy.power(2, range(4), dtype=int)
-    N_sim = 1000
+def run_strategic_bombing_batch(N_bomber_arr, N_sim, rng=None):
+    # all trials for all starting bomber counts at once, entry [i, j] is trial j for N_bomber_arr[i].  rng is a
+    # numpy.random.Generator, a fresh unseeded one by default
+    if rng is None:
+        rng = numpy.random.default_rng()
 
-    bomber_unit = unit_dict["bomber"]
+    N_bomber_arr = numpy.asarray(N_bomber_arr)
+    N_bomber_start = numpy.broadcast_to(N_bomber_arr[:, None], (N_bomber_arr.shape[0], N_sim))
+
+    num_air_defense_hits = rng.binomial(N_bomber_start, AIR_DEFENSE_TO_HIT / unit.DICE_SIDES)
+    N_bomber_after = N_bomber_start - num_air_defense_hits
 
-    data_dict = {"N_bomber_start":[], "N_bomber_after":[], "bomber_damage":[]}
-    for cur_n_bomber in N_bombers:
-        logger.info("cur_n_bomber:  {}".format(cur_n_bomber))
+    # one damage die per possible bomber, only the dice of the surviving bombers are counted
+    max_N_bomber = int(N_bomber_arr.max()) if N_bomber_arr.shape[0] > 0 else 0
+    damage_dice = rng.integers(1, unit.DICE_SIDES+1, (N_bomber_arr.shape[0], N_sim, max_N_bomber))
+    did_bomber_survive = numpy.arange(max_N_bomber) < N_bomber_after[:, :, None]
+    bomber_damage = numpy.sum(damage_dice * did_bomber_survive, axis=2)
 
-        attack_bombers = [bomber_unit.copy() for i in range(cur_n_bomber)]
+    return N_bomber_after, bomber_damage
 
-        for i in range(N_sim):
-            cur_attack_bombers, bomber_damage = run_strategic_bombing(attack_bombers)
-            data_dict["N_bomber_start"].append(cur_n_bomber)
-            data_dict["N_bomber_after"].append(len(cur_attack_bombers))
-            data_dict["bomber_damage"].append(numpy.sum(bomber_damage))
 
-    data_df = pandas.DataFrame(data_dict)
+def build_strategic_bombing_data_df(N_bomber_arr, N_sim, bomber_ipc, max_bomber_damage=DEFAULT_MAX_BOMBER_DAMAGE,
+                                    rng=None):
+    N_bomber_after, bomber_damage = run_strategic_bombing_batch(N_bomber_arr, N_sim, rng)
+
+    data_df = pandas.DataFrame({
+        "N_bomber_start":numpy.repeat(N_bomber_arr, N_sim), "N_bomber_after":N_bomber_after.ravel(),
+        "bomber_damage":bomber_damage.ravel()
+    })
     data_df["N_bombers_lost"] = data_df.N_bomber_start - data_df.N_bomber_after
-    data_df["bomber_IPC_lost"] = bomber_unit.ipc * data_df.N_bombers_lost
+    data_df["bomber_IPC_lost"] = bomber_ipc * data_df.N_bombers_lost
 
     data_df["net_IPC"] = data_df.bomber_damage - data_df.bomber_IPC_lost
 
-    data_df["clipped_bomber_damage"] = data_df.bomber_damage
-    locs = data_df.clipped_bomber_damage > max_bomber_damage
-    data_df.loc[locs, "clipped_bomber_damage"] = max_bomber_damage
-
+    data_df["clipped_bomber_damage"] = numpy.minimum(data_df.bomber_damage, max_bomber_damage)
     data_df["clipped_net_IPC"] = data_df.clipped_bomber_damage - data_df.bomber_IPC_lost
 
-    data_df["pct_rnk_net_IPC"] = numpy.nan
-    data_df["pct_rnk_clipped_net_IPC"] = numpy.nan
-    for cur_n_bomber in N_bombers:
-        locs = data_df.N_bomber_start == cur_n_bomber
-        data_df.loc[locs, "pct_rnk_net_IPC"] = data_df.loc[locs, "net_IPC"].rank(pct=True, method="first")
-        data_df.loc[locs, "pct_rnk_clipped_net_IPC"] = data_df.loc[locs, "clipped_net_IPC"].rank(pct=True, method="first")
+    grouped = data_df.groupby("N_bomber_start")
+    data_df["pct_rnk_net_IPC"] = grouped.net_IPC.rank(pct=True, method="first")
+    data_df["pct_rnk_clipped_net_IPC"] = grouped.clipped_net_IPC.rank(pct=True, method="first")
+
+    return data_df
+
+
+def calculate_damage_distribution(N_bomber):
+    # entry d is the probability that N_bomber damage dice sum to d
+    die_dist = numpy.array([0.] + [1. / unit.DICE_SIDES]*unit.DICE_SIDES)
+
+    damage_dist = numpy.ones(1)
+    for i in range(N_bomber):
+        damage_dist = numpy.convolve(damage_dist, die_dist)
+
+    return damage_dist
+
+
+def calculate_strategic_bombing_distribution(N_bomber, bomber_ipc, max_bomber_damage=DEFAULT_MAX_BOMBER_DAMAGE):
+    # exact joint distribution of the number of surviving bombers and the damage they do, one entry per outcome
+    # with non-zero probability
+    num_air_defense_hits_dist = exact_combat.calculate_hit_distribution([AIR_DEFENSE_TO_HIT]*N_bomber)
+
+    N_bomber_after_list = []
+    bomber_damage_list = []
+    probability_list = []
+    die_dist = calculate_damage_distribution(1)
+    damage_dist = numpy.ones(1)
+    for cur_N_bomber_after in range(N_bomber + 1):
+        if cur_N_bomber_after > 0:
+            damage_dist = numpy.convolve(damage_dist, die_dist)
+
+        bomber_damage = numpy.nonzero(damage_dist)[0]
+        N_bomber_after_list.append(numpy.full(bomber_damage.shape[0], cur_N_bomber_after))
+        bomber_damage_list.append(bomber_damage)
+        probability_list.append(num_air_defense_hits_dist[N_bomber - cur_N_bomber_after] * damage_dist[bomber_damage])
+
+    N_bomber_after = numpy.concatenate(N_bomber_after_list)
+    bomber_damage = numpy.concatenate(bomber_damage_list)
+    bomber_IPC_lost = bomber_ipc * (N_bomber - N_bomber_after)
+    clipped_bomber_damage = numpy.minimum(bomber_damage, max_bomber_damage)
+
+    return StrategicBombingDistribution(
+        N_bomber_after=N_bomber_after, bomber_damage=bomber_damage, clipped_bomber_damage=clipped_bomber_damage,
+        net_IPC=bomber_damage - bomber_IPC_lost, clipped_net_IPC=clipped_bomber_damage - bomber_IPC_lost,
+        probability=numpy.concatenate(probability_list)
+    )
+
+
+def calculate_expected_strategic_bombing(strategic_bombing_distribution):
+    probability = strategic_bombing_distribution.probability
+    return StrategicBombingDistribution(
+        *[numpy.sum(x * probability) for x in strategic_bombing_distribution[:-1]], probability=1.
+    )
+
+
+def build_exact_strategic_bombing_data_df(N_bomber_arr, bomber_ipc, max_bomber_damage=DEFAULT_MAX_BOMBER_DAMAGE):
+    # ECDF of net_IPC and clipped_net_IPC for each starting bomber count, same columns used for plotting as
+    # build_strategic_bombing_data_df
+    data_df_list = []
+    for cur_n_bomber in N_bomber_arr:
+        strategic_bombing_distribution = calculate_strategic_bombing_distribution(
+            cur_n_bomber, bomber_ipc, max_bomber_damage
+        )
+        for col in ["net_IPC", "clipped_net_IPC"]:
+            values, cumulative_probability = exact_combat.calculate_ecdf(
+                getattr(strategic_bombing_distribution, col), strategic_bombing_distribution.probability
+            )
+            data_df_list.append(pandas.DataFrame({
+                "N_bomber_start":cur_n_bomber, col:values, "pct_rnk_" + col:cumulative_probability
+            }))
+
+    return pandas.concat(data_df_list, axis=0, ignore_index=True)
+
+
+def simulate_strategic_bombing(unit_dict, max_bomber_damage=DEFAULT_MAX_BOMBER_DAMAGE, do_exact=False):
+    N_bombers = numpy.power(2, range(4), dtype=int)
+    N_sim = 1000
+
+    bomber_unit = unit_dict["bomber"]
+
+    if do_exact:
+        data_df = build_exact_strategic_bombing_data_df(N_bombers, bomber_unit.ipc, max_bomber_damage)
+    else:
+        data_df = build_strategic_bombing_data_df(N_bombers, N_sim, bomber_unit.ipc, max_bomber_damage)
 
     data_df["N_bomber_start_str"] = data_df.N_bomber_start.astype(str)
 
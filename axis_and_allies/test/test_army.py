@@ -0,0 +1,84 @@
+import unittest
+import logging
+import axis_and_allies.setup_logger as setup_logger
+
+import numpy
+
+import axis_and_allies.unit as unit
+import axis_and_allies.army as army
+import axis_and_allies.build_unit_dict as build_unit_dict
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+unit_dict = None
+
+
+class TestArmy(unittest.TestCase):
+    def test___init__(self):
+        unit_table = unit.build_unit_table(unit_dict)
+        r = army.Army(unit_table)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(0, len(r))
+        self.assertEqual(len(unit_table), r.counts.shape[0])
+
+    def test_build_army_from_names(self):
+        unit_table = unit.build_unit_table(unit_dict)
+        r = army.build_army_from_names(unit_table, ["tank", "infantry", "infantry"])
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(3, len(r))
+        self.assertEqual(2, r.counts[unit_table.get_index("infantry")])
+        self.assertEqual(2*unit_dict["infantry"].ipc + unit_dict["tank"].ipc, r.calculate_ipc())
+        self.assertEqual(["infantry", "infantry", "tank"], r.to_unit_names())
+
+    def test_to_units(self):
+        unit_table = unit.build_unit_table(unit_dict)
+        units = [unit_dict["fighter"].copy(), unit_dict["infantry"].copy(), unit_dict["fighter"].copy()]
+        r = army.build_army_from_units(unit_table, units)
+
+        converted_units = r.to_units()
+        logger.debug("converted_units:  {}".format(converted_units))
+        self.assertEqual(sorted([x.name for x in units]), sorted([x.name for x in converted_units]))
+        self.assertEqual(list(r.counts), list(army.build_army_from_units(unit_table, converted_units).counts))
+
+    def test_copy(self):
+        unit_table = unit.build_unit_table(unit_dict)
+        c = army.build_army_from_names(unit_table, ["tank"])
+        r = c.copy()
+        r.counts[unit_table.get_index("tank")] = 5
+        logger.debug("c:  {}  r:  {}".format(c, r))
+        self.assertEqual(1, len(c))
+        self.assertEqual(5, len(r))
+        self.assertIs(c.unit_table, r.unit_table)
+
+    def test_build_armies_from_units(self):
+        attack_units = [unit_dict["tank"].copy()]
+        defense_units = [unit_dict["infantry"].copy(), unit_dict["infantry"].copy()]
+        r_attack, r_defense = army.build_armies_from_units(attack_units, defense_units)
+        logger.debug("r_attack:  {}  r_defense:  {}".format(r_attack, r_defense))
+        self.assertIs(r_attack.unit_table, r_defense.unit_table)
+        self.assertEqual(["infantry", "tank"], r_attack.unit_table.names)
+        self.assertEqual(1, len(r_attack))
+        self.assertEqual(2, len(r_defense))
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units(do_add_test_units=True)
+
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+import logging
+import axis_and_allies.setup_logger as setup_logger
+
+import os
+import tempfile
+
+import numpy
+import pandas
+
+import axis_and_allies.battle_value_estimator as battle_value_estimator
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+
+UNIT_NAMES = ["infantry", "tank"]
+IPC_ARR = numpy.array([3, 6])
+
+
+def build_linear_estimator():
+    # one hidden layer with identity activation:  diff_remain_IPC = attack IPC - defense IPC and
+    # frac_diff_remain_IPC = diff_remain_IPC / 10
+    coef_list = [numpy.array([[0.], [0.], [0.], [0.], [1.], [-1.]]), numpy.array([[1., 0.1]])]
+    intercept_list = [numpy.zeros(1), numpy.zeros(2)]
+    return battle_value_estimator.BattleValueEstimator(
+        UNIT_NAMES, IPC_ARR, coef_list, intercept_list, numpy.zeros(6), numpy.ones(6), numpy.zeros(2), numpy.ones(2),
+        activation="identity"
+    )
+
+
+class TestBattleValueEstimator(unittest.TestCase):
+    def test_predict_battle(self):
+        estimator = build_linear_estimator()
+        logger.debug("estimator:  {}".format(estimator))
+
+        r = estimator.predict_battle(numpy.array([[2, 1], [1, 0], [0, 0]]), numpy.array([[1, 0], [0, 2], [0, 0]]))
+        logger.debug("r:  {}".format(r))
+        numpy.testing.assert_allclose([9., -9., 0.], r.diff_remain_IPC)
+        numpy.testing.assert_allclose([0.9, -0.9, 0.], r.frac_diff_remain_IPC)
+
+        logger.debug("single battle, frac_diff_remain_IPC is clipped")
+        r = estimator.predict_battle(numpy.array([0, 3]), numpy.array([0, 0]))
+        numpy.testing.assert_allclose([18.], r.diff_remain_IPC)
+        numpy.testing.assert_allclose([1.], r.frac_diff_remain_IPC)
+
+        logger.debug("standardization and relu")
+        estimator = battle_value_estimator.BattleValueEstimator(
+            UNIT_NAMES, IPC_ARR, [numpy.array([[0.], [0.], [0.], [0.], [1.], [-1.]]), numpy.array([[1., 1.]])],
+            [numpy.zeros(1), numpy.zeros(2)], numpy.zeros(6), numpy.full(6, 2.), numpy.array([1., 0.]),
+            numpy.array([2., 0.01])
+        )
+        r = estimator.predict_battle(numpy.array([[2, 0], [0, 0]]), numpy.array([[0, 0], [1, 0]]))
+        numpy.testing.assert_allclose([7., 1.], r.diff_remain_IPC)
+        numpy.testing.assert_allclose([0.03, 0.], r.frac_diff_remain_IPC)
+
+        with self.assertRaises(battle_value_estimator.AxisAndAlliesBattleValueEstimatorException):
+            battle_value_estimator.BattleValueEstimator(
+                UNIT_NAMES, IPC_ARR, [numpy.zeros((5, 2))], [numpy.zeros(2)], 0., 1., 0., 1.
+            )
+
+    def test_reorder_counts(self):
+        estimator = build_linear_estimator()
+
+        r = estimator.reorder_counts(numpy.array([[1, 0, 2], [0, 0, 1]]), ["tank", "submarine", "infantry"])
+        logger.debug("r:  {}".format(r))
+        self.assertEqual([[2, 1], [1, 0]], r.tolist())
+
+        with self.assertRaises(battle_value_estimator.AxisAndAlliesBattleValueEstimatorException) as context:
+            estimator.reorder_counts(numpy.array([1, 1, 2]), ["tank", "submarine", "infantry"])
+        logger.debug("context.exception:  {}".format(context.exception))
+        self.assertIn("submarine", str(context.exception))
+
+    def test_save_load(self):
+        estimator = build_linear_estimator()
+        attack_counts = numpy.array([[2, 1], [1, 0]])
+        defense_counts = numpy.array([[1, 0], [0, 2]])
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            output_file = os.path.join(output_dir, "estimator.npz")
+            estimator.save(output_file)
+            r = battle_value_estimator.load_estimator(output_file)
+
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(UNIT_NAMES, r.unit_names)
+        self.assertEqual("identity", r.activation)
+        for expected, actual in zip(estimator.predict_battle(attack_counts, defense_counts),
+                                    r.predict_battle(attack_counts, defense_counts)):
+            numpy.testing.assert_allclose(expected, actual)
+
+    def test_calculate_calibration(self):
+        observed = numpy.arange(-10., 10.)
+        r_summary, r_df = battle_value_estimator.calculate_calibration(observed + 1., observed, num_bins=4)
+        logger.debug("r_summary:  {}".format(r_summary))
+        logger.debug("r_df:\n{}".format(r_df))
+        self.assertEqual(20, r_summary.num_samples)
+        self.assertAlmostEqual(1., r_summary.rmse)
+        self.assertAlmostEqual(1., r_summary.bias)
+        self.assertAlmostEqual(0.95, r_summary.win_accuracy)
+        self.assertEqual(4, r_df.shape[0])
+        self.assertEqual(20, r_df.num_samples.sum())
+        numpy.testing.assert_allclose(r_df.mean_predicted - 1., r_df.mean_observed)
+
+    def test_build_calibration_report(self):
+        estimator = build_linear_estimator()
+        data_df = pandas.DataFrame({
+            "infantry_attack":[2, 1, 0], "tank_attack":[1, 0, 1], "infantry_defense":[1, 0, 3], "tank_defense":[0, 2, 0],
+            "diff_remain_IPC":[9., -9., -3.], "frac_diff_remain_IPC":[0.9, -0.9, -0.3]
+        })
+
+        r = battle_value_estimator.build_calibration_report(estimator, data_df, num_bins=2)
+        logger.debug("format_calibration_report:\n{}".format(battle_value_estimator.format_calibration_report(r)))
+        self.assertEqual(battle_value_estimator.TARGET_NAMES, list(r.keys()))
+        for calibration_summary, _ in r.values():
+            self.assertAlmostEqual(0., calibration_summary.rmse)
+            self.assertAlmostEqual(1., calibration_summary.r2)
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import logging
+import axis_and_allies.setup_logger as setup_logger
+
+import os
+import tempfile
+
+import axis_and_allies.benchmark as benchmark
+import axis_and_allies.combat as combat
+import axis_and_allies.build_unit_dict as build_unit_dict
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+
+
+unit_dict = None
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_run_benchmark_case(self):
+        benchmark_case = benchmark.build_combat_case(
+            unit_dict, "test_land", ["always_hit"]*2, ["always_miss"]*3, combat.BATTLE_TYPE_LAND
+        )
+        r = benchmark.run_benchmark_case(benchmark_case, min_duration=0.01)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual("test_land", r.name)
+        self.assertGreater(r.num_calls, 0)
+        logger.debug("always_hit x2 vs always_miss x3 always takes 2 rounds")
+        self.assertEqual(2*r.num_calls, r.num_rounds)
+        self.assertGreater(r.peak_memory_bytes, 0)
+        self.assertAlmostEqual(1e6 * r.duration / r.num_rounds, r.round_latency_usec)
+
+    def test_build_benchmark_case_list(self):
+        r = benchmark.build_benchmark_case_list(unit_dict)
+        names = [x.name for x in r]
+        logger.debug("names:  {}".format(names))
+        self.assertEqual(len(set(names)), len(names))
+        for prefix in ["run_combat_land", "run_combat_naval", "run_combat_amphibious", "run_strategic_bombing",
+                       "convert_action_to_integers", "build_purchase_nodes"]:
+            self.assertTrue(any(x.startswith(prefix) for x in names), prefix)
+
+    def test_save_load_compare_to_baseline(self):
+        baseline = [
+            benchmark.BenchmarkResult("a", 10, 1., 10., 0, None, 1000),
+            benchmark.BenchmarkResult("b", 10, 1., 10., 20, 50000., 1000),
+        ]
+        with tempfile.TemporaryDirectory() as output_dir:
+            output_file = os.path.join(output_dir, "baseline.json")
+            benchmark.save_results(baseline, output_file)
+            loaded = benchmark.load_results(output_file)
+        logger.debug("loaded:  {}".format(loaded))
+        self.assertEqual(sorted(baseline), sorted(loaded))
+
+        current = [
+            benchmark.BenchmarkResult("a", 9, 1., 9., 0, None, 1100),
+            benchmark.BenchmarkResult("b", 5, 1., 5., 10, 100000., 2000),
+            benchmark.BenchmarkResult("c", 1, 1., 1., 0, None, 10**9),
+        ]
+        r = benchmark.compare_to_baseline(current, loaded, tolerance=0.25)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual([("b", "calls_per_sec", 10., 5.), ("b", "peak_memory_bytes", 1000, 2000)], r)
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units(do_add_test_units=True)
+
+    unittest.main()
@@ -6,6 +6,7 @@ import numpy
 
 import axis_and_allies.combat as combat
 import axis_and_allies.unit as unit
+import axis_and_allies.army as army
 import axis_and_allies.build_unit_dict as build_unit_dict
 
 
@@ -270,6 +271,11 @@ class TestCombat(unittest.TestCase):
         self.assertEqual(1, len(r))
         self.assertEqual(attack_units[-1].id, r[0].id)
 
+        attack_units = [unit_dict["fighter"].copy(), unit_dict["fighter"].copy(), unit_dict["tank"].copy()]
+        r = combat.remove_air_units_from_aaa_defense(attack_units, 1)
+        logger.debug("1 hit on 2 copies of the same air unit - r:  {}".format(len(r)))
+        self.assertEqual(2, len(r))
+
     def test_check_for_and_run_submarine_surprise_attack(self):
         attacker_units = [unit_dict["submarine"].copy()]
         defender_units = [unit_dict["cruiser"].copy()]
@@ -318,6 +324,11 @@ class TestCombat(unittest.TestCase):
         logger.debug("2 sub surprise hits but only one naval unit - len(r):  {}".format(len(r)))
         self.assertEqual(1, len(r))
 
+        defender_units = [unit_dict["cruiser"].copy(), unit_dict["cruiser"].copy()]
+        r = combat.remove_naval_units_from_sub_attack(defender_units, 1)
+        logger.debug("1 sub hit on 2 copies of the same naval unit - len(r):  {}".format(len(r)))
+        self.assertEqual(1, len(r))
+
     def test_run_combat_sub_surprise(self):
         attacker_units = [unit_dict["submarine"].copy()]
         defender_units = [unit_dict["cruiser"].copy()]
@@ -331,6 +342,142 @@ class TestCombat(unittest.TestCase):
         logger.debug("remain_attacker_units:  {}".format(remain_attacker_units))
         logger.debug("remain_defender_units:  {}".format(remain_defender_units))
 
+    def test_remove_cheapest_units(self):
+        counts = numpy.array([[2, 1, 3], [2, 1, 3], [2, 1, 3]])
+        num_hits = numpy.array([0, 3, 10])
+
+        r = combat.remove_cheapest_units(counts, num_hits)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual([2, 1, 3], list(r[0]))
+        self.assertEqual([0, 0, 3], list(r[1]))
+        self.assertEqual([0, 0, 0], list(r[2]))
+
+        eligible_arr = numpy.array([False, True, True])
+        r = combat.remove_cheapest_units(counts, numpy.array([0, 2, 10]), eligible_arr)
+        logger.debug("only eligible columns r:  {}".format(r))
+        self.assertEqual([2, 1, 3], list(r[0]))
+        self.assertEqual([2, 0, 2], list(r[1]))
+        self.assertEqual([2, 0, 0], list(r[2]))
+
+    def test_run_combat_batch(self):
+        unit_table = unit.build_unit_table(unit_dict)
+
+        logger.debug("####################")
+        logger.debug("attack always hits, defense always misses")
+        attack_counts = unit_table.build_counts_from_names(["always_hit"]*2)
+        defense_counts = unit_table.build_counts_from_names(["always_miss"]*3)
+        r = combat.run_combat_batch(unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_LAND, 5)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual((5, len(unit_table)), r.attack_counts.shape)
+        self.assertTrue(all(r.attack_counts[:, unit_table.get_index("always_hit")] == 2))
+        self.assertEqual(0, r.defense_counts.sum())
+        self.assertTrue(all(r.num_rounds == 2))
+
+        logger.debug("####################")
+        logger.debug("one army per simulation, losses taken cheapest first")
+        attack_counts = numpy.zeros((2, len(unit_table)), dtype=int)
+        attack_counts[:, unit_table.get_index("always_miss")] = 1
+        attack_counts[0, unit_table.get_index("infantry")] = 1
+        defense_counts = unit_table.build_counts_from_names(["always_hit"])
+        r = combat.run_combat_batch(unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_LAND, 2)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(0, r.attack_counts[1].sum())
+        self.assertEqual(1, r.num_rounds[1])
+        self.assertEqual(0, r.attack_counts[0, unit_table.get_index("infantry")])
+
+        logger.debug("####################")
+        logger.debug("amphibious - naval units bombard then do not take part")
+        attack_counts = unit_table.build_counts_from_names(["always_hit", "always_hit_naval"])
+        defense_counts = unit_table.build_counts_from_names(["always_miss"]*2)
+        r = combat.run_combat_batch(unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_AMPHIBIOUS, 3)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(0, r.attack_counts[:, unit_table.get_index("always_hit_naval")].sum())
+        self.assertTrue(all(r.num_rounds == 2))
+
+    def test_run_combat_batch_bombardment_and_submarine(self):
+        t = unit_dict["always_hit_naval"].copy()
+        t.name = unit.CRUISER
+        u = unit_dict["always_hit_naval"].copy()
+        u.name = unit.SUBMARINE
+        unit_table = unit.UnitTable([unit_dict["always_hit"], unit_dict["always_miss"], unit_dict["always_hit_naval"],
+                                     t, u])
+
+        logger.debug("####################")
+        logger.debug("bombardment hits are added to the first round")
+        attack_counts = unit_table.build_counts_from_names(["always_hit", unit.CRUISER])
+        defense_counts = unit_table.build_counts_from_names(["always_miss"]*2)
+        r = combat.run_combat_batch(unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_AMPHIBIOUS, 3)
+        logger.debug("r:  {}".format(r))
+        self.assertTrue(all(r.num_rounds == 1))
+        self.assertEqual(0, r.defense_counts.sum())
+
+        logger.debug("####################")
+        logger.debug("submarine surprise attack removes the naval defender before it can fire")
+        attack_counts = unit_table.build_counts_from_names([unit.SUBMARINE])
+        defense_counts = unit_table.build_counts_from_names(["always_hit_naval"])
+        r = combat.run_combat_batch(unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_NAVAL, 3)
+        logger.debug("r:  {}".format(r))
+        self.assertTrue(all(r.attack_counts[:, unit_table.get_index(unit.SUBMARINE)] == 1))
+        self.assertEqual(0, r.defense_counts.sum())
+
+        logger.debug("####################")
+        logger.debug("submarine hits cannot be taken by non-naval units")
+        defense_counts = unit_table.build_counts_from_names(["always_hit"])
+        r = combat.run_combat_batch(unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_NAVAL, 3)
+        logger.debug("r:  {}".format(r))
+        self.assertTrue(all(r.defense_counts[:, unit_table.get_index("always_hit")] == 1))
+        self.assertEqual(0, r.attack_counts.sum())
+
+    def test_run_combat_batch_matches_run_combat(self):
+        numpy.random.seed(7)
+        unit_table = unit.build_unit_table(unit_dict)
+        ipc_arr = unit_table.ipc_arr
+
+        attack_unit_names = ["infantry"]*3 + ["artillery"]*2 + ["fighter"]*2 + ["cruiser"]
+        defense_unit_names = ["infantry"]*4 + ["anti-aircraft artillery"] + ["tank"]
+        attack_units = [unit_dict[x].copy() for x in attack_unit_names]
+        defense_units = [unit_dict[x].copy() for x in defense_unit_names]
+
+        N_sim = 4000
+        single_remain_ipc = []
+        for i in range(N_sim):
+            _, remain_attack_units, remain_defense_units = combat.run_combat(
+                attack_units, defense_units, combat.BATTLE_TYPE_AMPHIBIOUS
+            )[-1]
+            single_remain_ipc.append(sum([x.ipc for x in remain_attack_units]) - sum([x.ipc for x in remain_defense_units]))
+        single_mean = numpy.mean(single_remain_ipc)
+
+        r = combat.run_combat_batch(
+            unit_table, unit_table.build_counts_from_names(attack_unit_names),
+            unit_table.build_counts_from_names(defense_unit_names), combat.BATTLE_TYPE_AMPHIBIOUS, N_sim
+        )
+        batch_remain_ipc = numpy.sum(r.attack_counts * ipc_arr, axis=1) - numpy.sum(r.defense_counts * ipc_arr, axis=1)
+        batch_mean = numpy.mean(batch_remain_ipc)
+        logger.debug("single_mean:  {}  batch_mean:  {}".format(single_mean, batch_mean))
+
+        std_err = numpy.std(single_remain_ipc) * numpy.sqrt(2. / N_sim)
+        self.assertLess(abs(single_mean - batch_mean), 5*std_err)
+
+    def test_run_combat_army(self):
+        unit_table = unit.build_unit_table(unit_dict)
+
+        attack_army = army.build_army_from_names(unit_table, ["always_hit"]*2 + ["always_miss"])
+        defense_army = army.build_army_from_names(unit_table, ["always_miss"]*3 + ["always_hit"])
+        r = combat.run_combat_army(attack_army, defense_army, combat.BATTLE_TYPE_LAND)
+        logger.debug("r:  {}".format(r))
+
+        self.assertEqual(4, len(r))
+        self.assertEqual(list(attack_army.counts), list(r[0][1].counts))
+        logger.debug("round 1 - always_hit is cheapest so it is lost first")
+        self.assertEqual(2, len(r[1][1]))
+        self.assertEqual(1, r[1][1].counts[unit_table.get_index("always_hit")])
+        self.assertEqual(2, len(r[1][2]))
+        self.assertEqual(0, r[1][2].counts[unit_table.get_index("always_hit")])
+        self.assertEqual(1, len(r[2][2]))
+        self.assertEqual(2, len(r[3][1]))
+        self.assertEqual(0, len(r[3][2]))
+        self.assertEqual(4, len(defense_army))
+
 
 if __name__ == "__main__":
     setup_logger.setup(verbose=True)
@@ -0,0 +1,118 @@
+import unittest
+import logging
+import axis_and_allies.setup_logger as setup_logger
+
+import os
+import tempfile
+
+import numpy
+
+import axis_and_allies.combat as combat
+import axis_and_allies.unit as unit
+import axis_and_allies.combat_cache as combat_cache
+import axis_and_allies.build_unit_dict as build_unit_dict
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+unit_dict = None
+
+
+class TestCombatCache(unittest.TestCase):
+    def test_evaluate_combat_outcome_distribution(self):
+        unit_table = unit.build_unit_table(unit_dict)
+
+        logger.debug("####################")
+        logger.debug("exact solver")
+        attack_counts = unit_table.build_counts_from_names(["infantry"]*2 + ["tank"])
+        defense_counts = unit_table.build_counts_from_names(["infantry"]*2)
+        r = combat_cache.evaluate_combat_outcome_distribution(
+            unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_LAND, 100
+        )
+        logger.debug("r.probability:  {}".format(r.probability))
+        self.assertAlmostEqual(1., numpy.sum(r.probability))
+        self.assertEqual(r.probability.shape, r.combat_result_metric.diff_ipc.shape)
+
+        logger.debug("####################")
+        logger.debug("submarines fall back to sampling")
+        attack_counts = unit_table.build_counts_from_names(["submarine"]*2)
+        defense_counts = unit_table.build_counts_from_names(["destroyer"])
+        N_sim = 100
+        r = combat_cache.evaluate_combat_outcome_distribution(
+            unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_NAVAL, N_sim
+        )
+        logger.debug("r.probability:  {}".format(r.probability))
+        self.assertAlmostEqual(1., numpy.sum(r.probability))
+        self.assertTrue(all(numpy.isclose(numpy.round(r.probability * N_sim), r.probability * N_sim)))
+        merged_counts = numpy.hstack([r.attack_counts, r.defense_counts])
+        self.assertEqual(merged_counts.shape[0], numpy.unique(merged_counts, axis=0).shape[0])
+
+    def test_get(self):
+        unit_table = unit.build_unit_table(unit_dict)
+        c = combat_cache.CombatCache(unit_table, max_size=2)
+
+        infantry_counts = unit_table.build_counts_from_names(["infantry"])
+        tank_counts = unit_table.build_counts_from_names(["tank"])
+        artillery_counts = unit_table.build_counts_from_names(["artillery"])
+
+        r = c.get(infantry_counts, tank_counts, combat.BATTLE_TYPE_LAND)
+        s = c.get(infantry_counts, tank_counts, combat.BATTLE_TYPE_LAND)
+        logger.debug("c:  {}".format(c))
+        self.assertIs(r, s)
+        self.assertEqual(1, c.num_hits)
+        self.assertEqual(1, c.num_misses)
+
+        c.get(infantry_counts, artillery_counts, combat.BATTLE_TYPE_LAND)
+        c.get(infantry_counts, tank_counts, combat.BATTLE_TYPE_LAND)
+        c.get(tank_counts, tank_counts, combat.BATTLE_TYPE_LAND)
+        logger.debug("least recently used entry is evicted c:  {}".format(c))
+        self.assertEqual(2, len(c))
+        self.assertIn(c.build_key(infantry_counts, tank_counts, combat.BATTLE_TYPE_LAND), c.cache_dict)
+        self.assertNotIn(c.build_key(infantry_counts, artillery_counts, combat.BATTLE_TYPE_LAND), c.cache_dict)
+
+        r = c.get_expected_metrics(tank_counts, tank_counts, combat.BATTLE_TYPE_LAND)
+        logger.debug("expected metrics r:  {}".format(r))
+        self.assertAlmostEqual(0., r.diff_ipc)
+
+    def test_save_load(self):
+        unit_table = unit.build_unit_table(unit_dict)
+        c = combat_cache.CombatCache(unit_table)
+        r = c.get_from_names(["infantry"]*2, ["infantry"], combat.BATTLE_TYPE_LAND)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_file = os.path.join(temp_dir, "combat_cache.pkl")
+            c.save(cache_file)
+
+            d = combat_cache.CombatCache(unit_table, cache_file=cache_file)
+            logger.debug("d:  {}".format(d))
+            self.assertEqual(1, len(d))
+            s = d.get_from_names(["infantry"]*2, ["infantry"], combat.BATTLE_TYPE_LAND)
+            self.assertEqual(1, d.num_hits)
+            self.assertEqual(list(r.probability), list(s.probability))
+
+            other_unit_table = unit.UnitTable([unit_dict["infantry"]])
+            with self.assertRaises(combat_cache.AxisAndAlliesCombatCacheUnitMismatchException) as context:
+                combat_cache.CombatCache(other_unit_table, cache_file=cache_file)
+            logger.debug("context.exception:  {}".format(context.exception))
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units(do_add_test_units=True)
+
+    unittest.main()
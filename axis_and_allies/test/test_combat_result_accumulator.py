@@ -0,0 +1,94 @@
+import unittest
+import logging
+import axis_and_allies.setup_logger as setup_logger
+
+import numpy
+
+import axis_and_allies.combat_result_accumulator as combat_result_accumulator
+import axis_and_allies.run_simulation as run_simulation
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+
+
+class TestCombatResultAccumulator(unittest.TestCase):
+    def test_add(self):
+        diff_ipc = numpy.array([6, -3, 0, 6, 2, -9])
+        attack_ipc = numpy.maximum(diff_ipc, 0)
+        defense_ipc = numpy.maximum(-diff_ipc, 0)
+        fraction_ipc_winner = diff_ipc / 12.
+        num_rounds = numpy.array([1, 3, 2, 1, 1, 4])
+
+        r = combat_result_accumulator.CombatResultAccumulator(12, 9)
+        logger.debug("adding as one block and one at a time give the same result")
+        r.add(run_simulation.CombatResultMetric(attack_ipc[:2], defense_ipc[:2], diff_ipc[:2],
+                                                fraction_ipc_winner[:2]), num_rounds[:2])
+        for i in range(2, diff_ipc.shape[0]):
+            r.add(run_simulation.CombatResultMetric(attack_ipc[i], defense_ipc[i], diff_ipc[i],
+                                                    fraction_ipc_winner[i]), num_rounds[i])
+        logger.debug("r:  {}".format(r))
+
+        self.assertEqual(6, len(r))
+        mean = r.calculate_mean()
+        variance = r.calculate_variance()
+        self.assertAlmostEqual(numpy.mean(diff_ipc), mean["diff_ipc"])
+        self.assertAlmostEqual(numpy.var(diff_ipc), variance["diff_ipc"])
+        self.assertAlmostEqual(numpy.var(fraction_ipc_winner), variance["fraction_ipc_winner"])
+        self.assertAlmostEqual(numpy.mean(attack_ipc), mean["attack_ipc"])
+
+        self.assertEqual(list(numpy.sort(diff_ipc)), list(r.build_diff_ipc_values()))
+        self.assertAlmostEqual(numpy.mean(num_rounds), r.calculate_mean_num_rounds())
+
+        diff_ipc_arr, cumulative_fraction_arr = r.build_ecdf()
+        self.assertEqual([-9, -3, 0, 2, 6], list(diff_ipc_arr))
+        self.assertEqual([1/6, 2/6, 3/6, 4/6, 1.], list(cumulative_fraction_arr))
+
+        self.assertEqual([-9, 0, 6, 6], list(r.calculate_diff_ipc_quantile([0., 0.5, 0.9, 1.])))
+
+    def test_merge(self):
+        rng = numpy.random.RandomState(3)
+        diff_ipc = rng.randint(-20, 31, 1000)
+        fraction_ipc_winner = rng.rand(1000)
+        num_rounds = rng.randint(1, 8, 1000)
+
+        def build_accumulator(index):
+            r = combat_result_accumulator.CombatResultAccumulator(30, 20)
+            r.add(run_simulation.CombatResultMetric(diff_ipc[index], diff_ipc[index], diff_ipc[index],
+                                                    fraction_ipc_winner[index]), num_rounds[index])
+            return r
+
+        expected = build_accumulator(numpy.arange(1000))
+        r = combat_result_accumulator.merge_accumulators(
+            [build_accumulator(numpy.arange(x, min(x + 300, 1000))) for x in range(0, 1000, 300)]
+        )
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(len(expected), len(r))
+        for k, v in expected.calculate_variance().items():
+            self.assertAlmostEqual(v, r.calculate_variance()[k])
+        self.assertEqual(list(expected.diff_ipc_count_arr), list(r.diff_ipc_count_arr))
+        self.assertEqual(list(expected.num_rounds_count_arr), list(r.num_rounds_count_arr))
+        self.assertEqual(numpy.median(diff_ipc), r.calculate_diff_ipc_quantile(0.5))
+
+        with self.assertRaises(combat_result_accumulator.AxisAndAlliesCombatResultAccumulatorMismatchException):
+            r.merge(combat_result_accumulator.CombatResultAccumulator(30, 21))
+
+    def test_metric_fields(self):
+        self.assertEqual(list(run_simulation.CombatResultMetric._fields), combat_result_accumulator.METRIC_FIELDS)
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unittest.main()
@@ -0,0 +1,215 @@
+import unittest
+import logging
+import axis_and_allies.setup_logger as setup_logger
+
+import numpy
+
+import axis_and_allies.combat as combat
+import axis_and_allies.unit as unit
+import axis_and_allies.exact_combat as exact_combat
+import axis_and_allies.build_unit_dict as build_unit_dict
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+unit_dict = None
+
+
+class TestExactCombat(unittest.TestCase):
+    def test_calculate_hit_distribution(self):
+        r = exact_combat.calculate_hit_distribution([])
+        logger.debug("no units r:  {}".format(r))
+        self.assertEqual([1.], list(r))
+
+        r = exact_combat.calculate_hit_distribution([3, 3])
+        logger.debug("two units hitting on 3 r:  {}".format(r))
+        self.assertEqual(3, r.shape[0])
+        self.assertAlmostEqual(0.25, r[0])
+        self.assertAlmostEqual(0.5, r[1])
+        self.assertAlmostEqual(0.25, r[2])
+
+        r = exact_combat.calculate_hit_distribution([7, 0])
+        logger.debug("always hit and always miss r:  {}".format(r))
+        self.assertAlmostEqual(1., r[1])
+
+    def test_fold_hit_distribution(self):
+        r = exact_combat.fold_hit_distribution(numpy.array([0.1, 0.2, 0.3, 0.4]), 1)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(2, r.shape[0])
+        self.assertAlmostEqual(0.1, r[0])
+        self.assertAlmostEqual(0.9, r[1])
+
+        r = exact_combat.fold_hit_distribution(numpy.array([0.5, 0.5]), 3)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual([0.5, 0.5, 0., 0.], list(r))
+
+    def test_build_attack_to_hit_list(self):
+        unit_table = unit.build_unit_table(unit_dict).build_sorted_by_loss_order()
+        counts = unit_table.build_counts_from_names(["infantry"]*3 + ["artillery"]*2 + ["tank"])
+
+        r = exact_combat.build_attack_to_hit_list(unit_table, counts)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual([2, 2, 1, 2, 2, 3], list(r))
+
+    def test_calculate_exact_combat_outcome(self):
+        unit_table = unit.build_unit_table(unit_dict)
+
+        logger.debug("####################")
+        logger.debug("attack always hits, defense always misses")
+        attack_counts = unit_table.build_counts_from_names(["always_hit"]*2)
+        defense_counts = unit_table.build_counts_from_names(["always_miss"]*3)
+        r = exact_combat.calculate_exact_combat_outcome(
+            unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_LAND
+        )
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(1, r.probability.shape[0])
+        self.assertAlmostEqual(1., r.probability[0])
+        self.assertEqual(list(attack_counts), list(r.attack_counts[0]))
+        self.assertEqual(0, r.defense_counts.sum())
+
+        logger.debug("####################")
+        logger.debug("compare with batch simulation")
+        attack_counts = unit_table.build_counts_from_names(
+            ["infantry"]*3 + ["artillery"]*2 + ["fighter"]*2 + ["cruiser"]
+        )
+        defense_counts = unit_table.build_counts_from_names(["infantry"]*4 + ["anti-aircraft artillery"] + ["tank"])
+        r = exact_combat.calculate_exact_combat_outcome(
+            unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_AMPHIBIOUS
+        )
+        logger.debug("r.probability:  {}".format(r.probability))
+        self.assertAlmostEqual(1., numpy.sum(r.probability))
+        self.assertTrue(all(r.probability[:-1] >= r.probability[1:]))
+        self.assertTrue(all((r.attack_counts.sum(axis=1) == 0) | (r.defense_counts.sum(axis=1) == 0)))
+
+        exact_remain_ipc = (
+            numpy.sum(r.attack_counts * unit_table.ipc_arr, axis=1)
+            - numpy.sum(r.defense_counts * unit_table.ipc_arr, axis=1)
+        )
+        exact_mean = numpy.sum(exact_remain_ipc * r.probability)
+
+        numpy.random.seed(11)
+        N_sim = 100000
+        s = combat.run_combat_batch(unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_AMPHIBIOUS, N_sim)
+        batch_remain_ipc = (
+            numpy.sum(s.attack_counts * unit_table.ipc_arr, axis=1)
+            - numpy.sum(s.defense_counts * unit_table.ipc_arr, axis=1)
+        )
+        batch_mean = numpy.mean(batch_remain_ipc)
+        logger.debug("exact_mean:  {}  batch_mean:  {}".format(exact_mean, batch_mean))
+        self.assertLess(abs(exact_mean - batch_mean), 5*numpy.std(batch_remain_ipc)/numpy.sqrt(N_sim))
+
+    def test_calculate_exact_combat_outcome_submarines(self):
+        unit_table = unit.build_unit_table(unit_dict)
+
+        logger.debug("submarine hits cannot be taken by air units")
+        attack_counts = unit_table.build_counts_from_names(["submarine"]*2)
+        defense_counts = unit_table.build_counts_from_names(["fighter"])
+        r = exact_combat.calculate_exact_combat_outcome(
+            unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_NAVAL
+        )
+        logger.debug("r:  {}".format(r))
+        exact_attack_survival = numpy.sum(r.probability[r.attack_counts.sum(axis=1) > 0])
+        self.assertAlmostEqual(0., exact_attack_survival)
+
+        N_sim = 10000
+        s = combat.run_combat_batch(
+            unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_NAVAL, N_sim,
+            numpy.random.default_rng(12)
+        )
+        batch_attack_survival = numpy.mean(s.attack_counts.sum(axis=1) > 0)
+        logger.debug("exact_attack_survival:  {}  batch_attack_survival:  {}".format(
+            exact_attack_survival, batch_attack_survival
+        ))
+        self.assertEqual(0., batch_attack_survival)
+
+        logger.debug("the other attackers still hit the air units")
+        attack_counts = unit_table.build_counts_from_names(["submarine"]*2 + ["fighter"])
+        defense_counts = unit_table.build_counts_from_names(["fighter"])
+        r = exact_combat.calculate_exact_combat_outcome(
+            unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_NAVAL
+        )
+        exact_attack_survival = numpy.sum(r.probability[r.attack_counts.sum(axis=1) > 0])
+        s = combat.run_combat_batch(
+            unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_NAVAL, N_sim,
+            numpy.random.default_rng(13)
+        )
+        batch_attack_survival = numpy.mean(s.attack_counts.sum(axis=1) > 0)
+        logger.debug("exact_attack_survival:  {}  batch_attack_survival:  {}".format(
+            exact_attack_survival, batch_attack_survival
+        ))
+        self.assertLess(abs(exact_attack_survival - batch_attack_survival), 0.02)
+
+    def test_calculate_exact_combat_outcome_exceptions(self):
+        unit_table = unit.build_unit_table(unit_dict)
+
+        attack_counts = unit_table.build_counts_from_names(["submarine"])
+        defense_counts = unit_table.build_counts_from_names(["cruiser"])
+        with self.assertRaises(exact_combat.AxisAndAlliesExactCombatUnsupportedException) as context:
+            exact_combat.calculate_exact_combat_outcome(
+                unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_NAVAL
+            )
+        logger.debug("context.exception:  {}".format(context.exception))
+
+        attack_counts = unit_table.build_counts_from_names(["always_miss"])
+        defense_counts = unit_table.build_counts_from_names(["always_miss"])
+        with self.assertRaises(exact_combat.AxisAndAlliesCombatStalemateException) as context:
+            exact_combat.calculate_exact_combat_outcome(
+                unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_LAND
+            )
+        logger.debug("context.exception:  {}".format(context.exception))
+
+    def test_calculate_exact_combat_rounds(self):
+        unit_table = unit.build_unit_table(unit_dict)
+        attack_counts = unit_table.build_counts_from_names(["infantry"]*3 + ["tank"])
+        defense_counts = unit_table.build_counts_from_names(["infantry"]*3)
+
+        max_rounds = 60
+        r = exact_combat.calculate_exact_combat_rounds(
+            unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_LAND, max_rounds
+        )
+        self.assertEqual(max_rounds+1, len(r))
+
+        logger.debug("r[0]:  {}".format(r[0]))
+        self.assertEqual(1, r[0].probability.shape[0])
+        self.assertEqual(list(attack_counts), list(r[0].attack_counts[0]))
+        for x in r:
+            self.assertAlmostEqual(1., numpy.sum(x.probability))
+
+        terminal = exact_combat.calculate_exact_combat_outcome(
+            unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_LAND
+        )
+        last_round_dict = {
+            (tuple(a), tuple(d)):p for a, d, p in zip(r[-1].attack_counts, r[-1].defense_counts, r[-1].probability)
+        }
+        for a, d, p in zip(terminal.attack_counts, terminal.defense_counts, terminal.probability):
+            self.assertAlmostEqual(p, last_round_dict[(tuple(a), tuple(d))], places=6)
+
+    def test_calculate_ecdf(self):
+        values, cumulative_probability = exact_combat.calculate_ecdf([3, 1, 3, 2], [0.1, 0.2, 0.3, 0.4])
+        logger.debug("values:  {}  cumulative_probability:  {}".format(values, cumulative_probability))
+        self.assertEqual([1, 2, 3], list(values))
+        self.assertAlmostEqual(0.2, cumulative_probability[0])
+        self.assertAlmostEqual(0.6, cumulative_probability[1])
+        self.assertAlmostEqual(1., cumulative_probability[2])
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units(do_add_test_units=True)
+
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+import logging
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.region as region
+import axis_and_allies.zobrist as zobrist
+import axis_and_allies.game_state as game_state
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+unit_dict = None
+
+UNIT_NAMES = ["infantry", "tank", "fighter"]
+
+
+def calculate_expected_hash(my_game_state):
+    return zobrist.calculate_hash(
+        my_game_state.zobrist_keys, my_game_state.build_unit_count_arr(), my_game_state.build_owner_arr(),
+        my_game_state.build_has_industry_arr(), my_game_state.player, my_game_state.ipc_bank_arr
+    )
+
+
+class TestGameState(unittest.TestCase):
+    def test___init__(self):
+        r = game_state.GameState()
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(0, r.zobrist_hash)
+        self.assertEqual((0, 0), r.unit_count_arr.shape)
+
+    def test_build_game_state(self):
+        _, region_status_dict = region.load_from_txt("../region_data.txt")
+        region_id_list = sorted(region_status_dict.keys())
+        region_status_dict[region_id_list[0]].unit_list = [unit_dict["infantry"].copy(), unit_dict["tank"].copy()]
+
+        r = game_state.build_game_state(region_status_dict, UNIT_NAMES, owner_dict={region_id_list[0]:1},
+                                        ipc_bank_arr=[10, 20])
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(region_id_list, r.region_id_list)
+        self.assertEqual(1, r.get_unit_count(0, r.get_unit_index("tank")))
+        self.assertEqual(1, r.get_owner(r.get_region_index(region_id_list[0])))
+        self.assertEqual(game_state.NO_OWNER, r.get_owner(1))
+        self.assertEqual(region_status_dict[region_id_list[0]].has_industry, r.get_has_industry(0))
+        self.assertEqual([10, 20], list(r.ipc_bank_arr))
+        self.assertEqual(calculate_expected_hash(r), r.zobrist_hash)
+
+        r = game_state.load_game_state("../region_data.txt", UNIT_NAMES)
+        self.assertEqual(len(region_id_list), len(r.region_id_list))
+
+    def test_copy(self):
+        parent = game_state.load_game_state("../region_data.txt", UNIT_NAMES, ipc_bank_arr=[10, 20])
+        parent.add_units(0, 0, 3)
+        parent.set_owner(0, 0)
+        parent_hash = parent.zobrist_hash
+
+        child = parent.copy()
+        logger.debug("child starts with no changes and no arrays of its own")
+        self.assertEqual(0, child.calculate_num_changes())
+        self.assertIsNone(child.unit_count_arr)
+        self.assertEqual(parent_hash, child.zobrist_hash)
+
+        child.move_units(0, 1, 0, 2)
+        child.set_owner(1, 0)
+        child.set_has_industry(2, True)
+        child.add_ipc(0, -5)
+        child.set_player(1)
+        logger.debug("child:  {}".format(child))
+        self.assertEqual(1, child.get_unit_count(0, 0))
+        self.assertEqual(2, child.get_unit_count(1, 0))
+        self.assertEqual(0, child.get_owner(0))
+        self.assertEqual(4, child.calculate_num_changes())
+        self.assertEqual(calculate_expected_hash(child), child.zobrist_hash)
+
+        logger.debug("parent is unchanged and frozen")
+        self.assertEqual(3, parent.get_unit_count(0, 0))
+        self.assertEqual(0, parent.get_unit_count(1, 0))
+        self.assertEqual([10, 20], list(parent.ipc_bank_arr))
+        self.assertEqual(parent_hash, parent.zobrist_hash)
+        with self.assertRaises(game_state.AxisAndAlliesGameStateException):
+            parent.add_units(0, 0, 1)
+
+        logger.debug("a grandchild undoing the changes has the parent's hash")
+        grandchild = child.copy()
+        grandchild.move_units(1, 0, 0, 2)
+        grandchild.set_owner(1, game_state.NO_OWNER)
+        grandchild.set_has_industry(2, parent.get_has_industry(2))
+        grandchild.set_player(0)
+        logger.debug("states that differ only in the IPC bank have different hashes")
+        self.assertNotEqual(parent_hash, grandchild.zobrist_hash)
+        grandchild.add_ipc(0, 5)
+        self.assertEqual(parent_hash, grandchild.zobrist_hash)
+        self.assertTrue(numpy.array_equal(parent.build_unit_count_arr(), grandchild.build_unit_count_arr()))
+        self.assertEqual([3, 0, 0], list(grandchild.build_region_unit_counts(0)))
+
+        with self.assertRaises(game_state.AxisAndAlliesGameStateException):
+            grandchild.add_units(0, 1, -1)
+
+    def test_large_unit_count(self):
+        r = game_state.load_game_state("../region_data.txt", UNIT_NAMES)
+        initial_hash = r.zobrist_hash
+        r.add_units(0, 0, zobrist.DEFAULT_MAX_UNIT_COUNT + 10)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(zobrist.DEFAULT_MAX_UNIT_COUNT + 10, r.get_unit_count(0, 0))
+        self.assertEqual(calculate_expected_hash(r), r.zobrist_hash)
+
+        large_hash = r.zobrist_hash
+        r.add_units(0, 0, 1)
+        self.assertNotEqual(large_hash, r.zobrist_hash)
+        r.add_units(0, 0, -zobrist.DEFAULT_MAX_UNIT_COUNT - 11)
+        self.assertEqual(initial_hash, r.zobrist_hash)
+
+    def test_copy_flatten(self):
+        cur = game_state.load_game_state("../region_data.txt", UNIT_NAMES)
+        for i in range(2 * game_state.MAX_DIFF_DEPTH + 1):
+            cur = cur.copy()
+            cur.add_units(i % len(cur.region_id_list), 1, 1)
+            self.assertLessEqual(cur.diff_depth, game_state.MAX_DIFF_DEPTH)
+
+        logger.debug("cur:  {}".format(cur))
+        self.assertEqual(2 * game_state.MAX_DIFF_DEPTH + 1, numpy.sum(cur.build_unit_count_arr()))
+        self.assertEqual(calculate_expected_hash(cur), cur.zobrist_hash)
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units()
+
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+import logging
+import axis_and_allies.setup_logger as setup_logger
+
+import os
+import tempfile
+
+import numpy
+
+import axis_and_allies.unit as unit
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.generate_training_data as generate_training_data
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+
+unit_dict = None
+
+
+class TestGenerateTrainingData(unittest.TestCase):
+    def test_build_random_force_counts(self):
+        ipc_arr = numpy.array([3, 4, 6])
+        IPC_limit_arr = numpy.array([0, 2, 3, 10, 100, 100])
+
+        r = generate_training_data.build_random_force_counts(ipc_arr, IPC_limit_arr, numpy.random.default_rng(3))
+        logger.debug("r:  {}".format(r))
+        cost_arr = r @ ipc_arr
+        self.assertTrue(numpy.all(cost_arr <= IPC_limit_arr))
+        self.assertEqual([0, 0], cost_arr[:2].tolist())
+        self.assertLess(0, cost_arr[4])
+
+        logger.debug("units are drawn uniformly")
+        r = generate_training_data.build_random_force_counts(
+            ipc_arr, numpy.full(10000, 1000), numpy.random.default_rng(4)
+        )
+        unit_fraction = r.sum(axis=0) / r.sum()
+        logger.debug("unit_fraction:  {}".format(unit_fraction))
+        numpy.testing.assert_allclose(numpy.full(3, 1./3), unit_fraction, atol=0.01)
+
+    def test_build_IPC_arr(self):
+        rng = numpy.random.default_rng(5)
+        r = numpy.concatenate([
+            generate_training_data.build_IPC_arr(generate_training_data.SAMPLING_STRATIFIED, 10, 14, 4, i, rng)
+            for i in range(5)
+        ])
+        logger.debug("r:  {}".format(r))
+        self.assertEqual([4]*5, numpy.bincount(r)[10:].tolist())
+
+        r = generate_training_data.build_IPC_arr(generate_training_data.SAMPLING_RANDOM, 10, 14, 100, 0, rng)
+        self.assertEqual(10, r.min())
+        self.assertEqual(14, r.max())
+
+        with self.assertRaises(generate_training_data.AxisAndAlliesGenerateTrainingDataException):
+            generate_training_data.build_IPC_arr("fake", 10, 14, 100, 0, rng)
+
+    def test_generate_training_data(self):
+        kwargs = {"num_shards":2, "shard_num_configs":50, "N_sim_per_config":2, "IPC_min":5, "IPC_max":30, "seed":7}
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            r = generate_training_data.generate_training_data(unit_dict, output_dir, **kwargs)
+            self.assertEqual(200, r)
+
+            data_df = generate_training_data.load_training_data(output_dir)
+            logger.debug("data_df:\n{}".format(data_df))
+            self.assertEqual(200, data_df.shape[0])
+
+            possible_units = generate_training_data.select_possible_units(unit_dict)
+            ipc_arr = unit.UnitTable(possible_units).ipc_arr
+            attack_counts = data_df[[x.name + "_attack" for x in possible_units]].to_numpy()
+            defense_counts = data_df[[x.name + "_defense" for x in possible_units]].to_numpy()
+            numpy.testing.assert_array_equal(attack_counts @ ipc_arr, data_df.attack_IPC)
+            numpy.testing.assert_array_equal(defense_counts @ ipc_arr, data_df.defense_IPC)
+            self.assertTrue(numpy.all(data_df.attack_IPC <= data_df.IPC))
+            self.assertTrue(numpy.all(data_df.diff_remain_IPC <= data_df.attack_IPC))
+            self.assertTrue(numpy.all(-data_df.diff_remain_IPC <= data_df.defense_IPC))
+            self.assertTrue(numpy.all(numpy.abs(data_df.frac_diff_remain_IPC) <= 1.))
+            logger.debug("each configuration is simulated N_sim_per_config times")
+            numpy.testing.assert_array_equal(attack_counts[::2], attack_counts[1::2])
+
+            logger.debug("resume after losing a shard makes the same shard again, other shards are not rewritten")
+            shard_file_0 = generate_training_data.build_shard_file(output_dir, 0)
+            shard_file_1 = generate_training_data.build_shard_file(output_dir, 1)
+            mtime_0 = os.path.getmtime(shard_file_0)
+            os.remove(shard_file_1)
+            r = generate_training_data.generate_training_data(unit_dict, output_dir, **dict(kwargs, seed=None))
+            self.assertEqual(100, r)
+            self.assertEqual(mtime_0, os.path.getmtime(shard_file_0))
+            resumed_df = generate_training_data.load_training_data(output_dir)
+            self.assertTrue(resumed_df.equals(data_df))
+
+            logger.debug("more shards can be added")
+            r = generate_training_data.generate_training_data(unit_dict, output_dir, **dict(kwargs, num_shards=3))
+            self.assertEqual(100, r)
+            self.assertEqual(300, generate_training_data.load_training_data(output_dir).shape[0])
+            self.assertEqual(100, generate_training_data.load_training_data(output_dir, max_num_shards=1).shape[0])
+
+            with self.assertRaises(generate_training_data.AxisAndAlliesGenerateTrainingDataException) as context:
+                generate_training_data.generate_training_data(unit_dict, output_dir, **dict(kwargs, IPC_max=40))
+            logger.debug("context.exception:  {}".format(context.exception))
+            self.assertIn("IPC_max", str(context.exception))
+
+    def test_generate_training_data_n_workers(self):
+        kwargs = {"num_shards":3, "shard_num_configs":20, "IPC_min":5, "IPC_max":30, "seed":8}
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            generate_training_data.generate_training_data(unit_dict, output_dir, n_workers=1, **kwargs)
+            expected_df = generate_training_data.load_training_data(output_dir)
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            generate_training_data.generate_training_data(unit_dict, output_dir, n_workers=2, **kwargs)
+            r = generate_training_data.load_training_data(output_dir)
+
+        self.assertTrue(r.equals(expected_df))
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units("../unit_data.json")
+
+    unittest.main()
@@ -0,0 +1,143 @@
+import unittest
+import logging
+import axis_and_allies.setup_logger as setup_logger
+
+import itertools
+import os
+import tempfile
+
+import numpy
+import pandas
+
+import axis_and_allies.combat as combat
+import axis_and_allies.unit as unit
+import axis_and_allies.combat_cache as combat_cache
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.battle_value_estimator as battle_value_estimator
+import axis_and_allies.generate_training_data as generate_training_data
+import axis_and_allies.neural_net_training as neural_net_training
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+
+unit_dict = None
+
+UNIT_NAMES = ["infantry", "tank"]
+MAX_COUNT = 5
+
+
+def build_exact_data_df():
+    # same columns as run_simulation.collect_data_for_modeling with the expected result of each battle from the exact
+    # solver in place of simulated results
+    unit_table = unit.UnitTable([unit_dict[x] for x in UNIT_NAMES])
+    data_dict = {x:[] for x in ["attack_IPC", "defense_IPC", "diff_remain_IPC", "frac_diff_remain_IPC"]}
+    data_dict.update({x + "_attack":[] for x in UNIT_NAMES})
+    data_dict.update({x + "_defense":[] for x in UNIT_NAMES})
+
+    count_list = list(itertools.product(range(MAX_COUNT), repeat=len(UNIT_NAMES)))
+    for attack_counts, defense_counts in itertools.product(count_list, count_list):
+        attack_counts = numpy.array(attack_counts)
+        defense_counts = numpy.array(defense_counts)
+        combat_outcome_distribution = combat_cache.evaluate_combat_outcome_distribution(
+            unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_LAND, 100
+        )
+        expected_metrics = combat_cache.calculate_expected_metrics(combat_outcome_distribution)
+
+        for name, attack_count, defense_count in zip(UNIT_NAMES, attack_counts, defense_counts):
+            data_dict[name + "_attack"].append(attack_count)
+            data_dict[name + "_defense"].append(defense_count)
+        data_dict["attack_IPC"].append(attack_counts @ unit_table.ipc_arr)
+        data_dict["defense_IPC"].append(defense_counts @ unit_table.ipc_arr)
+        data_dict["diff_remain_IPC"].append(expected_metrics.diff_ipc)
+        data_dict["frac_diff_remain_IPC"].append(expected_metrics.fraction_ipc_winner)
+
+    return pandas.DataFrame(data_dict)
+
+
+class TestNeuralNetTraining(unittest.TestCase):
+    def test_load_sim_data(self):
+        data_df = pandas.DataFrame({
+            "IPC":[10, 10, 10], "attack_IPC":[9, 0, 6], "defense_IPC":[6, 0, 9], "diff_remain_IPC":[3, 0, -3],
+            "infantry_attack":[3, 0, 2], "infantry_defense":[2, 0, 3]
+        })
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            output_file = os.path.join(output_dir, "sim_data.txt")
+            data_df.to_csv(output_file, sep="\t")
+            r = neural_net_training.load_sim_data(output_file)
+
+        logger.debug("r:\n{}".format(r))
+        logger.debug("the battle where neither side bought anything is dropped")
+        self.assertEqual([0, 2], list(r.index))
+        numpy.testing.assert_allclose([1./3, -1./3], r.frac_diff_remain_IPC)
+        self.assertEqual(["infantry"], neural_net_training.find_unit_names(r))
+
+        logger.debug("directory of generate_training_data shards")
+        with tempfile.TemporaryDirectory() as output_dir:
+            generate_training_data.generate_training_data(
+                unit_dict, output_dir, num_shards=1, shard_num_configs=20, seed=2
+            )
+            r = neural_net_training.load_sim_data(output_dir)
+        self.assertLessEqual(r.shape[0], 20)
+        self.assertEqual(
+            [x.name for x in generate_training_data.select_possible_units(unit_dict)],
+            neural_net_training.find_unit_names(r)
+        )
+
+    def test_split_train_test(self):
+        data_df = pandas.DataFrame({
+            "infantry_attack":numpy.repeat(numpy.arange(10), 3), "infantry_defense":numpy.ones(30, dtype=int)
+        })
+
+        train_df, test_df = neural_net_training.split_train_test(data_df, ["infantry"], test_fraction=0.2, seed=7)
+        logger.debug("test_df:\n{}".format(test_df))
+        self.assertEqual(24, train_df.shape[0])
+        self.assertEqual(6, test_df.shape[0])
+        self.assertEqual(set(), set(train_df.infantry_attack) & set(test_df.infantry_attack))
+
+    def test_train_estimator(self):
+        data_df = build_exact_data_df()
+        train_df, test_df = neural_net_training.split_train_test(
+            data_df, UNIT_NAMES, test_fraction=0.2, seed=3
+        )
+
+        estimator = neural_net_training.train_estimator(
+            train_df, unit_dict, hidden_layer_sizes=(32, 32), max_iter=2000, seed=5
+        )
+        logger.debug("estimator:  {}".format(estimator))
+        self.assertEqual(UNIT_NAMES, estimator.unit_names)
+
+        calibration_report = battle_value_estimator.build_calibration_report(estimator, test_df, num_bins=5)
+        logger.debug("format_calibration_report:\n{}".format(
+            battle_value_estimator.format_calibration_report(calibration_report)
+        ))
+        calibration_summary, _ = calibration_report["diff_remain_IPC"]
+        self.assertGreater(calibration_summary.r2, 0.9)
+        self.assertGreater(calibration_summary.win_accuracy, 0.85)
+
+        attack_counts, defense_counts = battle_value_estimator.build_counts_from_df(test_df, UNIT_NAMES)
+        r = estimator.predict_battle(attack_counts, defense_counts)
+        self.assertEqual((test_df.shape[0],), r.diff_remain_IPC.shape)
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units("../unit_data.json")
+
+    unittest.main()
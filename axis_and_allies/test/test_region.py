@@ -56,6 +56,19 @@ class TestRegion(unittest.TestCase):
 
         self.assertEqual(set(r_dict.keys()), set(rs_dict.keys()))
 
+    def test_validate_region_connections(self):
+        a = region.Region(id=1)
+        b = region.Region(id=2)
+        c = region.Region(id=3)
+        a.adjacent_regions = [b, c]
+        b.adjacent_regions = [a]
+        c.adjacent_regions = [a]
+        region.validate_region_connections({1:a, 2:b, 3:c})
+
+        c.adjacent_regions = []
+        with self.assertRaises(region.AxisAndAlliesRegionMismatchConnectionsException):
+            region.validate_region_connections({1:a, 2:b, 3:c})
+
     def test_region_status__init__(self):
         r = region.RegionStatus()
         logger.debug("r:  {}".format(r))
@@ -0,0 +1,112 @@
+import unittest
+import logging
+import collections
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.region as region
+import axis_and_allies.region_index as region_index
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+unit_dict = None
+
+
+def build_grid_region_dict(num_rows, num_cols, rng):
+    # grid of regions connected to their 4 neighbors, randomly land or water
+    region_dict = {}
+    for i in range(num_rows * num_cols):
+        region_type = region.REGION_TYPE_LAND if rng.uniform() < 0.6 else region.REGION_TYPE_WATER
+        region_dict[i] = region.Region(id=i, region_type=region_type, ipc_production=1)
+
+    for i in range(num_rows * num_cols):
+        row, col = divmod(i, num_cols)
+        for d_row, d_col in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+            if 0 <= row + d_row < num_rows and 0 <= col + d_col < num_cols:
+                region_dict[i].adjacent_regions.append(region_dict[(row + d_row) * num_cols + col + d_col])
+
+    return region_dict
+
+
+def calculate_bfs_distances(region_dict, source_id, region_type):
+    # reference breadth first search over Region objects
+    r = {source_id:0}
+    queue = collections.deque([region_dict[source_id]])
+    while len(queue) > 0:
+        cur_region = queue.popleft()
+        for adj_region in cur_region.adjacent_regions:
+            if adj_region.id not in r and (region_type is None or adj_region.region_type == region_type):
+                r[adj_region.id] = r[cur_region.id] + 1
+                queue.append(adj_region)
+    return r
+
+
+class TestRegionIndex(unittest.TestCase):
+    def test_load_region_index(self):
+        r = region_index.load_region_index("../region_data.txt", unit_dict)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(11, len(r))
+
+        germany = r.get_region_index(100)
+        self.assertEqual({101, 102, 108, 104, 109}, {r.region_id_list[x] for x in r.get_adjacent_region_indexes(germany)})
+        self.assertEqual(0, r.calculate_distance(germany, germany))
+        self.assertEqual(2, r.calculate_distance(germany, r.get_region_index(110)))
+        self.assertEqual(4, r.calculate_distance(germany, r.get_region_index(107), region.REGION_TYPE_LAND))
+        logger.debug("there are no water regions")
+        self.assertEqual(region_index.UNREACHABLE,
+                         r.calculate_distance(germany, germany, region.REGION_TYPE_WATER))
+
+        logger.debug("reachability is precomputed for every move value")
+        self.assertIn((region.REGION_TYPE_LAND, unit_dict["tank"].move), r.reachable_arr_dict)
+        reachable_ids = {r.region_id_list[x] for x in r.get_unit_reachable_region_indexes(germany, unit_dict["infantry"])}
+        self.assertEqual({100, 101, 102, 108, 104, 109}, reachable_ids)
+        self.assertEqual(11, len(r.get_unit_reachable_region_indexes(germany, unit_dict["bomber"])))
+
+    def test_calculate_distances(self):
+        rng = numpy.random.RandomState(7)
+        region_dict = build_grid_region_dict(12, 15, rng)
+        r = region_index.RegionIndex(region_dict, move_list=[1, 2, 3])
+        logger.debug("r:  {}".format(r))
+
+        for region_type in [None, region.REGION_TYPE_LAND, region.REGION_TYPE_WATER]:
+            distance_arr = r.get_distance_arr(region_type)
+            for source_id in rng.choice(list(region_dict.keys()), 20, replace=False):
+                expected_dict = {}
+                if region_type is None or region_dict[source_id].region_type == region_type:
+                    expected_dict = calculate_bfs_distances(region_dict, source_id, region_type)
+
+                expected = numpy.full(len(r), region_index.UNREACHABLE)
+                for region_id, distance in expected_dict.items():
+                    expected[r.get_region_index(region_id)] = distance
+                self.assertTrue(numpy.array_equal(expected, distance_arr[r.get_region_index(source_id)]))
+
+            reachable_arr = r.build_reachable_arr(region_type, 2)
+            self.assertTrue(numpy.array_equal(distance_arr <= 2, reachable_arr))
+            logger.debug("distances are symmetric")
+            self.assertTrue(numpy.array_equal(distance_arr, distance_arr.T))
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units()
+
+    unittest.main()
@@ -0,0 +1,157 @@
+import unittest
+import logging
+import axis_and_allies.setup_logger as setup_logger
+
+import numpy
+
+import axis_and_allies.combat as combat
+import axis_and_allies.unit as unit
+import axis_and_allies.run_simulation as run_simulation
+import axis_and_allies.build_unit_dict as build_unit_dict
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+unit_dict = None
+
+
+class TestRunSimulation(unittest.TestCase):
+    def test_calculate_metrics_from_counts(self):
+        unit_table = unit.build_unit_table(unit_dict)
+        attack_counts = numpy.array([
+            unit_table.build_counts_from_names(["tank"]),
+            unit_table.build_counts_from_names([]),
+            unit_table.build_counts_from_names([]),
+        ])
+        defense_counts = numpy.array([
+            unit_table.build_counts_from_names([]),
+            unit_table.build_counts_from_names(["infantry"]),
+            unit_table.build_counts_from_names([]),
+        ])
+
+        r = run_simulation.calculate_metrics_from_counts(unit_table.ipc_arr, attack_counts, defense_counts, 12, 6)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual([6, 0, 0], list(r.attack_ipc))
+        self.assertEqual([0, 3, 0], list(r.defense_ipc))
+        self.assertEqual([6, -3, 0], list(r.diff_ipc))
+        self.assertEqual([0.5, -0.5, 0.], list(r.fraction_ipc_winner))
+
+        single_r = run_simulation.calculate_metrics_from_combat_result(
+            (1, [unit_dict["tank"]], []), 12, 6
+        )
+        self.assertEqual(single_r.fraction_ipc_winner, r.fraction_ipc_winner[0])
+
+    def test_build_chunk_N_sim_list(self):
+        r = run_simulation.build_chunk_N_sim_list(10, 4)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual([4, 4, 2], r)
+
+        r = run_simulation.build_chunk_N_sim_list(8, 4)
+        self.assertEqual([4, 4], r)
+
+    def test_run_combat_sims(self):
+        attack_units = run_simulation.build_units_from_names(unit_dict, ["infantry"]*3 + ["tank"])
+        defense_units = run_simulation.build_units_from_names(unit_dict, ["infantry"]*3)
+
+        def calculate_remain_ipc(all_results_list):
+            return [
+                (run_simulation.calculate_sum_ipc(x[-1][1]), run_simulation.calculate_sum_ipc(x[-1][2]))
+                for x in all_results_list
+            ]
+
+        N_sim = 25
+        r = run_simulation.run_combat_sims(
+            attack_units, defense_units, combat.BATTLE_TYPE_LAND, N_sim, n_workers=1, seed=3, chunk_size=4
+        )
+        self.assertEqual(N_sim, len(r))
+
+        s = run_simulation.run_combat_sims(
+            attack_units, defense_units, combat.BATTLE_TYPE_LAND, N_sim, n_workers=3, seed=3, chunk_size=4
+        )
+        logger.debug("same seed different number of workers gives the same results")
+        self.assertEqual(calculate_remain_ipc(r), calculate_remain_ipc(s))
+
+        t = run_simulation.run_combat_sims(
+            attack_units, defense_units, combat.BATTLE_TYPE_LAND, N_sim, n_workers=1, seed=4, chunk_size=4
+        )
+        self.assertNotEqual(calculate_remain_ipc(r), calculate_remain_ipc(t))
+
+        logger.debug("global random state is not changed by a seeded run")
+        numpy.random.seed(5)
+        expected = numpy.random.randint(1000000)
+        numpy.random.seed(5)
+        run_simulation.run_combat_sims(
+            attack_units, defense_units, combat.BATTLE_TYPE_LAND, N_sim, n_workers=1, seed=3, chunk_size=4
+        )
+        self.assertEqual(expected, numpy.random.randint(1000000))
+
+    def test_main(self):
+        attack_units = run_simulation.build_units_from_names(unit_dict, ["infantry"]*3 + ["tank"])
+        defense_units = run_simulation.build_units_from_names(unit_dict, ["infantry"]*3)
+
+        r = run_simulation.main(
+            attack_units, defense_units, "NA", combat.BATTLE_TYPE_LAND, N_sim=20, plot_data_for_round=[0, -1],
+            do_show_fig=False, n_workers=2, seed=1
+        )
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(2, len(r))
+        self.assertTrue(all(r[0] == 6))
+        self.assertEqual(20, r[1].shape[0])
+
+    def test_main_summary_only(self):
+        attack_units = run_simulation.build_units_from_names(unit_dict, ["infantry"]*3 + ["tank"])
+        defense_units = run_simulation.build_units_from_names(unit_dict, ["infantry"]*3)
+
+        diff_ipc_arr_list = run_simulation.main(
+            attack_units, defense_units, "NA", combat.BATTLE_TYPE_LAND, N_sim=30, plot_data_for_round=[1, -1],
+            do_show_fig=False, n_workers=2, seed=1
+        )
+        r = run_simulation.main(
+            attack_units, defense_units, "NA", combat.BATTLE_TYPE_LAND, N_sim=30, plot_data_for_round=[1, -1],
+            do_show_fig=False, n_workers=1, seed=1, summary_only=True
+        )
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(2, len(r))
+        for cur_accumulator, cur_diff_ipc_arr in zip(r, diff_ipc_arr_list):
+            self.assertEqual(30, len(cur_accumulator))
+            self.assertEqual(list(numpy.sort(cur_diff_ipc_arr)), list(cur_accumulator.build_diff_ipc_values()))
+            self.assertAlmostEqual(numpy.mean(cur_diff_ipc_arr), cur_accumulator.calculate_mean()["diff_ipc"])
+
+        logger.debug("every combat lasts at least 1 round")
+        self.assertEqual(0, r[-1].num_rounds_count_arr[0])
+        self.assertEqual(30, r[-1].num_rounds_count_arr.sum())
+
+    def test_run_combat_batch_accumulate(self):
+        unit_table = unit.build_unit_table(unit_dict)
+        attack_counts = unit_table.build_counts_from_names(["always_hit"]*2)
+        defense_counts = unit_table.build_counts_from_names(["always_miss"]*3)
+
+        r = run_simulation.run_combat_batch_accumulate(
+            unit_table, attack_counts, defense_counts, combat.BATTLE_TYPE_LAND, 25, chunk_size=10
+        )
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(25, len(r))
+        self.assertEqual([2*unit_dict["always_hit"].ipc], list(numpy.unique(r.build_diff_ipc_values())))
+        self.assertEqual(2., r.calculate_mean_num_rounds())
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units(do_add_test_units=True)
+
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import logging
+import axis_and_allies.setup_logger as setup_logger
+
+import numpy
+
+import axis_and_allies.strategic_bombing as strategic_bombing
+import axis_and_allies.build_unit_dict as build_unit_dict
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+
+
+unit_dict = None
+
+
+class TestStrategicBombing(unittest.TestCase):
+    def test_run_strategic_bombing_batch(self):
+        N_bomber_arr = numpy.array([0, 1, 4])
+        r_N_bomber_after, r_bomber_damage = strategic_bombing.run_strategic_bombing_batch(N_bomber_arr, 5000)
+        logger.debug("r_N_bomber_after[:, :10]:  {}".format(r_N_bomber_after[:, :10]))
+        logger.debug("r_bomber_damage[:, :10]:  {}".format(r_bomber_damage[:, :10]))
+
+        self.assertEqual((3, 5000), r_N_bomber_after.shape)
+        self.assertEqual((3, 5000), r_bomber_damage.shape)
+        self.assertTrue(numpy.all(r_N_bomber_after <= N_bomber_arr[:, None]))
+        self.assertTrue(numpy.all(r_bomber_damage >= r_N_bomber_after))
+        self.assertTrue(numpy.all(r_bomber_damage <= 6*r_N_bomber_after))
+        self.assertTrue(numpy.all(r_bomber_damage[0] == 0))
+
+        logger.debug("mean damage is 3.5 per surviving bomber, bombers survive with probability 5/6")
+        expected_damage = 3.5 * 5/6 * N_bomber_arr
+        self.assertTrue(numpy.all(numpy.abs(r_bomber_damage.mean(axis=1) - expected_damage) < 0.15))
+
+    def test_run_strategic_bombing_batch_generator(self):
+        N_bomber_arr = numpy.array([2, 3])
+        r_N_bomber_after, r_bomber_damage = strategic_bombing.run_strategic_bombing_batch(
+            N_bomber_arr, 100, numpy.random.default_rng(5)
+        )
+        logger.debug("r_bomber_damage[:, :10]:  {}".format(r_bomber_damage[:, :10]))
+        self.assertEqual((2, 100), r_bomber_damage.shape)
+        self.assertTrue(numpy.all(r_bomber_damage >= r_N_bomber_after))
+        self.assertTrue(numpy.all(r_bomber_damage <= 6*r_N_bomber_after))
+
+        logger.debug("the same seed repeats the trials")
+        e_N_bomber_after, e_bomber_damage = strategic_bombing.run_strategic_bombing_batch(
+            N_bomber_arr, 100, numpy.random.default_rng(5)
+        )
+        self.assertTrue(numpy.array_equal(e_N_bomber_after, r_N_bomber_after))
+        self.assertTrue(numpy.array_equal(e_bomber_damage, r_bomber_damage))
+
+    def test_calculate_damage_distribution(self):
+        r = strategic_bombing.calculate_damage_distribution(2)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(13, r.shape[0])
+        self.assertAlmostEqual(1., r.sum())
+        self.assertAlmostEqual(6/36, r[7])
+        self.assertEqual(0., r[1])
+
+        self.assertEqual([1.], list(strategic_bombing.calculate_damage_distribution(0)))
+
+    def test_calculate_strategic_bombing_distribution(self):
+        bomber_ipc = unit_dict["bomber"].ipc
+        r = strategic_bombing.calculate_strategic_bombing_distribution(3, bomber_ipc, max_bomber_damage=10)
+        logger.debug("r:  {}".format(r))
+        self.assertAlmostEqual(1., r.probability.sum())
+        self.assertTrue(numpy.all(r.clipped_bomber_damage <= 10))
+
+        logger.debug("all 3 shot down")
+        locs = r.N_bomber_after == 0
+        self.assertEqual(1, numpy.sum(locs))
+        self.assertAlmostEqual((1/6)**3, r.probability[locs][0])
+        self.assertEqual(-3*bomber_ipc, r.net_IPC[locs][0])
+
+        expected = strategic_bombing.calculate_expected_strategic_bombing(r)
+        logger.debug("expected:  {}".format(expected))
+        self.assertAlmostEqual(3 * 3.5 * 5/6, expected.bomber_damage)
+        self.assertAlmostEqual(3 * 3.5 * 5/6 - 3 * 1/6 * bomber_ipc, expected.net_IPC)
+        self.assertLess(expected.clipped_bomber_damage, expected.bomber_damage)
+
+        logger.debug("compare against the batch simulation")
+        data_df = strategic_bombing.build_strategic_bombing_data_df(
+            numpy.array([3]), 20000, bomber_ipc, max_bomber_damage=10, rng=numpy.random.default_rng(7)
+        )
+        self.assertLess(abs(expected.clipped_net_IPC - data_df.clipped_net_IPC.mean()), 0.15)
+        self.assertLess(abs(expected.net_IPC - data_df.net_IPC.mean()), 0.15)
+
+    def test_build_exact_strategic_bombing_data_df(self):
+        r = strategic_bombing.build_exact_strategic_bombing_data_df(
+            numpy.array([1, 2]), unit_dict["bomber"].ipc, max_bomber_damage=4
+        )
+        logger.debug("r:\n{}".format(r))
+        for cur_n_bomber in [1, 2]:
+            locs = r.N_bomber_start == cur_n_bomber
+            self.assertAlmostEqual(1., r.loc[locs, "pct_rnk_net_IPC"].max())
+            self.assertAlmostEqual(1., r.loc[locs, "pct_rnk_clipped_net_IPC"].max())
+        self.assertLessEqual(r.clipped_net_IPC.max(), 4)
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units(do_add_test_units=True)
+
+    unittest.main()
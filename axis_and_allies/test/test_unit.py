@@ -67,6 +67,26 @@ class TestUnit(unittest.TestCase):
         self.assertEqual(c.id, r.id)
         self.assertEqual(c.name, r.name)
         self.assertEqual(c.attack, r.attack)
+    def test_build_unit_table(self):
+        with open("../unit_data.json") as file:
+            json_str = file.read().strip()
+        unit_dict = unit.load_from_json(json_str)
+
+        r = unit.build_unit_table(unit_dict)
+        logger.debug("r:  {}".format(r))
+        self.assertEqual(sorted(unit_dict.keys()), r.names)
+        self.assertEqual(unit_dict["tank"].attack, r.attack_arr[r.get_index("tank")])
+        self.assertTrue(r.is_air_arr[r.get_index("fighter")])
+        self.assertTrue(r.can_bombard_arr[r.get_index("battleship")])
+        self.assertIsNone(r.get_index("not_a_unit"))
+
+        sorted_ipc = r.ipc_arr[r.loss_order]
+        self.assertTrue(all(sorted_ipc[:-1] <= sorted_ipc[1:]))
+
+        counts = r.build_counts_from_names(["tank", "infantry", "tank"])
+        self.assertEqual(2, counts[r.get_index("tank")])
+        self.assertEqual(1, counts[r.get_index("infantry")])
+        self.assertEqual(3, counts.sum())
 
 if __name__ == "__main__":
     setup_logger.setup(verbose=True)
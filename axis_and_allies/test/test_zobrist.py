@@ -0,0 +1,116 @@
+import unittest
+import logging
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+import axis_and_allies.build_unit_dict as build_unit_dict
+import axis_and_allies.region as region
+import axis_and_allies.zobrist as zobrist
+
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# Some notes on testing conventions (more in cuppers convention doc):
+#    (1) Use "self.assert..." over "assert"
+#        - self.assert* methods: https://docs.python.org/2.7/library/unittest.html#assert-methods
+#       - This will ensure that if one assertion fails inside a test method,
+#         exectution won't halt and the rest of the test method will be executed
+#         and other assertions are also verified in the same run.  
+#     (2) For testing exceptions use:
+#        with self.assertRaises(some_exception) as context:
+#            [call method that should raise some_exception]
+#        self.assertEqual(str(context.exception), "expected exception message")
+#
+#        self.assertAlmostEquals(...) for comparing floats
+
+
+unit_dict = None
+
+
+class TestZobrist(unittest.TestCase):
+    def test_build_zobrist_keys(self):
+        r = zobrist.build_zobrist_keys(4, 3, max_unit_count=5)
+        logger.debug("r.unit_count_keys.shape:  {}".format(r.unit_count_keys.shape))
+        self.assertEqual((4, 3, 6), r.unit_count_keys.shape)
+        self.assertEqual((4, 2), r.owner_keys.shape)
+        self.assertTrue(numpy.all(r.unit_count_keys[:, :, 0] == 0))
+        self.assertTrue(numpy.all(r.unit_count_keys[:, :, 1:] != 0))
+
+        logger.debug("same seed gives the same keys")
+        r2 = zobrist.build_zobrist_keys(4, 3, max_unit_count=5)
+        self.assertTrue(numpy.array_equal(r.unit_count_keys, r2.unit_count_keys))
+
+    def test_calculate_hash(self):
+        zobrist_keys = zobrist.build_zobrist_keys(3, 2, max_unit_count=10)
+        unit_count_arr = numpy.array([[1, 0], [3, 2], [0, 0]])
+        owner_arr = numpy.array([0, 1, -1])
+        has_industry_arr = numpy.array([True, False, False])
+
+        r = zobrist.calculate_hash(zobrist_keys, unit_count_arr, owner_arr, has_industry_arr, player=0,
+                                   ipc_bank_arr=[0, 0])
+        logger.debug("r:  {}".format(r))
+        self.assertIsInstance(r, numpy.uint64)
+        self.assertNotEqual(0, r)
+
+        logger.debug("incremental updates match hashing from scratch")
+        h = zobrist.update_unit_count(zobrist_keys, r, 1, 0, 3, 7)
+        h = zobrist.update_owner(zobrist_keys, h, 2, -1, 0)
+        h = zobrist.update_industry(zobrist_keys, h, 0)
+        h = zobrist.update_player(zobrist_keys, h, 0, 1)
+        h = zobrist.update_ipc(zobrist_keys, h, 1, 0, 12)
+        unit_count_arr[1, 0] = 7
+        owner_arr[2] = 0
+        has_industry_arr[0] = False
+        expected = zobrist.calculate_hash(zobrist_keys, unit_count_arr, owner_arr, has_industry_arr, player=1,
+                                          ipc_bank_arr=[0, 12])
+        self.assertEqual(expected, h)
+
+        logger.debug("moving a unit between regions changes the hash, moving it back restores it")
+        h2 = zobrist.update_unit_count(zobrist_keys, h, 0, 0, 1, 0)
+        h2 = zobrist.update_unit_count(zobrist_keys, h2, 2, 0, 0, 1)
+        self.assertNotEqual(h, h2)
+        h2 = zobrist.update_unit_count(zobrist_keys, h2, 2, 0, 1, 0)
+        h2 = zobrist.update_unit_count(zobrist_keys, h2, 0, 0, 0, 1)
+        self.assertEqual(h, h2)
+
+        logger.debug("counts above max_unit_count have their own keys")
+        h3 = zobrist.update_unit_count(zobrist_keys, h, 0, 0, 1, 11)
+        h4 = zobrist.update_unit_count(zobrist_keys, h, 0, 0, 1, 12)
+        self.assertEqual(3, len({h, h3, h4}))
+        unit_count_arr[0, 0] = 11
+        self.assertEqual(
+            zobrist.calculate_hash(zobrist_keys, unit_count_arr, owner_arr, has_industry_arr, player=1,
+                                   ipc_bank_arr=[0, 12]),
+            h3
+        )
+        self.assertEqual(h, zobrist.update_unit_count(zobrist_keys, h3, 0, 0, 11, 1))
+
+    def test_build_region_status_arrays(self):
+        region_dict, region_status_dict = region.load_from_txt("../region_data.txt")
+        region_id_list = sorted(region_status_dict.keys())
+        region_status_dict[region_id_list[1]].unit_list = [unit_dict["infantry"].copy(), unit_dict["infantry"].copy(),
+                                                           unit_dict["tank"].copy()]
+        unit_names = ["infantry", "tank"]
+
+        r = zobrist.build_region_status_arrays(region_status_dict, unit_names, owner_dict={region_id_list[0]:1})
+        logger.debug("r:  {}".format(r))
+        cur_region_id_list, unit_count_arr, owner_arr, has_industry_arr = r
+        self.assertEqual(region_id_list, cur_region_id_list)
+        self.assertEqual([2, 1], list(unit_count_arr[1]))
+        self.assertEqual(3, numpy.sum(unit_count_arr))
+        self.assertEqual([1, -1], list(owner_arr[:2]))
+        self.assertEqual([region_status_dict[x].has_industry for x in region_id_list], list(has_industry_arr))
+
+        zobrist_keys = zobrist.build_zobrist_keys(len(region_id_list), len(unit_names))
+        h = zobrist.calculate_hash(zobrist_keys, unit_count_arr, owner_arr, has_industry_arr)
+        logger.debug("h:  {}".format(h))
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unit_dict = build_unit_dict.load_units()
+
+    unittest.main()
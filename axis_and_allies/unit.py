@@ -1,6 +1,8 @@
 import json
 import itertools
 
+import numpy
+
 UNIT_TYPE_NAVAL = "naval"
 UNIT_TYPE_LAND = "land"
 UNIT_TYPE_AIR = "air"
@@ -15,6 +17,8 @@ DESTROYER = "destroyer"
 
 CAN_BOMBARD_NAMES = {CRUISER, BATTLESHIP}
 
+DICE_SIDES = 6
+
 class Unit:
     id_iter = itertools.count()
 
@@ -74,3 +78,63 @@ def load_from_json(json_str):
         unit_dict[name] = new_unit
 
     return unit_dict
+
+
+class UnitTable:
+    def __init__(self, unit_list) -> None:
+        self.unit_list = list(unit_list)
+        self.names = [x.name for x in self.unit_list]
+        self.name_index_dict = {name:i for i, name in enumerate(self.names)}
+
+        self.ipc_arr = numpy.array([x.ipc for x in self.unit_list], dtype=numpy.int64)
+        self.attack_arr = numpy.array([x.attack for x in self.unit_list], dtype=numpy.int64)
+        self.defense_arr = numpy.array([x.defense for x in self.unit_list], dtype=numpy.int64)
+        self.move_arr = numpy.array([x.move for x in self.unit_list], dtype=numpy.int64)
+        self.max_hit_points_arr = numpy.array([x.max_hit_points for x in self.unit_list], dtype=numpy.int64)
+        self.unit_type_arr = numpy.array([x.unit_type for x in self.unit_list], dtype=object)
+
+        self.attack_p_arr = numpy.clip(self.attack_arr / DICE_SIDES, 0., 1.)
+        self.defense_p_arr = numpy.clip(self.defense_arr / DICE_SIDES, 0., 1.)
+
+        self.is_air_arr = self.unit_type_arr == UNIT_TYPE_AIR
+        self.is_land_arr = self.unit_type_arr == UNIT_TYPE_LAND
+        self.is_naval_arr = self.unit_type_arr == UNIT_TYPE_NAVAL
+        self.can_bombard_arr = numpy.array([x in CAN_BOMBARD_NAMES for x in self.names], dtype=bool)
+
+        # order in which units are taken as losses - cheapest first, ties keep table order
+        self.loss_order = numpy.argsort(self.ipc_arr, kind="stable")
+        self.sorted_by_loss_order_table = None
+
+    def __len__(self) -> int:
+        return len(self.unit_list)
+
+    def __str__(self) -> str:
+        return """names:  {}
+ipc_arr:  {}
+attack_arr:  {}
+defense_arr:  {}""".format(self.names, self.ipc_arr, self.attack_arr, self.defense_arr)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def get_index(self, name):
+        return self.name_index_dict.get(name)
+
+    def build_sorted_by_loss_order(self):
+        if self.sorted_by_loss_order_table is None:
+            self.sorted_by_loss_order_table = UnitTable([self.unit_list[i] for i in self.loss_order])
+        return self.sorted_by_loss_order_table
+
+    def build_counts_from_names(self, unit_names):
+        counts = numpy.zeros(len(self), dtype=numpy.int64)
+        for name in unit_names:
+            counts[self.name_index_dict[name]] += 1
+        return counts
+
+    def build_counts_from_units(self, units):
+        return self.build_counts_from_names([x.name for x in units])
+
+
+def build_unit_table(unit_dict):
+    unit_list = [unit_dict[name] for name in sorted(unit_dict.keys())]
+    return UnitTable(unit_list)
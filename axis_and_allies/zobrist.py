@@ -0,0 +1,138 @@
+import logging
+import collections
+
+import numpy
+
+import axis_and_allies.setup_logger as setup_logger
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+# largest count with its own random key, keys of larger counts are computed by find_unit_count_keys
+DEFAULT_MAX_UNIT_COUNT = 63
+DEFAULT_NUM_PLAYERS = 2
+SEED = 20240611
+
+# splitmix64 constants used by mix_keys
+GOLDEN_GAMMA = numpy.uint64(0x9E3779B97F4A7C15)
+MIX_MULTIPLIER_1 = numpy.uint64(0xBF58476D1CE4E5B9)
+MIX_MULTIPLIER_2 = numpy.uint64(0x94D049BB133111EB)
+
+# one random 64 bit key per (region, unit type, count), (region, owner), (region, has industry) and player to move,
+# and a base key per player for the IPC bank.  The hash of a game state is the XOR of the keys of its contents so it
+# can be updated incrementally when one region changes
+ZobristKeys = collections.namedtuple("ZobristKeys",
+    ["unit_count_keys", "owner_keys", "industry_keys", "player_keys", "ipc_keys"]
+)
+
+
+def build_random_keys(rng, shape):
+    return rng.integers(1, numpy.iinfo(numpy.uint64).max, size=shape, dtype=numpy.uint64, endpoint=True)
+
+
+def build_zobrist_keys(num_regions, num_unit_types, max_unit_count=DEFAULT_MAX_UNIT_COUNT,
+                       num_players=DEFAULT_NUM_PLAYERS, seed=SEED):
+    # count 0 has key 0 so empty regions do not change the hash.  Owner NO_OWNER (-1) is not hashed
+    rng = numpy.random.default_rng(seed)
+
+    unit_count_keys = build_random_keys(rng, (num_regions, num_unit_types, max_unit_count + 1))
+    unit_count_keys[:, :, 0] = 0
+
+    return ZobristKeys(
+        unit_count_keys=unit_count_keys, owner_keys=build_random_keys(rng, (num_regions, num_players)),
+        industry_keys=build_random_keys(rng, num_regions), player_keys=build_random_keys(rng, num_players),
+        ipc_keys=build_random_keys(rng, num_players)
+    )
+
+
+def xor_reduce(key_arr):
+    return numpy.bitwise_xor.reduce(key_arr, axis=None) if key_arr.size > 0 else numpy.uint64(0)
+
+
+def mix_keys(key_arr, value_arr):
+    # key for each value of a quantity with too many values to give each its own random key (e.g. an IPC bank):
+    # splitmix64 of the base key plus the value
+    value_arr = numpy.asarray(value_arr, dtype=numpy.int64).astype(numpy.uint64)
+    with numpy.errstate(over="ignore"):
+        r = numpy.asarray(key_arr, dtype=numpy.uint64) + value_arr * GOLDEN_GAMMA
+        r = (r ^ (r >> numpy.uint64(30))) * MIX_MULTIPLIER_1
+        r = (r ^ (r >> numpy.uint64(27))) * MIX_MULTIPLIER_2
+        return r ^ (r >> numpy.uint64(31))
+
+
+def find_unit_count_keys(zobrist_keys, region_index, unit_index, unit_count):
+    # counts above max_unit_count are legal, their keys are mixed from the key of max_unit_count
+    max_unit_count = zobrist_keys.unit_count_keys.shape[2] - 1
+    unit_count = numpy.asarray(unit_count)
+    r = zobrist_keys.unit_count_keys[region_index, unit_index, numpy.minimum(unit_count, max_unit_count)]
+    return numpy.where(unit_count > max_unit_count, mix_keys(r, unit_count), r)
+
+
+def calculate_hash(zobrist_keys, unit_count_arr, owner_arr, has_industry_arr, player=None, ipc_bank_arr=None):
+    # unit_count_arr:  regions x unit types, owner_arr:  owning player of each region (-1 for none),
+    # has_industry_arr:  bool per region, ipc_bank_arr:  IPC of each player
+    num_regions, num_unit_types = unit_count_arr.shape
+    region_index, unit_index = numpy.indices((num_regions, num_unit_types))
+    r = xor_reduce(find_unit_count_keys(zobrist_keys, region_index, unit_index, unit_count_arr))
+
+    owner_arr = numpy.asarray(owner_arr)
+    locs = owner_arr >= 0
+    r ^= xor_reduce(zobrist_keys.owner_keys[numpy.nonzero(locs)[0], owner_arr[locs]])
+
+    r ^= xor_reduce(zobrist_keys.industry_keys[numpy.asarray(has_industry_arr, dtype=bool)])
+
+    if player is not None:
+        r ^= zobrist_keys.player_keys[player]
+
+    if ipc_bank_arr is not None:
+        r ^= xor_reduce(mix_keys(zobrist_keys.ipc_keys[:len(ipc_bank_arr)], ipc_bank_arr))
+
+    return numpy.uint64(r)
+
+
+def update_unit_count(zobrist_keys, cur_hash, region_index, unit_index, old_count, new_count):
+    unit_count_keys = find_unit_count_keys(zobrist_keys, region_index, unit_index, [old_count, new_count])
+    return numpy.uint64(cur_hash ^ unit_count_keys[0] ^ unit_count_keys[1])
+
+
+def update_owner(zobrist_keys, cur_hash, region_index, old_owner, new_owner):
+    r = numpy.uint64(cur_hash)
+    if old_owner >= 0:
+        r ^= zobrist_keys.owner_keys[region_index, old_owner]
+    if new_owner >= 0:
+        r ^= zobrist_keys.owner_keys[region_index, new_owner]
+    return r
+
+
+def update_industry(zobrist_keys, cur_hash, region_index):
+    # industry is built or destroyed
+    return numpy.uint64(cur_hash ^ zobrist_keys.industry_keys[region_index])
+
+
+def update_player(zobrist_keys, cur_hash, old_player, new_player):
+    return numpy.uint64(cur_hash ^ zobrist_keys.player_keys[old_player] ^ zobrist_keys.player_keys[new_player])
+
+
+def update_ipc(zobrist_keys, cur_hash, player, old_ipc, new_ipc):
+    ipc_key = zobrist_keys.ipc_keys[player]
+    return numpy.uint64(cur_hash ^ mix_keys(ipc_key, old_ipc) ^ mix_keys(ipc_key, new_ipc))
+
+
+def build_region_status_arrays(region_status_dict, unit_names, owner_dict=None):
+    # regions ordered by id, returns (region_id_list, unit_count_arr, owner_arr, has_industry_arr)
+    region_id_list = sorted(region_status_dict.keys())
+    unit_index_dict = {x:i for i, x in enumerate(unit_names)}
+
+    unit_count_arr = numpy.zeros((len(region_id_list), len(unit_names)), dtype=numpy.int64)
+    owner_arr = numpy.full(len(region_id_list), -1, dtype=numpy.int64)
+    has_industry_arr = numpy.zeros(len(region_id_list), dtype=bool)
+    for i, region_id in enumerate(region_id_list):
+        region_status = region_status_dict[region_id]
+        for cur_unit in region_status.unit_list:
+            unit_count_arr[i, unit_index_dict[cur_unit.name]] += 1
+        has_industry_arr[i] = region_status.has_industry
+        if owner_dict is not None and region_id in owner_dict:
+            owner_arr[i] = owner_dict[region_id]
+
+    return region_id_list, unit_count_arr, owner_arr, has_industry_arr
+